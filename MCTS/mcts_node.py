@@ -70,7 +70,7 @@ class MCTSNode(Generic[Node_info, Action, Example]):
             'score': self.score,
             'score_details': self.score_details,  # Ensure details are serializable
             'is_terminal': self.is_terminal,
-            'action': self.action,
+            'action': str(self.action) if self.action is not None else None,  # Actions are stored as their text
             'node_info': self.node_info,  # Ensure node_info is serializable
             'parent_id': self.parent.id if self.parent else None,  # Store parent ID for reference
             'depth': self.depth,
@@ -0,0 +1,305 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Rule-based pruning of candidate actions before they are verified.
+
+Every candidate returned by the action extractors costs one verifier call,
+yet many of them can be ruled out from the screen alone: clicking a disabled
+element, editing a disabled field, clearing an empty field. A
+`PruningRule` describes one such case declaratively and can be limited to
+some apps; `ActionPruner` applies a list of rules and counts how often each
+one fires.
+
+A rule either prunes a candidate, so that it is never scored, or demotes it
+behind the remaining candidates, so that it only wins if it scores strictly
+better than all of them.
+"""
+
+import collections
+import dataclasses
+import json
+from typing import Any
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+from android_world.agents import candidate_action
+from android_world.env import representation_utils
+
+Candidate = Union[str, candidate_action.CandidateAction]
+
+PRUNE = 'prune'
+DEMOTE = 'demote'
+
+_ELEMENT_FIELDS = frozenset(
+    field.name for field in dataclasses.fields(representation_utils.UIElement)
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class PruningRule:
+  """A declarative rule matching candidate actions.
+
+  A rule matches a candidate when all of its conditions hold: the action type
+  is one of `action_types`; the target element has every attribute value in
+  `element`; the app is one of `packages`, if given; and, with
+  `text_matches_element`, the action types the text the element already
+  shows. Rules with element conditions never match actions without a target.
+
+  Attributes:
+    name: Name used for hit counters and logs.
+    action_types: Action types the rule applies to.
+    element: Required UIElement attribute values, compared with ==.
+    packages: Apps the rule is limited to; empty applies it to every app. The
+      target element's package is used, or the foreground app for actions
+      without a target.
+    text_matches_element: Only match when the action's text equals the
+      target element's text.
+    effect: PRUNE or DEMOTE.
+  """
+
+  name: str
+  action_types: tuple[str, ...]
+  element: Mapping[str, Any] = dataclasses.field(default_factory=dict)
+  packages: tuple[str, ...] = ()
+  text_matches_element: bool = False
+  effect: str = PRUNE
+
+  def __post_init__(self):
+    if self.effect not in (PRUNE, DEMOTE):
+      raise ValueError(f'Unknown effect {self.effect!r} in rule {self.name}.')
+    unknown = set(self.element) - _ELEMENT_FIELDS
+    if unknown:
+      raise ValueError(
+          f'Unknown element attributes {sorted(unknown)} in rule {self.name}.'
+      )
+    # Configs come from JSON, which has no tuples.
+    object.__setattr__(self, 'action_types', tuple(self.action_types))
+    object.__setattr__(self, 'packages', tuple(self.packages))
+
+  @classmethod
+  def from_dict(cls, config: Mapping[str, Any]) -> 'PruningRule':
+    return cls(**config)
+
+  @property
+  def needs_element(self) -> bool:
+    return bool(self.element) or self.text_matches_element
+
+  def matches(
+      self,
+      action: Mapping[str, Any],
+      element: Optional[representation_utils.UIElement],
+      package: Optional[str] = None,
+  ) -> bool:
+    """Returns whether the rule applies to a parsed candidate action.
+
+    Args:
+      action: The candidate as a dict.
+      element: The element the candidate targets, if any.
+      package: The foreground app.
+    """
+    if action.get('action_type') not in self.action_types:
+      return False
+    if element is None and self.needs_element:
+      return False
+    if self.packages:
+      app = element.package_name if element is not None else package
+      if app not in self.packages:
+        return False
+    for key, value in self.element.items():
+      if getattr(element, key) != value:
+        return False
+    if self.text_matches_element:
+      text = action.get('text')
+      if not text or not element.text or text.strip() != element.text.strip():
+        return False
+    return True
+
+
+# VDroid prunes input_text candidates while their text is still the
+# '<text_input>' placeholder, so a text_matches_element rule would never fire
+# there; it is left to custom rules applied to completed actions.
+DEFAULT_RULES = (
+    PruningRule(
+        name='click_disabled',
+        action_types=('click', 'long_press'),
+        element={'is_enabled': False},
+    ),
+    PruningRule(
+        name='edit_disabled',
+        action_types=('input_text', 'clear_text'),
+        element={'is_enabled': False},
+    ),
+    PruningRule(
+        name='clear_empty_field',
+        action_types=('clear_text',),
+        element={'text': None},
+    ),
+    # Children of long-clickable parents still receive the long press, and
+    # sliders are scrolled by index, so these are only demoted.
+    PruningRule(
+        name='long_press_not_long_clickable',
+        action_types=('long_press',),
+        element={'is_long_clickable': False},
+        effect=DEMOTE,
+    ),
+    PruningRule(
+        name='scroll_not_scrollable',
+        action_types=('scroll',),
+        element={'is_scrollable': False},
+        effect=DEMOTE,
+    ),
+)
+
+
+def load_rules(path: str) -> list[PruningRule]:
+  """Loads rules from a JSON file holding a list of rule dicts."""
+  with open(path) as f:
+    return [PruningRule.from_dict(config) for config in json.load(f)]
+
+
+@dataclasses.dataclass
+class PruningResult:
+  """Outcome of pruning one list of candidates.
+
+  Attributes:
+    actions: Candidates left for the verifier, demoted ones last.
+    pruned: (candidate, rule name) pairs that were dropped.
+    demoted: (candidate, rule name) pairs moved to the end of `actions`.
+  """
+
+  actions: list[Candidate]
+  pruned: list[tuple[Candidate, str]]
+  demoted: list[tuple[Candidate, str]]
+
+
+class ActionPruner:
+  """Applies pruning rules to candidate actions and counts rule hits."""
+
+  def __init__(self, rules: Sequence[PruningRule] = DEFAULT_RULES):
+    """Initializes the pruner.
+
+    Args:
+      rules: Rules in priority order; the first matching rule decides.
+    """
+    self._rules = tuple(rules)
+    self._hits = collections.Counter()
+
+  @property
+  def rules(self) -> tuple[PruningRule, ...]:
+    return self._rules
+
+  @property
+  def hits(self) -> dict[str, int]:
+    """Number of candidates each rule has matched so far."""
+    return dict(self._hits)
+
+  def reset_hits(self) -> None:
+    self._hits.clear()
+
+  def match(
+      self,
+      action: Mapping[str, Any],
+      elements: Mapping[int, representation_utils.UIElement],
+      package: Optional[str] = None,
+  ) -> Optional[PruningRule]:
+    """Returns the first rule matching a parsed candidate, if any."""
+    index = action.get('index')
+    element = elements.get(index) if isinstance(index, int) else None
+    for rule in self._rules:
+      if rule.matches(action, element, package):
+        return rule
+    return None
+
+  def apply(
+      self,
+      candidates: Sequence[Candidate],
+      elements: Mapping[int, representation_utils.UIElement],
+      package: Optional[str] = None,
+  ) -> PruningResult:
+    """Prunes and demotes candidates.
+
+    Args:
+      candidates: Candidate actions, parsed or as JSON strings.
+      elements: Elements by the display id the candidates index them with.
+      package: The foreground app.
+
+    Returns:
+      The remaining candidates in their original order, demoted ones last,
+      and what was pruned or demoted by which rule. Candidates that are not
+      valid JSON are kept.
+    """
+    kept = []
+    pruned = []
+    demoted = []
+    for candidate in candidates:
+      if isinstance(candidate, candidate_action.CandidateAction):
+        action = candidate.arguments
+      else:
+        try:
+          action = json.loads(candidate)
+        except ValueError:
+          action = None
+      rule = None
+      if isinstance(action, dict):
+        rule = self.match(action, elements, package)
+      if rule is None:
+        kept.append(candidate)
+        continue
+      self._hits[rule.name] += 1
+      if rule.effect == PRUNE:
+        pruned.append((candidate, rule.name))
+      else:
+        demoted.append((candidate, rule.name))
+    return PruningResult(
+        actions=kept + [candidate for candidate, _ in demoted],
+        pruned=pruned,
+        demoted=demoted,
+    )
+
+
+def elements_by_display_id(
+    forest: Any,
+    extra_attributes: Mapping[tuple[int, int], Mapping[str, Any]],
+) -> dict[int, representation_utils.UIElement]:
+  """Maps display ids to UI elements.
+
+  Display ids index the candidate actions and skip keyboard, invisible and
+  notification nodes, so they differ from positions in `ui_elements`.
+
+  Args:
+    forest: The accessibility forest the candidates were extracted from.
+    extra_attributes: The mapping returned by the action extractors with
+      `return_mapping=True`.
+
+  Returns:
+    The element of every node that has a display id.
+  """
+  elements = {}
+  for window in forest.windows:
+    for node in window.tree.nodes:
+      attributes = extra_attributes.get((window.id, node.unique_id))
+      if attributes and attributes.get('display_id') is not None:
+        elements[attributes['display_id']] = (
+            representation_utils.accessibility_node_to_ui_element(node)
+        )
+  return elements
+
+
+def foreground_package(forest: Any) -> Optional[str]:
+  """Returns the package of the first application window, if any."""
+  for window in forest.windows:
+    if window.window_type == window.TYPE_APPLICATION and window.tree.nodes:
+      return window.tree.nodes[0].package_name
+  return None
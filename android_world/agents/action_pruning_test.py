@@ -0,0 +1,225 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import tempfile
+
+from absl.testing import absltest
+from android_world.agents import action_pruning
+from android_world.agents import candidate_action
+from android_world.env import representation_utils
+from android_world.utils import synthetic_forest
+from html_representation import html_representation
+
+_UIElement = representation_utils.UIElement
+
+
+def _click(index):
+  return json.dumps({'action_type': 'click', 'index': index})
+
+
+def _long_press(index):
+  return json.dumps({'action_type': 'long_press', 'index': index})
+
+
+class PruningRuleTest(absltest.TestCase):
+
+  def test_matches_element_attributes(self):
+    rule = action_pruning.PruningRule(
+        name='r', action_types=('click',), element={'is_enabled': False}
+    )
+
+    self.assertTrue(
+        rule.matches({'action_type': 'click'}, _UIElement(is_enabled=False))
+    )
+    self.assertFalse(
+        rule.matches({'action_type': 'click'}, _UIElement(is_enabled=True))
+    )
+    self.assertFalse(
+        rule.matches({'action_type': 'scroll'}, _UIElement(is_enabled=False))
+    )
+    self.assertFalse(rule.matches({'action_type': 'click'}, None))
+
+  def test_packages_limit_rule(self):
+    rule = action_pruning.PruningRule(
+        name='r', action_types=('click',), packages=('com.a',)
+    )
+
+    self.assertTrue(
+        rule.matches({'action_type': 'click'}, _UIElement(package_name='com.a'))
+    )
+    self.assertFalse(
+        rule.matches({'action_type': 'click'}, _UIElement(package_name='com.b'))
+    )
+    # Actions without a target fall back to the foreground app.
+    self.assertTrue(rule.matches({'action_type': 'click'}, None, 'com.a'))
+    self.assertFalse(rule.matches({'action_type': 'click'}, None, 'com.b'))
+
+  def test_text_matches_element(self):
+    rule = action_pruning.PruningRule(
+        name='r', action_types=('input_text',), text_matches_element=True
+    )
+    element = _UIElement(text='hello ')
+
+    self.assertTrue(
+        rule.matches({'action_type': 'input_text', 'text': 'hello'}, element)
+    )
+    self.assertFalse(
+        rule.matches({'action_type': 'input_text', 'text': 'world'}, element)
+    )
+    self.assertFalse(
+        rule.matches(
+            {'action_type': 'input_text', 'text': 'hello'}, _UIElement()
+        )
+    )
+
+  def test_rejects_invalid_rules(self):
+    with self.assertRaisesRegex(ValueError, 'Unknown effect'):
+      action_pruning.PruningRule(name='r', action_types=(), effect='drop')
+    with self.assertRaisesRegex(ValueError, 'Unknown element attributes'):
+      action_pruning.PruningRule(
+          name='r', action_types=(), element={'enabled': False}
+      )
+
+  def test_load_rules(self):
+    path = os.path.join(tempfile.mkdtemp(), 'rules.json')
+    with open(path, 'w') as f:
+      json.dump(
+          [{
+              'name': 'no_wait',
+              'action_types': ['wait'],
+              'packages': ['com.a'],
+              'effect': 'demote',
+          }],
+          f,
+      )
+
+    (rule,) = action_pruning.load_rules(path)
+
+    self.assertEqual(rule.action_types, ('wait',))
+    self.assertEqual(rule.packages, ('com.a',))
+    self.assertEqual(rule.effect, action_pruning.DEMOTE)
+
+
+class ActionPrunerTest(absltest.TestCase):
+
+  def test_prunes_demotes_and_counts(self):
+    elements = {
+        0: _UIElement(is_enabled=False, is_long_clickable=False),
+        1: _UIElement(is_enabled=True, is_long_clickable=False),
+        2: _UIElement(is_enabled=True, is_long_clickable=True),
+    }
+    candidates = [
+        _click(0), _long_press(0), _click(1), _long_press(1), _click(2),
+        _long_press(2), '{"action_type": "navigate_back"}', 'not json',
+    ]
+    pruner = action_pruning.ActionPruner()
+
+    result = pruner.apply(candidates, elements)
+
+    self.assertEqual(
+        result.actions,
+        [
+            _click(1), _click(2), _long_press(2),
+            '{"action_type": "navigate_back"}', 'not json', _long_press(1),
+        ],
+    )
+    self.assertEqual(
+        result.pruned,
+        [(_click(0), 'click_disabled'), (_long_press(0), 'click_disabled')],
+    )
+    self.assertEqual(
+        result.demoted, [(_long_press(1), 'long_press_not_long_clickable')]
+    )
+    self.assertEqual(
+        pruner.hits,
+        {'click_disabled': 2, 'long_press_not_long_clickable': 1},
+    )
+
+    pruner.reset_hits()
+    self.assertEqual(pruner.hits, {})
+
+  def test_accepts_parsed_candidates(self):
+    candidates = [
+        candidate_action.CandidateAction.parse(_click(0)),
+        candidate_action.CandidateAction.parse(_click(1)),
+    ]
+
+    result = action_pruning.ActionPruner().apply(
+        candidates, {0: _UIElement(is_enabled=False), 1: _UIElement()}
+    )
+
+    self.assertEqual(result.actions, candidates[1:])
+    self.assertEqual(result.pruned, [(candidates[0], 'click_disabled')])
+
+  def test_first_matching_rule_wins(self):
+    pruner = action_pruning.ActionPruner([
+        action_pruning.PruningRule(name='a', action_types=('click',)),
+        action_pruning.PruningRule(name='b', action_types=('click',)),
+    ])
+
+    result = pruner.apply([_click(0)], {0: _UIElement()})
+
+    self.assertEqual(result.pruned, [(_click(0), 'a')])
+
+  def test_no_rules_keeps_everything(self):
+    candidates = [_click(0), _long_press(0)]
+
+    result = action_pruning.ActionPruner([]).apply(
+        candidates, {0: _UIElement(is_enabled=False)}
+    )
+
+    self.assertEqual(result.actions, candidates)
+
+
+class ForestHelpersTest(absltest.TestCase):
+
+  def test_elements_by_display_id_match_candidates(self):
+    forest = synthetic_forest.generate_forest(
+        300, num_windows=2, include_keyboard=True, disabled_fraction=0.2
+    )
+    candidates, extra_attributes = (
+        html_representation.extract_actions_with_display_id_v2(
+            forest, return_mapping=True
+        )
+    )
+
+    elements = action_pruning.elements_by_display_id(forest, extra_attributes)
+
+    indices = {
+        json.loads(candidate)['index']
+        for candidate in candidates
+        if 'index' in json.loads(candidate)
+    }
+    self.assertNotEmpty(indices)
+    self.assertContainsSubset(indices, elements)
+    self.assertTrue(
+        all(
+            element.package_name != 'com.google.android.inputmethod.latin'
+            for element in elements.values()
+        )
+    )
+    result = action_pruning.ActionPruner().apply(candidates, elements)
+    self.assertNotEmpty(result.pruned)
+
+  def test_foreground_package(self):
+    forest = synthetic_forest.generate_forest(50, num_windows=2)
+
+    self.assertEqual(
+        action_pruning.foreground_package(forest), 'com.example.app'
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,157 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Typed candidate actions.
+
+VDroidAgent extracts candidate actions as JSON strings, shows them to the
+verifier, completes the chosen one with the LLM and executes it. A
+`CandidateAction` is parsed once when it is extracted and carries the parsed
+fields, the target's bounding box and the exact text shown to the verifier
+through all of these stages.
+"""
+
+import dataclasses
+import functools
+import hashlib
+import json
+from typing import Any
+from typing import Mapping
+from typing import Optional
+
+from android_world.agents import agent_utils
+from android_world.env import json_action
+from android_world.env import representation_utils
+
+# Placeholder the LLM has to fill in before the action can be executed.
+_PLACEHOLDERS = {
+    'input_text': '<text_input>',
+    'open_app': '<name>',
+    'answer': '<answer_text>',
+}
+
+
+def _parse_arguments(text: str) -> dict[str, Any]:
+  """Parses an action string, tolerating LLM output around the JSON."""
+  try:
+    arguments = json.loads(text)
+  except ValueError:
+    arguments = agent_utils.extract_json(text)
+  return arguments if isinstance(arguments, dict) else {}
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class CandidateAction:
+  """A candidate action parsed once from its JSON text.
+
+  Candidates compare and hash by `key`, a hash of their canonical JSON that
+  is stable across processes.
+
+  Attributes:
+    text: The action as rendered in prompts and logs.
+    arguments: The parsed JSON fields; empty if `text` is not an action.
+      Treat as read-only; `to_dict` returns a copy.
+    bbox: Pixel bounding box of the target element, if known.
+  """
+
+  text: str
+  arguments: Mapping[str, Any]
+  bbox: Optional[representation_utils.BoundingBox] = None
+
+  @classmethod
+  def parse(
+      cls,
+      text: str,
+      elements: Optional[Mapping[int, representation_utils.UIElement]] = None,
+  ) -> 'CandidateAction':
+    """Parses an action string.
+
+    Args:
+      text: The action as a JSON string, optionally surrounded by other text.
+      elements: Elements by the index the action refers to, used to attach
+        the target's bounding box.
+
+    Returns:
+      The candidate; never raises on malformed text.
+    """
+    arguments = _parse_arguments(text)
+    bbox = None
+    index = arguments.get('index')
+    if elements and isinstance(index, int) and index in elements:
+      bbox = elements[index].bbox_pixels
+    return cls(text, arguments, bbox)
+
+  @property
+  def action_type(self) -> Optional[str]:
+    return self.arguments.get('action_type')
+
+  @property
+  def index(self) -> Optional[int]:
+    index = self.arguments.get('index')
+    return index if isinstance(index, int) else None
+
+  @property
+  def needs_completion(self) -> bool:
+    """Whether the action still holds a placeholder for the LLM to fill."""
+    placeholder = _PLACEHOLDERS.get(self.action_type)
+    return placeholder is not None and placeholder in self.text
+
+  @functools.cached_property
+  def key(self) -> int:
+    if self.arguments:
+      canonical = json.dumps(
+          dict(self.arguments), sort_keys=True, ensure_ascii=False
+      )
+    else:
+      canonical = self.text
+    digest = hashlib.blake2b(canonical.encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
+
+  def completed(self, text: str) -> 'CandidateAction':
+    """Returns the candidate the LLM completed this one into.
+
+    The bounding box is kept if the completion targets the same element.
+
+    Args:
+      text: The completed action.
+    """
+    completion = CandidateAction.parse(text)
+    if self.bbox is not None and completion.index == self.index:
+      completion = dataclasses.replace(completion, bbox=self.bbox)
+    return completion
+
+  def to_dict(self) -> dict[str, Any]:
+    return dict(self.arguments)
+
+  def to_json_action(self) -> json_action.JSONAction:
+    """Converts to an executable action.
+
+    Raises:
+      ValueError: If the text is not a valid action.
+    """
+    if not self.arguments:
+      raise ValueError(f'Cannot parse action: {self.text}')
+    try:
+      return json_action.JSONAction(**self.arguments)
+    except TypeError as e:
+      raise ValueError(f'Invalid action {self.text}: {e}') from e
+
+  def __eq__(self, other: Any) -> bool:
+    if not isinstance(other, CandidateAction):
+      return NotImplemented
+    return self.key == other.key
+
+  def __hash__(self) -> int:
+    return self.key
+
+  def __str__(self) -> str:
+    return self.text
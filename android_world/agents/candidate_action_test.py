@@ -0,0 +1,122 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import pickle
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import candidate_action
+from android_world.env import json_action
+from android_world.env import representation_utils
+
+CandidateAction = candidate_action.CandidateAction
+_CLICK = '{"action_type": "click", "index": 2}'
+
+
+class CandidateActionTest(parameterized.TestCase):
+
+  def test_parse(self):
+    bbox = representation_utils.BoundingBox(1, 2, 3, 4)
+    elements = {2: representation_utils.UIElement(bbox_pixels=bbox)}
+
+    action = CandidateAction.parse(_CLICK, elements)
+
+    self.assertEqual(action.text, _CLICK)
+    self.assertEqual(str(action), _CLICK)
+    self.assertEqual(action.action_type, 'click')
+    self.assertEqual(action.index, 2)
+    self.assertEqual(action.bbox, bbox)
+    self.assertEqual(action.to_dict(), {'action_type': 'click', 'index': 2})
+    self.assertEqual(
+        action.to_json_action(),
+        json_action.JSONAction(action_type='click', index=2),
+    )
+
+  def test_parses_llm_output(self):
+    action = CandidateAction.parse(
+        "Reason: ... {'action_type': 'open_app', 'app_name': 'Clock'}"
+    )
+
+    self.assertEqual(action.action_type, 'open_app')
+    self.assertEqual(action.to_dict()['app_name'], 'Clock')
+    self.assertIsNone(action.index)
+    self.assertIsNone(action.bbox)
+
+  @parameterized.parameters(
+      'not an action', '[1, 2]', '{"action_type": "fly"}', '{"bogus": 1}'
+  )
+  def test_invalid_action_raises_on_conversion(self, text):
+    action = CandidateAction.parse(text)
+
+    with self.assertRaises(ValueError):
+      action.to_json_action()
+
+  def test_key_is_stable(self):
+    action = CandidateAction.parse(_CLICK)
+    reordered = CandidateAction.parse('{"index": 2, "action_type": "click"}')
+    expected = int.from_bytes(
+        hashlib.blake2b(
+            b'{"action_type": "click", "index": 2}', digest_size=8
+        ).digest(),
+        'little',
+    )
+
+    self.assertEqual(action.key, expected)
+    self.assertEqual(action, reordered)
+    self.assertEqual(hash(action), hash(reordered))
+    self.assertNotEqual(
+        action, CandidateAction.parse('{"action_type": "click", "index": 3}')
+    )
+    self.assertLen({action, reordered}, 1)
+
+  @parameterized.parameters(
+      ('{"action_type": "input_text", "text": "<text_input>", "index": 1}',
+       True),
+      ('{"action_type": "input_text", "text": "hello", "index": 1}', False),
+      ('{"action_type": "open_app", "app_name": "<name>"}', True),
+      ('{"action_type": "answer", "text": "<answer_text>"}', True),
+      (_CLICK, False),
+  )
+  def test_needs_completion(self, text, expected):
+    self.assertEqual(CandidateAction.parse(text).needs_completion, expected)
+
+  def test_completed_keeps_bbox_of_same_target(self):
+    bbox = representation_utils.BoundingBox(1, 2, 3, 4)
+    action = CandidateAction.parse(
+        '{"action_type": "input_text", "text": "<text_input>", "index": 1}',
+        {1: representation_utils.UIElement(bbox_pixels=bbox)},
+    )
+
+    same = action.completed(
+        '{"action_type": "input_text", "text": "hi", "index": 1}'
+    )
+    other = action.completed(
+        '{"action_type": "input_text", "text": "hi", "index": 4}'
+    )
+
+    self.assertEqual(same.to_dict()['text'], 'hi')
+    self.assertEqual(same.bbox, bbox)
+    self.assertIsNone(other.bbox)
+
+  def test_pickles(self):
+    action = CandidateAction.parse(_CLICK)
+
+    restored = pickle.loads(pickle.dumps(action))
+
+    self.assertEqual(restored, action)
+    self.assertEqual(restored.text, _CLICK)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -412,16 +412,13 @@ class M3A(base_agent.EnvironmentInteractingAgent):
     step_data['physical_frame_boundary'] = physical_frame_boundary
     step_data['orientation'] = orientation
     
-    for index, ui_element in enumerate(before_ui_elements):
-      if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-        m3a_utils.add_ui_element_mark(
-            before_screenshot,
-            ui_element,
-            index,
-            logical_screen_size,
-            physical_frame_boundary,
-            orientation,
-        )
+    m3a_utils.add_ui_element_marks_batched(
+        before_screenshot,
+        before_ui_elements,
+        logical_screen_size,
+        physical_frame_boundary,
+        orientation,
+    )
     step_data['before_screenshot_with_som'] = before_screenshot.copy()
 
     infer.store_screen(step_data, step_idx, save_dir)
@@ -558,7 +555,7 @@ class M3A(base_agent.EnvironmentInteractingAgent):
       print('Agent answered with: ' + converted_action.text)
 
     try:
-      self.env.execute_action(converted_action)
+      self.env.execute_action(converted_action, state=state)
     except Exception as e:  # pylint: disable=broad-exception-caught
       print('Failed to execute action.')
       print(str(e))
@@ -582,16 +579,13 @@ class M3A(base_agent.EnvironmentInteractingAgent):
         after_ui_elements, logical_screen_size
     )
     after_screenshot = state.pixels.copy()
-    for index, ui_element in enumerate(after_ui_elements):
-      if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-        m3a_utils.add_ui_element_mark(
-            after_screenshot,
-            ui_element,
-            index,
-            logical_screen_size,
-            physical_frame_boundary,
-            orientation,
-        )
+    m3a_utils.add_ui_element_marks_batched(
+        after_screenshot,
+        after_ui_elements,
+        logical_screen_size,
+        physical_frame_boundary,
+        orientation,
+    )
 
     m3a_utils.add_screenshot_label(
         step_data['before_screenshot_with_som'], 'before'
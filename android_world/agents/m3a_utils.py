@@ -15,9 +15,14 @@
 """Utils for M3A."""
 
 import base64
+import collections
+import functools
 import re
-from typing import Any, Optional
+import threading
+from typing import Any, Callable, Optional
+from android_world.env import geometry
 from android_world.env import representation_utils
+from android_world.env import screenshot_buffer
 import cv2
 import numpy as np
 import random
@@ -147,69 +152,442 @@ def add_ui_element_mark(
         physical_frame_boundary,
         orientation,
     )
-    # pdb.set_trace()
-    if add_image_desc:
-      color = get_ui_element_color(ui_element)
-    else:
-      color = (0, 255, 0)
-    cv2.rectangle(
+    _draw_ui_element_mark(
         screenshot,
+        ui_element,
+        index,
         upper_left_physical,
         lower_right_physical,
-        color=color,
-        thickness=2,
+        add_image_desc,
     )
-    
-    if add_image_desc:
-       
-      label_lines = [f"{index}"]  # Start with the index 
-      if ui_element.text:
-          label_lines.append(ui_element.text)
-      if ui_element.content_description and ui_element.content_description != ui_element.text:
-          label_lines.append(ui_element.content_description)
 
-      label_text = ", ".join(label_lines)
 
-      text_size = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-      text_box_width = text_size[0] + 10  # Add padding around the text
+def add_ui_element_marks(
+    screenshot: np.ndarray,
+    ui_elements: list[representation_utils.UIElement],
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+    add_image_desc: bool = False,
+) -> None:
+  """Marks every valid UI element of a screen in the screenshot.
 
-      # Draw the white background for text
-      screenshot[
-          upper_left_physical[1] + 1 : upper_left_physical[1] + 25,
-          upper_left_physical[0] + 1 : upper_left_physical[0] + text_box_width,
-          :,
-      ] = (255, 255, 255)
+  Equivalent to calling validate_ui_element against the logical screen size
+  and then add_ui_element_mark for each element, with the geometry computed
+  for the whole screen at once.
 
-      cv2.putText(
-            screenshot,
-            label_text,
-            (upper_left_physical[0] + 5, upper_left_physical[1] + 20),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (0, 0, 0),
-            thickness=1,
-      )
-    else:
+  Args:
+    screenshot: The screenshot as a numpy ndarray.
+    ui_elements: The UI elements of the screen; marks use their list index.
+    logical_screen_size: The logical screen size.
+    physical_frame_boundary: The physical coordinates in portrait orientation
+      for the upper left and lower right corner for the frame.
+    orientation: The current screen orientation.
+    add_image_desc: Whether to color marks by element type and label them
+      with the element text.
+  """
+  bounds = geometry.ui_element_bounds(ui_elements)
+  valid = geometry.valid_ui_elements(
+      ui_elements, logical_screen_size, bounds=bounds
+  )
+  to_mark = valid & geometry.has_bounds(bounds)
+  if not to_mark.any():
+    return
+  corners = geometry.physical_corners(
+      bounds, logical_screen_size, physical_frame_boundary, orientation
+  ).tolist()
+  for index in np.flatnonzero(to_mark).tolist():
+    upper_left_x, upper_left_y, lower_right_x, lower_right_y = corners[index]
+    _draw_ui_element_mark(
+        screenshot,
+        ui_elements[index],
+        index,
+        (upper_left_x, upper_left_y),
+        (lower_right_x, lower_right_y),
+        add_image_desc,
+    )
+
+
+def _draw_ui_element_mark(
+    screenshot: np.ndarray,
+    ui_element: representation_utils.UIElement,
+    index: int,
+    upper_left_physical: tuple[int, int],
+    lower_right_physical: tuple[int, int],
+    add_image_desc: bool,
+) -> None:
+  """Draws the box and index label of one element at physical corners."""
+  if add_image_desc:
+    color = get_ui_element_color(ui_element)
+  else:
+    color = (0, 255, 0)
+  cv2.rectangle(
+      screenshot,
+      upper_left_physical,
+      lower_right_physical,
+      color=color,
+      thickness=2,
+  )
+
+  if add_image_desc:
+    label_lines = [f"{index}"]  # Start with the index
+    if ui_element.text:
+        label_lines.append(ui_element.text)
+    if ui_element.content_description and ui_element.content_description != ui_element.text:
+        label_lines.append(ui_element.content_description)
 
-      screenshot[
+    label_text = ", ".join(label_lines)
+
+    text_size = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+    text_box_width = text_size[0] + 10  # Add padding around the text
+
+    # Draw the white background for text
+    screenshot[
         upper_left_physical[1] + 1 : upper_left_physical[1] + 25,
-        upper_left_physical[0] + 1 : upper_left_physical[0] + 35,
+        upper_left_physical[0] + 1 : upper_left_physical[0] + text_box_width,
         :,
-      ] = (255, 255, 255)
+    ] = (255, 255, 255)
+
+    cv2.putText(
+          screenshot,
+          label_text,
+          (upper_left_physical[0] + 5, upper_left_physical[1] + 20),
+          cv2.FONT_HERSHEY_SIMPLEX,
+          0.5,
+          (0, 0, 0),
+          thickness=1,
+    )
+  else:
+    screenshot[
+      upper_left_physical[1] + 1 : upper_left_physical[1] + 25,
+      upper_left_physical[0] + 1 : upper_left_physical[0] + 35,
+      :,
+    ] = (255, 255, 255)
+
+    cv2.putText(
+      screenshot,
+      str(index),
+      (
+          upper_left_physical[0] + 1,
+          upper_left_physical[1] + 20,
+      ),
+      cv2.FONT_HERSHEY_SIMPLEX,
+      0.7,
+      (0, 0, 0),
+      thickness=2,
+    )
+
+
+_WHITE = (255, 255, 255)
 
+
+class GlyphAtlas:
+  """Cache of pre-rendered black-on-white labels for one Hershey font.
+
+  OpenCV anti-aliases text and places characters at sub-pixel advances, so
+  whole labels are the glyphs: a label is rendered once with cv2.putText on
+  white, and its coverage is then multiplied into the screenshot wherever
+  the label is needed. Mark labels are mostly element indices, which repeat
+  on every screen.
+  """
+
+  def __init__(
+      self,
+      font_scale: float,
+      thickness: int,
+      font: int = cv2.FONT_HERSHEY_SIMPLEX,
+      max_bytes: int = 16 << 20,
+  ):
+    """Initializes an empty atlas.
+
+    Args:
+      font_scale: Font scale passed to cv2.putText.
+      thickness: Stroke thickness passed to cv2.putText.
+      font: Hershey font passed to cv2.putText.
+      max_bytes: Tiles beyond this total size evict the least recently used
+        labels.
+    """
+    self.font_scale = font_scale
+    self.thickness = thickness
+    self.font = font
+    self.max_bytes = max_bytes
+    self._labels = collections.OrderedDict()
+    self._num_bytes = 0
+    # The shared atlases are used by screenshot writer threads too.
+    self._lock = threading.Lock()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._labels)
+
+  @property
+  def num_bytes(self) -> int:
+    with self._lock:
+      return self._num_bytes
+
+  def preload(self, labels: Any) -> None:
+    for label in labels:
+      self.glyph(label)
+
+  def _render(self, label: str) -> tuple[np.ndarray, int, int, int]:
+    (width, height), baseline = cv2.getTextSize(
+        label, self.font, self.font_scale, self.thickness
+    )
+    margin = 2 * self.thickness + 2
+    while True:
+      origin = (margin, margin + height)
+      canvas = np.full(
+          (height + baseline + 2 * margin, width + 2 * margin), 255, np.uint8
+      )
       cv2.putText(
-        screenshot,
-        str(index),
-        (
-            upper_left_physical[0] + 1,
-            upper_left_physical[1] + 20,
-        ),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.7,
-        (0, 0, 0),
-        thickness=2,
+          canvas,
+          label,
+          origin,
+          self.font,
+          self.font_scale,
+          0,
+          thickness=self.thickness,
+      )
+      rows, columns = np.nonzero(canvas < 255)
+      if not rows.size:
+        return np.full((0, 0, 3), 255, np.uint8), 0, 0, width
+      top, bottom = rows.min(), rows.max() + 1
+      left, right = columns.min(), columns.max() + 1
+      if (
+          top > 0
+          and left > 0
+          and bottom < canvas.shape[0]
+          and right < canvas.shape[1]
+      ):
+        break
+      # Strokes reached the border and may have been cut; retry larger.
+      margin *= 2
+    tile = np.repeat(canvas[top:bottom, left:right, None], 3, axis=2)
+    return tile, int(left) - origin[0], int(top) - origin[1], width
+
+  def glyph(self, label: str) -> tuple[np.ndarray, int, int, int]:
+    """Returns (tile, dx, dy, width) of a label.
+
+    Args:
+      label: The text to render.
+
+    Returns:
+      The tile is an (H, W, 3) uint8 array holding the label drawn in black
+      on white, whose upper left corner sits at (dx, dy) from the text
+      origin; width is the text width as reported by cv2.getTextSize.
+    """
+    with self._lock:
+      glyph = self._labels.get(label)
+      if glyph is not None:
+        self._labels.move_to_end(label)
+        return glyph
+    rendered = self._render(label)
+    with self._lock:
+      # Another thread may have rendered the label meanwhile.
+      glyph = self._labels.get(label)
+      if glyph is not None:
+        self._labels.move_to_end(label)
+        return glyph
+      self._labels[label] = rendered
+      self._num_bytes += rendered[0].nbytes
+      while self._num_bytes > self.max_bytes and len(self._labels) > 1:
+        _, (evicted, *_) = self._labels.popitem(last=False)
+        self._num_bytes -= evicted.nbytes
+    return rendered
+
+
+@functools.lru_cache(maxsize=None)
+def _default_atlas(font_scale: float, thickness: int) -> GlyphAtlas:
+  return GlyphAtlas(font_scale, thickness)
+
+
+def _stamp(
+    screenshot: np.ndarray, tile: np.ndarray, left: int, top: int
+) -> None:
+  """Draws a label tile in black, clipped to the screenshot.
+
+  Scaling by the tile blends exactly like cv2.putText drawing black.
+  """
+  height, width = screenshot.shape[:2]
+  x0, y0 = max(left, 0), max(top, 0)
+  x1 = min(left + tile.shape[1], width)
+  y1 = min(top + tile.shape[0], height)
+  if x0 >= x1 or y0 >= y1:
+    return
+  region = screenshot[y0:y1, x0:x1]
+  cv2.multiply(
+      region,
+      tile[y0 - top : y1 - top, x0 - left : x1 - left],
+      dst=region,
+      scale=1 / 255,
+  )
+
+
+def _fill_white(
+    screenshot: np.ndarray, top: int, bottom: int, left: int, right: int
+) -> None:
+  """Whitens screenshot[top:bottom, left:right] with slice semantics."""
+  height, width = screenshot.shape[:2]
+  top, bottom, _ = slice(top, bottom).indices(height)
+  left, right, _ = slice(left, right).indices(width)
+  if top < bottom and left < right:
+    cv2.rectangle(
+        screenshot, (left, top), (right - 1, bottom - 1), _WHITE, cv2.FILLED
+    )
+
+
+def add_ui_element_marks_batched(
+    screenshot: np.ndarray,
+    ui_elements: list[representation_utils.UIElement],
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+    add_image_desc: bool = False,
+    atlas: Optional[GlyphAtlas] = None,
+) -> None:
+  """Draws the same marks as add_ui_element_marks, in one pass.
+
+  Geometry, colors and labels of all marks are resolved up front, and the
+  labels are stamped from a GlyphAtlas instead of being rendered with
+  cv2.putText on every call. Marks are still drawn in index order, so
+  overlapping marks cover each other as before.
+
+  Args:
+    screenshot: The screenshot as a numpy ndarray.
+    ui_elements: The UI elements of the screen; marks use their list index.
+    logical_screen_size: The logical screen size.
+    physical_frame_boundary: The physical coordinates in portrait orientation
+      for the upper left and lower right corner for the frame.
+    orientation: The current screen orientation.
+    add_image_desc: Whether to color marks by element type and label them
+      with the element text.
+    atlas: Label cache to use instead of the shared one. It must use the
+      font of the marks: scale 0.5 and thickness 1 with add_image_desc,
+      scale 0.7 and thickness 2 without.
+  """
+  bounds = geometry.ui_element_bounds(ui_elements)
+  valid = geometry.valid_ui_elements(
+      ui_elements, logical_screen_size, bounds=bounds
+  )
+  to_mark = valid & geometry.has_bounds(bounds)
+  if not to_mark.any():
+    return
+  corners = geometry.physical_corners(
+      bounds, logical_screen_size, physical_frame_boundary, orientation
+  ).tolist()
+  if atlas is None:
+    atlas = (
+        _default_atlas(0.5, 1) if add_image_desc else _default_atlas(0.7, 2)
+    )
+
+  marks = []
+  for index in np.flatnonzero(to_mark).tolist():
+    ui_element = ui_elements[index]
+    if add_image_desc:
+      color = get_ui_element_color(ui_element)
+      label_lines = [f'{index}']
+      if ui_element.text:
+        label_lines.append(ui_element.text)
+      if (
+          ui_element.content_description
+          and ui_element.content_description != ui_element.text
+      ):
+        label_lines.append(ui_element.content_description)
+      tile, dx, dy, text_width = atlas.glyph(', '.join(label_lines))
+      box_width, text_offset = text_width + 10, (5, 20)
+    else:
+      color = (0, 255, 0)
+      tile, dx, dy, _ = atlas.glyph(str(index))
+      box_width, text_offset = 35, (1, 20)
+    marks.append((corners[index], color, tile, dx, dy, box_width, text_offset))
+
+  for corner, color, tile, dx, dy, box_width, text_offset in marks:
+    left, top, right, bottom = corner
+    cv2.rectangle(screenshot, (left, top), (right, bottom), color, 2)
+    _fill_white(screenshot, top + 1, top + 25, left + 1, left + box_width)
+    _stamp(
+        screenshot, tile, left + text_offset[0] + dx, top + text_offset[1] + dy
+    )
+
+
+class SetOfMarkScreenshot:
+  """A screenshot whose set-of-mark annotation is drawn on first use.
+
+  Keeps the raw pixels and everything the marks are drawn from. `render`
+  returns what marking a copy of the pixels with add_ui_element_marks_batched
+  (and then, if given, apply_group_bouding_boxes) would have returned, and
+  caches it as a read-only array (see screenshot_buffer). The object also
+  converts with np.asarray, so it can be saved or shown wherever the eagerly
+  annotated array was; np.array(screenshot) gives a writable copy.
+  """
+
+  def __init__(
+      self,
+      pixels: np.ndarray,
+      ui_elements: list[representation_utils.UIElement],
+      logical_screen_size: tuple[int, int],
+      physical_frame_boundary: tuple[int, int, int, int],
+      orientation: int,
+      add_image_desc: bool = False,
+      group_bounding_boxes: Optional[Callable[[], dict[Any, Any]]] = None,
+  ):
+    """Initializes the screenshot without drawing anything.
+
+    Args:
+      pixels: The raw screenshot, e.g. a screenshot_buffer.share view. It is
+        not copied, so it must not be modified afterwards.
+      ui_elements: The UI elements to mark.
+      logical_screen_size: The logical screen size.
+      physical_frame_boundary: The physical coordinates in portrait
+        orientation for the upper left and lower right corner for the frame.
+      orientation: The current screen orientation.
+      add_image_desc: Whether to color marks by element type and label them
+        with the element text.
+      group_bounding_boxes: Returns the group bounding boxes to draw over
+        the marks; only called when rendering. Must be picklable (e.g. a
+        functools.partial) for the screenshot to be.
+    """
+    self.pixels = pixels
+    self.ui_elements = ui_elements
+    self.logical_screen_size = logical_screen_size
+    self.physical_frame_boundary = physical_frame_boundary
+    self.orientation = orientation
+    self.add_image_desc = add_image_desc
+    self.group_bounding_boxes = group_bounding_boxes
+    self._rendered = None
+
+  @property
+  def is_rendered(self) -> bool:
+    return self._rendered is not None
+
+  @property
+  def shape(self) -> tuple[int, ...]:
+    return self.pixels.shape
+
+  def render(self) -> np.ndarray:
+    """Returns the read-only annotated screenshot, drawn on the first call."""
+    if self._rendered is None:
+      annotated = screenshot_buffer.writable_copy(self.pixels)
+      add_ui_element_marks_batched(
+          annotated,
+          self.ui_elements,
+          self.logical_screen_size,
+          self.physical_frame_boundary,
+          self.orientation,
+          add_image_desc=self.add_image_desc,
       )
-    
+      if self.group_bounding_boxes is not None:
+        apply_group_bouding_boxes(annotated, self.group_bounding_boxes())
+      self._rendered = screenshot_buffer.share(annotated)
+    return self._rendered
+
+  def __array__(self, dtype=None, copy=None):
+    rendered = self.render()
+    if copy:
+      return np.array(rendered, dtype=dtype, copy=True)
+    if copy is False and dtype is not None and dtype != rendered.dtype:
+      raise ValueError('Converting the screenshot dtype requires a copy.')
+    return rendered if dtype is None else rendered.astype(dtype, copy=False)
 
 
 def add_screenshot_label(screenshot: np.ndarray, label: str):
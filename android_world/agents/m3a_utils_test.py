@@ -0,0 +1,297 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import functools
+import pickle
+import threading
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+from android_world.env import screenshot_buffer
+from android_world.utils import synthetic_forest
+from html_representation import bbox_representation
+import numpy as np
+
+_SCREEN_SIZE = (1080, 2400)
+_FRAME = (0, 0, 1080, 2400)
+
+
+def _screen(seed=0):
+  forest = synthetic_forest.generate_forest(150, seed=seed)
+  ui_elements = representation_utils.forest_to_ui_elements(
+      forest, exclude_invisible_elements=True
+  )
+  pixels = np.random.default_rng(seed).integers(
+      0, 256, size=(_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3), dtype=np.uint8
+  )
+  return forest, ui_elements, pixels
+
+
+def _group_boxes(forest):
+  return functools.partial(
+      bbox_representation.turn_tree_to_group_bounding_boxes,
+      0,
+      _SCREEN_SIZE,
+      _FRAME,
+      forest,
+  )
+
+
+class SetOfMarkScreenshotTest(parameterized.TestCase):
+
+  @parameterized.parameters(False, True)
+  def test_render_matches_eager_annotation(self, add_image_desc):
+    forest, ui_elements, pixels = _screen()
+    eager = pixels.copy()
+    m3a_utils.add_ui_element_marks(
+        eager, ui_elements, _SCREEN_SIZE, _FRAME, 0, add_image_desc
+    )
+    if add_image_desc:
+      m3a_utils.apply_group_bouding_boxes(eager, _group_boxes(forest)())
+
+    screenshot = m3a_utils.SetOfMarkScreenshot(
+        pixels,
+        ui_elements,
+        _SCREEN_SIZE,
+        _FRAME,
+        0,
+        add_image_desc=add_image_desc,
+        group_bounding_boxes=(
+            _group_boxes(forest) if add_image_desc else None
+        ),
+    )
+
+    np.testing.assert_array_equal(screenshot.render(), eager)
+    np.testing.assert_array_equal(np.uint8(screenshot), eager)
+
+  def test_draws_nothing_until_used(self):
+    forest, ui_elements, pixels = _screen(1)
+    original = pixels.copy()
+    calls = []
+
+    def group_boxes():
+      calls.append(True)
+      return _group_boxes(forest)()
+
+    screenshot = m3a_utils.SetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _FRAME, 0, True, group_boxes
+    )
+    self.assertFalse(screenshot.is_rendered)
+    self.assertEmpty(calls)
+    self.assertEqual(screenshot.shape, pixels.shape)
+
+    rendered = screenshot.render()
+
+    self.assertIs(screenshot.render(), rendered)
+    self.assertLen(calls, 1)
+    np.testing.assert_array_equal(pixels, original)
+
+  def test_array_copy_is_writable(self):
+    _, ui_elements, pixels = _screen(2)
+    screenshot = m3a_utils.SetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _FRAME, 0
+    )
+
+    converted = np.array(screenshot)
+    converted[:] = 0
+
+    self.assertTrue(screenshot.render().any())
+
+  def test_array_view_is_shared_and_read_only(self):
+    _, ui_elements, pixels = _screen(2)
+    screenshot = m3a_utils.SetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _FRAME, 0
+    )
+
+    converted = np.asarray(screenshot)
+
+    self.assertTrue(np.shares_memory(converted, screenshot.render()))
+    self.assertTrue(np.shares_memory(np.uint8(screenshot), converted))
+    with self.assertRaises(ValueError):
+      converted[:] = 0
+
+  def test_render_leaves_shared_pixels_alone(self):
+    _, ui_elements, pixels = _screen(2)
+    shared = screenshot_buffer.share(pixels)
+    original = pixels.copy()
+
+    m3a_utils.SetOfMarkScreenshot(
+        shared, ui_elements, _SCREEN_SIZE, _FRAME, 0
+    ).render()
+
+    np.testing.assert_array_equal(shared, original)
+
+  def test_pickles(self):
+    forest, ui_elements, pixels = _screen(3)
+    screenshot = m3a_utils.SetOfMarkScreenshot(
+        pixels,
+        ui_elements,
+        _SCREEN_SIZE,
+        _FRAME,
+        0,
+        add_image_desc=True,
+        group_bounding_boxes=_group_boxes(forest),
+    )
+
+    restored = pickle.loads(pickle.dumps(screenshot))
+
+    np.testing.assert_array_equal(restored.render(), screenshot.render())
+
+
+
+def _edge_elements(width, height):
+  """Elements touching each screen edge and corner, with long labels."""
+  boxes = [
+      (0, 40, 0, 40),
+      (width - 40, width, 0, 40),
+      (0, 40, height - 40, height),
+      (width - 40, width, height - 40, height),
+      (0, width, 0, height),
+      (width // 2, width, height - 10, height),
+  ]
+  return [
+      representation_utils.UIElement(
+          text='label with descenders gjpqy ' * (index % 3),
+          class_name='android.widget.Button',
+          is_clickable=True,
+          is_visible=True,
+          bbox_pixels=representation_utils.BoundingBox(*box),
+      )
+      for index, box in enumerate(boxes)
+  ]
+
+
+class BatchedMarksTest(parameterized.TestCase):
+
+  @parameterized.product(
+      add_image_desc=(False, True),
+      screen_size=((720, 1280), (1080, 2400), (1440, 3200)),
+  )
+  def test_matches_per_element_marks(self, add_image_desc, screen_size):
+    width, height = screen_size
+    forest = synthetic_forest.generate_forest(
+        300, seed=width, screen_size=screen_size
+    )
+    ui_elements = representation_utils.forest_to_ui_elements(
+        forest, exclude_invisible_elements=True
+    ) + _edge_elements(width, height)
+    pixels = np.random.default_rng(width).integers(
+        0, 256, size=(height, width, 3), dtype=np.uint8
+    )
+    frame = (0, 0, width, height)
+    expected = pixels.copy()
+    m3a_utils.add_ui_element_marks(
+        expected, ui_elements, screen_size, frame, 0, add_image_desc
+    )
+
+    m3a_utils.add_ui_element_marks_batched(
+        pixels, ui_elements, screen_size, frame, 0, add_image_desc
+    )
+
+    np.testing.assert_array_equal(pixels, expected)
+
+  @parameterized.parameters(1, 3)
+  def test_matches_per_element_marks_rotated(self, orientation):
+    _, ui_elements, _ = _screen(4)
+    pixels = np.random.default_rng(4).integers(
+        0, 256, size=(_SCREEN_SIZE[0], _SCREEN_SIZE[1], 3), dtype=np.uint8
+    )
+    expected = pixels.copy()
+    m3a_utils.add_ui_element_marks(
+        expected, ui_elements, _SCREEN_SIZE[::-1], _FRAME, orientation
+    )
+
+    m3a_utils.add_ui_element_marks_batched(
+        pixels, ui_elements, _SCREEN_SIZE[::-1], _FRAME, orientation
+    )
+
+    np.testing.assert_array_equal(pixels, expected)
+
+  def test_uses_given_atlas(self):
+    _, ui_elements, pixels = _screen(5)
+    atlas = m3a_utils.GlyphAtlas(0.7, 2)
+
+    m3a_utils.add_ui_element_marks_batched(
+        pixels, ui_elements, _SCREEN_SIZE, _FRAME, 0, atlas=atlas
+    )
+
+    self.assertNotEmpty(atlas)
+    self.assertLessEqual(len(atlas), len(ui_elements))
+
+
+class GlyphAtlasTest(absltest.TestCase):
+
+  def test_caches_glyphs(self):
+    atlas = m3a_utils.GlyphAtlas(0.7, 2)
+
+    first = atlas.glyph('42')
+    second = atlas.glyph('42')
+
+    self.assertIs(first, second)
+    self.assertLen(atlas, 1)
+
+  def test_glyph_is_black_on_white_text(self):
+    atlas = m3a_utils.GlyphAtlas(0.7, 2)
+
+    tile, dx, dy, width = atlas.glyph('17')
+
+    self.assertEqual(tile.dtype, np.uint8)
+    self.assertEqual(tile.shape[2], 3)
+    self.assertEqual(tile.min(), 0)
+    self.assertLess(dx, 5)
+    self.assertLess(dy, 0)
+    self.assertGreater(width, 0)
+
+  def test_empty_label(self):
+    atlas = m3a_utils.GlyphAtlas(0.5, 1)
+
+    tile, _, _, width = atlas.glyph('')
+
+    self.assertEqual(tile.size, 0)
+    self.assertEqual(width, 0)
+
+  def test_evicts_least_recently_used(self):
+    sizes = m3a_utils.GlyphAtlas(0.7, 2)
+    budget = sum(sizes.glyph(label)[0].nbytes for label in '123') - 1
+    atlas = m3a_utils.GlyphAtlas(0.7, 2, max_bytes=budget)
+    atlas.preload(['1', '2'])
+    kept = atlas.glyph('1')
+
+    atlas.glyph('3')
+
+    self.assertLessEqual(atlas.num_bytes, budget)
+    self.assertLen(atlas, 2)
+    self.assertIs(atlas.glyph('1'), kept)
+
+  def test_byte_count_stays_exact_across_threads(self):
+    atlas = m3a_utils.GlyphAtlas(0.7, 2, max_bytes=20000)
+
+    def render(seed):
+      for i in range(300):
+        atlas.glyph(str((seed * 7 + i * 13) % 200))
+
+    threads = [threading.Thread(target=render, args=(i,)) for i in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    cached = atlas._labels.values()  # pylint: disable=protected-access
+    self.assertEqual(atlas.num_bytes, sum(tile.nbytes for tile, *_ in cached))
+    self.assertLessEqual(atlas.num_bytes, 20000)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -1,27 +1,30 @@
 from absl import logging
 from MCTS.mcts_node import MCTSNode
-from android_world.agents import agent_utils
+from android_world.agents import action_pruning
 from android_world.agents import base_agent
+from android_world.agents import candidate_action
 from android_world.agents import infer
 from android_world.agents import m3a_utils
 from android_world.agents.reward_model import MAX_LENGTH
+from android_world.env import forest_view
 from android_world.env import interface
-from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.env import screenshot_buffer
 from typing import Generic, TypeVar, Optional, NamedTuple, Callable, Hashable
 import numpy as np
 from abc import ABC, abstractmethod
 import math
 import os
 import re
-from PIL import Image
 from tqdm import trange
 from copy import deepcopy
+import functools
 from math import ceil
 from typing import Type
 import torch
 
 from android_world.task_evals import task_eval
+from android_world.utils import screenshot_writer
 from html_representation.bbox_representation import turn_tree_to_group_bounding_boxes
 from html_representation.html_representation import extract_actions_with_display_id, html_truncate, turn_tree_to_html_input, extract_actions_with_display_id_v2, turn_tree_to_html_input_v2
 from util import ActionStack, entropy_estimation, generate_step_summary, obtain_reversed_action, polish_summary, polish_action, polish_reason
@@ -99,6 +102,33 @@ class ModelActor:
         return True
 
 
+def start_model_actors(service_name, local_model_name, adapter_dir, num_actors: int) -> list:
+    """Starts num_actors ModelActors, one GPU each, and waits until they are warmed up.
+
+    Ray runs the calls to an actor one at a time, so the returned actors can be shared by agents
+    running on different threads.
+    """
+    if not ray.is_initialized():
+        ray.init()
+
+    num_gpus = ray.cluster_resources().get('GPU', 0)
+    if num_actors > num_gpus:
+        raise RuntimeError(
+            f'{num_actors} model actors need one GPU each, but the Ray cluster has {num_gpus:g}.'
+            ' Lower --num_gpus or add GPUs.')
+
+    actors = []
+    ModelClass = ModelActor.options(num_gpus=1)
+    for _ in range(num_actors):
+        actor = ModelClass.remote(
+            service_name, local_model_name, adapter_dir, "dynamic_batch")
+        actors.append(actor)
+
+    ray.get([act.ping.remote() for act in actors])
+    ray.get([act.warm_up.remote() for act in actors])
+    return actors
+
+
 class VDroidAgent(base_agent.EnvironmentInteractingAgent):
     """V-Droid for mobile task automation"""
 
@@ -131,6 +161,9 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         family: str = "android_world",
         summary_mode: str = 'llm',
         num_actors: int = 2,
+        pruning_rules: Optional[list[action_pruning.PruningRule]] = None,
+        screenshot_config: Optional[screenshot_writer.WriterConfig] = None,
+        actors: Optional[list] = None,
     ):
         """Initializes a M3A Agent.
 
@@ -148,20 +181,18 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         :param cum_reward: the way to calculate the cumulative reward from each step. Defaults: sum
         :param w_exp: the weight of exploration in UCT
         :param explore_step_count_limit: the step count limit for simulation
+        :param pruning_rules: rules dropping or demoting candidate actions before they are scored.
+                              Defaults to action_pruning.DEFAULT_RULES; pass [] to score every candidate.
+        :param screenshot_config: format, downscaling and queueing of the screenshots saved under save_dir.
+                                  Defaults to JPEG at the PIL default quality.
+        :param actors: ModelActors from start_model_actors to score with, e.g. shared by the agents of
+                       several devices. If None, the agent starts num_actors of its own, one GPU each.
         """
         super().__init__(env, name)
 
-        if not ray.is_initialized():
-            ray.init()
-
-        actors = []
-        ModelClass = ModelActor.options(num_gpus=1)
-        for _ in range(num_actors):
-            actor = ModelClass.remote(
-                service_name, local_model_name, adapter_dir, "dynamic_batch")
-            actors.append(actor)
-
-        ray.get([act.ping.remote() for act in actors])
+        if actors is None:
+            actors = start_model_actors(
+                service_name, local_model_name, adapter_dir, num_actors)
 
         # llm used for action completion and working memory construction
         self.llm = infer.Gpt4Wrapper(llm_name, service_name, temperature=0.2)
@@ -185,6 +216,8 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         if save_dir != None:
             self.save_path = os.path.join(save_dir, f"screen_shot/")
             os.makedirs(self.save_path, exist_ok=True)
+        # save_path may also be set per episode by episode_runner.run_episode.
+        self.screenshot_writer = screenshot_writer.ScreenshotWriter(screenshot_config)
 
         assert output_strategy in ['max_reward', 'follow_max',
                                    'max_visit', 'max_iter', 'last_iter', 'last_terminal_iter']
@@ -212,16 +245,17 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
 
         self.family = family
         self.summary_mode = summary_mode
+        self.action_pruner = action_pruning.ActionPruner(
+            action_pruning.DEFAULT_RULES if pruning_rules is None else pruning_rules)
 
-        warmup_futs = [act.warm_up.remote() for act in actors]
-        ray.get(warmup_futs)
-        self.num_actors = num_actors
+        self.num_actors = len(actors)
         self.actors = actors
 
     def set_task_guidelines(self, task_guidelines: list[str]) -> None:
         self.additional_guidelines = task_guidelines
 
     def reset(self, go_home_on_reset: bool = False):
+        self.flush_screens()
         super().reset(go_home_on_reset)
         # Hide the coordinates on screen which might affect the vision model.
         self.env.hide_automation_ui()
@@ -230,6 +264,27 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
 
         self.history = []
 
+    def _extract_available_actions(self, forest) -> list[candidate_action.CandidateAction]:
+        """Extracts and parses the candidate actions and drops those the pruning rules rule out.
+
+        This is the only place candidates are parsed; later stages use the parsed fields.
+        """
+        available_actions, extra_attributes = extract_actions_with_display_id_v2(
+            forest, return_mapping=True, refine_a11y_tree=self.family == "android_lab")
+        elements = action_pruning.elements_by_display_id(forest, extra_attributes)
+        candidates = [candidate_action.CandidateAction.parse(action, elements)
+                      for action in available_actions]
+        result = self.action_pruner.apply(
+            candidates,
+            elements,
+            package=action_pruning.foreground_package(forest),
+        )
+        if result.pruned or result.demoted:
+            logging.info(
+                f"Pruned {len(result.pruned)} and demoted {len(result.demoted)} of "
+                f"{len(available_actions)} candidate actions.")
+        return result.actions
+
     def step(self, node: MCTSNode, converted_action,):
         logical_screen_size = self.env.logical_screen_size
         physical_frame_boundary = self.env.physical_frame_boundary
@@ -239,7 +294,10 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             print('Agent answered with: ' + converted_action.text)
 
         try:
-            self.env.execute_action(converted_action)
+            # The indices refer to the parent's elements; the environment reuses
+            # its state unless the screen was fetched or acted on since.
+            self.env.execute_action(
+                converted_action, state=node.parent.state['raw_ui_state'])
         except Exception as e:  # pylint: disable=broad-exception-caught
             print('Failed to execute action.')
             print(str(e))
@@ -255,14 +313,16 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             return state
         
         ui_state = self.get_post_transition_state()
+        # Hidden subtrees contribute neither HTML nor actions; dropping them first
+        # shrinks the quadratic HTML build without changing its output.
+        visible_forest = forest_view.filter_forest(ui_state.forest)
         try:
-            html_desc = turn_tree_to_html_input(ui_state.forest)
+            html_desc = turn_tree_to_html_input(visible_forest)
             node.node_info['html_desc'] = html_desc
         except:
             logging.error("Extract html_desc wrong")
 
-        available_actions = extract_actions_with_display_id_v2(
-            ui_state.forest, refine_a11y_tree=self.family == "android_lab")
+        available_actions = self._extract_available_actions(visible_forest)
 
         state = {
             'screenshot_raw': None,
@@ -272,40 +332,23 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             'logical_screen_size': None,
             'available_actions': available_actions,
             'raw_ui_state': None,
+            'screen_signature': None,
         }
 
         logical_screen_size = self.env.logical_screen_size
         orientation = self.env.orientation
         physical_frame_boundary = self.env.physical_frame_boundary
         after_ui_elements = ui_state.ui_elements
-        after_screenshot = ui_state.pixels.copy()
-
-        state['screenshot_raw'] = after_screenshot.copy()
-        for index, ui_element in enumerate(after_ui_elements):
-            if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-                m3a_utils.add_ui_element_mark(
-                    after_screenshot,
-                    ui_element,
-                    index,
-                    logical_screen_size,
-                    physical_frame_boundary,
-                    orientation,
-                    add_image_desc=self.add_image_desc
-                )
-
-        group_bounding_boxes = turn_tree_to_group_bounding_boxes(
-            orientation, logical_screen_size, physical_frame_boundary, ui_state.forest)
-        if self.add_image_desc:
-            m3a_utils.apply_group_bouding_boxes(
-                after_screenshot,
-                group_bounding_boxes
-            )
 
-        state['screenshot_som'] = after_screenshot.copy()
+        state['screenshot_raw'] = screenshot_buffer.share(ui_state.pixels)
+        state['screenshot_som'] = self._set_of_mark_screenshot(
+            ui_state, state['screenshot_raw'], orientation, logical_screen_size,
+            physical_frame_boundary)
         state['orientation'] = orientation
         state['physical_frame_boundary'] = physical_frame_boundary
         state['logical_screen_size'] = logical_screen_size
         state['raw_ui_state'] = ui_state
+        state['screen_signature'] = ui_state.screen_signature
 
         node.node_info['ui_elements'] = after_ui_elements
 
@@ -333,7 +376,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             node.node_info['summary_raw_response'] = "None"
 
         elif self.summary_mode == "rule":
-            last_step_action = json.loads(node.action)
+            last_step_action = node.action.to_dict()
             summary = generate_step_summary(
                 last_step_action, node.parent.node_info["ui_elements"], node.node_info["ui_elements"],)
             node.node_info['summary_prompt'] = "Use rule-based summary."
@@ -406,9 +449,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
                 continue
             else:
                 try:
-                    converted_action = json_action.JSONAction(
-                        **agent_utils.extract_json(node.action),
-                    )
+                    converted_action = node.action.to_json_action()
                     node.node_info['action_output_json'] = converted_action
                     action_index = converted_action.index
                     num_ui_elements = len(node.parent.node_info['ui_elements'])
@@ -457,8 +498,11 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
 
                                 take_a_step = False
                             else:
+                                # The raw screenshot is shared read-only; mark a copy of it.
+                                marked = screenshot_buffer.writable_copy(
+                                    node.parent.state['screenshot_raw'])
                                 m3a_utils.add_ui_element_mark(
-                                    node.parent.state['screenshot_raw'],
+                                    marked,
                                     node.parent.node_info['ui_elements'][action_index],
                                     action_index,
                                     node.parent.state["logical_screen_size"],
@@ -466,6 +510,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
                                     node.parent.state["orientation"],
                                     add_image_desc=self.add_image_desc
                                 )
+                                node.parent.state['screenshot_raw'] = screenshot_buffer.share(marked)
 
                         if take_a_step:
                             node_state = self.step(node, converted_action,)
@@ -513,7 +558,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
 
         action_prompt = action_completion_prompt(
             self.goal,
-            node.action,
+            node.action.text,
             step_summary,
             node.parent.node_info['html_desc'],
         )
@@ -529,9 +574,11 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         if raw_response is None:
             raise RuntimeError('Error calling LLM in action selection phase.')
 
-        action = m3a_utils.parse_action_output(action_output)
-        if action == None:  # we fall back to the origin action so the program can proceed.
+        action_text = m3a_utils.parse_action_output(action_output)
+        if action_text == None:  # we fall back to the origin action so the program can proceed.
             action = node.action
+        else:
+            action = node.action.completed(action_text)
 
         print(f"The incomplete action {node.action} is modified to {action}")
         logging.warning(
@@ -539,22 +586,12 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         return action
 
     def _action_completion(self, node: MCTSNode):
-        actions_requiring_completion = {
-            "input_text": "text_input",
-            "open_app": "name",
-            'answer': "answer_text",
-        }
-        action = node.action
-        if action:
-            for key, missing_field in actions_requiring_completion.items():
-                if key in action and f"<{missing_field}>" in action:
-                    # Query LLM to complete the action
-                    action = self.query_llm_for_action_completion(node)
-                    # Replace the action with the LLM's response
-                    node.action = action
+        if node.action is not None and node.action.needs_completion:
+            # Query LLM to complete the action and replace it with the LLM's response
+            node.action = self.query_llm_for_action_completion(node)
         return node
 
-    def _scoring_with_verifier_by_batch(self, actions: list[str], history, ui_desc):
+    def _scoring_with_verifier_by_batch(self, actions: list[candidate_action.CandidateAction], history, ui_desc):
         """
         For a list of actions, build the prompts and call predict_scores_batch in parallel
         across self.actors. Then flatten the results in the right order and return them.
@@ -564,7 +601,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         for action in actions:
             # Prepare your prompt as you do normally
             input_prompt = action_selection_prompt_with_verifier(
-                action,
+                action.text,
                 history,
                 self.goal,
                 ui_desc,
@@ -620,9 +657,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
     def _expand_verifier(self, node: MCTSNode, iter: int):
         if node.state is None:
             try:
-                converted_action = json_action.JSONAction(
-                    **agent_utils.extract_json(node.action),
-                )
+                converted_action = node.action.to_json_action()
                 node.node_info['action_output_json'] = converted_action
                 action_index = converted_action.index
 
@@ -761,6 +796,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             'physical_frame_boundary': None,
             'logical_screen_size': None,
             'raw_ui_state': None,
+            'screen_signature': None,
         }
         node_info = {
             'ui_elements': None,
@@ -782,40 +818,22 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
 
         ui_elements = ui_state.ui_elements
         logical_screen_size = self.env.logical_screen_size
-        state['screenshot_raw'] = ui_state.pixels.copy()
+        state['screenshot_raw'] = screenshot_buffer.share(ui_state.pixels)
         state['raw_ui_state'] = ui_state
-        before_screenshot = ui_state.pixels.copy()
+        state['screen_signature'] = ui_state.screen_signature
 
+        visible_forest = forest_view.filter_forest(ui_state.forest)
         if self.input_type == "html":
-            html_desc = turn_tree_to_html_input(ui_state.forest)
+            html_desc = turn_tree_to_html_input(visible_forest)
         elif self.input_type == "image":
             html_desc = None
         node_info['html_desc'] = html_desc
 
-        available_actions = extract_actions_with_display_id_v2(
-            ui_state.forest, refine_a11y_tree=self.family == "android_lab")
-
-        for index, ui_element in enumerate(ui_elements):
-            if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-                m3a_utils.add_ui_element_mark(
-                    before_screenshot,
-                    ui_element,
-                    index,
-                    logical_screen_size,
-                    physical_frame_boundary,
-                    orientation,
-                    add_image_desc=self.add_image_desc
-                )
-
-        group_bounding_boxes = turn_tree_to_group_bounding_boxes(
-            orientation, logical_screen_size, physical_frame_boundary, ui_state.forest)
-        if self.add_image_desc:
-            m3a_utils.apply_group_bouding_boxes(
-                before_screenshot,
-                group_bounding_boxes
-            )
+        available_actions = self._extract_available_actions(visible_forest)
 
-        state['screenshot_som'] = before_screenshot.copy()
+        state['screenshot_som'] = self._set_of_mark_screenshot(
+            ui_state, state['screenshot_raw'], orientation, logical_screen_size,
+            physical_frame_boundary)
         state['orientation'] = orientation
         state['physical_frame_boundary'] = physical_frame_boundary
         state['logical_screen_size'] = logical_screen_size
@@ -828,17 +846,51 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
         self.store_screen(self.root, iter=1)
         return
 
+    def _set_of_mark_screenshot(self, ui_state, pixels, orientation, logical_screen_size,
+                                physical_frame_boundary):
+        """Wraps the shared screenshot of ui_state for annotation on first use.
+
+        The verifier only reads text, so the marks (and the group boxes they
+        may include) are only drawn when the screenshot is saved or viewed.
+        """
+        group_bounding_boxes = None
+        if self.add_image_desc:
+            group_bounding_boxes = functools.partial(
+                turn_tree_to_group_bounding_boxes, orientation,
+                logical_screen_size, physical_frame_boundary, ui_state.forest)
+        return m3a_utils.SetOfMarkScreenshot(
+            pixels,
+            ui_state.ui_elements,
+            logical_screen_size,
+            physical_frame_boundary,
+            orientation,
+            add_image_desc=self.add_image_desc,
+            group_bounding_boxes=group_bounding_boxes,
+        )
+
     def store_screen(self, node: MCTSNode, iter: int):
+        """Queues the raw and annotated screenshots of a node; search() flushes them."""
         if self.if_store_screen:
-            pixels = node.state['screenshot_raw']
-            img = Image.fromarray(np.uint8(pixels))
-            img.save(self.save_path +
-                     f"iter_{iter}_step{node.depth + 1}.jpg", 'JPEG')
+            prefix = self.save_path + f"iter_{iter}_step{node.depth + 1}"
+            # Both are read-only, so the writer threads can encode them as they are.
+            self.screenshot_writer.submit(prefix, node.state['screenshot_raw'])
+            self.screenshot_writer.submit(prefix + "_ann", node.state['screenshot_som'])
 
-            pixels_ann = node.state['screenshot_som']
-            img_ann = Image.fromarray(np.uint8(pixels_ann))
-            img_ann.save(self.save_path +
-                         f"iter_{iter}_step{node.depth + 1}_ann.jpg", 'JPEG')
+    def flush_screens(self):
+        """Waits until every queued screenshot is on disk."""
+        if self.if_store_screen:
+            self.screenshot_writer.flush()
+            stats = self.screenshot_writer.stats
+            logging.info(
+                f"Saved {stats.num_written} screenshots ({stats.bytes_written / 1e6:.1f} MB, "
+                f"{stats.write_seconds:.2f}s writing, {stats.blocked_seconds:.2f}s blocked, "
+                f"{stats.num_failed} failed); {stats.num_deduplicated} duplicates linked, "
+                f"saving {stats.bytes_saved / 1e6:.1f} MB.")
+
+    def close(self):
+        """Writes the queued screenshots and stops the writer threads."""
+        self.flush_screens()
+        self.screenshot_writer.close()
 
     def _dfs_max_reward(self, path: list[MCTSNode]) -> tuple[float, list[MCTSNode]]:
         cur = path[-1]
@@ -893,9 +945,7 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
                     child = node.children[self.simulate_choice(scores)]
 
                     try:
-                        converted_action = json_action.JSONAction(
-                            **agent_utils.extract_json(child.action),
-                        )
+                        converted_action = child.action.to_json_action()
                         node.node_info['action_output_json'] = converted_action
 
                     except Exception as e:
@@ -962,6 +1012,8 @@ class VDroidAgent(base_agent.EnvironmentInteractingAgent):
             output.append(node.node_info)
             images.append(node.state["screenshot_raw"])
 
+        self.flush_screens()
+
         model_name = self.llm.model_name.lower()
         if 'llama-3.2' in model_name or 'llama-3.1' in model_name or 'deepseek' in model_name:
             torch.cuda.empty_cache()
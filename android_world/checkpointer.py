@@ -23,11 +23,51 @@ import pickle
 from typing import Any
 
 from absl import logging
+from android_world.utils import image_dedup
+import numpy as np
 
 INSTANCE_SEPARATOR = '_'
 
 Episode = dict[str, Any]
 
+# Arrays smaller than this are pickled as they are; hashing them costs more
+# than deduplicating them saves.
+_MIN_DEDUPLICATED_BYTES = 4096
+
+
+def _shared_array(array: np.ndarray) -> np.ndarray:
+  # Every copy of the array loads as this object. Make it read-only so that
+  # drawing on one step's frame raises instead of changing the others.
+  array.setflags(write=False)
+  return array
+
+
+class _DeduplicatingPickler(pickle.Pickler):
+  """Pickles arrays with identical contents once.
+
+  Screenshots in episode trees repeat a lot: unchanged screens after no-op
+  actions, states copied from a parent node, raw screenshots next to the
+  set-of-mark screenshot drawn from them. Later copies of an array are
+  pickled as references to the first one, so after loading they are the same
+  read-only object; copy a loaded frame before drawing on it.
+  """
+
+  def __init__(self, file: Any):
+    super().__init__(file)
+    self._arrays = {}
+
+  def reducer_override(self, obj: Any) -> Any:
+    if (
+        type(obj) is not np.ndarray  # pylint: disable=unidiomatic-typecheck
+        or obj.nbytes < _MIN_DEDUPLICATED_BYTES
+        or obj.dtype.hasobject
+    ):
+      return NotImplemented
+    first = self._arrays.setdefault(image_dedup.content_hash(obj), obj)
+    if first is obj:
+      return NotImplemented
+    return _shared_array, (first,)
+
 
 def _gzip_pickle(data: Any) -> bytes:
   """Pickle and gzip compress an object in memory.
@@ -39,7 +79,7 @@ def _gzip_pickle(data: Any) -> bytes:
       A bytes object containing the gzipped pickled data.
   """
   pickled_data = io.BytesIO()
-  pickle.dump(data, pickled_data)
+  _DeduplicatingPickler(pickled_data).dump(data)
 
   pickled_data.seek(0)  # Reset the stream position to the beginning
   compressed_data = io.BytesIO()
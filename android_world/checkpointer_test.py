@@ -16,6 +16,7 @@ import os
 import tempfile
 from absl.testing import absltest
 from android_world import checkpointer
+import numpy as np
 
 
 class CheckpointerTest(absltest.TestCase):
@@ -86,5 +87,73 @@ class CheckpointerTest(absltest.TestCase):
     self.assertEqual(expected_data, loaded_data)
 
 
+  def test_identical_arrays_are_stored_once(self) -> None:
+    """Tests that repeated screenshots do not grow the checkpoint."""
+    rng = np.random.default_rng(0)
+    screenshot = rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    other = rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    self.checkpointer.save_episodes(
+        [{'screenshots': [screenshot, other]}], 'distinct'
+    )
+    self.checkpointer.save_episodes(
+        [{'screenshots': [screenshot, other, screenshot.copy(), other.copy()]}],
+        'repeated',
+    )
+
+    distinct = os.path.getsize(
+        os.path.join(self.temp_dir.name, 'distinct.pkl.gz')
+    )
+    repeated = os.path.getsize(
+        os.path.join(self.temp_dir.name, 'repeated.pkl.gz')
+    )
+    self.assertLess(repeated, distinct + 200)
+    loaded = self.checkpointer._load_task_group('repeated')[0]['screenshots']
+    for loaded_array, expected in zip(
+        loaded, [screenshot, other, screenshot, other]
+    ):
+      np.testing.assert_array_equal(loaded_array, expected)
+    self.assertIs(loaded[0], loaded[2])
+    self.assertIsNot(loaded[0], loaded[1])
+
+  def test_shared_arrays_are_read_only(self) -> None:
+    """Tests that writing to a frame shared by two steps raises."""
+    screenshot = np.zeros((64, 64, 3), dtype=np.uint8)
+    self.checkpointer.save_episodes(
+        [{'screenshots': [screenshot, screenshot.copy()]}], 'task_group'
+    )
+
+    first, second = self.checkpointer.load()[0]['screenshots']
+
+    with self.assertRaises(ValueError):
+      first[0, 0] = 255
+    with self.assertRaises(ValueError):
+      second[0, 0] = 255
+    np.testing.assert_array_equal(second, screenshot)
+
+  def test_unshared_arrays_stay_writable(self) -> None:
+    """Tests that a frame stored once loads as a writable array."""
+    screenshot = np.zeros((64, 64, 3), dtype=np.uint8)
+    self.checkpointer.save_episodes(
+        [{'screenshots': [screenshot]}], 'task_group'
+    )
+
+    (loaded,) = self.checkpointer.load()[0]['screenshots']
+
+    loaded[0, 0] = 255
+    self.assertEqual(loaded[0, 0, 0], 255)
+
+  def test_distinguishes_arrays_by_shape_and_dtype(self) -> None:
+    """Tests that arrays sharing bytes but not shape or dtype stay apart."""
+    data = np.arange(8192, dtype=np.uint8)
+    arrays = [data, data.reshape(64, 128), data.view(np.int8)]
+    self.checkpointer.save_episodes([{'arrays': arrays}], 'task_group')
+
+    loaded = self.checkpointer.load()[0]['arrays']
+
+    for loaded_array, expected in zip(loaded, arrays):
+      self.assertEqual(loaded_array.dtype, expected.dtype)
+      np.testing.assert_array_equal(loaded_array, expected)
+
+
 if __name__ == '__main__':
   absltest.main()
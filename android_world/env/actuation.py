@@ -17,12 +17,64 @@
 import copy
 import logging
 import time
-from typing import Any
+from typing import Any, Optional
 
 from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.env import wait_conditions
+
+# Waits of execute_adb_action calls that are not given a waiter.
+_DEFAULT_WAITER = wait_conditions.Waiter()
+
+# Seconds to look for the element of find_and_click_element.
+_FIND_ELEMENT_TIMEOUT_SEC = 10.0
+# Seconds between looks for the element of find_and_click_element.
+_FIND_ELEMENT_POLL_INTERVAL_SEC = 0.2
+
+
+def _click_point(
+    action: json_action.JSONAction, screen_elements: list[Any]
+) -> tuple[Any, Any]:
+  """Returns the screen point an action targets by element index or x, y."""
+  idx = action.index
+  if idx is not None:
+    if idx < 0 or idx >= len(screen_elements):
+      raise ValueError(
+          f'Invalid element index: {idx}, must be between 0 and'
+          f' {len(screen_elements)-1}.'
+      )
+    element = screen_elements[idx]
+    if element.bbox_pixels is None:
+      raise ValueError('Bbox is not present on element.')
+    x, y = element.bbox_pixels.center
+    return int(x), int(y)
+  if action.x is not None and action.y is not None:
+    return action.x, action.y
+  raise ValueError(f'Invalid click action: {action}')
+
+
+def _click_into_text_field(
+    action: json_action.JSONAction,
+    screen_elements: list[Any],
+    screen_size: tuple[int, int],
+    env: android_world_controller.AndroidWorldController,
+    waiter: wait_conditions.Waiter,
+) -> None:
+  """Clicks the target of action and waits for a text field to get focus."""
+  point = _click_point(action, screen_elements)
+  previously_focused = [
+      element.bbox_pixels
+      for element in screen_elements
+      if element.is_editable and element.is_focused
+  ]
+  click_action = copy.deepcopy(action)
+  click_action.action_type = 'click'
+  execute_adb_action(click_action, screen_elements, screen_size, env, waiter)
+  waiter.wait_until(
+      wait_conditions.text_field_focused(env, point, previously_focused)
+  )
 
 
 def execute_adb_action(
@@ -30,6 +82,7 @@ def execute_adb_action(
     screen_elements: list[Any],  # list[UIElement]
     screen_size: tuple[int, int],
     env: android_world_controller.AndroidWorldController,
+    waiter: Optional[wait_conditions.Waiter] = None,
 ) -> None:
   """Execute an action based on a JSONAction object.
 
@@ -38,46 +91,24 @@ def execute_adb_action(
       screen_elements: List of UI elements on the screen.
       screen_size: The (width, height) of the screen.
       env: The environment to execute the action in.
+      waiter: Waits for the device between the steps of an action, e.g. for a
+        text field to get focus before typing; a shared default if None.
   """
+  waiter = waiter or _DEFAULT_WAITER
   if action.action_type in ['click', 'double_tap', 'long_press']:
-    idx = action.index
-    x = action.x
-    y = action.y
-    if idx is not None:
-      if idx < 0 or idx >= len(screen_elements):
-        raise ValueError(
-            f'Invalid element index: {idx}, must be between 0 and'
-            f' {len(screen_elements)-1}.'
-        )
-      element = screen_elements[idx]
-      if element.bbox_pixels is None:
-        raise ValueError('Bbox is not present on element.')
-      x, y = element.bbox_pixels.center
-      x, y = int(x), int(y)
-      if action.action_type == 'click':
-        adb_utils.tap_screen(x, y, env)
-      elif action.action_type == 'double_tap':
-        adb_utils.double_tap(x, y, env)
-      else:
-        adb_utils.long_press(x, y, env)
-    elif x is not None and y is not None:
-      if action.action_type == 'click':
-        adb_utils.tap_screen(x, y, env)
-      elif action.action_type == 'double_tap':
-        adb_utils.double_tap(x, y, env)
-      else:
-        adb_utils.long_press(x, y, env)
+    x, y = _click_point(action, screen_elements)
+    if action.action_type == 'click':
+      adb_utils.tap_screen(x, y, env)
+    elif action.action_type == 'double_tap':
+      adb_utils.double_tap(x, y, env)
     else:
-      raise ValueError(f'Invalid click action: {action}')
+      adb_utils.long_press(x, y, env)
 
   elif action.action_type == 'input_text':
     text = action.text
     if text:
       # First focus on enter text UI element.
-      click_action = copy.deepcopy(action)
-      click_action.action_type = 'click'
-      execute_adb_action(click_action, screen_elements, screen_size, env)
-      time.sleep(1.0)
+      _click_into_text_field(action, screen_elements, screen_size, env, waiter)
       adb_utils.type_text(text, env, timeout_sec=120)
       adb_utils.press_enter_button(env)
     else:
@@ -86,10 +117,7 @@ def execute_adb_action(
           'action will be executed.'
       )
   elif action.action_type == 'clear_text':
-    click_action = copy.deepcopy(action)
-    click_action.action_type = 'click'
-    execute_adb_action(click_action, screen_elements, screen_size, env)
-    time.sleep(1.0)
+    _click_into_text_field(action, screen_elements, screen_size, env, waiter)
     adb_utils.clear_text(env, timeout_sec=120)
   elif action.action_type == 'keyboard_enter':
     adb_utils.press_enter_button(env)
@@ -172,7 +200,7 @@ def execute_adb_action(
   elif action.action_type == 'launch_adb_activity':
     if action.activity_nickname == 'app_drawer':
       adb_utils.press_home_button(env)
-      time.sleep(1.0)
+      waiter.wait_until(wait_conditions.home_screen_focused(env))
       start_x, start_y = int(screen_size[0] / 2), int(screen_size[1] * 0.9)
       end_x = start_x
       end_y = int(0.3 * screen_size[1])
@@ -221,20 +249,23 @@ def _wait_and_find_click_element(
     case_sensitive: bool,
 ) -> json_action.JSONAction:
   """Wait for the screen to update until "element_text" appears."""
-  ui_elements = env.get_ui_elements()
-  element, distance = _find_target_element(
-      ui_elements, target_text, case_sensitive
-  )
-  start = time.time()
-  current = time.time()
-  while current - start < 10:
-    if distance == 0:
-      return json_action.JSONAction(action_type='click', index=element)
-    ui_elements = env.get_ui_elements()
+  found = []
+
+  def element_found() -> bool:
     element, distance = _find_target_element(
-        ui_elements, target_text, case_sensitive
+        env.get_ui_elements(), target_text, case_sensitive
     )
-    current = time.time()
+    if distance == 0:
+      found.append(element)
+    return bool(found)
+
+  wait_conditions.poll_until(
+      element_found,
+      _FIND_ELEMENT_TIMEOUT_SEC,
+      _FIND_ELEMENT_POLL_INTERVAL_SEC,
+  )
+  if found:
+    return json_action.JSONAction(action_type='click', index=found[0])
   raise ValueError(f'Target text "{target_text}" not found.')
 
 
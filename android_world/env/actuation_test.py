@@ -14,6 +14,7 @@
 
 import copy
 import time
+import types
 from unittest import mock
 
 from absl.testing import absltest
@@ -23,6 +24,9 @@ from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.env import wait_conditions
+from android_world.utils import simulated_device
+from android_world.utils import simulated_screen
 
 
 @mock.patch.object(time, 'sleep')
@@ -272,5 +276,96 @@ class ExecuteAdbActionTest(absltest.TestCase):
     )
 
 
+class ActuationWaitTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.clock = simulated_screen.VirtualClock()
+    self.fields = [
+        simulated_device.text_field(0, 0, 100, 50),
+        simulated_device.text_field(0, 100, 100, 150),
+    ]
+
+  def _run(self, action, mode, focus_seconds=0.3, screen_elements=None):
+    device = simulated_device.SimulatedDevice(
+        self.clock, self.fields, focus_seconds=focus_seconds
+    )
+    waiter = wait_conditions.Waiter(
+        wait_conditions.WaitConfig(mode=mode),
+        self.clock.time,
+        self.clock.sleep,
+    )
+    actuation.execute_adb_action(
+        action,
+        self.fields if screen_elements is None else screen_elements,
+        (1080, 2400),
+        device,
+        waiter,
+    )
+    return device, waiter
+
+  def test_input_text_waits_for_focus(self):
+    action = json_action.JSONAction(
+        action_type='input_text', text='buy milk', index=1
+    )
+
+    device, waiter = self._run(action, wait_conditions.CONDITION)
+
+    self.assertEqual(device.typed, {1: 'buy milk\n'})
+    self.assertEqual(waiter.stats.num_met, 1)
+    self.assertLess(waiter.stats.total_seconds, 1.0)
+
+  def test_input_text_fixed_mode_sleeps(self):
+    action = json_action.JSONAction(
+        action_type='input_text', text='buy milk', index=1
+    )
+
+    device, waiter = self._run(action, wait_conditions.FIXED)
+
+    self.assertEqual(device.typed, {1: 'buy milk\n'})
+    self.assertAlmostEqual(waiter.stats.total_seconds, 1.0)
+
+  def test_input_text_waits_longer_than_fixed_sleep_if_needed(self):
+    action = json_action.JSONAction(
+        action_type='input_text', text='buy milk', x=50, y=25
+    )
+
+    device, _ = self._run(action, wait_conditions.CONDITION, focus_seconds=1.5)
+    self.assertEqual(device.typed, {0: 'buy milk\n'})
+
+    device, _ = self._run(action, wait_conditions.FIXED, focus_seconds=1.5)
+    self.assertEqual(device.typed, {})
+    self.assertEqual(device.lost_text, 'buy milk\n')
+
+  def test_input_text_into_other_field_waits_for_its_focus(self):
+    # The first field still shows as focused in the observed elements.
+    observed = list(self.fields)
+    observed[0] = simulated_device.text_field(0, 0, 100, 50)
+    observed[0].is_focused = True
+    action = json_action.JSONAction(
+        action_type='input_text', text='x', index=1
+    )
+
+    device, waiter = self._run(
+        action, wait_conditions.CONDITION, screen_elements=observed
+    )
+
+    self.assertEqual(device.typed, {1: 'x\n'})
+    self.assertEqual(waiter.stats.num_met, 1)
+
+  def test_app_drawer_waits_for_home_screen(self):
+    # JSONAction has no activity_nickname; agents issuing this action pass
+    # their own action objects.
+    action = types.SimpleNamespace(
+        action_type='launch_adb_activity', activity_nickname='app_drawer'
+    )
+
+    device, waiter = self._run(action, wait_conditions.CONDITION)
+
+    self.assertEqual(device.activity, simulated_device.HOME_ACTIVITY)
+    self.assertEqual(waiter.stats.num_met, 1)
+    self.assertLess(waiter.stats.total_seconds, 1.0)
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -0,0 +1,280 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs adb shell commands through one long-lived `adb shell` process.
+
+The adb controller starts a new `adb` process for every command, which costs
+a process spawn and a connection to the adb server each time; setting up a
+task runs dozens of them. A ShellSession keeps `adb -s <device> shell` open
+and writes commands to its stdin. After each command it prints a unique
+delimiter with the command's exit status, which is how it splits the output
+stream back into per-command results. Several commands can be written at
+once and their results read back in one round trip.
+
+Each command runs in its own subshell with stdin from /dev/null and stderr
+merged into stdout, so like a separate `adb shell` call it cannot change the
+session's directory or environment, consume the commands that follow, or
+exit the session. If the process died, the next command starts a new one.
+A command that times out kills the session, since its output can no longer
+be told apart from the next command's; the following command reconnects.
+
+Sessions are attached to environments with attach(); adb_utils then sends
+`shell` requests through them.
+"""
+
+from collections.abc import Callable, Sequence
+import dataclasses
+import itertools
+import os
+import select
+import subprocess
+import threading
+import time
+from typing import Any, Optional
+import uuid
+import weakref
+
+from absl import logging
+
+_DEFAULT_TIMEOUT_SECS = 10.0
+
+
+@dataclasses.dataclass(frozen=True)
+class ShellResult:
+  """Output and exit status of one command."""
+
+  output: bytes
+  exit_code: int
+
+
+@dataclasses.dataclass
+class SessionStats:
+  """Counters of a ShellSession.
+
+  Attributes:
+    num_processes: Shell processes started, including reconnections.
+    num_round_trips: Writes of one or more commands followed by reading their
+      results.
+    num_commands: Commands run.
+    num_timeouts: Round trips that timed out.
+  """
+
+  num_processes: int = 0
+  num_round_trips: int = 0
+  num_commands: int = 0
+  num_timeouts: int = 0
+
+
+class ShellSession:
+  """A shell process that runs commands one after another."""
+
+  def __init__(
+      self,
+      argv: Sequence[str],
+      default_timeout_sec: float = _DEFAULT_TIMEOUT_SECS,
+      popen: Callable[..., subprocess.Popen] = subprocess.Popen,
+  ):
+    """Initializes the session; the process is started on first use.
+
+    Args:
+      argv: Command line of the shell, e.g. [adb, '-s', device, 'shell'].
+      default_timeout_sec: Timeout of a round trip if none is given.
+      popen: Starts the shell process.
+    """
+    self._argv = list(argv)
+    self._default_timeout_sec = default_timeout_sec
+    self._popen = popen
+    self._process: Optional[subprocess.Popen] = None
+    self._buffer = b''
+    self._lock = threading.Lock()
+    self._token = uuid.uuid4().hex
+    self._sequence = itertools.count()
+    self.stats = SessionStats()
+
+  @classmethod
+  def for_adb(
+      cls, adb_path: str, device_name: str, **kwargs: Any
+  ) -> 'ShellSession':
+    """Returns a session running `adb -s device_name shell`."""
+    return cls(
+        [os.path.expanduser(adb_path), '-s', device_name, 'shell'], **kwargs
+    )
+
+  def __enter__(self) -> 'ShellSession':
+    return self
+
+  def __exit__(self, *unused_exc_info: Any) -> None:
+    self.close()
+
+  def close(self) -> None:
+    """Stops the shell process, if it runs."""
+    with self._lock:
+      self._kill()
+
+  def _kill(self) -> None:
+    if self._process is None:
+      return
+    process, self._process = self._process, None
+    self._buffer = b''
+    try:
+      process.kill()
+      process.wait(timeout=1.0)
+    except (OSError, subprocess.TimeoutExpired):
+      pass
+    for pipe in (process.stdin, process.stdout):
+      if pipe is not None:
+        pipe.close()
+
+  def _ensure_process(self) -> subprocess.Popen:
+    if self._process is not None and self._process.poll() is not None:
+      logging.warning(
+          'Shell session exited with %s; reconnecting.',
+          self._process.returncode,
+      )
+      self._kill()
+    if self._process is None:
+      self._process = self._popen(
+          self._argv,
+          stdin=subprocess.PIPE,
+          stdout=subprocess.PIPE,
+          stderr=subprocess.STDOUT,
+      )
+      self.stats.num_processes += 1
+    return self._process
+
+  def _script(self, command: str, delimiter: str) -> bytes:
+    return (
+        f'( {command}\n) </dev/null 2>&1\n'
+        f"printf '\\n%s %d\\n' {delimiter} $?\n"
+    ).encode('utf-8', 'surrogateescape')
+
+  def _read_result(self, delimiter: bytes, deadline: float) -> ShellResult:
+    """Reads up to the delimiter line; raises TimeoutError or EOFError."""
+    marker = b'\n' + delimiter + b' '
+    while True:
+      start = self._buffer.find(marker)
+      if start >= 0:
+        end = self._buffer.find(b'\n', start + len(marker))
+        if end >= 0:
+          output = self._buffer[:start]
+          exit_code = int(self._buffer[start + len(marker) : end])
+          self._buffer = self._buffer[end + 1 :]
+          return ShellResult(output, exit_code)
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        raise TimeoutError(f'No result within the timeout: {self._argv}')
+      stdout = self._process.stdout
+      ready, _, _ = select.select([stdout], [], [], remaining)
+      if ready:
+        chunk = os.read(stdout.fileno(), 1 << 16)
+        if not chunk:
+          raise EOFError('Shell session closed its output.')
+        self._buffer += chunk
+
+  def run(
+      self, command: str, timeout_sec: Optional[float] = None
+  ) -> ShellResult:
+    """Runs one shell command and returns its result."""
+    return self.run_batch([command], timeout_sec)[0]
+
+  def run_batch(
+      self, commands: Sequence[str], timeout_sec: Optional[float] = None
+  ) -> list[ShellResult]:
+    """Runs commands in order, writing them all before reading any result.
+
+    Args:
+      commands: Shell command lines.
+      timeout_sec: Time allowed for all of them.
+
+    Returns:
+      One result per command.
+
+    Raises:
+      TimeoutError: If the results did not arrive in time. The session is
+        restarted on next use, and commands may or may not have run.
+      ConnectionError: If the shell exited while running the commands.
+    """
+    if not commands:
+      return []
+    if timeout_sec is None:
+      timeout_sec = self._default_timeout_sec
+    with self._lock:
+      delimiters = [
+          f'__aw_{self._token}_{next(self._sequence)}' for _ in commands
+      ]
+      script = b''.join(
+          self._script(command, delimiter)
+          for command, delimiter in zip(commands, delimiters)
+      )
+      deadline = time.monotonic() + timeout_sec
+      process = self._ensure_process()
+      try:
+        process.stdin.write(script)
+        process.stdin.flush()
+      except (BrokenPipeError, ValueError):
+        # The shell exited since it was last checked; nothing has run yet.
+        self._kill()
+        process = self._ensure_process()
+        process.stdin.write(script)
+        process.stdin.flush()
+      self.stats.num_round_trips += 1
+      self.stats.num_commands += len(commands)
+      try:
+        return [
+            self._read_result(delimiter.encode(), deadline)
+            for delimiter in delimiters
+        ]
+      except TimeoutError:
+        self.stats.num_timeouts += 1
+        self._kill()
+        raise
+      except (EOFError, OSError) as e:
+        self._kill()
+        raise ConnectionError(f'Shell session failed: {e}') from e
+
+
+# Sessions by the innermost environment of a wrapper chain.
+_SESSIONS: weakref.WeakKeyDictionary[Any, ShellSession] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _innermost(env: Any) -> Any:
+  # Only follows attributes set on the instance, so mocks, which make up any
+  # attribute asked for, end the walk.
+  inner = getattr(env, '__dict__', {}).get('_env')
+  while inner is not None:
+    env = inner
+    inner = getattr(env, '__dict__', {}).get('_env')
+  return env
+
+
+def attach(env: Any, session: ShellSession) -> None:
+  """Sends the shell requests that adb_utils issues to env through session."""
+  _SESSIONS[_innermost(env)] = session
+
+
+def detach(env: Any) -> Optional[ShellSession]:
+  """Stops using a session for env and returns it, if one was attached."""
+  return _SESSIONS.pop(_innermost(env), None)
+
+
+def session_for(env: Any) -> Optional[ShellSession]:
+  """Returns the session attached to env or to an environment it wraps."""
+  if not _SESSIONS:
+    return None
+  try:
+    return _SESSIONS.get(_innermost(env))
+  except TypeError:
+    # Unhashable or not weakly referenceable environments have no session.
+    return None
@@ -0,0 +1,180 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for adb_shell_session, run against a local /bin/sh."""
+
+import subprocess
+import time
+
+from absl.testing import absltest
+from android_world.env import adb_shell_session
+
+
+class _CountingPopen:
+  """Starts processes with subprocess.Popen and counts them."""
+
+  def __init__(self):
+    self.num_calls = 0
+
+  def __call__(self, *args, **kwargs):
+    self.num_calls += 1
+    return subprocess.Popen(*args, **kwargs)
+
+
+class ShellSessionTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.popen = _CountingPopen()
+    self.session = adb_shell_session.ShellSession(
+        ['/bin/sh'], default_timeout_sec=5.0, popen=self.popen
+    )
+    self.addCleanup(self.session.close)
+
+  def test_returns_output_and_exit_code(self):
+    result = self.session.run('echo hello; exit 3')
+
+    self.assertEqual(result, adb_shell_session.ShellResult(b'hello\n', 3))
+
+  def test_merges_stderr(self):
+    result = self.session.run('echo out; echo err >&2')
+
+    self.assertEqual(result.output, b'out\nerr\n')
+    self.assertEqual(result.exit_code, 0)
+
+  def test_output_without_trailing_newline(self):
+    self.assertEqual(self.session.run("printf 'a b'").output, b'a b')
+    self.assertEqual(self.session.run('true').output, b'')
+
+  def test_unicode_output(self):
+    result = self.session.run("printf 'café ☃'")
+
+    self.assertEqual(result.output.decode('utf-8'), 'café ☃')
+
+  def test_command_reading_stdin_does_not_consume_later_commands(self):
+    results = self.session.run_batch(['cat', 'echo after'])
+
+    self.assertEqual([r.output for r in results], [b'', b'after\n'])
+
+  def test_commands_do_not_change_session_state(self):
+    self.session.run('cd /; FOO=bar; export FOO')
+
+    self.assertEqual(self.session.run('echo "$FOO"').output, b'\n')
+    self.assertNotEqual(self.session.run('pwd').output, b'/\n')
+
+  def test_exit_does_not_end_session(self):
+    self.session.run('exit 3')
+    self.session.run('echo still here')
+
+    self.assertEqual(self.popen.num_calls, 1)
+
+  def test_batch_is_one_round_trip(self):
+    results = self.session.run_batch(
+        ['echo 1', 'false', 'echo 3', 'printf "%s" "$((1 + 1))"']
+    )
+
+    self.assertEqual(
+        results,
+        [
+            adb_shell_session.ShellResult(b'1\n', 0),
+            adb_shell_session.ShellResult(b'', 1),
+            adb_shell_session.ShellResult(b'3\n', 0),
+            adb_shell_session.ShellResult(b'2', 0),
+        ],
+    )
+    self.assertEqual(self.session.stats.num_round_trips, 1)
+    self.assertEqual(self.session.stats.num_commands, 4)
+
+  def test_empty_batch_starts_nothing(self):
+    self.assertEqual(self.session.run_batch([]), [])
+    self.assertEqual(self.popen.num_calls, 0)
+
+  def test_output_resembling_delimiter_is_kept(self):
+    result = self.session.run("printf '\\n__aw_x 0\\n'")
+
+    self.assertEqual(result.output, b'\n__aw_x 0\n')
+
+  def test_reconnects_after_process_died(self):
+    self.session.run('true')
+    self.session._process.kill()
+    self.session._process.wait()
+
+    result = self.session.run('echo back')
+
+    self.assertEqual(result.output, b'back\n')
+    self.assertEqual(self.session.stats.num_processes, 2)
+
+  def test_timeout_restarts_session(self):
+    start = time.monotonic()
+    with self.assertRaises(TimeoutError):
+      self.session.run('sleep 5', timeout_sec=0.2)
+
+    self.assertLess(time.monotonic() - start, 2.0)
+    self.assertEqual(self.session.run('echo next').output, b'next\n')
+    self.assertEqual(self.session.stats.num_timeouts, 1)
+    self.assertEqual(self.session.stats.num_processes, 2)
+
+  def test_shell_exiting_mid_command_raises_connection_error(self):
+    with self.assertRaises(ConnectionError):
+      self.session.run('kill -9 $$; sleep 1')
+
+    self.assertEqual(self.session.run('echo next').output, b'next\n')
+
+  def test_close_stops_process(self):
+    self.session.run('true')
+    process = self.session._process
+
+    self.session.close()
+
+    self.assertIsNotNone(process.poll())
+    self.assertIsNone(self.session._process)
+
+  def test_for_adb(self):
+    session = adb_shell_session.ShellSession.for_adb('adb', 'emulator-5554')
+
+    self.assertEqual(session._argv, ['adb', '-s', 'emulator-5554', 'shell'])
+
+
+class _Env:
+
+  def __init__(self, env=None):
+    if env is not None:
+      self._env = env
+
+
+class RegistryTest(absltest.TestCase):
+
+  def test_attach_to_wrapped_environment(self):
+    inner = _Env()
+    wrapper = _Env(_Env(inner))
+    session = adb_shell_session.ShellSession(['/bin/sh'])
+
+    adb_shell_session.attach(wrapper, session)
+
+    self.assertIs(adb_shell_session.session_for(inner), session)
+    self.assertIs(adb_shell_session.session_for(_Env(inner)), session)
+    self.assertIsNone(adb_shell_session.session_for(_Env()))
+
+    self.assertIs(adb_shell_session.detach(inner), session)
+    self.assertIsNone(adb_shell_session.session_for(wrapper))
+    self.assertIsNone(adb_shell_session.detach(inner))
+
+  def test_unhashable_environment_has_no_session(self):
+    adb_shell_session.attach(_Env(), adb_shell_session.ShellSession(['sh']))
+
+    self.assertIsNone(adb_shell_session.session_for([]))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -16,19 +16,27 @@
 
 import os
 import re
+import shlex
 import time
-from typing import Any, Callable, Collection, Iterable, Literal, Optional, TypeVar
+from typing import Any, Callable, Collection, Iterable, Literal, Optional, Sequence, TypeVar
 import unicodedata
 from absl import logging
 from android_env import env_interface
 from android_env.components import errors
 from android_env.proto import adb_pb2
+from android_world.env import adb_shell_session
 import immutabledict
 
 T = TypeVar('T')
 
 _DEFAULT_TIMEOUT_SECS = 240
 
+# Longest text handed to one `input text` when typing in bulk; long strings
+# can be typed out of order.
+_BULK_TYPING_CHUNK_CHARS = 100
+# Longest shell command line issued when typing in bulk.
+_BULK_TYPING_COMMAND_CHARS = 2000
+
 # Maps app names to the activity that should be launched to open the app.
 _PATTERN_TO_ACTIVITY = immutabledict.immutabledict({
     'google chrome|chrome': (
@@ -266,6 +274,70 @@ def get_current_activity(
   return (activity, response)
 
 
+def get_home_activity(
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+) -> Optional[str]:
+  """Returns the activity the HOME button opens, or None if it is unknown.
+
+  Args:
+    env: The environment.
+    timeout_sec: A timeout to use for this operation.
+  """
+  try:
+    response = issue_generic_request(
+        [
+            'shell',
+            'cmd',
+            'package',
+            'resolve-activity',
+            '--brief',
+            '-a',
+            'android.intent.action.MAIN',
+            '-c',
+            'android.intent.category.HOME',
+        ],
+        env,
+        timeout_sec,
+    )
+  except errors.AdbControllerError:
+    logging.warning('Failed to resolve the home activity.')
+    return None
+  if response.status != adb_pb2.AdbResponse.Status.OK:
+    return None
+  lines = response.generic.output.decode('utf-8', 'replace').splitlines()
+  activities = [line.strip() for line in lines if '/' in line]
+  return activities[-1] if activities else None
+
+
+def is_keyboard_shown(
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+) -> Optional[bool]:
+  """Returns whether the soft keyboard is shown, or None if it is unknown.
+
+  Args:
+    env: The environment.
+    timeout_sec: A timeout to use for this operation.
+  """
+  try:
+    response = issue_generic_request(
+        ['shell', 'dumpsys', 'input_method'], env, timeout_sec
+    )
+  except errors.AdbControllerError:
+    logging.warning('Failed to read the input method state.')
+    return None
+  if response.status != adb_pb2.AdbResponse.Status.OK:
+    return None
+  match = re.search(
+      r'mInputShown=(true|false)',
+      response.generic.output.decode('utf-8', 'replace'),
+  )
+  if match is None:
+    return None
+  return match.group(1) == 'true'
+
+
 def tap_screen(
     x: int,
     y: int,
@@ -499,24 +571,12 @@ def _split_words_and_newlines(text: str) -> Iterable[str]:
       yield '\n'
 
 
-def type_text(
+def _type_words(
     text: str,
     env: env_interface.AndroidEnvInterface,
-    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+    timeout_sec: Optional[float],
 ) -> None:
-  """Issues an AdbRequest to type the specified text string word-by-word.
-
-  It types word-by-word to fix issue where sometimes long text strings can be
-  typed out of order at the character level. Additionally, long strings can time
-  out and word-by-word fixes this, while allowing us to keep a lot timeout per
-  word.
-
-  Args:
-    text: The text string to be typed.
-    env: The environment.
-    timeout_sec: A timeout to use for this operation. Note: For longer texts,
-      this should be longer as it takes longer to type.
-  """
+  """Types text with one adb call per word, space and newline."""
   words = _split_words_and_newlines(text)
   for word in words:
     if word == '\n':
@@ -535,6 +595,97 @@ def type_text(
     if response.status != adb_pb2.AdbResponse.Status.OK:
       logging.error('Failed to type word: %r', formatted)
 
+
+def _can_type_in_bulk(line: str) -> bool:
+  """Whether `input text` types every character of line as it is."""
+  return all(' ' <= char <= '~' for char in line)
+
+
+def _bulk_chunks(line: str, max_chars: int) -> Iterable[str]:
+  """Splits line at spaces into chunks of at most max_chars, if possible."""
+  chunk = ''
+  for i, word in enumerate(line.split(' ')):
+    piece = word if i == 0 else ' ' + word
+    if chunk and len(chunk) + len(piece) > max_chars:
+      yield chunk
+      chunk = piece
+    else:
+      chunk += piece
+  if chunk:
+    yield chunk
+
+
+def _input_text_command(chunk: str) -> str:
+  # `input text` types %s as a space; the device shell removes the quoting.
+  return 'input text ' + shlex.quote(chunk.replace(' ', '%s'))
+
+
+def _issue_typing_commands(
+    commands: Sequence[str],
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float],
+) -> None:
+  """Issues shell commands in as few requests as the length limit allows."""
+  groups = []
+  for command in commands:
+    if groups and (
+        len(groups[-1]) + len(command) + 4 <= _BULK_TYPING_COMMAND_CHARS
+    ):
+      groups[-1] += ' && ' + command
+    else:
+      groups.append(command)
+  for group in groups:
+    try:
+      response = issue_generic_request(['shell', group], env, timeout_sec)
+    except errors.AdbControllerError:
+      logging.exception('Failed to type text: %r', group)
+      continue
+    if response.status != adb_pb2.AdbResponse.Status.OK:
+      logging.error('Failed to type text: %r', group)
+
+
+def type_text(
+    text: str,
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+    bulk: bool = True,
+) -> None:
+  """Issues adb requests to type the specified text string.
+
+  Lines of printable ASCII are typed in bulk: one `input text` per chunk of up
+  to _BULK_TYPING_CHUNK_CHARS characters, split at spaces, as long strings can
+  be typed out of order at the character level. The chunks and newlines of
+  consecutive such lines are sent as one shell command. Other lines, and all
+  text without bulk, are typed word-by-word with one request per word, which
+  normalizes non-ASCII characters to ASCII or drops them.
+
+  Args:
+    text: The text string to be typed.
+    env: The environment.
+    timeout_sec: A timeout to use for this operation. Note: For longer texts,
+      this should be longer as it takes longer to type.
+    bulk: Whether to type lines that allow it in bulk.
+  """
+  if not bulk:
+    _type_words(text, env, timeout_sec)
+    return
+  pending = []
+  lines = text.split('\n')
+  for i, line in enumerate(lines):
+    if _can_type_in_bulk(line):
+      pending.extend(
+          _input_text_command(chunk)
+          for chunk in _bulk_chunks(line, _BULK_TYPING_CHUNK_CHARS)
+      )
+    else:
+      logging.info('Typing %r word-by-word.', line)
+      _issue_typing_commands(pending, env, timeout_sec)
+      pending = []
+      _type_words(line, env, timeout_sec)
+    if i < len(lines) - 1:
+      pending.append('input keyevent KEYCODE_ENTER')
+  _issue_typing_commands(pending, env, timeout_sec)
+
 def clear_text(
     env: env_interface.AndroidEnvInterface,
     timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
@@ -564,6 +715,9 @@ def issue_generic_request(
   # or
   issue_generic_request('shell ls', env)
 
+  `shell` commands go through the persistent shell session attached to env,
+  if any; see adb_shell_session.
+
   Args:
     args: Set of arguments to be issued with the ABD broadcast. Can also be a
       string.
@@ -580,6 +734,19 @@ def issue_generic_request(
     args_str = ' '.join(args)
   logging.info('Issuing generic adb request: %r', args_str)
 
+  session = adb_shell_session.session_for(env)
+  if session is not None and len(args) > 1 and args[0] == 'shell':
+    response = _shell_response(
+        _run_in_session(session, [' '.join(args[1:])], timeout_sec)[0]
+    )
+    if response.status != adb_pb2.AdbResponse.Status.OK:
+      # Non-zero exit statuses raise, as they do for `adb shell`.
+      raise errors.AdbControllerError(
+          f'Error executing adb command: [adb {args_str}]\n'
+          f'adb stdout: [{response.error_message}]'
+      )
+    return response
+
   response = env.execute_adb_call(
       adb_pb2.AdbRequest(
           generic=adb_pb2.AdbRequest.GenericRequest(args=args),
@@ -592,6 +759,82 @@ def issue_generic_request(
   return response
 
 
+def _run_in_session(
+    session: adb_shell_session.ShellSession,
+    commands: Sequence[str],
+    timeout_sec: Optional[float],
+) -> list[adb_shell_session.ShellResult]:
+  try:
+    return session.run_batch(commands, timeout_sec)
+  except (TimeoutError, ConnectionError) as e:
+    raise errors.AdbControllerError(
+        f'Error executing adb shell commands: {list(commands)}\n'
+        f'Caused by: {e}'
+    ) from e
+
+
+def _shell_response(
+    result: adb_shell_session.ShellResult,
+) -> adb_pb2.AdbResponse:
+  if result.exit_code == 0:
+    response = adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+  else:
+    response = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.ADB_ERROR,
+        error_message=result.output.decode('utf-8', 'replace'),
+    )
+  response.generic.output = result.output
+  return response
+
+
+def issue_shell_batch(
+    commands: Sequence[str],
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+) -> list[adb_pb2.AdbResponse]:
+  """Runs shell commands in order, in one round trip when possible.
+
+  With a persistent shell session attached to env, all commands are written
+  to it at once and timeout_sec covers the whole batch. Otherwise each one is
+  issued with issue_generic_request. Either way every command runs, and one
+  that fails gets an ADB_ERROR response instead of raising.
+
+  Example:
+  ~~~~~~~
+
+  issue_shell_batch(['settings put global auto_time 0', 'date'], env)
+
+  Args:
+    commands: Shell command lines, without the leading `shell`.
+    env: The environment.
+    timeout_sec: A timeout to use for this operation.
+
+  Returns:
+    One response per command.
+  """
+  session = adb_shell_session.session_for(env)
+  if session is not None:
+    logging.info('Issuing %d adb shell commands in one batch.', len(commands))
+    return [
+        _shell_response(result)
+        for result in _run_in_session(session, commands, timeout_sec)
+    ]
+  responses = []
+  for command in commands:
+    try:
+      responses.append(
+          issue_generic_request(['shell', command], env, timeout_sec)
+      )
+    except errors.AdbControllerError as e:
+      responses.append(
+          adb_pb2.AdbResponse(
+              status=adb_pb2.AdbResponse.Status.ADB_ERROR,
+              error_message=str(e),
+          )
+      )
+  return responses
+
+
 def get_adb_activity(app_name: str) -> Optional[str]:
   """Get a mapping of regex patterns to ADB activities top Android apps."""
   for pattern, activity in _PATTERN_TO_ACTIVITY.items():
@@ -1559,11 +1802,14 @@ def get_logical_screen_size(
 
 def get_physical_frame_boundary(
     env: env_interface.AndroidEnvInterface,
+    orientation: Optional[int] = None,
 ) -> tuple[int, int, int, int]:
   """Returns the physical frame boundary.
 
   Args:
     env: The AndroidEnv interface.
+    orientation: The current screen orientation, if already known; it is
+      queried otherwise.
 
   Returns:
     First two integers are the coordinates for top left corner, last two are for
@@ -1584,7 +1830,8 @@ def get_physical_frame_boundary(
           and int(m[3]) == 0
       ):
         continue
-      orientation = get_orientation(env)
+      if orientation is None:
+        orientation = get_orientation(env)
       if orientation == 0 or orientation == 2:
         return (int(m[0]), int(m[1]), int(m[2]), int(m[3]))
       return (int(m[1]), int(m[0]), int(m[3]), int(m[2]))
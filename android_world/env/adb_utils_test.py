@@ -14,11 +14,15 @@
 
 """Tests for adb_utils."""
 
+import subprocess
 from unittest import mock
 
 from absl.testing import absltest
+from absl.testing import parameterized
 from android_env import env_interface
+from android_env.components import errors
 from android_env.proto import adb_pb2
+from android_world.env import adb_shell_session
 from android_world.env import adb_utils
 
 
@@ -185,7 +189,7 @@ class AdbTypingTest(AdbTestSetup):
       mock_execute_adb_call.return_value = adb_pb2.AdbResponse(
           status=adb_pb2.AdbResponse.Status.OK
       )
-      adb_utils.type_text('Type some\ntext', self.mock_env)
+      adb_utils.type_text('Type some\ntext', self.mock_env, bulk=False)
       expected_calls = [
           mock.call(
               adb_pb2.AdbRequest(
@@ -222,6 +226,220 @@ class AdbTypingTest(AdbTestSetup):
       ]
       mock_execute_adb_call.assert_has_calls(expected_calls)
 
+  def test_types_lines_in_bulk(self):
+    adb_utils.type_text('Type some\ntext', self.mock_env)
+
+    self.mock_issue_generic_request.assert_called_once_with(
+        [
+            'shell',
+            'input text Type%ssome && input keyevent KEYCODE_ENTER && input'
+            ' text text',
+        ],
+        self.mock_env,
+        adb_utils._DEFAULT_TIMEOUT_SECS,
+    )
+
+  def test_empty_text_issues_nothing(self):
+    adb_utils.type_text('', self.mock_env)
+
+    self.mock_issue_generic_request.assert_not_called()
+    self.mock_env.execute_adb_call.assert_not_called()
+
+
+# Prints the arguments of every `input` call, separated by NUL and followed
+# by \1, instead of injecting events.
+_FAKE_INPUT = "input() { printf '%s\\0' \"$@\"; printf '\\1'; }\n"
+
+
+class _FakeShellEnv:
+  """Runs adb requests through /bin/sh and records the text typed."""
+
+  def __init__(self):
+    self.typed = ''
+    self.requests = []
+
+  def _shell(self, command: str) -> None:
+    output = subprocess.run(
+        ['/bin/sh', '-c', _FAKE_INPUT + command],
+        capture_output=True,
+        check=True,
+    ).stdout.decode('utf-8')
+    for call in output.split('\1')[:-1]:
+      args = call.split('\0')[:-1]
+      if args[0] == 'text':
+        if len(args) > 2:
+          raise AssertionError(f'Text split into arguments: {args}')
+        # Without text, `input` only prints its usage.
+        self.typed += args[1].replace('%s', ' ') if len(args) == 2 else ''
+      elif args == ['keyevent', 'KEYCODE_ENTER']:
+        self.typed += '\n'
+      else:
+        raise AssertionError(f'Unexpected input call: {args}')
+
+  def execute_adb_call(self, request):
+    self.requests.append(request)
+    if request.HasField('input_text'):
+      # The adb controller runs `adb shell input text <text>`.
+      self._shell('input text ' + request.input_text.text)
+    elif request.HasField('press_button'):
+      self._shell('input keyevent KEYCODE_ENTER')
+    else:
+      args = list(request.generic.args)
+      if args[0] != 'shell':
+        raise AssertionError(f'Unexpected request: {request}')
+      self._shell(' '.join(args[1:]))
+    return adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+
+
+class TypeTextEscapingTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      'plain words',
+      'a;b|c&d && e || f',
+      '$(rm -rf /sdcard) `id` $HOME ${PATH}',
+      'it\'s "double" and \'single\'',
+      '<tag attr="x"> #hash \\back\\slash\\',
+      '*.txt ?[ab] {1,2} ~ ! = ^',
+      '  leading and trailing  ',
+      'first line\nsecond; line\n\nlast',
+  )
+  def test_bulk_types_text_as_given(self, text):
+    env = _FakeShellEnv()
+
+    adb_utils.type_text(text, env)
+
+    self.assertEqual(env.typed, text)
+    self.assertLen(env.requests, 1)
+
+  def test_long_line_is_chunked_in_one_request(self):
+    env = _FakeShellEnv()
+    text = ' '.join(f'word{i};' for i in range(60))
+
+    adb_utils.type_text(text, env)
+
+    self.assertEqual(env.typed, text)
+    self.assertLen(env.requests, 1)
+    command = env.requests[0].generic.args[1]
+    self.assertEqual(command.count('input text'), 5)
+
+  def test_very_long_text_is_split_into_requests(self):
+    env = _FakeShellEnv()
+    text = '\n'.join(f'line {i}; ' * 20 for i in range(20))
+
+    adb_utils.type_text(text, env)
+
+    self.assertEqual(env.typed, text)
+    self.assertGreater(len(env.requests), 1)
+    for request in env.requests:
+      self.assertLessEqual(
+          len(request.generic.args[1]), adb_utils._BULK_TYPING_COMMAND_CHARS
+      )
+
+  def test_unicode_line_falls_back_to_word_by_word(self):
+    env = _FakeShellEnv()
+
+    adb_utils.type_text('café crème', env)
+
+    self.assertEqual(env.typed, 'cafe creme')
+    self.assertTrue(all(r.HasField('input_text') for r in env.requests))
+
+  def test_mixed_lines_keep_order(self):
+    env = _FakeShellEnv()
+
+    adb_utils.type_text('plain; text\nnaïve 日本\nend & done', env)
+
+    self.assertEqual(env.typed, 'plain; text\nnaive \nend & done')
+
+  def test_word_by_word_matches_bulk_for_escaped_characters(self):
+    text = 'say "hi" & (go) <now>; $5 #1 | it\'s\nok'
+    bulk_env, words_env = _FakeShellEnv(), _FakeShellEnv()
+
+    adb_utils.type_text(text, bulk_env)
+    adb_utils.type_text(text, words_env, bulk=False)
+
+    self.assertEqual(bulk_env.typed, text)
+    self.assertEqual(words_env.typed, text)
+    self.assertLen(bulk_env.requests, 1)
+    self.assertLen(words_env.requests, 19)
+
+
+class ShellSessionRoutingTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.env = mock.create_autospec(env_interface.AndroidEnvInterface)
+    self.env.execute_adb_call.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK
+    )
+    self.session = adb_shell_session.ShellSession(['/bin/sh'])
+    self.addCleanup(self.session.close)
+
+  def _attach(self):
+    adb_shell_session.attach(self.env, self.session)
+    self.addCleanup(adb_shell_session.detach, self.env)
+
+  def test_shell_request_uses_session(self):
+    self._attach()
+
+    response = adb_utils.issue_generic_request(['shell', 'echo', 'hi'], self.env)
+
+    self.assertEqual(response.status, adb_pb2.AdbResponse.Status.OK)
+    self.assertEqual(response.generic.output, b'hi\n')
+    self.env.execute_adb_call.assert_not_called()
+
+  def test_failing_shell_request_raises(self):
+    self._attach()
+
+    with self.assertRaises(errors.AdbControllerError):
+      adb_utils.issue_generic_request('shell false', self.env)
+
+  def test_other_requests_use_controller(self):
+    self._attach()
+
+    adb_utils.issue_generic_request(['devices'], self.env)
+
+    self.env.execute_adb_call.assert_called_once()
+    self.assertEqual(self.session.stats.num_commands, 0)
+
+  def test_batch_with_session_is_one_round_trip(self):
+    self._attach()
+
+    responses = adb_utils.issue_shell_batch(
+        ['echo a', 'echo b >&2; exit 2', 'echo c'], self.env
+    )
+
+    self.assertEqual(
+        [r.generic.output for r in responses], [b'a\n', b'b\n', b'c\n']
+    )
+    self.assertEqual(
+        [r.status for r in responses],
+        [
+            adb_pb2.AdbResponse.Status.OK,
+            adb_pb2.AdbResponse.Status.ADB_ERROR,
+            adb_pb2.AdbResponse.Status.OK,
+        ],
+    )
+    self.assertEqual(responses[1].error_message, 'b\n')
+    self.assertEqual(self.session.stats.num_round_trips, 1)
+
+  def test_batch_without_session_issues_each_command(self):
+    self.env.execute_adb_call.side_effect = [
+        adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK),
+        errors.AdbControllerError('boom'),
+    ]
+
+    responses = adb_utils.issue_shell_batch(['echo a', 'false'], self.env)
+
+    self.assertEqual(
+        [r.status for r in responses],
+        [adb_pb2.AdbResponse.Status.OK, adb_pb2.AdbResponse.Status.ADB_ERROR],
+    )
+    requests = [
+        list(call.args[0].generic.args)
+        for call in self.env.execute_adb_call.call_args_list
+    ]
+    self.assertEqual(requests, [['shell', 'echo a'], ['shell', 'false']])
+
 
 class TestExtractBroadcastData(absltest.TestCase):
 
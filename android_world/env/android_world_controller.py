@@ -19,6 +19,7 @@ import enum
 import os
 import time
 from typing import Any
+from typing import Callable
 from typing import cast
 from typing import Optional
 from absl import logging
@@ -28,9 +29,11 @@ from android_env.components import config_classes
 from android_env.proto.a11y import android_accessibility_forest_pb2
 from android_env.wrappers import a11y_grpc_wrapper
 from android_env.wrappers import base_wrapper
+from android_world.env import adb_shell_session
 from android_world.env import adb_utils
 from android_world.env import representation_utils
 from android_world.utils import file_utils
+from android_world.utils import forest_corpus
 import dm_env
 import pdb
 
@@ -56,10 +59,98 @@ def _has_wrapper(
     return False
 
 
+class AirplaneModeCheck:
+  """Decides when fetching the a11y tree checks for airplane mode.
+
+  Airplane mode cuts the gRPC connection the a11y forwarder reports through,
+  so the fetch turns it off when it is on. The check is an adb round trip;
+  instead of paying it on every fetch, it is repeated once ttl_seconds have
+  passed, or sooner when invalidate() is called after an event that may have
+  changed the setting.
+  """
+
+  def __init__(
+      self,
+      ttl_seconds: float = 30.0,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    """Initializes the check.
+
+    Args:
+      ttl_seconds: Time a check stays valid. 0 checks on every fetch.
+      clock: Returns the current time in seconds.
+    """
+    self._ttl_seconds = ttl_seconds
+    self._clock = clock
+    self._checked_at: Optional[float] = None
+
+  @property
+  def due(self) -> bool:
+    """Whether the next fetch should check airplane mode."""
+    return (
+        self._checked_at is None
+        or self._clock() - self._checked_at >= self._ttl_seconds
+    )
+
+  def mark_checked(self) -> None:
+    """Records that airplane mode was just checked, and is now off."""
+    self._checked_at = self._clock()
+
+  def invalidate(self) -> None:
+    """Makes the next fetch check airplane mode."""
+    self._checked_at = None
+
+
+# Task extra under which the a11y forwarder delivers accessibility events.
+_A11Y_EVENT_KEY = 'full_event'
+
+
+class A11yEventMonitor:
+  """Tracks when the a11y forwarder last delivered accessibility events.
+
+  The gRPC wrapper accumulates events in its task extras until they are
+  read, so the monitor compares event counts between fetches. A fetch that
+  returns more events than the previous one, or events after the
+  accumulation was cleared, marks new events at the fetch's time. Event
+  times are therefore only as precise as the fetches.
+  """
+
+  def __init__(self, clock: Callable[[], float] = time.monotonic):
+    self._clock = clock
+    self._num_events = 0
+    self.last_event_time: Optional[float] = None
+
+  def observe(self, extras: dict[str, Any]) -> None:
+    """Records the events in the extras returned by a fetch."""
+    num_events = len(extras.get(_A11Y_EVENT_KEY, ()))
+    if num_events > self._num_events or 0 < num_events < self._num_events:
+      self.last_event_time = self._clock()
+    self._num_events = num_events
+
+
+def _turn_off_airplane_mode(
+    env: a11y_grpc_wrapper.A11yGrpcWrapper,
+    airplane_mode_check: Optional[AirplaneModeCheck],
+) -> None:
+  """Enables networking if airplane mode is on."""
+  if adb_utils.retry(3)(adb_utils.check_airplane_mode)(env):
+    logging.warning(
+        'Airplane mode is on -- cannot retrieve a11y tree via gRPC. Turning'
+        ' it off...'
+    )
+    logging.info('Enabling networking...')
+    env.attempt_enable_networking()
+    time.sleep(1.0)
+  if airplane_mode_check is not None:
+    airplane_mode_check.mark_checked()
+
+
 def get_a11y_tree(
     env: env_interface.AndroidEnvInterface,
     max_retries: int = 5,
     sleep_duration: float = 1.0,
+    airplane_mode_check: Optional[AirplaneModeCheck] = None,
+    event_monitor: Optional[A11yEventMonitor] = None,
 ) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
   """Gets a11y tree.
 
@@ -67,6 +158,12 @@ def get_a11y_tree(
     env: AndroidEnv.
     max_retries: Maximum number of retries to get a11y tree.
     sleep_duration: Time to sleep between each retry in seconds.
+    airplane_mode_check: Decides whether to check for airplane mode before
+      fetching. If None, it is checked on every call. A skipped check is made
+      as soon as the tree cannot be retrieved, and a call that fails
+      invalidates it.
+    event_monitor: If set, records the accessibility events delivered with
+      the tree.
 
   Returns:
     A11y tree.
@@ -79,26 +176,30 @@ def get_a11y_tree(
         'Must use a11y_grpc_wrapper.A11yGrpcWrapper to get the a11y tree.'
     )
   env = cast(a11y_grpc_wrapper.A11yGrpcWrapper, env)
-  if adb_utils.retry(3)(adb_utils.check_airplane_mode)(env):
-    logging.warning(
-        'Airplane mode is on -- cannot retrieve a11y tree via gRPC. Turning'
-        ' it off...'
-    )
-    logging.info('Enabling networking...')
-    env.attempt_enable_networking()
-    time.sleep(1.0)
+  checked = airplane_mode_check is None or airplane_mode_check.due
+  if checked:
+    _turn_off_airplane_mode(env, airplane_mode_check)
 
   forest: Optional[
       android_accessibility_forest_pb2.AndroidAccessibilityForest
   ] = None
   for _ in range(max_retries):
     try:
-      forest = env.accumulate_new_extras()['accessibility_tree'][-1]  # pytype:disable=attribute-error
+      extras = env.accumulate_new_extras()  # pytype:disable=attribute-error
+      if event_monitor is not None:
+        event_monitor.observe(extras)
+      forest = extras['accessibility_tree'][-1]
       return forest
     except KeyError:
       logging.warning('Could not get a11y tree, retrying.')
+      if not checked:
+        # Airplane mode may have been turned on since the last check.
+        _turn_off_airplane_mode(env, airplane_mode_check)
+        checked = True
     time.sleep(sleep_duration)
 
+  if airplane_mode_check is not None:
+    airplane_mode_check.invalidate()
   if forest is None:
     raise RuntimeError('Could not get a11y tree.')
   return forest
@@ -147,7 +248,22 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
       self,
       env: env_interface.AndroidEnvInterface,
       a11y_method: A11yMethod = A11yMethod.A11Y_FORWARDER_APP,
+      forest_recorder: Optional[forest_corpus.ForestRecorder] = None,
+      airplane_mode_ttl_seconds: float = 30.0,
   ):
+    """Initializes the controller.
+
+    Args:
+      env: The AndroidEnv to wrap.
+      a11y_method: How to get the a11y tree.
+      forest_recorder: Records every observed forest or XML dump, if set.
+      airplane_mode_ttl_seconds: How long a check that airplane mode is off
+        is trusted by the a11y tree fetch. The check is repeated sooner after
+        a reset, or when the tree cannot be retrieved.
+    """
+    self._airplane_mode_check = AirplaneModeCheck(airplane_mode_ttl_seconds)
+    self._a11y_event_monitor = A11yEventMonitor()
+    self._shell_session: Optional[adb_shell_session.ShellSession] = None
     if a11y_method == A11yMethod.A11Y_FORWARDER_APP:
       self._env = a11y_grpc_wrapper.A11yGrpcWrapper(
           env,
@@ -160,7 +276,44 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     else:
       self._env = env
     self._a11y_method = a11y_method
-  
+    self._forest_recorder = forest_recorder
+
+  @property
+  def forest_recorder(self) -> Optional[forest_corpus.ForestRecorder]:
+    """Recorder that stores every observed forest or XML dump, if any."""
+    return self._forest_recorder
+
+  @forest_recorder.setter
+  def forest_recorder(
+      self, recorder: Optional[forest_corpus.ForestRecorder]
+  ) -> None:
+    self._forest_recorder = recorder
+
+  @property
+  def shell_session(self) -> Optional[adb_shell_session.ShellSession]:
+    """Persistent shell that adb_utils sends shell requests through, if any."""
+    return self._shell_session
+
+  def attach_shell_session(
+      self, session: adb_shell_session.ShellSession
+  ) -> None:
+    """Sends the adb_utils shell requests of this device through session."""
+    if self._shell_session is not None:
+      self._shell_session.close()
+    self._shell_session = session
+    adb_shell_session.attach(self._env, session)
+
+  def close(self) -> None:
+    if self._shell_session is not None:
+      adb_shell_session.detach(self._env)
+      self._shell_session.close()
+      self._shell_session = None
+    super().close()
+
+  def last_a11y_event_time(self) -> Optional[float]:
+    """time.monotonic() of the latest fetch that brought new a11y events."""
+    return self._a11y_event_monitor.last_event_time
+
   @property
   def device_screen_size(self) -> tuple[int, int]:
     """Returns the physical screen size of the device: (width, height)."""
@@ -189,6 +342,7 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     #     grpc_port=self.env._coordinator._simulator._config.emulator_launcher.grpc_port,
     # ).env
 
+    self._airplane_mode_check.invalidate()
     self._env = get_controller_for_device(
         device_id=self.env._coordinator._simulator._config.adb_controller.device_name,
         console_port=self.env._coordinator._simulator._config.emulator_launcher.emulator_console_port,
@@ -197,20 +351,36 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     ).env
     # pylint: enable=protected-access
     # pytype: enable=attribute-error
+    if self._shell_session is not None:
+      # The adb connection may have been reset as well.
+      self._shell_session.close()
+      adb_shell_session.attach(self._env, self._shell_session)
 
   def get_a11y_forest(
       self,
   ) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
     """Returns the most recent a11y forest from the device."""
     try:
-      return get_a11y_tree(self._env)
+      return get_a11y_tree(
+          self._env,
+          airplane_mode_check=self._airplane_mode_check,
+          event_monitor=self._a11y_event_monitor,
+      )
     except RuntimeError:
       print(
           'Could not get a11y tree. Reconnecting to Android, reinitializing'
           ' AndroidEnv, and restarting a11y forwarding.'
       )
       self.refresh_env()
-      return get_a11y_tree(self._env)
+      return get_a11y_tree(
+          self._env,
+          airplane_mode_check=self._airplane_mode_check,
+          event_monitor=self._a11y_event_monitor,
+      )
+
+  def _reset_state(self):
+    # Tasks are set up around resets and may toggle airplane mode.
+    self._airplane_mode_check.invalidate()
 
   def get_ui_elements(self) -> list[representation_utils.UIElement]:
     """Returns the most recent UI elements from the device."""
@@ -220,9 +390,10 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
           exclude_invisible_elements=True,
       )
     else:
-      return representation_utils.xml_dump_to_ui_elements(
-          adb_utils.uiautomator_dump(self._env)
-      )
+      xml_dump = adb_utils.uiautomator_dump(self._env)
+      if self._forest_recorder is not None:
+        self._forest_recorder.record_dump(xml_dump)
+      return representation_utils.xml_dump_to_ui_elements(xml_dump)
 
   def _process_timestep(self, timestep: dm_env.TimeStep) -> dm_env.TimeStep:
     """Adds a11y tree info to the observation."""
@@ -235,6 +406,8 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     else:
       forest = None
       ui_elements = self.get_ui_elements()
+    if forest is not None and self._forest_recorder is not None:
+      self._forest_recorder.record(forest)
     timestep.observation[OBSERVATION_KEY_FOREST] = forest
     timestep.observation[OBSERVATION_KEY_UI_ELEMENTS] = ui_elements
     return timestep
@@ -323,8 +496,18 @@ def get_controller_for_device(
     console_port: int = 5554,
     adb_path: str = DEFAULT_ADB_PATH,
     grpc_port: int = 8554,
+    persistent_shell: bool = False,
 ) -> AndroidWorldController:
-  """Creates a controller by connecting to an existing Android environment."""
+  """Creates a controller by connecting to an existing Android environment.
+
+  Args:
+    device_id: Serial of the device, as listed by `adb devices`.
+    console_port: The console port of the device.
+    adb_path: The location of the adb binary.
+    grpc_port: The port for gRPC communication with the emulator.
+    persistent_shell: Whether to send adb_utils shell requests through one
+      long-lived `adb shell` process; see adb_shell_session.
+  """
 
   config = config_classes.AndroidEnvConfig(
       task=config_classes.FilesystemTaskConfig(
@@ -345,4 +528,9 @@ def get_controller_for_device(
   android_env_instance = loader.load(config)
   config.simulator.adb_controller.default_timeout=240
   logging.info('Setting up AndroidWorldController.')
-  return AndroidWorldController(android_env_instance)
+  controller = AndroidWorldController(android_env_instance)
+  if persistent_shell:
+    controller.attach_shell_session(
+        adb_shell_session.ShellSession.for_adb(adb_path, device_id)
+    )
+  return controller
@@ -14,18 +14,26 @@
 
 import os
 import tempfile
+import time
 from unittest import mock
 
 from absl.testing import absltest
 from android_env import env_interface
 from android_env.wrappers import a11y_grpc_wrapper
+from android_world.env import adb_shell_session
 from android_world.env import adb_utils
 from android_world.env import android_world_controller
+from android_world.env import interface
 from android_world.env import representation_utils
+from android_world.env import ui_stabilizer
 from android_world.utils import fake_adb_responses
 from android_world.utils import file_test_utils
 from android_world.utils import file_utils
+from android_world.utils import forest_corpus
+from android_world.utils import simulated_screen
+from android_world.utils import synthetic_forest
 import dm_env
+import numpy as np
 
 
 def create_file_with_contents(contents: str) -> str:
@@ -130,6 +138,43 @@ class AndroidWorldControllerTest(absltest.TestCase):
         exclude_invisible_elements=True,
     )
 
+  @mock.patch.object(android_world_controller, 'get_a11y_tree')
+  def test_process_timestep_records_forest(self, mock_get_a11y_tree):
+    forest = synthetic_forest.generate_forest(20)
+    mock_get_a11y_tree.return_value = forest
+    corpus_dir = tempfile.mkdtemp()
+    env = android_world_controller.AndroidWorldController(
+        mock.Mock(spec=env_interface.AndroidEnvInterface),
+        forest_recorder=forest_corpus.ForestRecorder(corpus_dir),
+    )
+    timestep = dm_env.TimeStep(
+        observation={}, reward=None, discount=None, step_type=None
+    )
+
+    env._process_timestep(timestep)
+    env._process_timestep(timestep)
+
+    self.assertEqual(forest_corpus.load_corpus(corpus_dir), [forest, forest])
+
+  @mock.patch.object(adb_utils, 'uiautomator_dump')
+  def test_get_ui_elements_records_dump(self, mock_uiautomator_dump):
+    xml_dump = synthetic_forest.forest_to_xml_dump(
+        synthetic_forest.generate_forest(20)
+    )
+    mock_uiautomator_dump.return_value = xml_dump
+    corpus_dir = tempfile.mkdtemp()
+    env = android_world_controller.AndroidWorldController(
+        mock.Mock(spec=env_interface.AndroidEnvInterface),
+        a11y_method=android_world_controller.A11yMethod.UIAUTOMATOR,
+        forest_recorder=forest_corpus.ForestRecorder(corpus_dir),
+    )
+
+    ui_elements = env.get_ui_elements()
+
+    self.assertLen(ui_elements, 20)
+    (path,) = forest_corpus.dump_paths(corpus_dir)
+    self.assertEqual(forest_corpus.load_dump(path), xml_dump)
+
   @mock.patch.object(adb_utils, 'check_airplane_mode')
   @mock.patch.object(android_world_controller, 'get_controller')
   @mock.patch.object(android_world_controller, '_has_wrapper')
@@ -189,5 +234,221 @@ class AndroidWorldControllerTest(absltest.TestCase):
     self.assertEqual(open(remote_file_path, 'r').read(), new_file_contents)
 
 
+  def test_shell_session_follows_env_and_closes(self):
+    mock_base_env = mock.Mock(spec=env_interface.AndroidEnvInterface)
+    env = android_world_controller.AndroidWorldController(mock_base_env)
+    session = adb_shell_session.ShellSession(['/bin/sh'])
+    session.run('true')
+
+    env.attach_shell_session(session)
+
+    self.assertIs(env.shell_session, session)
+    self.assertIs(adb_shell_session.session_for(env), session)
+    process = session._process
+    env.close()
+    self.assertIsNotNone(process.poll())
+    self.assertIsNone(adb_shell_session.session_for(env))
+    self.assertIsNone(env.shell_session)
+
+
+class _FakeClock:
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class AirplaneModeCheckTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.airplane_mode = False
+    self.airplane_mode_queries = 0
+    self.enter_context(
+        mock.patch.object(
+            adb_utils,
+            'issue_generic_request',
+            side_effect=self._issue_generic_request,
+        )
+    )
+    self.enter_context(
+        mock.patch.object(
+            a11y_grpc_wrapper,
+            'A11yGrpcWrapper',
+            spec=a11y_grpc_wrapper.A11yGrpcWrapper,
+        )
+    )
+    self.enter_context(
+        mock.patch.object(
+            android_world_controller, '_has_wrapper', return_value=True
+        )
+    )
+    self.enter_context(mock.patch.object(time, 'sleep'))
+    self.forest = synthetic_forest.generate_forest(20)
+
+  def _issue_generic_request(self, args, unused_env, timeout_sec=None):
+    del timeout_sec
+    if 'airplane_mode_on' in args:
+      self.airplane_mode_queries += 1
+      return fake_adb_responses.create_successful_generic_response(
+          '1' if self.airplane_mode else '0'
+      )
+    return fake_adb_responses.create_successful_generic_response('')
+
+  def _controller(self, ttl_seconds):
+    controller = android_world_controller.AndroidWorldController(
+        mock.Mock(spec=env_interface.AndroidEnvInterface),
+        airplane_mode_ttl_seconds=ttl_seconds,
+    )
+    controller._env.accumulate_new_extras.return_value = {
+        'accessibility_tree': [self.forest]
+    }
+    controller._env.step.side_effect = lambda unused_action: dm_env.TimeStep(
+        observation={'pixels': np.zeros((4, 4, 3), np.uint8)},
+        reward=None,
+        discount=None,
+        step_type=None,
+    )
+    return controller
+
+  def _polling_env(self, controller):
+    env = interface.AsyncAndroidEnv(controller)
+    clock = simulated_screen.VirtualClock()
+    env._stabilizer = ui_stabilizer.UIStabilizer(
+        clock=clock.time, sleep=clock.sleep
+    )
+    return env
+
+  def test_polled_observation_checks_once_within_ttl(self):
+    unchecked = self._polling_env(self._controller(ttl_seconds=0))
+    unchecked.get_state(wait_to_stabilize=True)
+    unchecked_queries = self.airplane_mode_queries
+    self.airplane_mode_queries = 0
+
+    env = self._polling_env(self._controller(ttl_seconds=30.0))
+    env.get_state(wait_to_stabilize=True)
+
+    # Polling fetches the tree several times; each used to query adb.
+    self.assertGreater(unchecked_queries, 1)
+    transition = unchecked.stabilizer.last_transition
+    self.assertEqual(
+        unchecked_queries, transition.num_observations + transition.num_probes
+    )
+    self.assertEqual(self.airplane_mode_queries, 1)
+
+  def test_reset_forces_check(self):
+    controller = self._controller(ttl_seconds=30.0)
+    controller.get_a11y_forest()
+    controller.get_a11y_forest()
+
+    controller._reset_state()
+    controller.get_a11y_forest()
+
+    self.assertEqual(self.airplane_mode_queries, 2)
+
+  def test_checks_again_after_ttl(self):
+    clock = _FakeClock()
+    check = android_world_controller.AirplaneModeCheck(10.0, clock=clock)
+    env = mock.Mock()
+    env.accumulate_new_extras.return_value = {
+        'accessibility_tree': [self.forest]
+    }
+
+    for now in (0.0, 5.0, 9.9, 10.0, 15.0):
+      clock.now = now
+      android_world_controller.get_a11y_tree(env, airplane_mode_check=check)
+
+    self.assertEqual(self.airplane_mode_queries, 2)
+
+  def test_missing_tree_forces_check_and_turns_off_airplane_mode(self):
+    check = android_world_controller.AirplaneModeCheck(30.0)
+    env = mock.Mock()
+    env.accumulate_new_extras.return_value = {
+        'accessibility_tree': [self.forest]
+    }
+    android_world_controller.get_a11y_tree(env, airplane_mode_check=check)
+    self.airplane_mode = True
+    env.accumulate_new_extras.side_effect = [
+        {},
+        {'accessibility_tree': [self.forest]},
+    ]
+
+    forest = android_world_controller.get_a11y_tree(
+        env, airplane_mode_check=check
+    )
+
+    self.assertEqual(forest, self.forest)
+    self.assertEqual(self.airplane_mode_queries, 2)
+    env.attempt_enable_networking.assert_called_once()
+
+  def test_failed_fetch_invalidates_check(self):
+    check = android_world_controller.AirplaneModeCheck(30.0)
+    env = mock.Mock()
+    env.accumulate_new_extras.return_value = {}
+    with self.assertRaises(RuntimeError):
+      android_world_controller.get_a11y_tree(
+          env, max_retries=2, airplane_mode_check=check
+      )
+
+    self.assertTrue(check.due)
+
+  def test_without_check_queries_every_call(self):
+    env = mock.Mock()
+    env.accumulate_new_extras.return_value = {
+        'accessibility_tree': [self.forest]
+    }
+
+    for _ in range(3):
+      android_world_controller.get_a11y_tree(env)
+
+    self.assertEqual(self.airplane_mode_queries, 3)
+
+
+class A11yEventMonitorTest(absltest.TestCase):
+
+  def test_records_fetches_with_new_events(self):
+    clock = _FakeClock()
+    monitor = android_world_controller.A11yEventMonitor(clock=clock)
+    self.assertIsNone(monitor.last_event_time)
+
+    for now, num_events in ((1.0, 2), (2.0, 2), (3.0, 3), (4.0, 0), (5.0, 1)):
+      clock.now = now
+      monitor.observe({'full_event': np.zeros(num_events)})
+      if now == 2.0:
+        self.assertEqual(monitor.last_event_time, 1.0)
+
+    # The accumulation was cleared at 4.0 and a new event arrived at 5.0.
+    self.assertEqual(monitor.last_event_time, 5.0)
+
+  def test_extras_without_events(self):
+    monitor = android_world_controller.A11yEventMonitor()
+
+    monitor.observe({'accessibility_tree': ['tree']})
+
+    self.assertIsNone(monitor.last_event_time)
+
+  @mock.patch.object(adb_utils, 'check_airplane_mode', return_value=False)
+  @mock.patch.object(
+      android_world_controller, '_has_wrapper', return_value=True
+  )
+  def test_get_a11y_tree_reports_events(
+      self, unused_mock_has_wrapper, unused_mock_check_airplane_mode
+  ):
+    clock = _FakeClock()
+    clock.now = 7.0
+    monitor = android_world_controller.A11yEventMonitor(clock=clock)
+    env = mock.Mock()
+    env.accumulate_new_extras.return_value = {
+        'accessibility_tree': ['tree'],
+        'full_event': np.zeros(3),
+    }
+
+    android_world_controller.get_a11y_tree(env, event_monitor=monitor)
+
+    self.assertEqual(monitor.last_event_time, 7.0)
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -0,0 +1,218 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An asyncio interface to an Android environment.
+
+AsyncAndroidEnv is async in name only: every call blocks until the device
+answered. AsyncioEnv offers observe, act and wait_stable as coroutines, so
+one event loop can overlap an agent's own work with device I/O -- scoring
+candidate actions while the screen settles, say -- or drive several devices
+at once, without threads in the agent.
+
+AsyncioEnv talks to the device through an AsyncController. The adb and gRPC
+clients underneath are blocking, so ExecutorController runs the calls of an
+existing AsyncAndroidEnv on a worker thread of its own, one at a time as the
+device serves them. Waiting for the screen to settle sleeps on the event loop
+between polls, so a waiting environment does not hold that thread.
+"""
+
+import abc
+import asyncio
+import concurrent.futures
+import functools
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from android_world.env import interface
+from android_world.env import json_action
+from android_world.env import ui_stabilizer
+
+
+class AsyncController(abc.ABC):
+  """Awaitable I/O with one device."""
+
+  @abc.abstractmethod
+  async def reset(self, go_home: bool) -> interface.State:
+    """Resets the device and returns its state."""
+
+  @abc.abstractmethod
+  async def get_state(self) -> interface.State:
+    """Returns the current state, without waiting for the screen to settle."""
+
+  @abc.abstractmethod
+  async def get_ui_digest(self) -> int:
+    """Returns the content hash of the UI elements, without a screenshot."""
+
+  @abc.abstractmethod
+  async def execute_action(
+      self,
+      action: json_action.JSONAction,
+      state: Optional[interface.State],
+  ) -> None:
+    """Executes action, chosen on state if given; see AsyncEnv.execute_action."""
+
+  def last_a11y_event_time(self) -> Optional[float]:
+    """time.monotonic() of the latest accessibility event, if known."""
+    return None
+
+  def close(self) -> None:
+    """Releases the device."""
+
+
+class ExecutorController(AsyncController):
+  """Runs the blocking calls of an AsyncAndroidEnv off the event loop."""
+
+  def __init__(
+      self,
+      env: interface.AsyncAndroidEnv,
+      executor: Optional[concurrent.futures.Executor] = None,
+  ):
+    """Initializes the controller.
+
+    Args:
+      env: The environment of the device.
+      executor: Runs the calls. If None, the controller starts a thread of its
+        own, so that calls to the device do not overlap.
+    """
+    self._env = env
+    self._owns_executor = executor is None
+    self._executor = executor or concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix='android_env'
+    )
+
+  @property
+  def env(self) -> interface.AsyncAndroidEnv:
+    return self._env
+
+  async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        self._executor, functools.partial(fn, *args)
+    )
+
+  async def reset(self, go_home: bool) -> interface.State:
+    return await self._call(self._env.reset, go_home)
+
+  async def get_state(self) -> interface.State:
+    return await self._call(self._env.get_state, False)
+
+  async def get_ui_digest(self) -> int:
+    return await self._call(self._env.probe_ui_digest)
+
+  async def execute_action(
+      self,
+      action: json_action.JSONAction,
+      state: Optional[interface.State],
+  ) -> None:
+    await self._call(self._env.execute_action, action, state)
+
+  def last_a11y_event_time(self) -> Optional[float]:
+    return self._env.controller.last_a11y_event_time()
+
+  def close(self) -> None:
+    if self._owns_executor:
+      self._executor.shutdown(wait=True)
+    self._env.close()
+
+
+class AsyncioEnv:
+  """Observes and acts on one device with coroutines.
+
+  Calls on one environment run one after another, in the order they were
+  made; calls on different environments overlap.
+  """
+
+  def __init__(
+      self,
+      controller: AsyncController,
+      stabilizer_config: Optional[ui_stabilizer.StabilizerConfig] = None,
+      clock: Callable[[], float] = time.monotonic,
+      async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+  ):
+    """Initializes the environment.
+
+    Args:
+      controller: The device.
+      stabilizer_config: How wait_stable polls the screen; see
+        ui_stabilizer.StabilizerConfig.
+      clock: Returns the current time in seconds.
+      async_sleep: Sleeps for the given number of seconds.
+    """
+    self._controller = controller
+    config = stabilizer_config or ui_stabilizer.StabilizerConfig()
+    self._stabilizer = ui_stabilizer.UIStabilizer(
+        config,
+        last_event_time=(
+            None
+            if config.event_quiet_seconds is None
+            else controller.last_a11y_event_time
+        ),
+        clock=clock,
+        async_sleep=async_sleep,
+    )
+    self._lock = asyncio.Lock()
+
+  @classmethod
+  def from_env(
+      cls, env: interface.AsyncAndroidEnv, **kwargs: Any
+  ) -> 'AsyncioEnv':
+    """Returns an AsyncioEnv on the device of a blocking environment."""
+    return cls(ExecutorController(env), **kwargs)
+
+  @property
+  def controller(self) -> AsyncController:
+    return self._controller
+
+  @property
+  def stabilizer(self) -> ui_stabilizer.UIStabilizer:
+    """Waits of wait_stable; its histogram records them."""
+    return self._stabilizer
+
+  async def reset(self, go_home: bool = False) -> interface.State:
+    async with self._lock:
+      return await self._controller.reset(go_home)
+
+  async def observe(self) -> interface.State:
+    """Returns the current state, without waiting for the screen to settle."""
+    async with self._lock:
+      return await self._controller.get_state()
+
+  async def wait_stable(self) -> interface.State:
+    """Returns the state once the screen stopped changing.
+
+    The screen is polled with UI digests and observed once, as
+    AsyncAndroidEnv.get_state(wait_to_stabilize=True) does; between polls
+    other tasks run.
+    """
+    async with self._lock:
+      return await self._stabilizer.async_wait(
+          self._controller.get_state, probe=self._controller.get_ui_digest
+      )
+
+  async def act(
+      self,
+      action: json_action.JSONAction,
+      state: Optional[interface.State] = None,
+  ) -> None:
+    """Executes action; pass the state it was chosen on to skip a fetch."""
+    async with self._lock:
+      await self._controller.execute_action(action, state)
+
+  def close(self) -> None:
+    self._controller.close()
+
+  async def __aenter__(self) -> 'AsyncioEnv':
+    return self
+
+  async def __aexit__(self, *unused_exc_info: Any) -> None:
+    self.close()
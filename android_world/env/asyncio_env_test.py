@@ -0,0 +1,308 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for asyncio_env, with fake devices that take time to answer."""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from absl.testing import absltest
+from android_world.env import asyncio_env
+from android_world.env import interface
+from android_world.env import json_action
+from android_world.env import representation_utils
+from android_world.env import ui_stabilizer
+import numpy as np
+
+_CLICK = json_action.JSONAction(action_type='click', index=0)
+_FAST_SETTLE = ui_stabilizer.StabilizerConfig(
+    min_interval=0.02, max_interval=0.05, settle_seconds=0.1
+)
+
+
+def _state(version: int) -> interface.State:
+  return interface.State(
+      pixels=np.zeros((1, 1, 3), np.uint8),
+      forest=None,
+      ui_elements=[representation_utils.UIElement(text=f'screen {version}')],
+  )
+
+
+class _LatencyController(asyncio_env.AsyncController):
+  """Device whose I/O takes latency seconds and whose screen changes after
+  every action, at change_times seconds after it."""
+
+  def __init__(self, latency=0.05, change_times=(0.05, 0.1)):
+    self._latency = latency
+    self._change_times = change_times
+    self._acted_at: Optional[float] = None
+    self._in_flight = 0
+    self.max_in_flight = 0
+    self.actions = []
+    self.calls = []
+    self.closed = False
+
+  @property
+  def version(self) -> int:
+    if self._acted_at is None:
+      return 0
+    elapsed = time.monotonic() - self._acted_at
+    return 10 * len(self.actions) + sum(t <= elapsed for t in self._change_times)
+
+  async def _io(self, name):
+    self.calls.append(name)
+    self._in_flight += 1
+    self.max_in_flight = max(self.max_in_flight, self._in_flight)
+    try:
+      await asyncio.sleep(self._latency)
+    finally:
+      self._in_flight -= 1
+
+  async def reset(self, go_home):
+    await self._io('reset')
+    self._acted_at = None
+    return _state(self.version)
+
+  async def get_state(self):
+    await self._io('get_state')
+    return _state(self.version)
+
+  async def get_ui_digest(self):
+    await self._io('get_ui_digest')
+    return _state(self.version).ui_element_table.content_hash
+
+  async def execute_action(self, action, state):
+    await self._io('execute_action')
+    self.actions.append((action, state))
+    self._acted_at = time.monotonic()
+
+  def close(self):
+    self.closed = True
+
+
+def _run(coroutine):
+  return asyncio.run(coroutine)
+
+
+class AsyncioEnvTest(absltest.TestCase):
+
+  def test_observe_and_act(self):
+    controller = _LatencyController(change_times=(1.0,))
+    env = asyncio_env.AsyncioEnv(controller)
+
+    async def episode():
+      state = await env.reset()
+      await env.act(_CLICK, state)
+      return state, await env.observe()
+
+    first, second = _run(episode())
+
+    self.assertEqual(first.ui_elements[0].text, 'screen 0')
+    self.assertEqual(second.ui_elements[0].text, 'screen 10')
+    self.assertEqual(controller.actions, [(_CLICK, first)])
+
+  def test_wait_stable_returns_settled_screen(self):
+    controller = _LatencyController(latency=0.01)
+    env = asyncio_env.AsyncioEnv(controller, _FAST_SETTLE)
+
+    async def step():
+      await env.act(_CLICK)
+      return await env.wait_stable()
+
+    state = _run(step())
+
+    self.assertEqual(state.ui_elements[0].text, 'screen 12')
+    self.assertTrue(env.stabilizer.last_transition.stable)
+    self.assertEqual(controller.calls.count('get_state'), 1)
+    self.assertGreater(controller.calls.count('get_ui_digest'), 2)
+
+  def test_agent_work_overlaps_wait_stable(self):
+    env = asyncio_env.AsyncioEnv(_LatencyController(), _FAST_SETTLE)
+    think_seconds = 0.4
+
+    async def think():
+      await asyncio.sleep(think_seconds)
+
+    async def sequential():
+      await env.act(_CLICK)
+      await env.wait_stable()
+      await think()
+
+    async def overlapped():
+      await env.act(_CLICK)
+      await asyncio.gather(env.wait_stable(), think())
+
+    start = time.monotonic()
+    _run(sequential())
+    sequential_seconds = time.monotonic() - start
+    start = time.monotonic()
+    _run(overlapped())
+    overlapped_seconds = time.monotonic() - start
+
+    self.assertGreater(sequential_seconds, think_seconds + 0.2)
+    self.assertLess(overlapped_seconds, sequential_seconds - 0.15)
+
+  def test_devices_run_concurrently(self):
+    controllers = [_LatencyController() for _ in range(4)]
+    envs = [asyncio_env.AsyncioEnv(c, _FAST_SETTLE) for c in controllers]
+
+    async def episode(env):
+      for _ in range(2):
+        state = await env.wait_stable()
+        await env.act(_CLICK, state)
+
+    async def run_all():
+      await asyncio.gather(*(episode(env) for env in envs))
+
+    start = time.monotonic()
+    _run(episode(asyncio_env.AsyncioEnv(_LatencyController(), _FAST_SETTLE)))
+    one_seconds = time.monotonic() - start
+    start = time.monotonic()
+    _run(run_all())
+    all_seconds = time.monotonic() - start
+
+    self.assertLess(all_seconds, 2 * one_seconds)
+    self.assertTrue(all(len(c.actions) == 2 for c in controllers))
+
+  def test_calls_on_one_env_do_not_overlap(self):
+    controller = _LatencyController()
+    env = asyncio_env.AsyncioEnv(controller, _FAST_SETTLE)
+
+    async def concurrent_calls():
+      await asyncio.gather(
+          env.observe(), env.act(_CLICK), env.wait_stable(), env.observe()
+      )
+
+    _run(concurrent_calls())
+
+    self.assertEqual(controller.max_in_flight, 1)
+    self.assertEqual(controller.calls[:2], ['get_state', 'execute_action'])
+
+  def test_context_manager_closes(self):
+    controller = _LatencyController()
+
+    async def use():
+      async with asyncio_env.AsyncioEnv(controller) as env:
+        await env.observe()
+
+    _run(use())
+
+    self.assertTrue(controller.closed)
+
+
+class _BlockingEnv:
+  """Stands in for an AsyncAndroidEnv whose calls block for latency seconds."""
+
+  def __init__(self, latency=0.1):
+    self._latency = latency
+    self._lock = threading.Lock()
+    self.threads = set()
+    self.overlapping_calls = 0
+    self.actions = []
+    self.closed = False
+    self.controller = self
+
+  def _block(self):
+    if not self._lock.acquire(blocking=False):
+      self.overlapping_calls += 1
+      self._lock.acquire()
+    try:
+      self.threads.add(threading.get_ident())
+      time.sleep(self._latency)
+    finally:
+      self._lock.release()
+
+  def reset(self, go_home):
+    self._block()
+    return _state(0)
+
+  def get_state(self, wait_to_stabilize):
+    del wait_to_stabilize
+    self._block()
+    return _state(len(self.actions))
+
+  def probe_ui_digest(self):
+    self._block()
+    return _state(len(self.actions)).ui_element_table.content_hash
+
+  def execute_action(self, action, state):
+    self._block()
+    self.actions.append((action, state))
+
+  def last_a11y_event_time(self):
+    return None
+
+  def close(self):
+    self.closed = True
+
+
+class ExecutorControllerTest(absltest.TestCase):
+
+  def test_blocking_calls_leave_event_loop_free(self):
+    blocking_env = _BlockingEnv(latency=0.1)
+    env = asyncio_env.AsyncioEnv.from_env(blocking_env)
+    ticks = []
+
+    async def ticker():
+      for _ in range(5):
+        ticks.append(time.monotonic())
+        await asyncio.sleep(0.02)
+
+    async def main():
+      state, _ = await asyncio.gather(env.observe(), ticker())
+      await env.act(_CLICK, state)
+      return state
+
+    state = _run(main())
+
+    self.assertLen(ticks, 5)
+    self.assertLess(ticks[-1] - ticks[0], 0.09)
+    self.assertEqual(blocking_env.actions, [(_CLICK, state)])
+    self.assertNotIn(threading.get_ident(), blocking_env.threads)
+    env.close()
+    self.assertTrue(blocking_env.closed)
+
+  def test_calls_to_device_are_serialized(self):
+    blocking_env = _BlockingEnv(latency=0.02)
+    controller = asyncio_env.ExecutorController(blocking_env)
+
+    async def main():
+      await asyncio.gather(*(controller.get_state() for _ in range(5)))
+
+    _run(main())
+    controller.close()
+
+    self.assertEqual(blocking_env.overlapping_calls, 0)
+    self.assertLen(blocking_env.threads, 1)
+
+  def test_devices_on_separate_controllers_overlap(self):
+    blocking_envs = [_BlockingEnv(latency=0.1) for _ in range(4)]
+    envs = [asyncio_env.AsyncioEnv.from_env(e) for e in blocking_envs]
+
+    async def main():
+      await asyncio.gather(*(env.observe() for env in envs))
+
+    start = time.monotonic()
+    _run(main())
+    elapsed = time.monotonic() - start
+    for env in envs:
+      env.close()
+
+    self.assertLess(elapsed, 0.3)
+
+
+if __name__ == '__main__':
+  absltest.main()
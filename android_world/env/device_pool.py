@@ -0,0 +1,315 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A pool of Android devices shared by the workers of a parallel run.
+
+A machine that can host several emulators evaluates a suite faster by
+running tasks on all of them at once. `DevicePool` hands its devices out one
+lease at a time: a worker leases a free device, runs a task on it and
+releases it. A device released after a failure is health-checked, and
+retired if the check fails, so one crashed emulator does not take down the
+rest of the run.
+
+`TaskQueues` decides which task a device runs next. Tasks are queued per
+device, grouped by key -- the task template in a suite run -- so a device
+runs all instances of a template in order; a device whose queue is empty
+takes work from the longest other queue. Two tasks with the same key never
+run at the same time, since instances of a template share their app data
+and output directory.
+"""
+
+import collections
+import contextlib
+import dataclasses
+import threading
+import time
+from typing import Callable, Generic, Hashable, Iterator, Mapping, Optional, Sequence, TypeVar
+
+from absl import logging
+from android_world.env import adb_utils
+from android_world.env import interface
+
+_T = TypeVar('_T')
+
+
+class NoHealthyDeviceError(RuntimeError):
+  """Raised when every device of a pool has been retired."""
+
+
+def check_device(env: interface.AsyncEnv) -> bool:
+  """Returns whether the device answers adb requests."""
+  try:
+    adb_utils.get_api_level(env.controller)
+  except Exception:  # pylint: disable=broad-exception-caught
+    logging.exception('Health check failed.')
+    return False
+  return True
+
+
+@dataclasses.dataclass
+class Device:
+  """A device of a pool.
+
+  Attributes:
+    name: Name of the device, e.g. its adb serial.
+    env: The environment on the device.
+    healthy: False once the device has been retired.
+    num_leases: Times the device has been leased.
+    num_failures: Leases that ended in a failure.
+  """
+
+  name: str
+  env: interface.AsyncEnv
+  healthy: bool = True
+  num_leases: int = 0
+  num_failures: int = 0
+
+
+class DevicePool:
+  """Leases devices to workers, one worker per device at a time."""
+
+  def __init__(
+      self,
+      envs: Mapping[str, interface.AsyncEnv],
+      health_check: Callable[[interface.AsyncEnv], bool] = check_device,
+  ):
+    """Initializes the pool.
+
+    Args:
+      envs: Environments by device name, in the order they are leased.
+      health_check: Returns whether a device can still run tasks.
+    """
+    if not envs:
+      raise ValueError('A device pool needs at least one device.')
+    self._devices = [Device(name, env) for name, env in envs.items()]
+    self._health_check = health_check
+    self._free = collections.deque(self._devices)
+    self._condition = threading.Condition()
+
+  @property
+  def devices(self) -> list[Device]:
+    return list(self._devices)
+
+  @property
+  def healthy_devices(self) -> list[Device]:
+    with self._condition:
+      return [device for device in self._devices if device.healthy]
+
+  def lease(self, timeout: Optional[float] = None) -> Device:
+    """Waits for a free healthy device and leases it.
+
+    Args:
+      timeout: Longest time to wait, in seconds; no limit if None.
+
+    Returns:
+      The leased device; release it when done with it.
+
+    Raises:
+      NoHealthyDeviceError: If every device has been retired.
+      TimeoutError: If no device came free within timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with self._condition:
+      while not self._free:
+        if not any(device.healthy for device in self._devices):
+          raise NoHealthyDeviceError('All devices have been retired.')
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+          raise TimeoutError(f'No device came free in {timeout} seconds.')
+        self._condition.wait(remaining)
+      device = self._free.popleft()
+      device.num_leases += 1
+      return device
+
+  def release(self, device: Device, failed: bool = False) -> bool:
+    """Returns a leased device to the pool.
+
+    Args:
+      device: The device, as returned by lease.
+      failed: Whether the lease ended in a failure; the device is then
+        health-checked and retired if the check fails.
+
+    Returns:
+      Whether the device is still healthy.
+    """
+    healthy = not failed or self._health_check(device.env)
+    with self._condition:
+      device.num_failures += failed
+      self._return(device, healthy)
+    return healthy
+
+  def _return(self, device: Device, healthy: bool) -> None:
+    if healthy:
+      self._free.append(device)
+    else:
+      device.healthy = False
+      logging.error(
+          'Retiring device %s after a failed health check.', device.name
+      )
+    self._condition.notify_all()
+
+  @contextlib.contextmanager
+  def leased(self, timeout: Optional[float] = None) -> Iterator[Device]:
+    """Leases a device for a with block; an exception counts as a failure."""
+    device = self.lease(timeout)
+    try:
+      yield device
+    except BaseException:
+      self.release(device, failed=True)
+      raise
+    self.release(device)
+
+  def check_all(self) -> list[Device]:
+    """Health-checks the free devices, retiring the failing ones.
+
+    Returns:
+      The devices that are still healthy.
+    """
+    with self._condition:
+      free = list(self._free)
+      self._free.clear()
+    for device in free:
+      healthy = self._health_check(device.env)
+      with self._condition:
+        self._return(device, healthy)
+    return self.healthy_devices
+
+  def close(self) -> None:
+    """Closes the environments of all devices."""
+    for device in self._devices:
+      try:
+        device.env.close()
+      except Exception:  # pylint: disable=broad-exception-caught
+        logging.exception('Failed to close device %s.', device.name)
+
+
+class TaskQueues(Generic[_T]):
+  """Per-device task queues with work stealing; thread-safe."""
+
+  def __init__(
+      self,
+      tasks: Sequence[_T],
+      device_names: Sequence[str],
+      key: Callable[[_T], Hashable],
+  ):
+    """Initializes the queues.
+
+    Args:
+      tasks: The tasks, in the order they should run. Tasks with the same key
+        must be adjacent.
+      device_names: Devices to queue tasks for.
+      key: Returns the group of a task; groups are dealt to the devices in
+        turn, and two tasks of a group never run at once.
+    """
+    if not device_names:
+      raise ValueError('TaskQueues needs at least one device.')
+    self._key = key
+    self._queues = {name: collections.deque() for name in device_names}
+    self._running = {}
+    self._condition = threading.Condition()
+    names = list(device_names)
+    for i, group in enumerate(self._groups(tasks)):
+      self._queues[names[i % len(names)]].extend(group)
+
+  def _groups(self, tasks) -> list[list[_T]]:
+    groups = []
+    for task in tasks:
+      if groups and self._key(groups[-1][0]) == self._key(task):
+        groups[-1].append(task)
+      else:
+        groups.append([task])
+    return groups
+
+  @property
+  def num_pending(self) -> int:
+    with self._condition:
+      return sum(len(queue) for queue in self._queues.values())
+
+  def pending(self, device_name: str) -> list[_T]:
+    """Returns the tasks queued for a device, in order."""
+    with self._condition:
+      return list(self._queues.get(device_name, ()))
+
+  def next_task(self, device_name: str) -> Optional[_T]:
+    """Takes the next task for a device, waiting if none can run yet.
+
+    The device's own queue comes first; when it is empty, the device takes
+    the last group from the longest other queue whose tasks are not running.
+    Waits while every queued task belongs to a group running elsewhere.
+
+    Args:
+      device_name: The device asking.
+
+    Returns:
+      The task, or None if no tasks are left.
+    """
+    with self._condition:
+      while True:
+        task = self._take(device_name)
+        if task is not None:
+          self._running[device_name] = task
+          return task
+        if not self._running or not any(self._queues.values()):
+          return None
+        self._condition.wait()
+
+  def _take(self, device_name: str) -> Optional[_T]:
+    running = {self._key(task) for task in self._running.values()}
+    queue = self._queues[device_name]
+    if queue and self._key(queue[0]) not in running:
+      return queue.popleft()
+    others = sorted(
+        (other for name, other in self._queues.items() if name != device_name),
+        key=len,
+        reverse=True,
+    )
+    for other in others:
+      groups = self._groups(other)
+      for index in reversed(range(len(groups))):
+        if self._key(groups[index][0]) not in running:
+          queue.extend(groups.pop(index))
+          other.clear()
+          other.extend(task for group in groups for task in group)
+          return queue.popleft()
+    return None
+
+  def done(self, device_name: str) -> None:
+    """Marks the task the device took last as finished."""
+    with self._condition:
+      self._running.pop(device_name, None)
+      self._condition.notify_all()
+
+  def retire(self, device_name: str) -> list[_T]:
+    """Stops queueing tasks for a device and deals its tasks to the others.
+
+    The task the device was running, if not marked done, is queued again
+    ahead of the rest.
+
+    Args:
+      device_name: The device to retire.
+
+    Returns:
+      The tasks that were moved.
+    """
+    with self._condition:
+      queue = self._queues.pop(device_name)
+      if device_name in self._running:
+        queue.appendleft(self._running.pop(device_name))
+      moved = list(queue)
+      if self._queues:
+        for group in self._groups(moved):
+          shortest = min(self._queues.values(), key=len)
+          shortest.extend(group)
+      self._condition.notify_all()
+      return moved
@@ -0,0 +1,237 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for device_pool."""
+
+import threading
+import time
+
+from absl.testing import absltest
+from android_world.env import device_pool
+
+
+class _FakeEnv:
+
+  def __init__(self, healthy=True):
+    self.healthy = healthy
+    self.closed = False
+
+  def close(self):
+    self.closed = True
+
+
+def _pool(**envs):
+  return device_pool.DevicePool(envs, health_check=lambda env: env.healthy)
+
+
+class DevicePoolTest(absltest.TestCase):
+
+  def test_leases_devices_in_turn(self):
+    pool = _pool(a=_FakeEnv(), b=_FakeEnv())
+
+    first = pool.lease()
+    second = pool.lease()
+    pool.release(first)
+    third = pool.lease()
+
+    self.assertEqual([first.name, second.name, third.name], ['a', 'b', 'a'])
+    self.assertEqual(first.num_leases, 2)
+
+  def test_lease_waits_for_release(self):
+    pool = _pool(a=_FakeEnv())
+    device = pool.lease()
+    timer = threading.Timer(0.05, pool.release, [device])
+    timer.start()
+
+    start = time.monotonic()
+    self.assertIs(pool.lease(timeout=5), device)
+    self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+  def test_lease_times_out(self):
+    pool = _pool(a=_FakeEnv())
+    pool.lease()
+
+    with self.assertRaises(TimeoutError):
+      pool.lease(timeout=0.01)
+
+  def test_failed_release_retires_unhealthy_device(self):
+    env = _FakeEnv()
+    pool = _pool(a=env, b=_FakeEnv())
+    device = pool.lease()
+    env.healthy = False
+
+    self.assertFalse(pool.release(device, failed=True))
+    self.assertFalse(device.healthy)
+    self.assertEqual(device.num_failures, 1)
+    self.assertEqual([d.name for d in pool.healthy_devices], ['b'])
+    self.assertEqual(pool.lease().name, 'b')
+
+  def test_failed_release_keeps_healthy_device(self):
+    pool = _pool(a=_FakeEnv())
+    device = pool.lease()
+
+    self.assertTrue(pool.release(device, failed=True))
+    self.assertIs(pool.lease(), device)
+    self.assertEqual(device.num_failures, 1)
+
+  def test_release_is_not_health_checked_unless_failed(self):
+    env = _FakeEnv(healthy=False)
+    pool = _pool(a=env)
+
+    pool.release(pool.lease())
+
+    self.assertTrue(pool.lease().healthy)
+
+  def test_lease_raises_when_all_devices_retired(self):
+    env = _FakeEnv()
+    pool = _pool(a=env)
+    device = pool.lease()
+    errors = []
+
+    def lease():
+      try:
+        pool.lease()
+      except device_pool.NoHealthyDeviceError as e:
+        errors.append(e)
+
+    waiter = threading.Thread(target=lease)
+    waiter.start()
+    env.healthy = False
+    pool.release(device, failed=True)
+    waiter.join(timeout=5)
+
+    self.assertLen(errors, 1)
+
+  def test_leased_releases_as_failed_on_exception(self):
+    env = _FakeEnv()
+    pool = _pool(a=env, b=_FakeEnv())
+
+    with self.assertRaises(ValueError):
+      with pool.leased() as device:
+        env.healthy = False
+        raise ValueError('Device crashed.')
+
+    self.assertFalse(device.healthy)
+    with pool.leased() as device:
+      self.assertEqual(device.name, 'b')
+    self.assertEqual(device.num_failures, 0)
+
+  def test_check_all_retires_unhealthy_devices(self):
+    pool = _pool(a=_FakeEnv(), b=_FakeEnv(healthy=False), c=_FakeEnv())
+
+    healthy = pool.check_all()
+
+    self.assertEqual([d.name for d in healthy], ['a', 'c'])
+    self.assertEqual([pool.lease().name, pool.lease().name], ['a', 'c'])
+
+  def test_close_closes_all_envs(self):
+    envs = {'a': _FakeEnv(), 'b': _FakeEnv()}
+    device_pool.DevicePool(envs).close()
+
+    self.assertTrue(all(env.closed for env in envs.values()))
+
+  def test_empty_pool_raises(self):
+    with self.assertRaises(ValueError):
+      device_pool.DevicePool({})
+
+
+def _queues(tasks, device_names=('a', 'b')):
+  return device_pool.TaskQueues(tasks, device_names, key=lambda t: t[0])
+
+
+class TaskQueuesTest(absltest.TestCase):
+
+  def test_deals_groups_to_devices_in_order(self):
+    queues = _queues(['x1', 'x2', 'y1', 'z1', 'z2'])
+
+    self.assertEqual(queues.pending('a'), ['x1', 'x2', 'z1', 'z2'])
+    self.assertEqual(queues.pending('b'), ['y1'])
+    self.assertEqual(queues.num_pending, 5)
+
+  def test_runs_own_queue_in_order(self):
+    queues = _queues(['x1', 'x2', 'y1'])
+    taken = []
+    while (task := queues.next_task('a')) is not None:
+      taken.append(task)
+      queues.done('a')
+
+    self.assertEqual(taken, ['x1', 'x2', 'y1'])
+
+  def test_steals_last_group_of_longest_queue(self):
+    queues = _queues(['x1', 'y1', 'z1', 'z2', 'w1'], ('a', 'b', 'c'))
+    self.assertEqual(queues.pending('a'), ['x1', 'w1'])
+
+    self.assertEqual(queues.next_task('b'), 'y1')
+    queues.done('b')
+    self.assertEqual(queues.next_task('b'), 'w1')
+
+    self.assertEqual(queues.pending('a'), ['x1'])
+    self.assertEqual(queues.pending('c'), ['z1', 'z2'])
+
+  def test_does_not_steal_running_group(self):
+    queues = _queues(['x1', 'x2', 'x3', 'y1'], ('a', 'b'))
+    self.assertEqual(queues.next_task('a'), 'x1')
+    self.assertEqual(queues.next_task('b'), 'y1')
+    queues.done('b')
+    finished = threading.Event()
+    taken = []
+
+    def take():
+      taken.append(queues.next_task('b'))
+      finished.set()
+
+    thread = threading.Thread(target=take)
+    thread.start()
+    self.assertFalse(finished.wait(0.05))
+    queues.done('a')
+    thread.join(timeout=5)
+
+    self.assertEqual(taken, ['x2'])
+    self.assertEqual(queues.pending('b'), ['x3'])
+
+  def test_returns_none_when_empty(self):
+    queues = _queues(['x1'])
+    self.assertEqual(queues.next_task('b'), 'x1')
+    queues.done('b')
+
+    self.assertIsNone(queues.next_task('a'))
+    self.assertIsNone(queues.next_task('b'))
+
+  def test_retire_requeues_running_task_first(self):
+    queues = _queues(['x1', 'x2', 'y1', 'y2', 'z1'], ('a', 'b', 'c'))
+    self.assertEqual(queues.next_task('a'), 'x1')
+
+    moved = queues.retire('a')
+
+    self.assertEqual(moved, ['x1', 'x2'])
+    self.assertEqual(queues.pending('c'), ['z1', 'x1', 'x2'])
+    self.assertEqual(queues.pending('a'), [])
+
+  def test_retire_wakes_waiting_devices(self):
+    queues = _queues(['x1', 'x2'], ('a', 'b'))
+    self.assertEqual(queues.next_task('a'), 'x1')
+    taken = []
+    thread = threading.Thread(
+        target=lambda: taken.append(queues.next_task('b'))
+    )
+    thread.start()
+
+    queues.retire('a')
+    thread.join(timeout=5)
+
+    self.assertEqual(taken, ['x1'])
+
+
+if __name__ == '__main__':
+  absltest.main()
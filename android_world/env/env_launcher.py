@@ -15,11 +15,13 @@
 """Launches the environment used in the benchmark."""
 
 import resource
+from typing import Optional
 
 from absl import logging
 from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import interface
+from android_world.env import wait_conditions
 from android_world.env.setup_device import setup
 from android_world.utils import datetime_utils
 
@@ -39,13 +41,18 @@ def _get_env(
   return interface.AsyncAndroidEnv(controller)
 
 def  _get_env_with_device(
-    device_id: int, console_port: int, adb_path: str, grpc_port: int
+    device_id: int,
+    console_port: int,
+    adb_path: str,
+    grpc_port: int,
+    persistent_shell: bool = False,
+    wait_config: Optional[wait_conditions.WaitConfig] = None,
 ) -> interface.AsyncEnv:
   """Creates an AsyncEnv by connecting to an existing Android environment."""
   controller = android_world_controller.get_controller_for_device(
-      device_id, console_port, adb_path, grpc_port
+      device_id, console_port, adb_path, grpc_port, persistent_shell
   )
-  return interface.AsyncAndroidEnv(controller)
+  return interface.AsyncAndroidEnv(controller, wait_config=wait_config)
 
 
 def verify_api_level(env: interface.AsyncEnv) -> None:
@@ -124,6 +131,8 @@ def load_and_setup_env(
     grpc_port: int = 8554,
     device_name: str = 'Y5FY5HROKR99E6JN',
     family: str= 'android_world',
+    persistent_shell: bool = False,
+    wait_config: Optional[wait_conditions.WaitConfig] = None,
 ) -> interface.AsyncEnv:
   """Create environment with `get_env()` and perform env setup and validation.
 
@@ -143,11 +152,20 @@ def load_and_setup_env(
       2023, to ensure consistent benchmarking.
     adb_path: The location of the adb binary.
     grpc_port: The port for gRPC communication with the emulator.
+    device_name: Serial of the device, as listed by `adb devices`.
+    family: The task family the environment is set up for.
+    persistent_shell: Whether to run adb shell requests through one long-lived
+      `adb shell` process instead of one adb process per request.
+    wait_config: How actions wait for the device; see
+      wait_conditions.WaitConfig.
 
   Returns:
     An interactable Android environment.
   """
   # env = _get_env(console_port, adb_path, grpc_port)
-  env = _get_env_with_device(device_name, console_port, adb_path, grpc_port)
+  env = _get_env_with_device(
+      device_name, console_port, adb_path, grpc_port, persistent_shell,
+      wait_config,
+  )
   setup_env(env, emulator_setup, freeze_datetime, family)
   return env
@@ -0,0 +1,370 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Lazy and filtered access to accessibility forests.
+
+`LazyForest` gives window- and node-level access to a forest without
+decoding all of it. Over serialized bytes it only scans message boundaries up
+front and decodes a window header, a node or a whole window when it is first
+accessed; over a forest returned by `get_a11y_tree` it serves the already
+decoded messages through the same interface.
+
+`filter_forest` copies a forest without the subtrees that cannot contribute
+to the HTML representation: those without a single node visible to the user
+and, optionally, on screen.
+"""
+
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import Union
+
+from android_env.proto.a11y import android_accessibility_forest_pb2
+from android_env.proto.a11y import android_accessibility_node_info_pb2
+from android_env.proto.a11y import android_accessibility_window_info_pb2
+
+_Forest = android_accessibility_forest_pb2.AndroidAccessibilityForest
+_Node = android_accessibility_node_info_pb2.AndroidAccessibilityNodeInfo
+_Window = android_accessibility_window_info_pb2.AndroidAccessibilityWindowInfo
+
+# Field numbers of the repeated messages along forest -> window -> tree -> node.
+_FOREST_WINDOWS = 1
+_WINDOW_TREE = 11
+_TREE_NODES = 1
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+
+
+def _read_varint(data: memoryview, pos: int) -> tuple[int, int]:
+  result = 0
+  shift = 0
+  while True:
+    byte = data[pos]
+    pos += 1
+    result |= (byte & 0x7F) << shift
+    if byte < 0x80:
+      return result, pos
+    shift += 7
+
+
+def _iter_fields(
+    data: memoryview, start: int, end: int
+) -> Iterator[tuple[int, int, int, int, int]]:
+  """Yields (field number, wire type, tag start, start, end) of each field.
+
+  For length-delimited fields, start and end delimit the payload; for the
+  others, the encoded value. The whole field, tag included, spans from tag
+  start to end.
+  """
+  pos = start
+  while pos < end:
+    tag_start = pos
+    tag, pos = _read_varint(data, pos)
+    field, wire_type = tag >> 3, tag & 7
+    value_start = pos
+    if wire_type == _WIRE_VARINT:
+      _, pos = _read_varint(data, pos)
+    elif wire_type == _WIRE_FIXED64:
+      pos += 8
+    elif wire_type == _WIRE_LENGTH_DELIMITED:
+      length, value_start = _read_varint(data, pos)
+      pos = value_start + length
+    elif wire_type == _WIRE_FIXED32:
+      pos += 4
+    else:
+      raise ValueError(f'Unsupported wire type {wire_type} at byte {pos}.')
+    yield field, wire_type, tag_start, value_start, pos
+
+
+def _message_spans(
+    data: memoryview, start: int, end: int, field_number: int
+) -> list[tuple[int, int]]:
+  return [
+      (value_start, value_end)
+      for field, wire_type, _, value_start, value_end in _iter_fields(
+          data, start, end
+      )
+      if field == field_number and wire_type == _WIRE_LENGTH_DELIMITED
+  ]
+
+
+class LazyForest:
+  """Read-only forest whose windows and nodes are decoded on first access.
+
+  Windows are addressed by their position in the forest and nodes by their
+  position in the window. The `windows` property decodes every window, so a
+  LazyForest can stand in for a forest in the representation builders.
+  """
+
+  def __init__(self, source: Union[bytes, _Forest]):
+    """Initializes the view.
+
+    Args:
+      source: A serialized forest, or a forest as returned by
+        `get_a11y_tree`.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+      self._forest = None
+      self._data = memoryview(source)
+      self._window_spans = _message_spans(
+          self._data, 0, len(self._data), _FOREST_WINDOWS
+      )
+      num_windows = len(self._window_spans)
+    else:
+      self._forest = source
+      self._data = None
+      num_windows = len(source.windows)
+    self._headers: list[Optional[_Window]] = [None] * num_windows
+    self._windows: list[Optional[_Window]] = [None] * num_windows
+    self._node_spans: list[Optional[list[tuple[int, int]]]] = (
+        [None] * num_windows
+    )
+    self._nodes: dict[tuple[int, int], _Node] = {}
+    self._node_index: dict[int, dict[int, int]] = {}
+
+  @classmethod
+  def from_forest(cls, forest: _Forest) -> 'LazyForest':
+    return cls(forest)
+
+  @classmethod
+  def from_serialized(cls, data: bytes) -> 'LazyForest':
+    return cls(data)
+
+  @property
+  def is_serialized(self) -> bool:
+    return self._data is not None
+
+  def __len__(self) -> int:
+    return len(self._windows)
+
+  def window_header(self, window: int) -> _Window:
+    """Returns the window without decoding its nodes.
+
+    Over a decoded forest, this is the window itself, tree included.
+
+    Args:
+      window: Position of the window in the forest.
+    """
+    if self._forest is not None:
+      return self._forest.windows[window]
+    header = self._headers[window]
+    if header is None:
+      start, end = self._window_spans[window]
+      encoded = b''.join(
+          self._data[tag_start:value_end]
+          for field, _, tag_start, _, value_end in _iter_fields(
+              self._data, start, end
+          )
+          if field != _WINDOW_TREE
+      )
+      header = _Window.FromString(encoded)
+      self._headers[window] = header
+    return header
+
+  def window(self, window: int) -> _Window:
+    """Returns the fully decoded window."""
+    if self._forest is not None:
+      return self._forest.windows[window]
+    decoded = self._windows[window]
+    if decoded is None:
+      start, end = self._window_spans[window]
+      decoded = _Window.FromString(self._data[start:end])
+      self._windows[window] = decoded
+    return decoded
+
+  @property
+  def windows(self) -> list[_Window]:
+    return [self.window(i) for i in range(len(self))]
+
+  def _spans(self, window: int) -> list[tuple[int, int]]:
+    spans = self._node_spans[window]
+    if spans is None:
+      start, end = self._window_spans[window]
+      spans = []
+      for tree_start, tree_end in _message_spans(
+          self._data, start, end, _WINDOW_TREE
+      ):
+        spans.extend(
+            _message_spans(self._data, tree_start, tree_end, _TREE_NODES)
+        )
+      self._node_spans[window] = spans
+    return spans
+
+  def num_nodes(self, window: int) -> int:
+    if self._forest is not None or self._windows[window] is not None:
+      return len(self.window(window).tree.nodes)
+    return len(self._spans(window))
+
+  def node(self, window: int, position: int) -> _Node:
+    """Returns a node, decoding only that node."""
+    if self._forest is not None or self._windows[window] is not None:
+      return self.window(window).tree.nodes[position]
+    key = (window, position)
+    node = self._nodes.get(key)
+    if node is None:
+      start, end = self._spans(window)[position]
+      node = _Node.FromString(self._data[start:end])
+      self._nodes[key] = node
+    return node
+
+  def nodes(self, window: int) -> Iterator[_Node]:
+    for position in range(self.num_nodes(window)):
+      yield self.node(window, position)
+
+  def node_by_id(self, window: int, unique_id: int) -> Optional[_Node]:
+    """Looks a node up by unique id; indexes the window on first use."""
+    index = self._node_index.get(window)
+    if index is None:
+      index = {
+          node.unique_id: position
+          for position, node in enumerate(self.nodes(window))
+      }
+      self._node_index[window] = index
+    position = index.get(unique_id)
+    return None if position is None else self.node(window, position)
+
+  def find_window(self, predicate: Callable[[_Window], bool]) -> Optional[int]:
+    """Returns the position of the first window whose header matches."""
+    for window in range(len(self)):
+      if predicate(self.window_header(window)):
+        return window
+    return None
+
+  def focused_window(self) -> Optional[int]:
+    """Returns the position of the focused window, else of the active one."""
+    focused = self.find_window(lambda header: header.is_focused)
+    if focused is None:
+      focused = self.find_window(lambda header: header.is_active)
+    return focused
+
+  def to_forest(self) -> _Forest:
+    """Returns the fully decoded forest."""
+    if self._forest is not None:
+      return self._forest
+    return _Forest.FromString(self._data)
+
+
+def _on_screen(node: _Node, screen_size: tuple[int, int]) -> bool:
+  bounds = node.bounds_in_screen
+  width, height = screen_size
+  return (
+      bounds.right > max(bounds.left, 0)
+      and bounds.bottom > max(bounds.top, 0)
+      and bounds.left < width
+      and bounds.top < height
+  )
+
+
+def _kept_positions(
+    nodes: Any, screen_size: Optional[tuple[int, int]]
+) -> Optional[list[bool]]:
+  """Decides which nodes of a window survive filtering.
+
+  Args:
+    nodes: The window's nodes.
+    screen_size: If given, nodes entirely off this screen count as hidden.
+
+  Returns:
+    Whether to keep each node, or None to keep the window unchanged.
+  """
+  num_nodes = len(nodes)
+  position = {node.unique_id: i for i, node in enumerate(nodes)}
+  if len(position) != num_nodes:
+    return None
+  parent = [-1] * num_nodes
+  children = [[] for _ in range(num_nodes)]
+  shown = [False] * num_nodes
+  for i, node in enumerate(nodes):
+    for child_id in node.child_ids:
+      child = position.get(child_id)
+      # Builders walk parents before children and treat shared children
+      # first-come; only plain pre-ordered trees are filtered.
+      if child is None or child <= i or parent[child] != -1:
+        return None
+      parent[child] = i
+      children[i].append(child)
+    shown[i] = node.is_visible_to_user and (
+        screen_size is None or _on_screen(node, screen_size)
+    )
+
+  # Children follow their parents, so one backward pass folds subtrees.
+  has_shown = list(shown)
+  for i in range(num_nodes - 1, 0, -1):
+    if has_shown[i] and parent[i] >= 0:
+      has_shown[parent[i]] = True
+
+  keep = [has_shown[i] or parent[i] == -1 for i in range(num_nodes)]
+  for i in range(num_nodes):
+    if has_shown[i] or parent[i] == -1:
+      if children[i] and not any(has_shown[c] for c in children[i]):
+        # Keep one hidden child, without its subtree, so that the node does
+        # not turn into a leaf, which would make it eligible for a display id.
+        keep[children[i][0]] = True
+  if all(keep):
+    return None
+  return keep
+
+
+def filter_forest(
+    forest: _Forest,
+    screen_size: Optional[tuple[int, int]] = None,
+) -> _Forest:
+  """Copies a forest without subtrees that hold no node visible to the user.
+
+  Window roots are always kept, as is one (childless) hidden child of a node
+  whose children are all hidden, so every remaining node stays a leaf or an
+  inner node as before. With the default screen_size, the HTML, clean HTML
+  and action representations built with invisible elements excluded are
+  unchanged. Node unique ids are preserved; windows that are not plain
+  parent-before-child trees are copied unfiltered.
+
+  Args:
+    forest: A forest, e.g. from `get_a11y_tree`.
+    screen_size: Screen (width, height). If given, nodes entirely off screen
+      are treated as invisible too. This changes the representations when
+      the accessibility service reports off-screen nodes as visible.
+
+  Returns:
+    The filtered copy.
+  """
+  filtered = _Forest()
+  for window in forest.windows:
+    nodes = window.tree.nodes
+    new_window = filtered.windows.add()
+    keep = _kept_positions(nodes, screen_size)
+    if keep is None:
+      new_window.CopyFrom(window)
+      continue
+    for field, value in window.ListFields():
+      if field.number == _WINDOW_TREE:
+        continue
+      if field.message_type is not None:
+        getattr(new_window, field.name).CopyFrom(value)
+      else:
+        setattr(new_window, field.name, value)
+    kept_ids = {node.unique_id for node, kept in zip(nodes, keep) if kept}
+    new_nodes = new_window.tree.nodes
+    for node, kept in zip(nodes, keep):
+      if not kept:
+        continue
+      new_node = new_nodes.add()
+      new_node.CopyFrom(node)
+      child_ids = [c for c in node.child_ids if c in kept_ids]
+      if len(child_ids) != len(node.child_ids):
+        del new_node.child_ids[:]
+        new_node.child_ids.extend(child_ids)
+  return filtered
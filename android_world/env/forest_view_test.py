@@ -0,0 +1,191 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.env import forest_view
+from android_world.env import representation_utils
+from android_world.utils import synthetic_forest
+from html_representation import html_representation
+
+
+def _displayed(extracted):
+  """Drops mapping entries of nodes that got no display id."""
+  return [
+      {key: value for key, value in part.items() if value['display_id'] is not None}
+      if isinstance(part, dict)
+      else part
+      for part in extracted
+  ]
+
+
+def _hidden_forest(seed=0, num_nodes=400, num_windows=1):
+  return synthetic_forest.generate_forest(
+      num_nodes,
+      seed=seed,
+      num_windows=num_windows,
+      hidden_subtree_fraction=0.1,
+  )
+
+
+class LazyForestTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.forest = synthetic_forest.generate_forest(300, num_windows=3)
+    self.forest.windows[1].is_focused = True
+    self.view = forest_view.LazyForest.from_serialized(
+        self.forest.SerializeToString()
+    )
+
+  def test_window_header_has_no_nodes(self):
+    header = self.view.window_header(0)
+
+    self.assertEmpty(header.tree.nodes)
+    self.assertEqual(header.id, self.forest.windows[0].id)
+    self.assertEqual(
+        header.bounds_in_screen, self.forest.windows[0].bounds_in_screen
+    )
+
+  def test_nodes_match_full_decode(self):
+    for window in range(len(self.forest.windows)):
+      self.assertEqual(
+          self.view.num_nodes(window),
+          len(self.forest.windows[window].tree.nodes),
+      )
+      self.assertEqual(
+          list(self.view.nodes(window)),
+          list(self.forest.windows[window].tree.nodes),
+      )
+
+  def test_node_by_id(self):
+    expected = self.forest.windows[0].tree.nodes[17]
+
+    self.assertEqual(self.view.node_by_id(0, expected.unique_id), expected)
+    self.assertIsNone(self.view.node_by_id(0, -1))
+
+  def test_focused_window(self):
+    self.assertEqual(self.view.focused_window(), 1)
+
+  def test_focused_window_falls_back_to_active(self):
+    self.forest.windows[1].is_focused = False
+    self.forest.windows[2].is_active = True
+    view = forest_view.LazyForest.from_forest(self.forest)
+
+    self.assertEqual(view.focused_window(), 2)
+
+  @parameterized.parameters(True, False)
+  def test_round_trip(self, serialized):
+    source = self.forest.SerializeToString() if serialized else self.forest
+    view = forest_view.LazyForest(source)
+
+    self.assertEqual(view.is_serialized, serialized)
+    self.assertEqual(view.to_forest(), self.forest)
+    self.assertEqual(list(view.windows), list(self.forest.windows))
+
+  def test_serialized_view_works_with_builders(self):
+    self.assertEqual(
+        representation_utils.forest_to_ui_elements(self.view),
+        representation_utils.forest_to_ui_elements(self.forest),
+    )
+
+
+class FilterForestTest(parameterized.TestCase):
+
+  @parameterized.parameters(0, 1, 2, 3, 4)
+  def test_representations_unchanged(self, seed):
+    forest = _hidden_forest(seed, num_windows=2)
+    filtered = forest_view.filter_forest(forest)
+
+    self.assertLess(
+        sum(len(w.tree.nodes) for w in filtered.windows),
+        sum(len(w.tree.nodes) for w in forest.windows),
+    )
+    for build in (
+        html_representation.turn_tree_to_html_input,
+        html_representation.turn_tree_to_html_input_v2,
+        html_representation.turn_tree_to_clean_html_input,
+    ):
+      self.assertEqual(build(filtered), build(forest))
+    for extract in (
+        html_representation.extract_actions_with_display_id_v2,
+        html_representation.extract_actions_with_display_id_v3,
+    ):
+      # The mappings also list the nodes without a display id, hidden ones
+      # included; those are the only entries allowed to differ.
+      self.assertEqual(
+          _displayed(extract(filtered, return_mapping=True)),
+          _displayed(extract(forest, return_mapping=True)),
+      )
+    self.assertEqual(
+        representation_utils.forest_to_ui_elements(
+            filtered, exclude_invisible_elements=True
+        ),
+        representation_utils.forest_to_ui_elements(
+            forest, exclude_invisible_elements=True
+        ),
+    )
+
+  def test_keeps_roots_and_stub_children(self):
+    forest = synthetic_forest.generate_forest(3, invisible_fraction=0.0)
+    nodes = forest.windows[0].tree.nodes
+    root = nodes[0]
+    del root.child_ids[:]
+    root.child_ids.append(nodes[1].unique_id)
+    del nodes[1].child_ids[:]
+    nodes[1].child_ids.append(nodes[2].unique_id)
+    del nodes[2].child_ids[:]
+    root.is_visible_to_user = False
+    nodes[1].is_visible_to_user = False
+    nodes[2].is_visible_to_user = False
+
+    filtered = forest_view.filter_forest(forest).windows[0]
+
+    self.assertEqual(
+        [node.unique_id for node in filtered.tree.nodes],
+        [root.unique_id, nodes[1].unique_id],
+    )
+    self.assertEmpty(filtered.tree.nodes[1].child_ids)
+    self.assertEqual(filtered.id, forest.windows[0].id)
+
+  def test_window_with_shared_child_is_copied(self):
+    forest = _hidden_forest()
+    nodes = forest.windows[0].tree.nodes
+    nodes[1].child_ids.append(nodes[-1].unique_id)
+    nodes[2].child_ids.append(nodes[-1].unique_id)
+
+    self.assertEqual(forest_view.filter_forest(forest), forest)
+
+  def test_screen_size_drops_off_screen_nodes(self):
+    forest = synthetic_forest.generate_forest(50, invisible_fraction=0.0)
+    nodes = forest.windows[0].tree.nodes
+    # A leaf with a sibling, so that it is not kept as a stub child.
+    by_id = {node.unique_id: node for node in nodes}
+    leaf = next(
+        by_id[node.child_ids[-1]]
+        for node in nodes
+        if len(node.child_ids) > 1 and not by_id[node.child_ids[-1]].child_ids
+    )
+    leaf.bounds_in_screen.top = 5000
+    leaf.bounds_in_screen.bottom = 5100
+
+    on_screen = forest_view.filter_forest(forest)
+    cropped = forest_view.filter_forest(forest, screen_size=(1080, 2400))
+
+    ids = lambda f: {node.unique_id for node in f.windows[0].tree.nodes}
+    self.assertIn(leaf.unique_id, ids(on_screen))
+    self.assertNotIn(leaf.unique_id, ids(cropped))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,203 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Vectorized screen geometry for UI element and accessibility node bounds.
+
+All bounds of a screen are held in one `(N, 4)` float array whose columns are
+`(x_min, y_min, x_max, y_max)`. Elements without a bounding box are stored as
+rows of NaN. The functions here reproduce the scalar helpers in
+`m3a_utils` and `representation_utils` exactly, including the integer
+truncation and the rotation handling, but process a whole screen per call.
+"""
+
+from typing import Any, Sequence
+
+from android_world.env import representation_utils
+import numpy as np
+
+X_MIN, Y_MIN, X_MAX, Y_MAX = range(4)
+
+# For each orientation, the bounds columns holding the logical (x, y) of the
+# upper left and then the lower right corner; see
+# m3a_utils._ui_element_logical_corner.
+_LOGICAL_CORNER_COLUMNS = {
+    0: (X_MIN, Y_MIN, X_MAX, Y_MAX),
+    1: (X_MIN, Y_MAX, X_MAX, Y_MIN),
+    2: (X_MAX, Y_MAX, X_MIN, Y_MIN),
+    3: (X_MAX, Y_MIN, X_MIN, Y_MAX),
+}
+
+
+def _check_orientation(orientation: int) -> None:
+  if orientation not in _LOGICAL_CORNER_COLUMNS:
+    raise ValueError('Unsupported orientation.')
+
+
+def ui_element_bounds(
+    ui_elements: Sequence[representation_utils.UIElement],
+) -> np.ndarray:
+  """Returns the pixel bounds of the elements as an (N, 4) array."""
+  bounds = np.full((len(ui_elements), 4), np.nan)
+  for i, element in enumerate(ui_elements):
+    bbox = element.bbox_pixels
+    if bbox is not None:
+      bounds[i] = (bbox.x_min, bbox.y_min, bbox.x_max, bbox.y_max)
+  return bounds
+
+
+def node_bounds(nodes: Sequence[Any]) -> np.ndarray:
+  """Returns the bounds_in_screen of accessibility nodes as an (N, 4) array."""
+  bounds = np.empty((len(nodes), 4))
+  for i, node in enumerate(nodes):
+    rect = node.bounds_in_screen
+    bounds[i] = (rect.left, rect.top, rect.right, rect.bottom)
+  return bounds
+
+
+def has_bounds(bounds: np.ndarray) -> np.ndarray:
+  """Returns a boolean mask of the rows that hold a bounding box."""
+  return ~np.isnan(bounds).any(axis=1)
+
+
+def logical_corners(bounds: np.ndarray, orientation: int) -> np.ndarray:
+  """Logical upper left and lower right corners for the given orientation.
+
+  Args:
+    bounds: (N, 4) bounds array.
+    orientation: The current screen orientation.
+
+  Returns:
+    (N, 4) int64 array of (upper_left_x, upper_left_y, lower_right_x,
+    lower_right_y), truncated towards zero like int(). Rows without bounds are
+    zero.
+
+  Raises:
+    ValueError: If orientation is not valid.
+  """
+  _check_orientation(orientation)
+  corners = bounds[:, _LOGICAL_CORNER_COLUMNS[orientation]]
+  corners = np.nan_to_num(np.trunc(corners), nan=0.0)
+  return corners.astype(np.int64)
+
+
+def logical_to_physical(
+    points: np.ndarray,
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+) -> np.ndarray:
+  """Converts logical points to physical points in portrait orientation.
+
+  Vectorized m3a_utils._logical_to_physical.
+
+  Args:
+    points: (..., 2) integer array of logical (x, y) coordinates.
+    logical_screen_size: The logical screen size.
+    physical_frame_boundary: The physical coordinates in portrait orientation
+      for the upper left and lower right corner for the frame.
+    orientation: The current screen orientation.
+
+  Returns:
+    (..., 2) int64 array of physical coordinates.
+
+  Raises:
+    ValueError: If the orientation is not valid.
+  """
+  _check_orientation(orientation)
+  x, y = points[..., 0], points[..., 1]
+  px0, py0, px1, py1 = physical_frame_boundary
+  px, py = px1 - px0, py1 - py0
+  lx, ly = logical_screen_size
+
+  def scale(value, physical, logical):
+    # Matches int(value * physical / logical) for integer inputs.
+    return np.trunc(value * physical / logical).astype(np.int64)
+
+  if orientation == 0:
+    out_x, out_y = scale(x, px, lx) + px0, scale(y, py, ly) + py0
+  elif orientation == 1:
+    out_x, out_y = px - scale(y, px, ly) + px0, scale(x, py, lx) + py0
+  elif orientation == 2:
+    out_x, out_y = px - scale(x, px, lx) + px0, py - scale(y, py, ly) + py0
+  else:
+    out_x, out_y = scale(y, px, ly) + px0, py - scale(x, py, lx) + py0
+  return np.stack([out_x, out_y], axis=-1).astype(np.int64)
+
+
+def physical_corners(
+    bounds: np.ndarray,
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+) -> np.ndarray:
+  """Physical (upper left, lower right) corners of every row of bounds.
+
+  Args:
+    bounds: (N, 4) bounds array.
+    logical_screen_size: The logical screen size.
+    physical_frame_boundary: The physical coordinates in portrait orientation
+      for the upper left and lower right corner for the frame.
+    orientation: The current screen orientation.
+
+  Returns:
+    (N, 4) int64 array of (upper_left_x, upper_left_y, lower_right_x,
+    lower_right_y) in physical coordinates.
+  """
+  corners = logical_corners(bounds, orientation).reshape(-1, 2, 2)
+  return logical_to_physical(
+      corners, logical_screen_size, physical_frame_boundary, orientation
+  ).reshape(-1, 4)
+
+
+def valid_bounds(
+    bounds: np.ndarray, screen_width_height_px: tuple[int, int]
+) -> np.ndarray:
+  """Mask of bounds that are non-empty and intersect the screen.
+
+  Rows without bounds count as valid, like in m3a_utils.validate_ui_element.
+
+  Args:
+    bounds: (N, 4) bounds array.
+    screen_width_height_px: Screen (width, height).
+
+  Returns:
+    Boolean mask of shape (N,).
+  """
+  screen_width, screen_height = screen_width_height_px
+  x_min, y_min = bounds[:, X_MIN], bounds[:, Y_MIN]
+  x_max, y_max = bounds[:, X_MAX], bounds[:, Y_MAX]
+  with np.errstate(invalid='ignore'):
+    invalid = (
+        (x_min >= x_max)
+        | (x_min >= screen_width)
+        | (x_max <= 0)
+        | (y_min >= y_max)
+        | (y_min >= screen_height)
+        | (y_max <= 0)
+    )
+  return ~invalid | ~has_bounds(bounds)
+
+
+def valid_ui_elements(
+    ui_elements: Sequence[representation_utils.UIElement],
+    screen_width_height_px: tuple[int, int],
+    bounds: np.ndarray | None = None,
+) -> np.ndarray:
+  """Vectorized m3a_utils.validate_ui_element over a whole screen."""
+  if bounds is None:
+    bounds = ui_element_bounds(ui_elements)
+  visible = np.array(
+      [bool(element.is_visible) for element in ui_elements], dtype=bool
+  )
+  return visible & valid_bounds(bounds, screen_width_height_px)
+
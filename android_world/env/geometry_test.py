@@ -0,0 +1,116 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import m3a_utils
+from android_world.env import geometry
+from android_world.env import representation_utils
+import numpy as np
+
+
+def _random_elements(rng, count, screen_size=(1080, 2400)):
+  width, height = screen_size
+  elements = []
+  for _ in range(count):
+    if rng.random() < 0.1:
+      bbox = None
+    else:
+      x = sorted(rng.randint(-200, width + 200) for _ in range(2))
+      y = sorted(rng.randint(-200, height + 200) for _ in range(2))
+      if rng.random() < 0.2:
+        x.reverse()
+      bbox = representation_utils.BoundingBox(x[0], x[1], y[0], y[1])
+    elements.append(
+        representation_utils.UIElement(
+            bbox_pixels=bbox, is_visible=rng.random() < 0.9
+        )
+    )
+  return elements
+
+
+class GeometryTest(parameterized.TestCase):
+
+  @parameterized.product(
+      orientation=(0, 1, 2, 3),
+      logical_screen_size=((1080, 2400), (2400, 1080), (720, 1280)),
+      physical_frame_boundary=((0, 0, 1080, 2400), (0, 100, 1080, 2300)),
+  )
+  def test_physical_corners_match_scalar(
+      self, orientation, logical_screen_size, physical_frame_boundary
+  ):
+    elements = [
+        element
+        for element in _random_elements(random.Random(orientation), 300)
+        if element.bbox_pixels is not None
+    ]
+    bounds = geometry.ui_element_bounds(elements)
+
+    corners = geometry.physical_corners(
+        bounds, logical_screen_size, physical_frame_boundary, orientation
+    )
+
+    for element, row in zip(elements, corners.tolist()):
+      upper_left, lower_right = m3a_utils._ui_element_logical_corner(
+          element, orientation
+      )
+      expected = m3a_utils._logical_to_physical(
+          upper_left, logical_screen_size, physical_frame_boundary, orientation
+      ) + m3a_utils._logical_to_physical(
+          lower_right, logical_screen_size, physical_frame_boundary, orientation
+      )
+      self.assertEqual(tuple(row), expected)
+
+  def test_invalid_orientation(self):
+    with self.assertRaisesRegex(ValueError, 'Unsupported orientation'):
+      geometry.physical_corners(np.zeros((1, 4)), (1, 1), (0, 0, 1, 1), 4)
+
+  def test_valid_ui_elements_match_scalar(self):
+    elements = _random_elements(random.Random(0), 500)
+    screen_size = (1080, 2400)
+
+    valid = geometry.valid_ui_elements(elements, screen_size)
+
+    self.assertEqual(
+        valid.tolist(),
+        [m3a_utils.validate_ui_element(e, screen_size) for e in elements],
+    )
+
+  def test_add_ui_element_marks_matches_per_element_marks(self):
+    elements = _random_elements(random.Random(2), 60)
+    for element in elements[::3]:
+      element.text = 'Settings'
+      element.is_clickable = True
+    for add_image_desc in (False, True):
+      for orientation in (0, 1):
+        expected = np.zeros((2400, 1080, 3), dtype=np.uint8)
+        for index, element in enumerate(elements):
+          if m3a_utils.validate_ui_element(element, (1080, 2400)):
+            m3a_utils.add_ui_element_mark(
+                expected, element, index, (1080, 2400), (0, 0, 1080, 2400),
+                orientation, add_image_desc=add_image_desc,
+            )
+        actual = np.zeros_like(expected)
+
+        m3a_utils.add_ui_element_marks(
+            actual, elements, (1080, 2400), (0, 0, 1080, 2400), orientation,
+            add_image_desc=add_image_desc,
+        )
+
+        np.testing.assert_array_equal(actual, expected)
+
+
+if __name__ == '__main__':
+  absltest.main()
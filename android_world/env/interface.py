@@ -16,8 +16,8 @@
 
 import abc
 import dataclasses
-import time
-from typing import Any, Optional, Self
+import functools
+from typing import Any, Callable, Optional, Self
 
 from android_env.components import action_type
 from android_world.env import actuation
@@ -25,6 +25,10 @@ from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.env import screen_signature
+from android_world.env import ui_element_table
+from android_world.env import ui_stabilizer
+from android_world.env import wait_conditions
 import dm_env
 import numpy as np
 
@@ -52,6 +56,16 @@ class State:
   forest: Any
   ui_elements: list[representation_utils.UIElement]
 
+  @functools.cached_property
+  def ui_element_table(self) -> ui_element_table.UIElementTable:
+    """Columnar copy of ui_elements with a precomputed content hash."""
+    return ui_element_table.UIElementTable.from_ui_elements(self.ui_elements)
+
+  @functools.cached_property
+  def screen_signature(self) -> int:
+    """Content-free structural signature; see screen_signature.py."""
+    return screen_signature.screen_signature(self.ui_element_table)
+
   @classmethod
   def create_and_infer_elements(
       cls,
@@ -132,8 +146,17 @@ class AsyncEnv(abc.ABC):
     """
 
   @abc.abstractmethod
-  def execute_action(self, action: json_action.JSONAction) -> None:
-    """Executes action on the environment."""
+  def execute_action(
+      self, action: json_action.JSONAction, state: Optional[State] = None
+  ) -> None:
+    """Executes action on the environment.
+
+    Args:
+      action: The action to execute.
+      state: The state the action was chosen on. Its UI elements resolve the
+        action's element index if it is still the latest observation;
+        otherwise the environment fetches the current state.
+    """
 
   @property
   @abc.abstractmethod
@@ -192,6 +215,34 @@ class AsyncEnv(abc.ABC):
     orientation.
     """
 
+  def invalidate_geometry(self) -> None:
+    """Drops cached screen geometry after the orientation or size changed."""
+
+
+def _display_signature(forest: Any) -> Optional[tuple[int, int]]:
+  """Returns the extent of the windows in a forest, or None if unknown.
+
+  Rotating the screen or changing its size changes the extent, so it tells
+  when cached screen geometry may be stale without asking the device. It
+  cannot tell portrait from reverse portrait (or landscape from reverse
+  landscape); code that rotates the screen calls invalidate_geometry.
+
+  Args:
+    forest: The accessibility forest of an observation.
+  """
+  if forest is None or not getattr(forest, 'windows', None):
+    return None
+  right = bottom = 0
+  for window in forest.windows:
+    bounds = window.bounds_in_screen
+    if not (bounds.right or bounds.bottom) and window.tree.nodes:
+      bounds = window.tree.nodes[0].bounds_in_screen
+    right = max(right, bounds.right)
+    bottom = max(bottom, bounds.bottom)
+  if not (right and bottom):
+    return None
+  return right, bottom
+
 
 def _process_timestep(timestep: dm_env.TimeStep) -> State:
   """Parses timestep observation and returns State."""
@@ -212,10 +263,43 @@ class AsyncAndroidEnv(AsyncEnv):
   interaction_cache = ''
 
   def __init__(
-      self, controller: android_world_controller.AndroidWorldController
+      self,
+      controller: android_world_controller.AndroidWorldController,
+      cache_geometry: bool = True,
+      stabilizer_config: Optional[ui_stabilizer.StabilizerConfig] = None,
+      wait_config: Optional[wait_conditions.WaitConfig] = None,
   ):
+    """Initializes the environment.
+
+    Args:
+      controller: The controller of the device.
+      cache_geometry: Whether to keep logical_screen_size, orientation and
+        physical_frame_boundary until the windows of an observation change
+        extent or invalidate_geometry is called, instead of querying the
+        device on every access.
+      stabilizer_config: How get_state(wait_to_stabilize=True) polls the
+        screen; see ui_stabilizer.StabilizerConfig.
+      wait_config: How actions wait for the device between their steps, e.g.
+        for a text field to get focus before typing; see
+        wait_conditions.WaitConfig.
+    """
     self._controller = controller
-    self._prior_state = None
+    config = stabilizer_config or ui_stabilizer.StabilizerConfig()
+    self._stabilizer = ui_stabilizer.UIStabilizer(
+        config,
+        last_event_time=(
+            None
+            if config.event_quiet_seconds is None
+            else controller.last_a11y_event_time
+        ),
+    )
+    self._waiter = wait_conditions.Waiter(wait_config)
+    self._cache_geometry = cache_geometry
+    self._geometry = {}
+    self._display_signature = None
+    # The last state returned by get_state or reset, until an action is
+    # executed.
+    self._latest_state = None
     # Variable used to temporarily save interactions between agent and user.
     # Like when agent use answer action to answer user questions, we
     # use this to save the agent response. Or later on when agent has the
@@ -231,69 +315,96 @@ class AsyncAndroidEnv(AsyncEnv):
       adb_utils.press_home_button(self.controller)
     self.interaction_cache = ''
 
-    return _process_timestep(self.controller.reset())
+    self.invalidate_geometry()
+    return self._observe(_process_timestep(self.controller.reset()))
 
   def _get_state(self):
-    return _process_timestep(self.controller.step(_get_no_op_action()))
+    return self._observe(
+        _process_timestep(self.controller.step(_get_no_op_action()))
+    )
 
-  def _get_stable_state(
-      self,
-      stability_threshold: int = 3,
-      sleep_duration: float = 0.5,
-      timeout: float = 120.0,
-  ) -> State:
-    """Checks if the UI elements remain stable over a number of checks and gets state.
+  def _observe(self, state: State) -> State:
+    """Records the latest state; invalidates geometry if the extent changed."""
+    signature = _display_signature(state.forest)
+    if signature is None or signature != self._display_signature:
+      self.invalidate_geometry()
+    self._display_signature = signature
+    self._latest_state = state
+    return state
 
-    Args:
-        stability_threshold: Number of consecutive checks where UI elements must
-          remain the same to consider UI stable.
-        sleep_duration: Time in seconds to wait between checks.
-        timeout: Maximum time in seconds to wait for UI to become stable before
-          giving up.
+  def _state_for_action(self, state: Optional[State]) -> State:
+    """Returns state if no action was executed since it was observed.
 
-    Returns:
-        True if UI is considered stable, False if it never stabilizes within the
-        timeout.
+    An agent picks the action from the state it observed last, so fetching
+    the screen again before acting only repeats that fetch. States that are
+    older, or were not observed through this environment, are replaced by a
+    fresh one. Commands sent to the controller directly are not tracked, so
+    callers that use it between observing and acting should not pass state.
+
+    Args:
+      state: The state the action was chosen on, if the caller knows it.
     """
-    if not self._prior_state:
-      self._prior_state = self._get_state()
+    if state is None or state is not self._latest_state:
+      state = self.get_state(wait_to_stabilize=False)
+    # The action is about to change the screen.
+    self._latest_state = None
+    return state
+
+  def invalidate_geometry(self) -> None:
+    self._geometry.clear()
+
+  def _cached(self, key: str, fetch: Callable[[], Any]) -> Any:
+    if not self._cache_geometry:
+      return fetch()
+    if key not in self._geometry:
+      self._geometry[key] = fetch()
+    return self._geometry[key]
 
-    stable_checks = 0
-    elapsed_time = 0.0
-    current_state = self._get_state()
+  @property
+  def stabilizer(self) -> ui_stabilizer.UIStabilizer:
+    """Waits for stable states; its histogram records the waits."""
+    return self._stabilizer
+
+  @property
+  def waiter(self) -> wait_conditions.Waiter:
+    """Waits within actions; its stats record the waits."""
+    return self._waiter
 
-    while stable_checks < stability_threshold and elapsed_time < timeout:
-      if self._prior_state.ui_elements == current_state.ui_elements:
-        stable_checks += 1
-        if stable_checks == stability_threshold:
-          break  # Exit early if stability is achieved.
-      else:
-        stable_checks = 0  # Reset if any change is detected
-        self._prior_state = current_state
+  def probe_ui_digest(self) -> int:
+    """Digest of the current UI elements, read without a screenshot."""
+    return ui_element_table.UIElementTable.from_ui_elements(
+        self.controller.get_ui_elements()
+    ).content_hash
 
-      time.sleep(sleep_duration)
-      elapsed_time += sleep_duration
-      current_state = self._get_state()
+  def _get_stable_state(self) -> State:
+    """Waits for the UI elements to stop changing and fetches the state.
 
-    return current_state
+    The UI tree is polled on its own; the screenshot is taken once, with the
+    state returned.
+    """
+    return self._stabilizer.wait(self._get_state, probe=self.probe_ui_digest)
 
   def get_state(self, wait_to_stabilize: bool = False) -> State:
     if wait_to_stabilize:
       return self._get_stable_state()
     return self._get_state()
 
-  def execute_action(self, action: json_action.JSONAction) -> None:
+  def execute_action(
+      self, action: json_action.JSONAction, state: Optional[State] = None
+  ) -> None:
     if action.action_type == json_action.ANSWER:
       self.interaction_cache = action.text
       if action.text:
+        self._latest_state = None
         self.display_message(action.text, header='Agent answered:')
       return
-    state = self.get_state(wait_to_stabilize=False)
+    state = self._state_for_action(state)
     actuation.execute_adb_action(
         action,
         state.ui_elements,
         self.logical_screen_size,
         self.controller,
+        self._waiter,
     )
   
   def execute_magma_action(self, action: json_action.JSONAction) -> None:
@@ -302,12 +413,13 @@ class AsyncAndroidEnv(AsyncEnv):
       if action.text:
         self.display_message(action.text, header='Agent answered:')
       return
-    state = self.get_state(wait_to_stabilize=False)
+    state = self._state_for_action(None)
     actuation.execute_adb_action(
         action,
         state.ui_elements,
         self.logical_screen_size,
         self.controller,
+        self._waiter,
     )
 
   def hide_automation_ui(self) -> None:
@@ -343,15 +455,25 @@ class AsyncAndroidEnv(AsyncEnv):
 
   @property
   def logical_screen_size(self) -> tuple[int, int]:
-    return adb_utils.get_logical_screen_size(self.controller)
+    return self._cached(
+        'logical_screen_size',
+        lambda: adb_utils.get_logical_screen_size(self.controller),
+    )
 
   def close(self) -> None:
     return self.controller.close()
 
   @property
   def orientation(self) -> int:
-    return adb_utils.get_orientation(self.controller)
+    return self._cached(
+        'orientation', lambda: adb_utils.get_orientation(self.controller)
+    )
 
   @property
   def physical_frame_boundary(self) -> tuple[int, int, int, int]:
-    return adb_utils.get_physical_frame_boundary(self.controller)
+    return self._cached(
+        'physical_frame_boundary',
+        lambda: adb_utils.get_physical_frame_boundary(
+            self.controller, orientation=self.orientation
+        ),
+    )
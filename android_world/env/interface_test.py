@@ -15,79 +15,402 @@
 from unittest import mock
 
 from absl.testing import absltest
+from android_world.env import actuation
+from android_world.env import android_world_controller
 from android_world.env import interface
+from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.env import ui_stabilizer
+from android_world.env import wait_conditions
+from android_world.utils import fake_adb_responses
+from android_world.utils import simulated_screen
+from android_world.utils import synthetic_forest
 import numpy as np
 
+_GEOMETRY_QUERIES = ("logicalFrame", "physicalFrame", "mCurrentRotation")
+
+
+class _FakeDevice:
+  """Controller answering geometry queries and counting adb calls."""
+
+  def __init__(self):
+    self.orientation = 0
+    self.geometry_calls = 0
+    self.adb_calls = 0
+    self.fetches = 0
+    self.commands = []
+    self.taps = []
+    self.controller = mock.MagicMock()
+    self.controller.execute_adb_call.side_effect = self._execute_adb_call
+    self.controller.step.side_effect = self._timestep
+    self.controller.reset.side_effect = self._timestep
+
+  def _screen_size(self):
+    return (1080, 2400) if self.orientation % 2 == 0 else (2400, 1080)
+
+  def _execute_adb_call(self, request):
+    self.adb_calls += 1
+    if request.HasField("tap"):
+      self.taps.append((request.tap.x, request.tap.y))
+    command = " ".join(request.generic.args)
+    self.commands.append(command)
+    if any(query in command for query in _GEOMETRY_QUERIES):
+      self.geometry_calls += 1
+    if "logicalFrame" in command:
+      return fake_adb_responses.create_get_logical_screen_size_response(
+          *self._screen_size()
+      )
+    if "physicalFrame" in command:
+      return fake_adb_responses.create_get_physical_frame_boundary_response(
+          0, 0, 1080, 2400
+      )
+    if "mCurrentRotation" in command:
+      return fake_adb_responses.create_get_orientation_response(
+          self.orientation
+      )
+    return fake_adb_responses.create_successful_generic_response("")
+
+  def _timestep(self, *unused_args):
+    self.fetches += 1
+    forest = synthetic_forest.generate_forest(
+        20, screen_size=self._screen_size()
+    )
+    for window in forest.windows:
+      window.bounds_in_screen.right, window.bounds_in_screen.bottom = (
+          self._screen_size()
+      )
+    timestep = mock.MagicMock()
+    timestep.observation = {
+        "pixels": np.zeros((2400, 1080, 3), np.uint8),
+        android_world_controller.OBSERVATION_KEY_FOREST: forest,
+        android_world_controller.OBSERVATION_KEY_UI_ELEMENTS: [
+            representation_utils.UIElement(
+                text="Button",
+                is_clickable=True,
+                bbox_pixels=representation_utils.BoundingBox(
+                    0, 100, 0, 100 + 10 * self.fetches
+                ),
+            )
+        ],
+    }
+    return timestep
+
+
+def _agent_step(env):
+  """Observes and acts the way VDroid does in one step."""
+  env.get_state(wait_to_stabilize=False)
+  geometry = (
+      env.logical_screen_size,
+      env.orientation,
+      env.physical_frame_boundary,
+  )
+  env.execute_action(json_action.JSONAction(action_type="click", index=0))
+  return geometry
+
 
 class InterfaceTest(absltest.TestCase):
 
-  @mock.patch("time.sleep", return_value=None)
-  def test_ui_stability_true(self, unused_mocked_time_sleep):
-    stable_ui_elements = [representation_utils.UIElement(text="StableElement")]
+  def _env_with_states(self, texts, **config):
+    """Returns an env observing one element per text, and its clock."""
+    config.setdefault("settle_seconds", 0.5)
+    config.setdefault("use_probes", False)
+    clock = simulated_screen.VirtualClock()
+    env = interface.AsyncAndroidEnv(mock.MagicMock())
+    env._stabilizer = ui_stabilizer.UIStabilizer(
+        ui_stabilizer.StabilizerConfig(**config),
+        clock=clock.time,
+        sleep=clock.sleep,
+    )
     states = [
         interface.State(
-            ui_elements=stable_ui_elements,
+            ui_elements=[representation_utils.UIElement(text=text)],
             pixels=np.empty([1, 2, 3]),
             forest=None,
         )
-        for _ in range(4)
+        for text in texts
     ]
-    env = interface.AsyncAndroidEnv(mock.MagicMock())
     env._get_state = mock.MagicMock(side_effect=states)
+    return env, states, clock
 
-    self.assertEqual(
-        env._get_stable_state(
-            stability_threshold=3, sleep_duration=0.1, timeout=1
-        ),
-        states[3],
-    )
-
-  @mock.patch("time.sleep", return_value=None)
-  def test_ui_stability_false_due_to_timeout(
-      self, unused_unused_mocked_time_sleep
-  ):
-    changing_ui_elements = [
-        representation_utils.UIElement(text=f"Element{i}") for i in range(10)
-    ]
-    env = interface.AsyncAndroidEnv(mock.MagicMock())
-    states = [
-        interface.State(
-            ui_elements=[elem], pixels=np.empty([1, 2, 3]), forest=None
-        )
-        for elem in changing_ui_elements
-    ]
-    env._get_state = mock.MagicMock(side_effect=states)
+  def test_ui_stability_true(self):
+    env, states, clock = self._env_with_states(["Stable"] * 4)
 
-    self.assertEqual(
-        env._get_stable_state(
-            stability_threshold=3, sleep_duration=0.5, timeout=2
-        ),
-        states[5],
+    self.assertIs(env.get_state(wait_to_stabilize=True), states[3])
+    self.assertAlmostEqual(clock.time(), 0.5)
+    self.assertEqual(env.stabilizer.histogram.num_transitions, 1)
+
+  def test_ui_stability_false_due_to_timeout(self):
+    env, states, clock = self._env_with_states(
+        [f"Element{i}" for i in range(30)], timeout=2
+    )
+
+    state = env.get_state(wait_to_stabilize=True)
+
+    self.assertIs(state, states[env._get_state.call_count - 1])
+    self.assertAlmostEqual(clock.time(), 2.0)
+    self.assertFalse(env.stabilizer.last_transition.stable)
+
+  def test_stability_fluctuates(self):
+    env, states, clock = self._env_with_states(
+        ["Stable"] * 2 + ["Unstable"] + ["Stable"] * 5
     )
 
-  @mock.patch("time.sleep", return_value=None)
-  def test_stability_fluctuates(self, unused_mocked_time_sleep):
+    state = env.get_state(wait_to_stabilize=True)
+
+    # The screen changed back to "Stable" at the fourth observation, 0.4 s.
+    self.assertIs(state, states[6])
+    self.assertAlmostEqual(clock.time(), 0.4 + 0.5)
+
+  def _probed_env(self, change_times, fetch_seconds=0.02, **config):
+    """Returns an env over a simulated screen, and the screen."""
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(
+        clock, change_times, fetch_seconds=fetch_seconds
+    )
     env = interface.AsyncAndroidEnv(mock.MagicMock())
-    fluctuating_ui_elements = (
-        [representation_utils.UIElement(text="Stable")] * 2
-        + [representation_utils.UIElement(text="Unstable")]
-        + [representation_utils.UIElement(text="Stable")] * 3
-        + [representation_utils.UIElement(text="Unstable")]
+    env._stabilizer = ui_stabilizer.UIStabilizer(
+        ui_stabilizer.StabilizerConfig(settle_seconds=0.5, **config),
+        clock=clock.time,
+        sleep=clock.sleep,
     )
-    states = [
-        interface.State(
-            ui_elements=[elem], pixels=np.empty([1, 2, 3]), forest=None
+
+    def ui_elements():
+      return [representation_utils.UIElement(text=str(screen.fetch()))]
+
+    env.controller.get_ui_elements.side_effect = ui_elements
+    env._get_state = mock.MagicMock(
+        side_effect=lambda: interface.State(
+            pixels=np.empty([1, 2, 3]), forest=None, ui_elements=ui_elements()
         )
-        for elem in fluctuating_ui_elements
-    ]
-    env._get_state = mock.MagicMock(side_effect=states)
+    )
+    return env, screen
+
+  def test_stable_state_probes_without_screenshots(self):
+    env, screen = self._probed_env([0.05, 0.2])
+
+    state = env.get_state(wait_to_stabilize=True)
+
+    self.assertEqual(state.ui_elements[0].text, "2")
+    env._get_state.assert_called_once()
+    transition = env.stabilizer.last_transition
+    self.assertEqual(transition.num_observations, 1)
+    self.assertEqual(transition.num_probes, screen.num_fetches - 1)
+    self.assertGreater(transition.num_probes, 1)
+
+  def test_stable_state_rechecks_change_after_last_probe(self):
+    # Probes end at 0.54 s, when the screen has held still for 0.5 s; the
+    # fetch that follows sees the change at 0.55 s.
+    env, screen = self._probed_env([0.55])
+
+    state = env.get_state(wait_to_stabilize=True)
+
+    self.assertEqual(state.ui_elements[0].text, "1")
+    self.assertEqual(env._get_state.call_count, 2)
+    self.assertGreaterEqual(screen.num_fetches, 7)
+    self.assertGreaterEqual(
+        env.stabilizer.last_transition.wait_seconds, 0.55 + 0.5
+    )
+    self.assertTrue(env.stabilizer.last_transition.stable)
+
+  def test_stable_state_without_probes(self):
+    env, unused_screen = self._probed_env([0.05], use_probes=False)
+
+    env.get_state(wait_to_stabilize=True)
+
+    env.controller.get_ui_elements.assert_not_called()
     self.assertEqual(
-        env._get_stable_state(
-            stability_threshold=3, sleep_duration=0.5, timeout=2.5
-        ),
-        states[6],
+        env._get_state.call_count,
+        env.stabilizer.last_transition.num_observations,
+    )
+
+  def test_state_screen_signature_ignores_text(self):
+    def state(text):
+      return interface.State(
+          pixels=np.empty([1, 2, 3]),
+          forest=None,
+          ui_elements=[
+              representation_utils.UIElement(
+                  text=text, class_name="android.widget.TextView"
+              )
+          ],
+      )
+
+    self.assertEqual(
+        state("10:01").screen_signature, state("10:02").screen_signature
+    )
+    self.assertNotEqual(
+        state("10:01").ui_element_table, state("10:02").ui_element_table
+    )
+
+
+
+class GeometryCacheTest(absltest.TestCase):
+
+  def _run_steps(self, cache_geometry, num_steps=5):
+    device = _FakeDevice()
+    env = interface.AsyncAndroidEnv(
+        device.controller, cache_geometry=cache_geometry
+    )
+    env.reset()
+    calls = []
+    for _ in range(num_steps):
+      before = device.geometry_calls
+      _agent_step(env)
+      calls.append(device.geometry_calls - before)
+    return device, env, calls
+
+  def test_uncached_queries_every_access(self):
+    _, _, calls = self._run_steps(cache_geometry=False)
+
+    # logical_screen_size, orientation, physical_frame_boundary (which reads
+    # the orientation again) and the logical_screen_size of execute_action.
+    self.assertEqual(calls, [5] * 5)
+
+  def test_cached_queries_once(self):
+    _, _, calls = self._run_steps(cache_geometry=True)
+
+    self.assertEqual(calls, [3, 0, 0, 0, 0])
+
+  def test_cached_values_match_uncached(self):
+    uncached_device = _FakeDevice()
+    uncached = interface.AsyncAndroidEnv(
+        uncached_device.controller, cache_geometry=False
     )
+    device = _FakeDevice()
+    cached = interface.AsyncAndroidEnv(device.controller)
+
+    for orientation in (0, 1, 0):
+      uncached_device.orientation = device.orientation = orientation
+      self.assertEqual(_agent_step(cached), _agent_step(uncached))
+
+  def test_rotation_is_noticed_from_observation(self):
+    device, env, _ = self._run_steps(cache_geometry=True, num_steps=2)
+
+    device.orientation = 1
+    geometry = _agent_step(env)
+
+    self.assertEqual(geometry, ((2400, 1080), 1, (0, 0, 2400, 1080)))
+
+  def test_explicit_invalidation(self):
+    device, env, _ = self._run_steps(cache_geometry=True, num_steps=1)
+    device.orientation = 2
+
+    self.assertEqual(env.orientation, 0)
+    env.invalidate_geometry()
+    self.assertEqual(env.orientation, 2)
+
+  def test_reset_invalidates(self):
+    device, env, _ = self._run_steps(cache_geometry=True, num_steps=1)
+    device.orientation = 2
+
+    env.reset()
+
+    self.assertEqual(env.orientation, 2)
+
+  def test_unknown_extent_disables_cache(self):
+    device = _FakeDevice()
+    device.controller.step.side_effect = None
+    device.controller.step.return_value.observation = {
+        "pixels": np.zeros((1, 1, 3), np.uint8),
+        android_world_controller.OBSERVATION_KEY_FOREST: None,
+        android_world_controller.OBSERVATION_KEY_UI_ELEMENTS: [],
+    }
+    env = interface.AsyncAndroidEnv(device.controller)
+
+    for _ in range(2):
+      env.get_state()
+      env.logical_screen_size
+
+    self.assertEqual(device.geometry_calls, 2)
+
+
+class ExecuteActionStateTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.device = _FakeDevice()
+    self.env = interface.AsyncAndroidEnv(self.device.controller)
+    self.click = json_action.JSONAction(action_type="click", index=0)
+
+  def test_fetches_state_when_none_is_given(self):
+    for _ in range(3):
+      self.env.get_state()
+      self.env.execute_action(self.click)
+
+    self.assertEqual(self.device.fetches, 6)
+
+  def test_reuses_latest_state(self):
+    for _ in range(3):
+      state = self.env.get_state()
+      self.env.execute_action(self.click, state=state)
+
+    self.assertEqual(self.device.fetches, 3)
+
+  def test_resolves_index_against_given_state(self):
+    state = self.env.get_state()
+
+    self.env.execute_action(self.click, state=state)
+
+    # Element bounds grow with each fetch; the tap hits the first fetch's.
+    self.assertEqual(self.device.taps, [(50, 55)])
+
+  def test_refetches_after_newer_observation(self):
+    state = self.env.get_state()
+    self.env.get_state()
+
+    self.env.execute_action(self.click, state=state)
+
+    self.assertEqual(self.device.fetches, 3)
+    self.assertEqual(self.device.taps, [(50, 65)])
+
+  def test_refetches_after_action(self):
+    state = self.env.get_state()
+    self.env.execute_action(self.click, state=state)
+
+    self.env.execute_action(self.click, state=state)
+
+    self.assertEqual(self.device.fetches, 2)
+
+  def test_refetches_after_answer_message(self):
+    state = self.env.get_state()
+    self.env.execute_action(
+        json_action.JSONAction(action_type="answer", text="Done")
+    )
+
+    self.env.execute_action(self.click, state=state)
+
+    self.assertEqual(self.device.fetches, 2)
+
+  def test_reuses_reset_state(self):
+    state = self.env.reset()
+
+    self.env.execute_action(self.click, state=state)
+
+    self.assertEqual(self.device.fetches, 1)
+
+  def test_refetches_foreign_state(self):
+    foreign = interface.State(
+        pixels=np.zeros((1, 1, 3), np.uint8), forest=None, ui_elements=[]
+    )
+    self.env.get_state()
+
+    self.env.execute_action(self.click, state=foreign)
+
+    self.assertEqual(self.device.fetches, 2)
+    self.assertEqual(self.device.taps, [(50, 60)])
+
+  def test_actions_wait_with_env_waiter(self):
+    env = interface.AsyncAndroidEnv(
+        self.device.controller,
+        wait_config=wait_conditions.WaitConfig(mode=wait_conditions.FIXED),
+    )
+    state = env.get_state()
+
+    with mock.patch.object(actuation, "execute_adb_action") as mock_execute:
+      env.execute_action(self.click, state=state)
+
+    self.assertIs(mock_execute.call_args.args[4], env.waiter)
+    self.assertEqual(env.waiter.config.mode, wait_conditions.FIXED)
 
 
 if __name__ == "__main__":
@@ -162,6 +162,82 @@ def forest_to_ui_elements(
   return elements
 
 
+_XML_CHUNK_SIZE = 1 << 16
+
+
+def _parse_xml_bounds(bounds: Optional[str]) -> Optional[BoundingBox]:
+  """Parses uiautomator bounds of the form '[x_min,y_min][x_max,y_max]'."""
+  if not bounds:
+    return None
+  x_min, y_min, x_max, y_max = map(
+      int, bounds.strip('[]').replace('][', ',').split(',')
+  )
+  return BoundingBox(x_min, x_max, y_min, y_max)
+
+
+def _xml_node_to_ui_element(attributes: dict[str, str]) -> UIElement:
+  """Converts the attributes of a uiautomator node to a UIElement."""
+  get = attributes.get
+  bbox = _parse_xml_bounds(get('bounds'))
+  return UIElement(
+      text=get('text'),
+      content_description=get('content-desc'),
+      class_name=get('class'),
+      bbox=bbox,
+      bbox_pixels=bbox,
+      is_checked=get('checked') == 'true',
+      is_checkable=get('checkable') == 'true',
+      is_clickable=get('clickable') == 'true',
+      is_enabled=get('enabled') == 'true',
+      is_focused=get('focused') == 'true',
+      is_focusable=get('focusable') == 'true',
+      is_long_clickable=get('long-clickable') == 'true',
+      is_scrollable=get('scrollable') == 'true',
+      is_selected=get('selected') == 'true',
+      package_name=get('package'),
+      resource_id=get('resource-id'),
+      is_visible=True,
+  )
+
+
+def xml_dump_to_ui_elements(xml_string: str) -> list[UIElement]:
+  """Converts a UI hierarchy XML dump from uiautomator dump to UIElements.
+
+  The dump is parsed incrementally in a single pass. Elements are built from
+  start events, in document order, and every XML node is cleared once its
+  subtree has ended, so the parse keeps at most the open path of the
+  hierarchy in memory and has no recursion limit.
+
+  Args:
+    xml_string: The dump.
+
+  Returns:
+    One element per node below the root, in document order.
+  """
+  parser = ET.XMLPullParser(events=('start', 'end'))
+  ui_elements = []
+  depth = 0
+
+  def consume_events():
+    nonlocal depth
+    for event, node in parser.read_events():
+      if event == 'start':
+        # The root is the <hierarchy> element, not a UI node.
+        if depth:
+          ui_elements.append(_xml_node_to_ui_element(node.attrib))
+        depth += 1
+      else:
+        depth -= 1
+        node.clear()
+
+  for start in range(0, len(xml_string), _XML_CHUNK_SIZE):
+    parser.feed(xml_string[start : start + _XML_CHUNK_SIZE])
+    consume_events()
+  parser.close()
+  consume_events()
+  return ui_elements
+
+
 def _parse_ui_hierarchy(xml_string: str) -> dict[str, Any]:
   """Parses the UI hierarchy XML into a dictionary structure."""
   root = ET.fromstring(xml_string)
@@ -174,8 +250,11 @@ def _parse_ui_hierarchy(xml_string: str) -> dict[str, Any]:
   return parse_node(root)
 
 
-def xml_dump_to_ui_elements(xml_string: str) -> list[UIElement]:
-  """Converts a UI hierarchy XML dump from uiautomator dump to UIElements."""
+def _xml_dump_to_ui_elements_dom(xml_string: str) -> list[UIElement]:
+  """DOM-based reference for `xml_dump_to_ui_elements`.
+
+  Kept for equivalence tests and benchmarks.
+  """
   parsed_hierarchy = _parse_ui_hierarchy(xml_string)
   ui_elements = []
 
@@ -18,6 +18,8 @@ from unittest import mock
 from absl.testing import absltest
 from absl.testing import parameterized
 from android_world.env import representation_utils
+from android_world.utils import synthetic_forest
+import xml.etree.ElementTree as ET
 
 
 @dataclasses.dataclass(frozen=True)
@@ -115,5 +117,83 @@ class TestAccessibilityNodeToUIElement(parameterized.TestCase):
     self.assertEqual(ui_element.bbox, expected_normalized_bbox)
 
 
+_RECORDED_DUMP = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.android.settings" content-desc="" checkable="false" checked="false" clickable="false" enabled="true" focusable="false" focused="false" scrollable="false" long-clickable="false" password="false" selected="false" bounds="[0,0][1080,2400]">
+    <node index="0" text="Wi&#8209;Fi &amp; network" resource-id="android:id/title" class="android.widget.TextView" package="com.android.settings" content-desc="" checkable="false" checked="false" clickable="false" enabled="true" focusable="false" focused="false" scrollable="false" long-clickable="false" password="false" selected="false" bounds="[42,300][600,360]" />
+    <node index="1" text="" resource-id="com.android.settings:id/recycler_view" class="androidx.recyclerview.widget.RecyclerView" package="com.android.settings" content-desc="" checkable="false" checked="false" clickable="false" enabled="true" focusable="true" focused="false" scrollable="true" long-clickable="false" password="false" selected="false" bounds="[0,400][1080,2400]">
+      <node NAF="true" index="0" text="" resource-id="" class="android.widget.ImageButton" package="com.android.settings" content-desc="" checkable="false" checked="false" clickable="true" enabled="true" focusable="true" focused="false" scrollable="false" long-clickable="false" password="false" selected="false" bounds="[0,400][126,526]" />
+      <node index="1" text="Café “N° 1” &lt;b&gt;" resource-id="" class="android.widget.CheckBox" package="com.android.settings" content-desc="Say &quot;hi&quot;" checkable="true" checked="true" clickable="true" enabled="false" focusable="true" focused="true" scrollable="false" long-clickable="true" password="false" selected="true" bounds="[126,400][1080,526]" />
+      <node index="2" text="no bounds" class="android.view.View" package="com.android.settings" />
+    </node>
+  </node>
+</hierarchy>"""
+
+
+class XmlDumpToUIElementsTest(parameterized.TestCase):
+
+  def test_recorded_dump(self):
+    elements = representation_utils.xml_dump_to_ui_elements(_RECORDED_DUMP)
+
+    self.assertEqual(
+        elements,
+        representation_utils._xml_dump_to_ui_elements_dom(_RECORDED_DUMP),
+    )
+    self.assertLen(elements, 6)
+    self.assertEqual(elements[1].text, 'Wi\u2011Fi & network')
+    checkbox = elements[4]
+    self.assertEqual(checkbox.text, 'Caf\u00e9 \u201cN\u00b0 1\u201d <b>')
+    self.assertEqual(checkbox.content_description, 'Say "hi"')
+    self.assertTrue(checkbox.is_checked)
+    self.assertFalse(checkbox.is_enabled)
+    self.assertEqual(
+        checkbox.bbox_pixels,
+        representation_utils.BoundingBox(126, 1080, 400, 526),
+    )
+    self.assertIsNone(elements[5].bbox)
+    self.assertIsNone(elements[5].resource_id)
+
+  @parameterized.product(num_nodes=(1, 50, 2000), seed=(0, 1, 2))
+  def test_matches_dom_parser(self, num_nodes, seed):
+    xml_dump = synthetic_forest.forest_to_xml_dump(
+        synthetic_forest.generate_forest(
+            num_nodes, seed=seed, disabled_fraction=0.1
+        )
+    )
+
+    elements = representation_utils.xml_dump_to_ui_elements(xml_dump)
+
+    self.assertLen(elements, num_nodes)
+    self.assertEqual(
+        elements, representation_utils._xml_dump_to_ui_elements_dom(xml_dump)
+    )
+
+  def test_empty_hierarchy(self):
+    self.assertEmpty(
+        representation_utils.xml_dump_to_ui_elements(
+            '<hierarchy rotation="0" />'
+        )
+    )
+
+  def test_deep_hierarchy(self):
+    depth = 5000
+    xml_dump = (
+        '<hierarchy>'
+        + '<node class="android.view.View">' * depth
+        + '</node>' * depth
+        + '</hierarchy>'
+    )
+
+    elements = representation_utils.xml_dump_to_ui_elements(xml_dump)
+
+    self.assertLen(elements, depth)
+
+  def test_malformed_dump_raises(self):
+    with self.assertRaises(ET.ParseError):
+      representation_utils.xml_dump_to_ui_elements(
+          _RECORDED_DUMP.replace('</hierarchy>', '')
+      )
+
+
 if __name__ == '__main__':
   absltest.main()
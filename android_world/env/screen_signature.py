@@ -0,0 +1,134 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Content-free structural signature of a screen.
+
+The signature identifies a screen by its layout rather than its content. Each
+UI element contributes a token made of its class name, resource id, package,
+interaction flags and its bounds snapped to a coarse grid. Text, content
+descriptions, hints and checked/selected state are left out, so a screen
+keeps its signature while a clock ticks, a list item is renamed or a switch
+is toggled. The tokens are combined as a multiset, making the signature
+independent of element order.
+
+It is cheap enough to compute on every observation and is meant to be shared
+by screen deduplication, score caches and loop detection.
+"""
+
+import functools
+import hashlib
+from typing import Sequence
+
+from android_world.env import representation_utils
+from android_world.env import ui_element_table
+import numpy as np
+
+# Grid size, in pixels, used to bucket element bounds.
+DEFAULT_BUCKET_PX = 48
+
+# Flags that describe what an element is rather than what it currently shows.
+_STRUCTURAL_FLAGS = (
+    'is_checkable',
+    'is_clickable',
+    'is_editable',
+    'is_long_clickable',
+    'is_scrollable',
+    'is_visible',
+)
+# Fields whose values are part of the signature.
+_STRUCTURAL_STRINGS = ('class_name', 'resource_name', 'package_name')
+
+_MIX_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_SHIFT = np.uint64(31)
+_MISSING = np.uint64(0x9E3779B97F4A7C15)
+
+
+@functools.lru_cache(maxsize=4096)
+def _string_hash(value: str) -> int:
+  # Class names, resource ids and packages repeat across screens, so the
+  # hashes are cached.
+  digest = hashlib.blake2b(str(value).encode('utf-8', 'surrogatepass'),
+                           digest_size=8)
+  return int.from_bytes(digest.digest(), 'little')
+
+
+def _mix(state: np.ndarray, values: np.ndarray) -> np.ndarray:
+  """Folds values into per-element uint64 states (splitmix64 finalizer)."""
+  state = (state ^ values) * _MIX_MULTIPLIER
+  return state ^ (state >> _MIX_SHIFT)
+
+
+def layout_buckets(
+    table: ui_element_table.UIElementTable,
+    bucket_px: int = DEFAULT_BUCKET_PX,
+) -> np.ndarray:
+  """(N, 4) int64 grid cells of the pixel bounds; -1 where bounds are missing."""
+  bounds = table.bbox_pixels
+  missing = np.isnan(bounds)
+  buckets = np.floor_divide(np.where(missing, 0, bounds), bucket_px)
+  return np.where(missing, -1, buckets).astype(np.int64)
+
+
+def element_tokens(
+    table: ui_element_table.UIElementTable,
+    bucket_px: int = DEFAULT_BUCKET_PX,
+) -> np.ndarray:
+  """Per-element uint64 structural tokens, in element order."""
+  n = len(table)
+  pool = table.string_pool
+  codes = np.stack([table.string_codes(name) for name in _STRUCTURAL_STRINGS])
+  # Only strings used by the structural columns are hashed, not the texts.
+  used_codes, inverse = np.unique(codes, return_inverse=True)
+  used_hashes = np.array(
+      [int(_MISSING) if code < 0 else _string_hash(pool[code])
+       for code in used_codes.tolist()],
+      dtype=np.uint64,
+  )
+  string_hashes = used_hashes[inverse.reshape(codes.shape)]
+  with np.errstate(over='ignore'):
+    tokens = np.zeros(n, dtype=np.uint64)
+    for column in string_hashes:
+      tokens = _mix(tokens, column)
+    flag_bits = np.zeros(n, dtype=np.uint64)
+    for bit, name in enumerate(_STRUCTURAL_FLAGS):
+      flag_bits |= table.flag(name).astype(np.uint64) << np.uint64(bit)
+    tokens = _mix(tokens, flag_bits)
+    buckets = layout_buckets(table, bucket_px).astype(np.uint64)
+    for column in range(4):
+      tokens = _mix(tokens, buckets[:, column])
+  return tokens
+
+
+def screen_signature(
+    ui_elements: (
+        ui_element_table.UIElementTable
+        | Sequence[representation_utils.UIElement]
+    ),
+    bucket_px: int = DEFAULT_BUCKET_PX,
+) -> int:
+  """Returns the 64-bit content-free signature of a screen.
+
+  Args:
+    ui_elements: The screen's UI elements, as a table or a list.
+    bucket_px: Grid size used to bucket element bounds. Larger values make the
+      signature more tolerant to small layout shifts.
+
+  Returns:
+    The signature as a non-negative int.
+  """
+  if not isinstance(ui_elements, ui_element_table.UIElementTable):
+    ui_elements = ui_element_table.UIElementTable.from_ui_elements(ui_elements)
+  tokens = np.sort(element_tokens(ui_elements, bucket_px))
+  digest = hashlib.blake2b(tokens.tobytes(), digest_size=8)
+  digest.update(len(tokens).to_bytes(8, 'little'))
+  return int.from_bytes(digest.digest(), 'little')
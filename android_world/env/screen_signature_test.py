@@ -0,0 +1,125 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import dataclasses
+import random
+
+from absl.testing import absltest
+from android_world.env import representation_utils
+from android_world.env import screen_signature
+from android_world.env import ui_element_table
+from android_world.utils import synthetic_forest
+
+
+def _elements(seed=0, num_nodes=200):
+  return representation_utils.forest_to_ui_elements(
+      synthetic_forest.generate_forest(num_nodes, seed=seed),
+      exclude_invisible_elements=True,
+  )
+
+
+def _shift(element, dx, dy):
+  bbox = element.bbox_pixels
+  return dataclasses.replace(
+      element,
+      bbox_pixels=representation_utils.BoundingBox(
+          bbox.x_min + dx, bbox.x_max + dx, bbox.y_min + dy, bbox.y_max + dy
+      ),
+  )
+
+
+class ScreenSignatureTest(absltest.TestCase):
+
+  def test_ignores_content(self):
+    elements = _elements()
+    changed = [
+        dataclasses.replace(
+            e,
+            text='12:0%d' % i if e.text else None,
+            content_description='other' if e.content_description else None,
+            hint_text='hint',
+            is_checked=not e.is_checked,
+            is_selected=True,
+        )
+        for i, e in enumerate(elements)
+    ]
+
+    self.assertEqual(
+        screen_signature.screen_signature(elements),
+        screen_signature.screen_signature(changed),
+    )
+
+  def test_ignores_element_order(self):
+    elements = _elements()
+    shuffled = list(elements)
+    random.Random(0).shuffle(shuffled)
+
+    self.assertEqual(
+        screen_signature.screen_signature(elements),
+        screen_signature.screen_signature(shuffled),
+    )
+
+  def test_detects_structural_changes(self):
+    elements = _elements()
+    base = screen_signature.screen_signature(elements)
+    index = next(i for i, e in enumerate(elements) if e.class_name)
+    variants = (
+        elements[:-1],
+        elements + [elements[0]],
+        [dataclasses.replace(e, class_name='X') if i == index else e
+         for i, e in enumerate(elements)],
+        [dataclasses.replace(e, resource_name='app:id/new') if i == index else e
+         for i, e in enumerate(elements)],
+        [dataclasses.replace(e, is_clickable=not e.is_clickable)
+         if i == index else e for i, e in enumerate(elements)],
+        [_shift(e, 0, 500) if i == index else e
+         for i, e in enumerate(elements)],
+    )
+    for variant in variants:
+      self.assertNotEqual(screen_signature.screen_signature(variant), base)
+
+  def test_layout_buckets(self):
+    element = representation_utils.UIElement(
+        bbox_pixels=representation_utils.BoundingBox(0, 100, 47, 48)
+    )
+    table = ui_element_table.UIElementTable.from_ui_elements(
+        [element, representation_utils.UIElement()]
+    )
+
+    buckets = screen_signature.layout_buckets(table, bucket_px=48)
+
+    self.assertEqual(buckets.tolist(), [[0, 2, 0, 1], [-1, -1, -1, -1]])
+
+  def test_table_and_list_agree(self):
+    elements = _elements(seed=3)
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+
+    self.assertEqual(
+        screen_signature.screen_signature(table),
+        screen_signature.screen_signature(elements),
+    )
+
+  def test_distinct_screens_do_not_collide(self):
+    signatures = {
+        screen_signature.screen_signature(_elements(seed=seed, num_nodes=60))
+        for seed in range(200)
+    }
+
+    self.assertLen(signatures, 200)
+
+  def test_empty_screen(self):
+    self.assertIsInstance(screen_signature.screen_signature([]), int)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,46 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Read-only screenshots shared along an agent step.
+
+A full-resolution screenshot is 5-12 MB, and an agent step hands the same one
+to its state, the set-of-mark annotation, storage and the episode result.
+Rather than each of them taking a defensive copy, the step shares one
+read-only view: `share` marks it read-only without copying, code that draws
+on a screenshot takes its own `writable_copy`, and numpy raises if anything
+writes to the shared pixels instead.
+
+A shared view only protects against writes through it. The array it was
+made from must not be modified either; observations from the environment
+are fresh arrays, so this holds for `State.pixels`.
+"""
+
+import numpy as np
+
+
+def share(pixels: np.ndarray) -> np.ndarray:
+  """Returns a read-only view of pixels, or pixels if already read-only."""
+  if not pixels.flags.writeable:
+    return pixels
+  view = pixels.view()
+  view.flags.writeable = False
+  return view
+
+
+def is_shared(pixels: np.ndarray) -> bool:
+  return not pixels.flags.writeable
+
+
+def writable_copy(pixels: np.ndarray) -> np.ndarray:
+  """Returns a copy of pixels that the caller may draw on."""
+  return pixels.copy()
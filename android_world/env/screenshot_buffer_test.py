@@ -0,0 +1,52 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from absl.testing import absltest
+from android_world.env import screenshot_buffer
+import numpy as np
+
+
+class ScreenshotBufferTest(absltest.TestCase):
+
+  def test_share_does_not_copy(self):
+    pixels = np.zeros((4, 3, 3), np.uint8)
+
+    shared = screenshot_buffer.share(pixels)
+
+    self.assertTrue(np.shares_memory(shared, pixels))
+    self.assertTrue(screenshot_buffer.is_shared(shared))
+    self.assertFalse(screenshot_buffer.is_shared(pixels))
+
+  def test_shared_pixels_reject_writes(self):
+    shared = screenshot_buffer.share(np.zeros((4, 3, 3), np.uint8))
+
+    with self.assertRaises(ValueError):
+      shared[0, 0] = 255
+
+  def test_share_returns_shared_pixels_unchanged(self):
+    shared = screenshot_buffer.share(np.zeros((4, 3, 3), np.uint8))
+
+    self.assertIs(screenshot_buffer.share(shared), shared)
+
+  def test_writable_copy(self):
+    shared = screenshot_buffer.share(np.zeros((4, 3, 3), np.uint8))
+
+    copy = screenshot_buffer.writable_copy(shared)
+    copy[0, 0] = 255
+
+    self.assertFalse(np.shares_memory(copy, shared))
+    self.assertEqual(shared.max(), 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
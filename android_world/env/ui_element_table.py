@@ -0,0 +1,287 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Columnar storage for the UI elements of one screen.
+
+`UIElementTable` holds a `list[UIElement]` as a struct of arrays: bounding
+boxes in float arrays, strings as codes into a small interned pool and the
+tri-state boolean flags packed into two bit masks. A 64-bit content hash is
+computed once, so comparing two screens is usually a single integer compare,
+and a stored table takes a fraction of the memory of the dataclass list.
+"""
+
+import hashlib
+import itertools
+import operator
+import sys
+from typing import Any, Iterator, Optional, Sequence
+
+from android_world.env import representation_utils
+import numpy as np
+
+# String-valued UIElement fields, in column order.
+STRING_FIELDS = (
+    'text',
+    'content_description',
+    'class_name',
+    'hint_text',
+    'package_name',
+    'resource_name',
+    'tooltip',
+    'resource_id',
+)
+# Optional[bool] UIElement fields; bit i of the flag masks is FLAG_FIELDS[i].
+FLAG_FIELDS = (
+    'is_checked',
+    'is_checkable',
+    'is_clickable',
+    'is_editable',
+    'is_enabled',
+    'is_focused',
+    'is_focusable',
+    'is_long_clickable',
+    'is_scrollable',
+    'is_selected',
+    'is_visible',
+)
+_NONE = -1
+# Reads every stored field of an element in one call, strings first, then
+# flags, then the two bounding boxes.
+_FIELD_GETTER = operator.attrgetter(
+    *STRING_FIELDS, *FLAG_FIELDS, 'bbox', 'bbox_pixels'
+)
+_BBOX_GETTER = operator.attrgetter('x_min', 'x_max', 'y_min', 'y_max')
+
+
+def _bbox_from_row(
+    row: np.ndarray, is_int: bool
+) -> Optional[representation_utils.BoundingBox]:
+  if np.isnan(row[0]):
+    return None
+  cast = int if is_int else float
+  return representation_utils.BoundingBox(*(cast(v) for v in row))
+
+
+class UIElementTable:
+  """Immutable struct-of-arrays view of a screen's UI elements.
+
+  Two tables compare equal exactly when the element lists they were built from
+  compare equal. Strings are coded in order of first appearance, column by
+  column, so equal screens also have identical code arrays and pools.
+  """
+
+  __slots__ = (
+      '_strings',
+      '_string_codes',
+      '_flags',
+      '_flags_known',
+      '_bbox',
+      '_bbox_pixels',
+      '_bbox_is_int',
+      '_content_hash',
+  )
+
+  def __init__(
+      self,
+      strings: tuple[Any, ...],
+      string_codes: np.ndarray,
+      flags: np.ndarray,
+      flags_known: np.ndarray,
+      bbox: np.ndarray,
+      bbox_pixels: np.ndarray,
+      bbox_is_int: np.ndarray,
+  ):
+    """Initializes the table from its columns; see from_ui_elements."""
+    self._strings = strings
+    self._string_codes = string_codes
+    self._flags = flags
+    self._flags_known = flags_known
+    # Adding zero turns -0.0 into 0.0, which compares equal but hashes apart.
+    self._bbox = bbox + 0.0
+    self._bbox_pixels = bbox_pixels + 0.0
+    self._bbox_is_int = bbox_is_int
+    for array in (self._string_codes, self._flags, self._flags_known,
+                  self._bbox, self._bbox_pixels, self._bbox_is_int):
+      array.setflags(write=False)
+    self._content_hash = self._compute_hash()
+
+  @classmethod
+  def from_ui_elements(
+      cls, ui_elements: Sequence[representation_utils.UIElement]
+  ) -> 'UIElementTable':
+    """Builds a table from UI elements."""
+    n = len(ui_elements)
+    if n:
+      columns = list(zip(*map(_FIELD_GETTER, ui_elements)))
+    else:
+      columns = [()] * (len(STRING_FIELDS) + len(FLAG_FIELDS) + 2)
+    string_columns = columns[:len(STRING_FIELDS)]
+    flag_columns = columns[len(STRING_FIELDS):-2]
+    bbox_columns = columns[-2:]
+
+    # Codes are assigned column by column in order of first appearance.
+    pool = {}
+    string_codes = np.empty((n, len(STRING_FIELDS)), dtype=np.int32)
+    for j, column in enumerate(string_columns):
+      string_codes[:, j] = [
+          _NONE if value is None else pool.setdefault(value, len(pool))
+          for value in column
+      ]
+
+    flags = np.zeros(n, dtype=np.uint16)
+    flags_known = np.zeros(n, dtype=np.uint16)
+    for bit, column in enumerate(flag_columns):
+      known = np.array([v is not None for v in column], dtype=bool)
+      value = np.array([bool(v) for v in column], dtype=bool)
+      flags |= value.astype(np.uint16) << bit
+      flags_known |= known.astype(np.uint16) << bit
+
+    bounds = []
+    bbox_is_int = np.zeros((n, 2), dtype=bool)
+    for j, column in enumerate(bbox_columns):
+      values = np.full((n, 4), np.nan)
+      present = [i for i, bbox in enumerate(column) if bbox is not None]
+      if present:
+        rows = [_BBOX_GETTER(column[i]) for i in present]
+        values[present] = rows
+        kinds = set(map(type, itertools.chain.from_iterable(rows)))
+        if kinds == {int}:
+          bbox_is_int[present, j] = True
+        elif int in kinds:
+          bbox_is_int[present, j] = [
+              all(type(v) is int for v in row) for row in rows
+          ]
+      bounds.append(values)
+
+    strings = tuple(
+        sys.intern(s) if isinstance(s, str) else s for s in pool
+    )
+    return cls(strings, string_codes, flags, flags_known, bounds[0],
+               bounds[1], bbox_is_int)
+
+  def _compute_hash(self) -> int:
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(len(self).to_bytes(8, 'little'))
+    for array in (self._string_codes, self._flags, self._flags_known,
+                  self._bbox, self._bbox_pixels):
+      digest.update(np.ascontiguousarray(array).tobytes())
+    # repr escapes NUL, so the separator cannot occur inside an entry.
+    digest.update(
+        '\0'.join(map(repr, self._strings)).encode('utf-8', 'surrogatepass')
+    )
+    return int.from_bytes(digest.digest(), 'little')
+
+  @property
+  def content_hash(self) -> int:
+    """Stable 64-bit hash of the table's contents."""
+    return self._content_hash
+
+  @property
+  def bbox_pixels(self) -> np.ndarray:
+    """(N, 4) pixel bounds as (x_min, x_max, y_min, y_max); NaN if absent."""
+    return self._bbox_pixels
+
+  @property
+  def bbox(self) -> np.ndarray:
+    """(N, 4) normalized bounds as (x_min, x_max, y_min, y_max)."""
+    return self._bbox
+
+  def flag(self, name: str) -> np.ndarray:
+    """Boolean column of a flag; unset (None) values read as False."""
+    bit = np.uint16(1 << FLAG_FIELDS.index(name))
+    return (self._flags & bit) != 0
+
+  @property
+  def string_pool(self) -> tuple[Any, ...]:
+    """Distinct string values; the codes of every string column index it."""
+    return self._strings
+
+  def string_codes(self, name: str) -> np.ndarray:
+    """Codes of a string field into string_pool, -1 for missing values."""
+    return self._string_codes[:, STRING_FIELDS.index(name)]
+
+  def strings(self, name: str) -> list[Any]:
+    """Column of a string field, with None for missing values."""
+    column = self._string_codes[:, STRING_FIELDS.index(name)]
+    return [None if code == _NONE else self._strings[code] for code in column]
+
+  @property
+  def nbytes(self) -> int:
+    """Approximate memory held by the table's arrays and string pool."""
+    arrays = (self._string_codes, self._flags, self._flags_known, self._bbox,
+              self._bbox_pixels, self._bbox_is_int)
+    return sum(a.nbytes for a in arrays) + sum(
+        sys.getsizeof(s) for s in self._strings
+    )
+
+  def element(self, index: int) -> representation_utils.UIElement:
+    """Materializes one UI element."""
+    kwargs = {}
+    for j, name in enumerate(STRING_FIELDS):
+      code = self._string_codes[index, j]
+      kwargs[name] = None if code == _NONE else self._strings[code]
+    value_bits = int(self._flags[index])
+    known_bits = int(self._flags_known[index])
+    for bit, name in enumerate(FLAG_FIELDS):
+      mask = 1 << bit
+      kwargs[name] = bool(value_bits & mask) if known_bits & mask else None
+    kwargs['bbox'] = _bbox_from_row(self._bbox[index],
+                                    self._bbox_is_int[index, 0])
+    kwargs['bbox_pixels'] = _bbox_from_row(self._bbox_pixels[index],
+                                           self._bbox_is_int[index, 1])
+    return representation_utils.UIElement(**kwargs)
+
+  def to_ui_elements(self) -> list[representation_utils.UIElement]:
+    """Converts back to the list the table was built from."""
+    return [self.element(i) for i in range(len(self))]
+
+  def __len__(self) -> int:
+    return len(self._flags)
+
+  def __getitem__(self, index: int) -> representation_utils.UIElement:
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError('UIElementTable index out of range')
+    return self.element(index)
+
+  def __iter__(self) -> Iterator[representation_utils.UIElement]:
+    for i in range(len(self)):
+      yield self.element(i)
+
+  def __hash__(self) -> int:
+    return self._content_hash
+
+  def __eq__(self, other: Any) -> bool:
+    if not isinstance(other, UIElementTable):
+      return NotImplemented
+    if self is other:
+      return True
+    # The hash settles almost every comparison; the columns rule out
+    # collisions.
+    return (
+        self._content_hash == other._content_hash
+        and self._strings == other._strings
+        and np.array_equal(self._string_codes, other._string_codes)
+        and np.array_equal(self._flags, other._flags)
+        and np.array_equal(self._flags_known, other._flags_known)
+        and np.array_equal(self._bbox, other._bbox, equal_nan=True)
+        and np.array_equal(self._bbox_pixels, other._bbox_pixels,
+                           equal_nan=True)
+    )
+
+  def __repr__(self) -> str:
+    return (
+        f'UIElementTable(num_elements={len(self)}, '
+        f'content_hash={self._content_hash:#018x})'
+    )
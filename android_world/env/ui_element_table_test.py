@@ -0,0 +1,123 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import dataclasses
+import tracemalloc
+
+from absl.testing import absltest
+from android_world.env import representation_utils
+from android_world.env import ui_element_table
+from android_world.utils import synthetic_forest
+
+
+def _elements(seed=0, num_nodes=300):
+  forest = synthetic_forest.generate_forest(num_nodes, seed=seed)
+  return representation_utils.forest_to_ui_elements(
+      forest, screen_size=(1080, 2400)
+  )
+
+
+class UIElementTableTest(absltest.TestCase):
+
+  def test_round_trip(self):
+    elements = _elements()
+    elements.append(representation_utils.UIElement())
+    elements.append(
+        representation_utils.UIElement(
+            text='half',
+            is_checked=False,
+            bbox_pixels=representation_utils.BoundingBox(0.5, 1.5, -0.0, 2),
+        )
+    )
+
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+
+    self.assertLen(table, len(elements))
+    self.assertEqual(table.to_ui_elements(), elements)
+    self.assertEqual(table[-1], elements[-1])
+    self.assertIsNone(table[-2].is_checked)
+    self.assertIs(table[-1].is_checked, False)
+    self.assertIsInstance(table[0].bbox_pixels.x_min, int)
+
+  def test_equal_lists_give_equal_tables(self):
+    table = ui_element_table.UIElementTable.from_ui_elements(_elements())
+    other = ui_element_table.UIElementTable.from_ui_elements(_elements())
+
+    self.assertEqual(table, other)
+    self.assertEqual(table.content_hash, other.content_hash)
+    self.assertEqual(hash(table), hash(other))
+
+  def test_any_field_change_is_detected(self):
+    elements = _elements(num_nodes=50)
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+    index = next(i for i, e in enumerate(elements) if e.text and e.bbox)
+    changes = (
+        dict(text='other'),
+        dict(text=None),
+        dict(is_clickable=None),
+        dict(is_selected=not elements[index].is_selected),
+        dict(bbox_pixels=representation_utils.BoundingBox(0, 1, 2, 3)),
+        dict(bbox=None),
+        dict(resource_id='x'),
+    )
+    for change in changes:
+      changed = list(elements)
+      changed[index] = dataclasses.replace(elements[index], **change)
+
+      other = ui_element_table.UIElementTable.from_ui_elements(changed)
+
+      self.assertNotEqual(table, other, change)
+      self.assertNotEqual(table.content_hash, other.content_hash, change)
+
+  def test_negative_zero_matches_list_equality(self):
+    def table(value):
+      return ui_element_table.UIElementTable.from_ui_elements([
+          representation_utils.UIElement(
+              bbox_pixels=representation_utils.BoundingBox(value, 1, 0, 1)
+          )
+      ])
+
+    self.assertEqual(table(0.0), table(-0.0))
+    self.assertEqual(table(0.0).content_hash, table(-0.0).content_hash)
+
+  def test_columns(self):
+    elements = _elements(num_nodes=80)
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+
+    self.assertEqual(table.strings('text'), [e.text for e in elements])
+    self.assertEqual(
+        table.flag('is_clickable').tolist(),
+        [bool(e.is_clickable) for e in elements],
+    )
+    self.assertEqual(table.bbox_pixels[0, 1], elements[0].bbox_pixels.x_max)
+
+  def test_is_read_only(self):
+    table = ui_element_table.UIElementTable.from_ui_elements(_elements())
+
+    with self.assertRaises(ValueError):
+      table.bbox_pixels[0, 0] = 5
+
+  def test_smaller_than_element_list(self):
+    tracemalloc.start()
+    try:
+      elements = _elements(num_nodes=2000)
+      list_bytes, _ = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+
+    self.assertLess(table.nbytes, list_bytes / 2)
+
+
+if __name__ == '__main__':
+  absltest.main()
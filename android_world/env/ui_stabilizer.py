@@ -0,0 +1,346 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Waits for the UI to stop changing after an action.
+
+Each observation is reduced to a digest of its UI elements, so deciding
+whether the screen changed is one integer comparison. After a change the
+screen is polled every min_interval seconds; while it holds still the
+interval grows by backoff up to max_interval. The screen is stable once its
+digest has held for settle_seconds over at least min_checks observations
+and, if an accessibility event clock is given, no event has arrived for
+event_quiet_seconds.
+
+The caller can pass a probe that reads only the digest, e.g. from the UI tree
+without a screenshot; the full observation is then fetched once the probe
+found the screen stable.
+
+Every wait is recorded in a WaitHistogram, so the cost of stabilization can
+be read off a run.
+
+The polling loop only asks for fetches, probes and sleeps; wait() performs
+them blocking and async_wait() awaits them, so an asyncio caller can wait
+without holding up its event loop.
+"""
+
+import asyncio
+import bisect
+from collections.abc import Awaitable, Generator
+import dataclasses
+import time
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+_T = TypeVar('_T')
+
+# What the polling loop asks of the caller of wait() or async_wait().
+_FETCH = 'fetch'
+_PROBE = 'probe'
+_SLEEP = 'sleep'
+
+# Upper bounds, in seconds, of the default histogram buckets.
+DEFAULT_BUCKET_EDGES = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def ui_digest(state: Any) -> int:
+  """Returns the content hash of an interface.State's UI elements."""
+  return state.ui_element_table.content_hash
+
+
+@dataclasses.dataclass(frozen=True)
+class StabilizerConfig:
+  """How UIStabilizer polls and when it considers the screen stable.
+
+  Attributes:
+    min_interval: Seconds between the observations following a change.
+    max_interval: Longest interval between observations.
+    backoff: Factor the interval grows by with every unchanged observation.
+    settle_seconds: How long the digest must hold to be stable. The default
+      matches the 3 x 0.5 s the environment used to wait. Shorter times
+      return sooner but mistake pauses in a transition, e.g. while content
+      loads, for its end; with event_quiet_seconds such pauses are bridged
+      by the accessibility events they emit.
+    min_checks: Observations with the same digest needed to be stable.
+    event_quiet_seconds: If set, accessibility events must also have stopped
+      for this long. Only used when the stabilizer has an event clock.
+    timeout: Seconds after which the latest observation is returned even if
+      the screen is still changing.
+    use_probes: Whether to poll with the caller's probe, if it has one,
+      instead of fetching full observations.
+  """
+
+  min_interval: float = 0.1
+  max_interval: float = 0.5
+  backoff: float = 2.0
+  settle_seconds: float = 1.5
+  min_checks: int = 2
+  event_quiet_seconds: Optional[float] = None
+  timeout: float = 120.0
+  use_probes: bool = True
+
+  def __post_init__(self):
+    if self.min_interval <= 0 or self.max_interval < self.min_interval:
+      raise ValueError(
+          'Expected 0 < min_interval <= max_interval, got'
+          f' {self.min_interval} and {self.max_interval}.'
+      )
+    if self.backoff < 1:
+      raise ValueError(f'backoff must be at least 1, got {self.backoff}.')
+    if self.settle_seconds < 0 or self.timeout < 0:
+      raise ValueError('settle_seconds and timeout must not be negative.')
+    if self.min_checks < 1:
+      raise ValueError(f'min_checks must be positive, got {self.min_checks}.')
+    if self.event_quiet_seconds is not None and self.event_quiet_seconds < 0:
+      raise ValueError('event_quiet_seconds must not be negative.')
+
+
+@dataclasses.dataclass(frozen=True)
+class Transition:
+  """One wait for the screen to stabilize.
+
+  Attributes:
+    wait_seconds: Time from the first observation to the returned one.
+    num_observations: Observations fetched during the wait.
+    stable: False if the wait timed out.
+    num_probes: Probes of the screen during the wait.
+  """
+
+  wait_seconds: float
+  num_observations: int
+  stable: bool
+  num_probes: int = 0
+
+
+class WaitHistogram:
+  """Counts transitions by how long they waited for the screen."""
+
+  def __init__(self, bucket_edges: Sequence[float] = DEFAULT_BUCKET_EDGES):
+    """Initializes an empty histogram.
+
+    Args:
+      bucket_edges: Increasing upper bounds of the buckets, in seconds. Waits
+        longer than the last edge go to an overflow bucket.
+    """
+    if list(bucket_edges) != sorted(bucket_edges):
+      raise ValueError(f'Bucket edges must increase, got {bucket_edges}.')
+    self._edges = tuple(bucket_edges)
+    self.reset()
+
+  def reset(self) -> None:
+    self._counts = [0] * (len(self._edges) + 1)
+    self.num_transitions = 0
+    self.num_timeouts = 0
+    self.num_observations = 0
+    self.num_probes = 0
+    self.total_seconds = 0.0
+    self.max_seconds = 0.0
+
+  @property
+  def bucket_edges(self) -> tuple[float, ...]:
+    return self._edges
+
+  @property
+  def counts(self) -> list[int]:
+    """Transitions per bucket; the last entry counts the overflow."""
+    return list(self._counts)
+
+  @property
+  def mean_seconds(self) -> float:
+    if not self.num_transitions:
+      return 0.0
+    return self.total_seconds / self.num_transitions
+
+  def record(self, transition: Transition) -> None:
+    self._counts[bisect.bisect_left(self._edges, transition.wait_seconds)] += 1
+    self.num_transitions += 1
+    self.num_timeouts += not transition.stable
+    self.num_observations += transition.num_observations
+    self.num_probes += transition.num_probes
+    self.total_seconds += transition.wait_seconds
+    self.max_seconds = max(self.max_seconds, transition.wait_seconds)
+
+  def format(self) -> str:
+    """Returns the histogram as text, one bucket per line."""
+    lines = [
+        f'{self.num_transitions} transitions, {self.num_timeouts} timed out,'
+        f' mean {self.mean_seconds:.2f} s, max {self.max_seconds:.2f} s,'
+        f' {self.num_observations} observations, {self.num_probes} probes'
+    ]
+    lower = 0.0
+    for edge, count in zip(self._edges + (float('inf'),), self._counts):
+      lines.append(f'  {lower:6.2f} - {edge:6.2f} s: {count}')
+      lower = edge
+    return '\n'.join(lines)
+
+
+class UIStabilizer:
+  """Fetches observations until the screen stops changing."""
+
+  def __init__(
+      self,
+      config: Optional[StabilizerConfig] = None,
+      digest: Callable[[Any], Any] = ui_digest,
+      last_event_time: Optional[Callable[[], Optional[float]]] = None,
+      clock: Callable[[], float] = time.monotonic,
+      sleep: Callable[[float], None] = time.sleep,
+      async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+  ):
+    """Initializes the stabilizer.
+
+    Args:
+      config: Polling and stability settings; the defaults if None.
+      digest: Maps an observation to a value that changes with the screen.
+      last_event_time: Returns the clock time of the latest accessibility
+        event, or None if none was seen. Needed for event_quiet_seconds.
+      clock: Returns the current time in seconds.
+      sleep: Sleeps for the given number of seconds.
+      async_sleep: Sleeps for the given number of seconds in async_wait.
+    """
+    self._config = config or StabilizerConfig()
+    self._digest = digest
+    self._last_event_time = last_event_time
+    self._clock = clock
+    self._sleep = sleep
+    self._async_sleep = async_sleep
+    self.histogram = WaitHistogram()
+    self.last_transition: Optional[Transition] = None
+
+  @property
+  def config(self) -> StabilizerConfig:
+    return self._config
+
+  def _events_quiet_for(self, now: float) -> float:
+    """Seconds until accessibility events count as quiet; 0 if they are."""
+    quiet = self._config.event_quiet_seconds
+    if quiet is None or self._last_event_time is None:
+      return 0.0
+    last_event = self._last_event_time()
+    if last_event is None:
+      return 0.0
+    return max(0.0, last_event + quiet - now)
+
+  def wait(
+      self,
+      fetch: Callable[[], _T],
+      probe: Optional[Callable[[], Any]] = None,
+  ) -> _T:
+    """Fetches observations until the screen is stable.
+
+    Args:
+      fetch: Returns the current observation.
+      probe: Returns the digest of the current screen, cheaper than fetch;
+        e.g. without taking a screenshot. Unless config.use_probes is off,
+        the screen is then polled with the probe and fetched once, when it is
+        stable. If that observation's digest differs from the probe's, the
+        screen changed in between and the wait goes on.
+
+    Returns:
+      The first observation at which the screen was stable, or the latest one
+      if the timeout passed first.
+    """
+    steps = self._steps(probe is not None and self._config.use_probes)
+    reply = None
+    while True:
+      try:
+        request, seconds = steps.send(reply)
+      except StopIteration as done:
+        return done.value
+      if request == _FETCH:
+        reply = fetch()
+      elif request == _PROBE:
+        reply = probe()
+      else:
+        reply = self._sleep(seconds)
+
+  async def async_wait(
+      self,
+      fetch: Callable[[], Awaitable[_T]],
+      probe: Optional[Callable[[], Awaitable[Any]]] = None,
+  ) -> _T:
+    """Like wait, with awaitable fetch and probe and sleeping on the loop."""
+    steps = self._steps(probe is not None and self._config.use_probes)
+    reply = None
+    while True:
+      try:
+        request, seconds = steps.send(reply)
+      except StopIteration as done:
+        return done.value
+      if request == _FETCH:
+        reply = await fetch()
+      elif request == _PROBE:
+        reply = await probe()
+      else:
+        reply = await self._async_sleep(seconds)
+
+  def _steps(
+      self, use_probe: bool
+  ) -> Generator[tuple[str, float], Any, Any]:
+    """The polling loop; yields what to do and returns the observation."""
+    config = self._config
+    start = self._clock()
+    observation = None
+    num_observations = num_probes = 0
+
+    def poll() -> Generator[tuple[str, float], Any, Any]:
+      nonlocal observation, num_observations, num_probes
+      if not use_probe:
+        observation = yield _FETCH, 0.0
+        num_observations += 1
+        return self._digest(observation)
+      observation = None
+      num_probes += 1
+      return (yield _PROBE, 0.0)
+
+    digest = yield from poll()
+    changed_at = self._clock()
+    checks = 1
+    interval = config.min_interval
+    while True:
+      now = self._clock()
+      remaining = max(
+          changed_at + config.settle_seconds - now,
+          self._events_quiet_for(now),
+      )
+      stable = remaining <= 0 and checks >= config.min_checks
+      timed_out = now - start >= config.timeout
+      if stable or timed_out:
+        if observation is not None:
+          break
+        observation = yield _FETCH, 0.0
+        num_observations += 1
+        new_digest = self._digest(observation)
+        stable = stable and new_digest == digest
+        if stable or timed_out:
+          break
+      else:
+        delay = interval
+        if remaining > 0:
+          # Wake up when the screen would have settled rather than after it.
+          delay = min(delay, max(remaining, config.min_interval))
+        yield _SLEEP, min(delay, max(0.0, start + config.timeout - now))
+        new_digest = yield from poll()
+      if new_digest == digest:
+        checks += 1
+        interval = min(interval * config.backoff, config.max_interval)
+      else:
+        digest = new_digest
+        changed_at = self._clock()
+        checks = 1
+        interval = config.min_interval
+    self.last_transition = Transition(
+        wait_seconds=self._clock() - start,
+        num_observations=num_observations,
+        stable=stable,
+        num_probes=num_probes,
+    )
+    self.histogram.record(self.last_transition)
+    return observation
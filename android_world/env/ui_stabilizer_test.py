@@ -0,0 +1,287 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import random
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.env import ui_stabilizer
+from android_world.utils import simulated_screen
+
+
+def _stabilizer(clock, screen=None, **config):
+  config.setdefault('settle_seconds', 0.5)
+
+  async def async_sleep(seconds):
+    clock.sleep(seconds)
+
+  return ui_stabilizer.UIStabilizer(
+      ui_stabilizer.StabilizerConfig(**config),
+      digest=lambda content: content,
+      last_event_time=screen.last_event_time if screen else None,
+      clock=clock.time,
+      sleep=clock.sleep,
+      async_sleep=async_sleep,
+  )
+
+
+def _false_stable_rate_and_latency(config, num_transitions=300):
+  """Replays random transitions; returns (false-stable rate, mean wait)."""
+  rng = random.Random(0)
+  clock = simulated_screen.VirtualClock()
+  stabilizer = ui_stabilizer.UIStabilizer(
+      config, digest=lambda content: content, clock=clock.time,
+      sleep=clock.sleep,
+  )
+  false_stable = 0
+  for _ in range(num_transitions):
+    screen = simulated_screen.SimulatedScreen(
+        clock, simulated_screen.random_transition(rng), fetch_seconds=0.03
+    )
+    stabilizer.wait(screen.fetch)
+    false_stable += clock.time() < screen.settled_at
+  return false_stable / num_transitions, stabilizer.histogram.mean_seconds
+
+
+class UIStabilizerTest(parameterized.TestCase):
+
+  def test_unchanged_screen_is_stable_after_settle_time(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [])
+    stabilizer = _stabilizer(clock)
+
+    content = stabilizer.wait(screen.fetch)
+
+    self.assertEqual(content, 0)
+    # Polls after 0.1 s, then backs off but wakes up when settled.
+    self.assertAlmostEqual(clock.time(), 0.5)
+    self.assertEqual(screen.num_fetches, 4)
+    self.assertEqual(
+        stabilizer.last_transition,
+        ui_stabilizer.Transition(
+            wait_seconds=clock.time(), num_observations=4, stable=True
+        ),
+    )
+
+  def test_waits_for_last_change(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.05, 0.12, 0.3, 0.9], fetch_seconds=0.02
+    )
+    stabilizer = _stabilizer(clock)
+
+    content = stabilizer.wait(screen.fetch)
+
+    self.assertEqual(content, 4)
+    self.assertBetween(clock.time() - screen.settled_at, 0.5, 0.7)
+
+  def test_interval_backs_off_and_resets_on_change(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [0.75])
+    sleeps = []
+
+    def sleep(seconds):
+      sleeps.append(round(seconds, 6))
+      clock.sleep(seconds)
+
+    stabilizer = ui_stabilizer.UIStabilizer(
+        ui_stabilizer.StabilizerConfig(settle_seconds=2.0),
+        digest=lambda content: content,
+        clock=clock.time,
+        sleep=sleep,
+    )
+
+    stabilizer.wait(screen.fetch)
+
+    # The change at 0.75 s is seen by the fetch at 1.2 s.
+    self.assertEqual(sleeps[:7], [0.1, 0.2, 0.4, 0.5, 0.1, 0.2, 0.4])
+    self.assertEqual(max(sleeps), 0.5)
+
+  def test_timeout_returns_latest_observation(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.1 * i for i in range(1, 100)]
+    )
+    stabilizer = _stabilizer(clock, timeout=2.0)
+
+    content = stabilizer.wait(screen.fetch)
+
+    self.assertEqual(content, screen.content())
+    self.assertAlmostEqual(clock.time(), 2.0)
+    self.assertFalse(stabilizer.last_transition.stable)
+    self.assertEqual(stabilizer.histogram.num_timeouts, 1)
+
+  def test_probes_poll_and_fetch_once(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [0.05, 0.2])
+    fetches = []
+
+    def fetch():
+      fetches.append(clock.time())
+      return screen.fetch()
+
+    stabilizer = _stabilizer(clock)
+
+    content = stabilizer.wait(fetch, probe=screen.fetch)
+
+    self.assertEqual(content, 2)
+    self.assertLen(fetches, 1)
+    self.assertEqual(stabilizer.last_transition.num_observations, 1)
+    self.assertEqual(
+        stabilizer.last_transition.num_probes, screen.num_fetches - 1
+    )
+
+  def test_probes_fetch_once_on_timeout(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.1 * i for i in range(1, 100)]
+    )
+    stabilizer = _stabilizer(clock, timeout=2.0)
+
+    stabilizer.wait(screen.fetch, probe=screen.fetch)
+
+    self.assertFalse(stabilizer.last_transition.stable)
+    self.assertEqual(stabilizer.last_transition.num_observations, 1)
+
+  def test_probes_can_be_disabled(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [])
+    stabilizer = _stabilizer(clock, use_probes=False)
+
+    stabilizer.wait(screen.fetch, probe=mock.Mock())
+
+    self.assertEqual(stabilizer.last_transition.num_probes, 0)
+    self.assertEqual(stabilizer.last_transition.num_observations, 4)
+
+  @parameterized.parameters(True, False)
+  def test_async_wait_polls_like_wait(self, use_probe):
+    results = []
+    for run_async in (False, True):
+      clock = simulated_screen.VirtualClock()
+      screen = simulated_screen.SimulatedScreen(clock, [0.05, 0.2, 0.3])
+      stabilizer = _stabilizer(clock)
+      probe = screen.fetch if use_probe else None
+      if run_async:
+
+        async def fetch():
+          return screen.fetch()
+
+        async def async_probe():
+          return screen.fetch()
+
+        content = asyncio.run(
+            stabilizer.async_wait(fetch, async_probe if use_probe else None)
+        )
+      else:
+        content = stabilizer.wait(screen.fetch, probe)
+      results.append((content, clock.time(), stabilizer.last_transition))
+
+    self.assertEqual(results[0], results[1])
+    self.assertEqual(results[1][0], 3)
+
+  def test_waits_for_event_quiescence(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [])
+    stabilizer = ui_stabilizer.UIStabilizer(
+        ui_stabilizer.StabilizerConfig(
+            settle_seconds=0.5, event_quiet_seconds=0.3
+        ),
+        digest=lambda content: content,
+        # Events that do not change the UI elements, e.g. a progress bar.
+        last_event_time=lambda: min(clock.time(), 1.0),
+        clock=clock.time,
+        sleep=clock.sleep,
+    )
+
+    stabilizer.wait(screen.fetch)
+
+    self.assertBetween(clock.time(), 1.3, 1.3 + 0.5)
+
+  def test_events_are_ignored_without_quiet_period(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(clock, [])
+    stabilizer = ui_stabilizer.UIStabilizer(
+        ui_stabilizer.StabilizerConfig(settle_seconds=0.5),
+        digest=lambda content: content,
+        last_event_time=clock.time,
+        clock=clock.time,
+        sleep=clock.sleep,
+    )
+
+    stabilizer.wait(screen.fetch)
+
+    self.assertAlmostEqual(clock.time(), 0.5)
+
+  @parameterized.parameters(
+      dict(event_quiet_seconds=None, content=1),
+      dict(event_quiet_seconds=0.3, content=2),
+  )
+  def test_events_bridge_pause_in_content(self, event_quiet_seconds, content):
+    clock = simulated_screen.VirtualClock()
+    # The content pauses for 0.6 s while a progress indicator keeps sending
+    # events.
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.1, 0.7], event_times=[0.2, 0.3, 0.4, 0.5, 0.6]
+    )
+    stabilizer = _stabilizer(
+        clock, screen, event_quiet_seconds=event_quiet_seconds
+    )
+
+    self.assertEqual(stabilizer.wait(screen.fetch), content)
+
+  def test_histogram_buckets(self):
+    histogram = ui_stabilizer.WaitHistogram(bucket_edges=(0.5, 1.0))
+    for wait_seconds in (0.2, 0.5, 0.7, 3.0):
+      histogram.record(
+          ui_stabilizer.Transition(wait_seconds, 2, wait_seconds < 3)
+      )
+
+    self.assertEqual(histogram.counts, [2, 1, 1])
+    self.assertEqual(histogram.num_transitions, 4)
+    self.assertEqual(histogram.num_timeouts, 1)
+    self.assertEqual(histogram.num_observations, 8)
+    self.assertAlmostEqual(histogram.mean_seconds, 1.1)
+    self.assertEqual(histogram.max_seconds, 3.0)
+    self.assertIn('4 transitions, 1 timed out', histogram.format())
+
+  @parameterized.parameters(
+      dict(min_interval=0),
+      dict(min_interval=0.5, max_interval=0.1),
+      dict(backoff=0.5),
+      dict(settle_seconds=-1),
+      dict(min_checks=0),
+      dict(event_quiet_seconds=-0.1),
+  )
+  def test_invalid_config(self, **config):
+    with self.assertRaises(ValueError):
+      ui_stabilizer.StabilizerConfig(**config)
+
+  def test_settle_time_trades_latency_for_false_stables(self):
+    results = [
+        _false_stable_rate_and_latency(
+            ui_stabilizer.StabilizerConfig(settle_seconds=settle_seconds)
+        )
+        for settle_seconds in (0.2, 0.5, 1.0, 2.0)
+    ]
+    rates = [rate for rate, _ in results]
+    latencies = [latency for _, latency in results]
+
+    self.assertEqual(rates, sorted(rates, reverse=True))
+    self.assertEqual(latencies, sorted(latencies))
+    self.assertEqual(rates[-1], 0.0)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,317 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Waits for the device to reach a condition instead of sleeping.
+
+Actuation used to sleep a fixed second after focusing a text field or
+pressing HOME, however long the device actually took. A Waiter polls a cheap
+condition instead -- a text field got focus, the home screen is in front, an
+element is on screen, the keyboard is shown or hidden -- until it holds or
+the timeout passes, and returns as soon as it holds.
+
+A condition returns None when it cannot tell, e.g. because the device does
+not report the keyboard state or a request failed; the Waiter then sleeps
+what is left of the fixed time. In FIXED mode every wait is the fixed sleep,
+as before.
+"""
+
+import dataclasses
+import time
+from typing import Any, Callable, Collection, Optional
+
+from absl import logging
+from android_world.env import adb_utils
+from android_world.env import representation_utils
+
+# Modes of WaitConfig.
+CONDITION = 'condition'
+FIXED = 'fixed'
+
+# Returns whether the awaited state was reached, or None if it cannot tell.
+Condition = Callable[[], Optional[bool]]
+
+
+@dataclasses.dataclass(frozen=True)
+class WaitConfig:
+  """How a Waiter waits.
+
+  Attributes:
+    mode: CONDITION to poll conditions, FIXED to sleep fixed_sleep_sec.
+    timeout_sec: Longest time a condition is polled for.
+    poll_interval_sec: Time between polls.
+    fixed_sleep_sec: The fixed sleep; also the least time waited when a
+      condition cannot tell.
+  """
+
+  mode: str = CONDITION
+  timeout_sec: float = 3.0
+  poll_interval_sec: float = 0.1
+  fixed_sleep_sec: float = 1.0
+
+  def __post_init__(self):
+    if self.mode not in (CONDITION, FIXED):
+      raise ValueError(f'Unknown wait mode: {self.mode}')
+    if self.timeout_sec < 0 or self.fixed_sleep_sec < 0:
+      raise ValueError('Wait times cannot be negative.')
+    if self.poll_interval_sec <= 0:
+      raise ValueError('poll_interval_sec must be positive.')
+
+
+@dataclasses.dataclass(frozen=True)
+class WaitResult:
+  """Outcome of one wait.
+
+  Attributes:
+    met: Whether the condition held; None if it was not or could not be
+      evaluated and the fixed time was slept instead.
+    seconds: Time waited, including the polls.
+    num_polls: Times the condition was evaluated.
+  """
+
+  met: Optional[bool]
+  seconds: float
+  num_polls: int
+
+
+@dataclasses.dataclass
+class WaitStats:
+  """Totals over the waits of a Waiter."""
+
+  num_waits: int = 0
+  num_met: int = 0
+  num_timeouts: int = 0
+  num_fixed: int = 0
+  num_polls: int = 0
+  total_seconds: float = 0.0
+
+
+def _evaluate(condition: Condition) -> Optional[bool]:
+  try:
+    return condition()
+  except Exception:  # pylint: disable=broad-exception-caught
+    logging.exception('Wait condition failed; using the fixed wait.')
+    return None
+
+
+def poll_until(
+    condition: Condition,
+    timeout_sec: float,
+    poll_interval_sec: float = 0.1,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> WaitResult:
+  """Evaluates condition until it is not False or timeout_sec passed.
+
+  Args:
+    condition: The condition to wait for.
+    timeout_sec: Time after which to stop polling.
+    poll_interval_sec: Time between polls.
+    clock: Returns the current time in seconds.
+    sleep: Sleeps for the given number of seconds.
+
+  Returns:
+    The result, with met None if the condition could not tell.
+
+  Raises:
+    Whatever the condition raises.
+  """
+  start = clock()
+  deadline = start + timeout_sec
+  num_polls = 0
+  while True:
+    met = condition()
+    num_polls += 1
+    now = clock()
+    if met is None or met or now >= deadline:
+      return WaitResult(met, now - start, num_polls)
+    sleep(min(poll_interval_sec, deadline - now))
+
+
+class Waiter:
+  """Waits for conditions, or fixed times, and keeps count."""
+
+  def __init__(
+      self,
+      config: Optional[WaitConfig] = None,
+      clock: Callable[[], float] = time.monotonic,
+      sleep: Callable[[float], None] = time.sleep,
+  ):
+    """Initializes the waiter.
+
+    Args:
+      config: How to wait; the defaults if None.
+      clock: Returns the current time in seconds.
+      sleep: Sleeps for the given number of seconds.
+    """
+    self._config = config or WaitConfig()
+    self._clock = clock
+    self._sleep = sleep
+    self.stats = WaitStats()
+
+  @property
+  def config(self) -> WaitConfig:
+    return self._config
+
+  def wait_until(
+      self, condition: Condition, timeout_sec: Optional[float] = None
+  ) -> WaitResult:
+    """Waits until condition holds, the timeout passes or it cannot tell.
+
+    A condition that raises cannot tell.
+
+    Args:
+      condition: The condition to wait for. Not evaluated in FIXED mode.
+      timeout_sec: Overrides the configured timeout.
+
+    Returns:
+      How the wait went.
+    """
+    config = self._config
+    start = self._clock()
+    if config.mode == CONDITION:
+      result = poll_until(
+          lambda: _evaluate(condition),
+          config.timeout_sec if timeout_sec is None else timeout_sec,
+          config.poll_interval_sec,
+          self._clock,
+          self._sleep,
+      )
+      num_polls = result.num_polls
+      if result.met is not None:
+        return self._record(result)
+    else:
+      num_polls = 0
+    remaining = config.fixed_sleep_sec - (self._clock() - start)
+    if remaining > 0:
+      self._sleep(remaining)
+    return self._record(WaitResult(None, self._clock() - start, num_polls))
+
+  def _record(self, result: WaitResult) -> WaitResult:
+    stats = self.stats
+    stats.num_waits += 1
+    stats.num_polls += result.num_polls
+    stats.total_seconds += result.seconds
+    if result.met is None:
+      stats.num_fixed += 1
+    elif result.met:
+      stats.num_met += 1
+    else:
+      stats.num_timeouts += 1
+      logging.warning('Wait condition not met after %.2fs.', result.seconds)
+    return result
+
+
+def _contains(
+    bbox: Optional[representation_utils.BoundingBox], point: tuple[float, float]
+) -> bool:
+  if bbox is None:
+    return False
+  x, y = point
+  return bbox.x_min <= x <= bbox.x_max and bbox.y_min <= y <= bbox.y_max
+
+
+def element_present(
+    env: Any, predicate: Callable[[representation_utils.UIElement], bool]
+) -> Condition:
+  """Holds once an element on screen satisfies predicate.
+
+  Args:
+    env: An AndroidWorldController, or anything with get_ui_elements().
+    predicate: Tests one UI element.
+  """
+  return lambda: any(predicate(e) for e in env.get_ui_elements())
+
+
+def text_field_focused(
+    env: Any,
+    point: Optional[tuple[float, float]] = None,
+    previously_focused: Collection[representation_utils.BoundingBox] = (),
+) -> Condition:
+  """Holds once an editable element has focus, e.g. after tapping it.
+
+  Args:
+    env: An AndroidWorldController, or anything with get_ui_elements().
+    point: If set, where the element was tapped. A text field there must get
+      focus; if there is none, e.g. after tapping a search icon, any field
+      other than the previously focused ones may.
+    previously_focused: Bounding boxes of the editable elements focused
+      before the tap.
+  """
+
+  def focused() -> bool:
+    elements = env.get_ui_elements()
+    fields = [e for e in elements if e.is_editable and e.is_focused]
+    if point is None:
+      return bool(fields)
+    if any(_contains(e.bbox_pixels, point) for e in fields):
+      return True
+    if any(e.is_editable and _contains(e.bbox_pixels, point) for e in elements):
+      return False
+    return any(e.bbox_pixels not in previously_focused for e in fields)
+
+  return focused
+
+
+def activity_changed(env: Any, previous: Optional[str]) -> Condition:
+  """Holds once the activity in front is no longer previous.
+
+  Args:
+    env: The environment.
+    previous: The activity in front before the action.
+  """
+
+  def changed() -> Optional[bool]:
+    activity, _ = adb_utils.get_current_activity(env)
+    if activity is None:
+      return None
+    return activity != previous
+
+  return changed
+
+
+def home_screen_focused(env: Any) -> Condition:
+  """Holds once the launcher's activity is in front.
+
+  Args:
+    env: The environment.
+  """
+  home_package = None
+
+  def focused() -> Optional[bool]:
+    nonlocal home_package
+    if home_package is None:
+      home_activity = adb_utils.get_home_activity(env)
+      if home_activity is None:
+        return None
+      home_package = adb_utils.extract_package_name(home_activity)
+    activity, _ = adb_utils.get_current_activity(env)
+    if activity is None:
+      return None
+    return adb_utils.extract_package_name(activity) == home_package
+
+  return focused
+
+
+def keyboard_shown(env: Any) -> Condition:
+  """Holds once the soft keyboard is shown."""
+  return lambda: adb_utils.is_keyboard_shown(env)
+
+
+def keyboard_hidden(env: Any) -> Condition:
+  """Holds once the soft keyboard is hidden."""
+
+  def hidden() -> Optional[bool]:
+    shown = adb_utils.is_keyboard_shown(env)
+    return None if shown is None else not shown
+
+  return hidden
@@ -0,0 +1,243 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for wait_conditions, against a simulated device."""
+
+from absl.testing import absltest
+from android_world.env import adb_utils
+from android_world.env import wait_conditions
+from android_world.utils import simulated_device
+from android_world.utils import simulated_screen
+
+
+class _Flag:
+  """Condition whose answers are scripted, one per poll."""
+
+  def __init__(self, *answers):
+    self._answers = list(answers)
+    self.num_calls = 0
+
+  def __call__(self):
+    self.num_calls += 1
+    if isinstance(self._answers[0], Exception):
+      raise self._answers[0]
+    return self._answers.pop(0) if len(self._answers) > 1 else self._answers[0]
+
+
+class WaitConfigTest(absltest.TestCase):
+
+  def test_rejects_unknown_mode(self):
+    with self.assertRaises(ValueError):
+      wait_conditions.WaitConfig(mode='sometimes')
+
+  def test_rejects_bad_times(self):
+    with self.assertRaises(ValueError):
+      wait_conditions.WaitConfig(poll_interval_sec=0)
+    with self.assertRaises(ValueError):
+      wait_conditions.WaitConfig(timeout_sec=-1)
+
+
+class WaiterTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.clock = simulated_screen.VirtualClock()
+
+  def _waiter(self, **config):
+    return wait_conditions.Waiter(
+        wait_conditions.WaitConfig(**config), self.clock.time, self.clock.sleep
+    )
+
+  def test_returns_once_condition_holds(self):
+    waiter = self._waiter(poll_interval_sec=0.1)
+
+    result = waiter.wait_until(_Flag(False, False, True))
+
+    self.assertTrue(result.met)
+    self.assertEqual(result.num_polls, 3)
+    self.assertAlmostEqual(result.seconds, 0.2)
+    self.assertEqual(waiter.stats.num_met, 1)
+
+  def test_times_out(self):
+    waiter = self._waiter(timeout_sec=1.0, poll_interval_sec=0.3)
+
+    result = waiter.wait_until(_Flag(False))
+
+    self.assertFalse(result.met)
+    self.assertAlmostEqual(self.clock.time(), 1.0)
+    self.assertEqual(waiter.stats.num_timeouts, 1)
+
+  def test_timeout_override(self):
+    waiter = self._waiter(timeout_sec=3.0)
+
+    waiter.wait_until(_Flag(False), timeout_sec=0.5)
+
+    self.assertAlmostEqual(self.clock.time(), 0.5)
+
+  def test_fixed_mode_sleeps_without_polling(self):
+    waiter = self._waiter(mode=wait_conditions.FIXED, fixed_sleep_sec=1.0)
+    condition = _Flag(True)
+
+    result = waiter.wait_until(condition)
+
+    self.assertIsNone(result.met)
+    self.assertEqual(condition.num_calls, 0)
+    self.assertAlmostEqual(self.clock.time(), 1.0)
+    self.assertEqual(waiter.stats.num_fixed, 1)
+
+  def test_undecided_condition_falls_back_to_fixed_sleep(self):
+    waiter = self._waiter(fixed_sleep_sec=1.0, poll_interval_sec=0.1)
+
+    result = waiter.wait_until(_Flag(False, None))
+
+    self.assertIsNone(result.met)
+    self.assertEqual(result.num_polls, 2)
+    self.assertAlmostEqual(self.clock.time(), 1.0)
+
+  def test_raising_condition_falls_back_to_fixed_sleep(self):
+    waiter = self._waiter(fixed_sleep_sec=1.0)
+
+    result = waiter.wait_until(_Flag(RuntimeError('no tree')))
+
+    self.assertIsNone(result.met)
+    self.assertAlmostEqual(self.clock.time(), 1.0)
+
+  def test_poll_until_propagates_errors(self):
+    with self.assertRaises(RuntimeError):
+      wait_conditions.poll_until(_Flag(RuntimeError('no tree')), 1.0)
+
+
+class ConditionsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.clock = simulated_screen.VirtualClock()
+    self.fields = [
+        simulated_device.text_field(0, 0, 100, 50),
+        simulated_device.text_field(0, 100, 100, 150),
+    ]
+    self.device = simulated_device.SimulatedDevice(
+        self.clock, self.fields, focus_seconds=0.35, home_seconds=0.45
+    )
+    self.waiter = wait_conditions.Waiter(
+        wait_conditions.WaitConfig(poll_interval_sec=0.05),
+        self.clock.time,
+        self.clock.sleep,
+    )
+
+  def test_text_field_focused_after_tap(self):
+    adb_utils.tap_screen(50, 25, self.device)
+
+    result = self.waiter.wait_until(
+        wait_conditions.text_field_focused(self.device, (50, 25))
+    )
+
+    self.assertTrue(result.met)
+    self.assertEqual(self.device.focused, 0)
+    self.assertLess(result.seconds, 0.6)
+
+  def test_previously_focused_field_elsewhere_does_not_count(self):
+    adb_utils.tap_screen(50, 25, self.device)
+    self.clock.sleep(1.0)
+    previously_focused = [self.fields[0].bbox_pixels]
+
+    adb_utils.tap_screen(50, 125, self.device)
+    result = self.waiter.wait_until(
+        wait_conditions.text_field_focused(
+            self.device, (50, 125), previously_focused
+        )
+    )
+
+    self.assertTrue(result.met)
+    self.assertEqual(self.device.focused, 1)
+
+  def test_tapped_field_must_get_focus_even_if_another_has_it(self):
+    adb_utils.tap_screen(50, 25, self.device)
+    self.clock.sleep(1.0)
+    condition = wait_conditions.text_field_focused(self.device, (50, 125))
+
+    self.assertFalse(condition())
+    adb_utils.tap_screen(50, 125, self.device)
+    self.assertTrue(self.waiter.wait_until(condition).met)
+    self.assertEqual(self.device.focused, 1)
+
+  def test_newly_focused_field_elsewhere_counts(self):
+    adb_utils.tap_screen(50, 25, self.device)
+
+    result = self.waiter.wait_until(
+        wait_conditions.text_field_focused(self.device, (500, 500))
+    )
+
+    self.assertTrue(result.met)
+
+  def test_element_present(self):
+    condition = wait_conditions.element_present(
+        self.device, lambda element: bool(element.is_focused)
+    )
+    self.assertFalse(condition())
+
+    adb_utils.tap_screen(50, 125, self.device)
+    self.clock.sleep(0.5)
+
+    self.assertTrue(condition())
+
+  def test_home_screen_focused(self):
+    adb_utils.press_home_button(self.device)
+
+    result = self.waiter.wait_until(
+        wait_conditions.home_screen_focused(self.device)
+    )
+
+    self.assertTrue(result.met)
+    self.assertEqual(self.device.activity, simulated_device.HOME_ACTIVITY)
+    self.assertLess(result.seconds, 0.6)
+
+  def test_activity_changed(self):
+    condition = wait_conditions.activity_changed(
+        self.device, simulated_device.APP_ACTIVITY
+    )
+    self.assertFalse(condition())
+
+    adb_utils.press_home_button(self.device)
+    self.clock.sleep(0.5)
+
+    self.assertTrue(condition())
+
+  def test_keyboard_shown_and_hidden(self):
+    shown = wait_conditions.keyboard_shown(self.device)
+    hidden = wait_conditions.keyboard_hidden(self.device)
+    self.assertFalse(shown())
+    self.assertTrue(hidden())
+
+    adb_utils.tap_screen(50, 25, self.device)
+    self.assertTrue(self.waiter.wait_until(shown).met)
+    self.assertFalse(hidden())
+
+    adb_utils.press_home_button(self.device)
+    self.assertTrue(self.waiter.wait_until(hidden).met)
+
+  def test_unreported_keyboard_falls_back_to_fixed_sleep(self):
+    device = simulated_device.SimulatedDevice(
+        self.clock, self.fields, reports_keyboard=False
+    )
+    start = self.clock.time()
+
+    result = self.waiter.wait_until(wait_conditions.keyboard_shown(device))
+
+    self.assertIsNone(result.met)
+    self.assertAlmostEqual(self.clock.time() - start, 1.0)
+
+
+if __name__ == '__main__':
+  absltest.main()
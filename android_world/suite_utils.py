@@ -15,11 +15,13 @@
 """Utilities for evaluating automation agents."""
 
 import collections
+import concurrent.futures
 import datetime
 import hashlib
 import os
 import pdb
 import random
+import threading
 import time
 import traceback
 from typing import Any, Callable, Type
@@ -28,8 +30,9 @@ from android_env import env_interface
 from android_world import checkpointer as checkpointer_lib
 from android_world import constants
 from android_world import episode_runner
-from android_world.agents import base_agent, infer
+from android_world.agents import base_agent
 from android_world.env import adb_utils
+from android_world.env import device_pool
 from android_world.env import interface
 from android_world.task_evals import task_eval
 from android_world.task_evals.miniwob import miniwob_base
@@ -313,6 +316,18 @@ def _get_task_info(
   return completed, failed
 
 
+# Episode fields kept in the results of a suite run.
+_METADATA_FIELDS = [
+    constants.EpisodeConstants.GOAL,
+    constants.EpisodeConstants.TASK_TEMPLATE,
+    constants.EpisodeConstants.INSTANCE_ID,
+    constants.EpisodeConstants.IS_SUCCESSFUL,
+    constants.EpisodeConstants.EPISODE_LENGTH,
+    constants.EpisodeConstants.RUN_TIME,
+    constants.EpisodeConstants.EXCEPTION_INFO,
+]
+
+
 def _run_task_suite(
     suite: Suite,
     agent,
@@ -335,15 +350,7 @@ def _run_task_suite(
   Returns:
     Metadata for each episode, including the scripted reward.
   """
-  metadata_fields = [
-      constants.EpisodeConstants.GOAL,
-      constants.EpisodeConstants.TASK_TEMPLATE,
-      constants.EpisodeConstants.INSTANCE_ID,
-      constants.EpisodeConstants.IS_SUCCESSFUL,
-      constants.EpisodeConstants.EPISODE_LENGTH,
-      constants.EpisodeConstants.RUN_TIME,
-      constants.EpisodeConstants.EXCEPTION_INFO,
-  ]
+  metadata_fields = _METADATA_FIELDS
   completed_tasks, failed_tasks = _get_task_info(
       checkpointer.load(fields=metadata_fields)
   )
@@ -395,6 +402,23 @@ def _run_task_suite(
 
 
 
+_LOG_HANDLERS_LOCK = threading.Lock()
+
+
+class _ThreadLogFilter(logger.Filter):
+  """Passes the records logged by the thread that created it."""
+
+  def __init__(self):
+    super().__init__()
+    self._thread = threading.get_ident()
+
+  def is_current_thread(self) -> bool:
+    return self._thread == threading.get_ident()
+
+  def filter(self, record: logger.LogRecord) -> bool:
+    return record.thread == self._thread
+
+
 def run_episode(agent, task: task_eval.TaskEval, save_name: int, demo_mode) -> episode_runner.EpisodeResult:
   if demo_mode:
     _display_goal(agent.env, task)
@@ -405,12 +429,18 @@ def run_episode(agent, task: task_eval.TaskEval, save_name: int, demo_mode) -> e
   os.makedirs(save_dir, exist_ok=True)
 
   log_file = os.path.join(save_dir, 'app.log')
-  root_logger = logger.getLogger()
-  if root_logger.hasHandlers():
-      root_logger.handlers.clear()
-
   file_handler = logger.FileHandler(log_file)
-  root_logger.addHandler(file_handler)
+  file_handler.addFilter(_ThreadLogFilter())
+  root_logger = logger.getLogger()
+  with _LOG_HANDLERS_LOCK:
+    # Episodes running on other devices keep their handlers.
+    for handler in list(root_logger.handlers):
+      if not any(
+          isinstance(f, _ThreadLogFilter) and not f.is_current_thread()
+          for f in handler.filters
+      ):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(file_handler)
 
   return episode_runner.run_episode(
       goal=task.goal,
@@ -470,6 +500,127 @@ def run(
   return results
 
 
+def run_parallel(
+    suite: Suite,
+    pool: device_pool.DevicePool,
+    make_agent: Callable[
+        [interface.AsyncEnv], base_agent.EnvironmentInteractingAgent
+    ],
+    checkpointer: checkpointer_lib.Checkpointer = checkpointer_lib.NullCheckpointer(),
+    agent_name: str = '',
+    save_name: int = 0,
+) -> list[dict[str, Any]]:
+  """Runs a suite on all devices of a pool at once.
+
+  Every device gets an agent of its own and runs task templates off its
+  queue in device_pool.TaskQueues, one instance at a time. Episodes are
+  checkpointed as they finish, in the same format as `run`, so either can
+  resume a run the other started. A task that fails on a device that then
+  fails its health check is not checkpointed but run again on another
+  device; task instances left when every device has been retired are
+  reported and run on resume.
+
+  Args:
+    suite: The suite of tasks to run on.
+    pool: The devices to run on.
+    make_agent: Returns an agent interacting with the given environment.
+    checkpointer: See docstring from `run`.
+    agent_name: The name of the agent.
+    save_name: Name of the run, used in the directory episodes are saved to.
+
+  Returns:
+    Metadata for each episode, in suite order, as `run` returns it.
+  """
+  completed_tasks, failed_tasks = _get_task_info(
+      checkpointer.load(fields=_METADATA_FIELDS)
+  )
+  # Metadata per instance, in suite order: checkpointed episodes, then the
+  # episode run now.
+  instance_metadata: dict[str, list[dict[str, Any]]] = {}
+  pending = []
+  for instances in suite.values():
+    for i, instance in enumerate(instances):
+      instance_name = (
+          instance.name + checkpointer_lib.INSTANCE_SEPARATOR + str(i)
+      )
+      instance_metadata[instance_name] = completed_tasks.get(
+          instance_name, []
+      ) + failed_tasks.get(instance_name, [])
+      if instance_name in completed_tasks and instance_name not in failed_tasks:
+        print(f'Skipping already processed task {instance_name}')
+        continue
+      pending.append((instance_name, i, instance))
+
+  devices = pool.check_all()
+  if not devices:
+    raise device_pool.NoHealthyDeviceError('No device passed its health check.')
+  agents = {device.name: make_agent(device.env) for device in devices}
+  queues = device_pool.TaskQueues(
+      pending, list(agents), key=lambda item: item[2].name
+  )
+  finished = set()
+  lock = threading.Lock()
+
+  def run_tasks() -> None:
+    while True:
+      try:
+        device = pool.lease()
+      except device_pool.NoHealthyDeviceError:
+        return
+      item = queues.next_task(device.name)
+      if item is None:
+        pool.release(device)
+        return
+      instance_name, i, instance = item
+      try:
+        print(f'Running task {instance_name} on {device.name}')
+        try:
+          episode = _run_task(
+              instance, device.env, save_name, agents[device.name],
+              demo_mode=False,
+          )
+        except BaseException:
+          # Failures inside the episode are caught by _run_task; this is a
+          # bug or an interrupt. Hand the device back before propagating it.
+          if not pool.release(device, failed=True):
+            queues.retire(device.name)
+          raise
+        exception_info = episode[constants.EpisodeConstants.EXCEPTION_INFO]
+        if not pool.release(device, failed=exception_info is not None):
+          moved = queues.retire(device.name)
+          print(f'Retired {device.name}; requeued {len(moved)} tasks.')
+          continue
+        episode[constants.EpisodeConstants.AGENT_NAME] = agent_name
+        episode[constants.EpisodeConstants.INSTANCE_ID] = i
+        checkpointer.save_episodes([episode], instance_name)
+        with lock:
+          finished.add(instance_name)
+          instance_metadata[instance_name].append(
+              {k: episode[k] for k in _METADATA_FIELDS}
+          )
+          process_episodes(
+              [m for ms in instance_metadata.values() for m in ms],
+              print_summary=True,
+          )
+      finally:
+        queues.done(device.name)
+
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=len(devices), thread_name_prefix='suite'
+  ) as executor:
+    workers = [executor.submit(run_tasks) for _ in devices]
+    for worker in workers:
+      worker.result()
+
+  unfinished = [name for name, _, _ in pending if name not in finished]
+  if unfinished:
+    print(
+        f'{len(unfinished)} task instances did not run because no healthy'
+        f' device was left: {unfinished}. Resume the run to run them.'
+    )
+  return [m for ms in instance_metadata.values() for m in ms]
+
+
 def _allocate_step_budget(task_complexity: int) -> int:
   """Allocates number of steps dynamically based on the complexity score.
 
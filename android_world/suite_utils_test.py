@@ -14,8 +14,13 @@
 
 """Tests for suite utils."""
 
+import collections
 import copy
+import os
+import tempfile
+import threading
 import time
+import types
 from typing import Any
 from unittest import mock
 from absl.testing import absltest
@@ -27,6 +32,7 @@ from android_world import registry
 from android_world import suite_utils
 from android_world.agents import base_agent
 from android_world.env import adb_utils
+from android_world.env import device_pool
 from android_world.env import interface
 from android_world.utils import test_utils
 import dm_env
@@ -712,5 +718,288 @@ class RunTaskSuiteTest(absltest.TestCase):
     self.assertLen(result2, 1)
 
 
+class _FakeTask:
+  """Task instance whose outcome is scripted by the device it runs on."""
+
+  complexity = 1
+  start_on_home_screen = False
+
+  def __init__(self, name: str, index: int):
+    self.name = name
+    self.goal = f'Goal of {name}'
+    self.params = {'seed': index}
+    self.key = (name, index)
+
+  def initialize_task(self, env):
+    env.start(self)
+
+  def is_successful(self, env):
+    return env.finish(self)
+
+  def tear_down(self, env):
+    del env
+
+
+class _FakeDeviceEnv:
+  """Device that records the tasks it runs.
+
+  Tasks in crash_on take the device down; tasks in fail_on raise but leave
+  the device working.
+  """
+
+  def __init__(self, name, log, crash_on=(), fail_on=()):
+    self.name = name
+    self.alive = True
+    self._log = log
+    self._crash_on = set(crash_on)
+    self._fail_on = set(fail_on)
+
+  def start(self, task):
+    self._log.start(self.name, task.key)
+    if task.key in self._crash_on:
+      self.alive = False
+    if not self.alive or task.key in self._fail_on:
+      self._log.end(self.name, task.key)
+      raise RuntimeError(f'{task.key} failed on {self.name}.')
+
+  def finish(self, task):
+    self._log.end(self.name, task.key)
+    return 1.0
+
+  def close(self):
+    pass
+
+
+class _RunLog:
+  """Thread-safe log of task starts and ends."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.events = []
+    self._in_flight = 0
+    self.max_in_flight = 0
+
+  def start(self, device, key):
+    with self._lock:
+      self.events.append(('start', device, key))
+      self._in_flight += 1
+      self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+  def end(self, device, key):
+    with self._lock:
+      self.events.append(('end', device, key))
+      self._in_flight -= 1
+
+  def started(self, device=None):
+    return [
+        key for kind, name, key in self.events
+        if kind == 'start' and device in (None, name)
+    ]
+
+
+def _fake_episode(*unused_args, **unused_kwargs):
+  time.sleep(0.01)
+  return episode_runner.EpisodeResult(True, {'step_number': [0, 1]})
+
+
+def _fake_suite(**num_instances):
+  suite = suite_utils.Suite(**{
+      name: [_FakeTask(name, i) for i in range(n)]
+      for name, n in num_instances.items()
+  })
+  suite.suite_family = 'android'
+  return suite
+
+
+def _instance_keys(results):
+  return [
+      (r['task_template'], r['instance_id'], r['exception_info'] is None)
+      for r in results
+  ]
+
+
+@mock.patch.object(suite_utils, 'run_episode', side_effect=_fake_episode)
+class RunParallelTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.log = _RunLog()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.directory = temp_dir.name
+
+  def _pool(self, num_devices=3, **scripts):
+    envs = {}
+    for i in range(num_devices):
+      name = f'emulator-{5554 + 2 * i}'
+      envs[name] = _FakeDeviceEnv(name, self.log, **scripts.get(name, {}))
+    return device_pool.DevicePool(envs, health_check=lambda env: env.alive)
+
+  def _run(self, suite, pool):
+    return suite_utils.run_parallel(
+        suite,
+        pool,
+        lambda env: types.SimpleNamespace(name='fake', env=env),
+        checkpointer.IncrementalCheckpointer(self.directory),
+        agent_name='fake',
+    )
+
+  def test_results_match_sequential_run(self, unused_run_episode):
+    suite = _fake_suite(A=3, B=2, C=1, D=2)
+    sequential_dir = os.path.join(self.directory, 'sequential')
+    sequential = suite_utils._run_task_suite(
+        suite,
+        types.SimpleNamespace(name='fake'),
+        _FakeDeviceEnv('emulator-5554', _RunLog()),
+        checkpointer.IncrementalCheckpointer(sequential_dir),
+        agent_name='fake',
+    )
+
+    parallel = self._run(suite, self._pool())
+
+    self.assertEqual(_instance_keys(parallel), _instance_keys(sequential))
+    self.assertEqual([list(r) for r in parallel], [list(r) for r in sequential])
+    saved = checkpointer.IncrementalCheckpointer(self.directory).load()
+    saved_sequential = checkpointer.IncrementalCheckpointer(
+        sequential_dir
+    ).load()
+    self.assertCountEqual(
+        _instance_keys(saved), _instance_keys(saved_sequential)
+    )
+    self.assertEqual(
+        sorted(saved[0]), sorted(saved_sequential[0])
+    )
+
+  def test_instances_of_a_template_run_in_order_one_at_a_time(
+      self, unused_run_episode
+  ):
+    self._run(_fake_suite(A=4, B=4, C=1, D=1, E=2), self._pool())
+
+    in_flight = set()
+    started = collections.defaultdict(list)
+    for kind, _, (name, index) in self.log.events:
+      if kind == 'start':
+        self.assertNotIn(name, in_flight)
+        in_flight.add(name)
+        started[name].append(index)
+      else:
+        in_flight.remove(name)
+    for name, indices in started.items():
+      self.assertEqual(indices, sorted(indices), name)
+    self.assertGreater(self.log.max_in_flight, 1)
+    self.assertLen(
+        {device for _, device, _ in self.log.events}, 3
+    )
+
+  def test_failed_task_is_checkpointed_without_stopping_device(
+      self, unused_run_episode
+  ):
+    pool = self._pool(2, **{'emulator-5554': {'fail_on': [('A', 0)]}})
+
+    results = self._run(_fake_suite(A=2, B=2), pool)
+
+    self.assertEqual(
+        _instance_keys(results),
+        [('A', 0, False), ('A', 1, True), ('B', 0, True), ('B', 1, True)],
+    )
+    self.assertEqual(
+        self.log.started('emulator-5554')[:2], [('A', 0), ('A', 1)]
+    )
+    self.assertLen(pool.healthy_devices, 2)
+
+  def test_crashed_device_is_retired_and_its_tasks_rerun(
+      self, unused_run_episode
+  ):
+    pool = self._pool(3, **{'emulator-5556': {'crash_on': [('B', 0)]}})
+
+    results = self._run(_fake_suite(A=2, B=2, C=2, D=2), pool)
+
+    self.assertEqual(
+        _instance_keys(results),
+        [(name, i, True) for name in 'ABCD' for i in range(2)],
+    )
+    self.assertEqual(self.log.started('emulator-5556'), [('B', 0)])
+    self.assertEqual(self.log.started().count(('B', 0)), 2)
+    self.assertEqual(
+        [d.name for d in pool.healthy_devices],
+        ['emulator-5554', 'emulator-5558'],
+    )
+
+  def test_resumes_after_all_devices_crashed(self, unused_run_episode):
+    suite = _fake_suite(A=2, B=2)
+    pool = self._pool(1, **{'emulator-5554': {'crash_on': [('B', 0)]}})
+
+    partial = self._run(suite, pool)
+    self.log.events.clear()
+    resumed = self._run(suite, self._pool(2))
+
+    self.assertEqual(_instance_keys(partial), [('A', 0, True), ('A', 1, True)])
+    self.assertEqual(self.log.started(), [('B', 0), ('B', 1)])
+    self.assertEqual(
+        _instance_keys(resumed),
+        [(name, i, True) for name in 'AB' for i in range(2)],
+    )
+
+  def test_resumes_sequential_run_and_reruns_failed_tasks(
+      self, unused_run_episode
+  ):
+    suite = _fake_suite(A=2, B=1)
+    env = _FakeDeviceEnv('emulator-5554', _RunLog(), fail_on=[('A', 1)])
+    suite_utils._run_task_suite(
+        suite,
+        types.SimpleNamespace(name='fake'),
+        env,
+        checkpointer.IncrementalCheckpointer(self.directory),
+    )
+
+    results = self._run(suite, self._pool(2))
+
+    self.assertEqual(self.log.started(), [('A', 1)])
+    self.assertEqual(
+        _instance_keys(results),
+        [('A', 0, True), ('A', 1, False), ('A', 1, True), ('B', 0, True)],
+    )
+
+  def test_device_is_released_when_run_task_raises(self, unused_run_episode):
+    pool = self._pool(1)
+    suite = _fake_suite(A=1)
+    del suite['A'][0].params['seed']
+
+    with self.assertRaises(KeyError):
+      self._run(suite, pool)
+
+    self.assertLen(pool.healthy_devices, 1)
+    with pool.leased(timeout=0) as device:
+      self.assertEqual(device.num_failures, 1)
+
+  def test_device_is_retired_when_run_task_raises_after_crash(
+      self, unused_run_episode
+  ):
+    pool = self._pool(1)
+    (device,) = pool.devices
+    suite = _fake_suite(A=1)
+    del suite['A'][0].params['seed']
+
+    def crash(unused_task):
+      device.env.alive = False
+
+    with mock.patch.object(
+        suite_utils, '_get_screen_config', side_effect=crash
+    ):
+      with self.assertRaises(KeyError):
+        self._run(suite, pool)
+
+    self.assertFalse(device.healthy)
+    self.assertEqual(device.num_failures, 1)
+
+  def test_raises_without_healthy_device(self, unused_run_episode):
+    pool = self._pool(1)
+    for device in pool.devices:
+      device.env.alive = False
+
+    with self.assertRaises(device_pool.NoHealthyDeviceError):
+      self._run(_fake_suite(A=1), pool)
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -15,6 +15,7 @@
 """Utils for handling snapshots for apps."""
 
 import os
+import shlex
 
 from absl import logging
 from android_env import env_interface
@@ -111,16 +112,16 @@ def restore_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
 
   # File permissions, ownership, and security context may be lost during save
   # and/or loading of the snapshot. As a workaround, restore the security
-  # context and open up full file permissions.
-  adb_utils.check_ok(
-      adb_utils.issue_generic_request(
-          ["shell", "restorecon", "-RD", app_data_path], env
-      ),
-      "Failed to restore app data security context.",
+  # context and open up full file permissions. Both commands go out as one
+  # batch, which is a single round trip when a shell session is attached.
+  restorecon, chmod = adb_utils.issue_shell_batch(
+      [
+          f"restorecon -RD {shlex.quote(app_data_path)}",
+          f"chmod 777 -R {shlex.quote(app_data_path)}",
+      ],
+      env,
   )
   adb_utils.check_ok(
-      adb_utils.issue_generic_request(
-          ["shell", "chmod", "777", "-R", app_data_path], env
-      ),
-      "Failed to set app data permissions.",
+      restorecon, "Failed to restore app data security context."
   )
+  adb_utils.check_ok(chmod, "Failed to set app data permissions.")
@@ -0,0 +1,68 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+from absl.testing import absltest
+from android_env import env_interface
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+from android_world.utils import app_snapshot
+from android_world.utils import file_utils
+
+
+def _response(status: adb_pb2.AdbResponse.Status) -> adb_pb2.AdbResponse:
+  return adb_pb2.AdbResponse(status=status)
+
+
+@mock.patch.object(file_utils, 'copy_dir')
+@mock.patch.object(file_utils, 'clear_directory')
+@mock.patch.object(file_utils, 'check_directory_exists', return_value=True)
+@mock.patch.object(adb_utils, 'close_app')
+class RestoreSnapshotTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.env = mock.create_autospec(env_interface.AndroidEnvInterface)
+
+  @mock.patch.object(adb_utils, 'issue_shell_batch')
+  def test_fixes_permissions_in_one_batch(self, mock_batch, *unused_mocks):
+    mock_batch.return_value = [
+        _response(adb_pb2.AdbResponse.Status.OK),
+        _response(adb_pb2.AdbResponse.Status.OK),
+    ]
+
+    app_snapshot.restore_snapshot('markor', self.env)
+
+    mock_batch.assert_called_once_with(
+        [
+            'restorecon -RD /data/data/net.gsantner.markor',
+            'chmod 777 -R /data/data/net.gsantner.markor',
+        ],
+        self.env,
+    )
+
+  @mock.patch.object(adb_utils, 'issue_shell_batch')
+  def test_raises_when_a_command_fails(self, mock_batch, *unused_mocks):
+    mock_batch.return_value = [
+        _response(adb_pb2.AdbResponse.Status.OK),
+        _response(adb_pb2.AdbResponse.Status.ADB_ERROR),
+    ]
+
+    with self.assertRaisesRegex(RuntimeError, 'app data permissions'):
+      app_snapshot.restore_snapshot('markor', self.env)
+
+
+if __name__ == '__main__':
+  absltest.main()
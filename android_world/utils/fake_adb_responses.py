@@ -125,3 +125,33 @@ def create_copy_to_device_responses() -> list[adb_pb2.AdbResponse]:
       create_check_directory_exists_response(exists=True),
       create_successful_generic_response(""),
   ]
+
+
+def create_get_logical_screen_size_response(
+    width: int, height: int
+) -> adb_pb2.AdbResponse:
+  """Returns an AdbResponse for `dumpsys input | grep logicalFrame`."""
+  return create_successful_generic_response(
+      f"logicalFrame=[0, 0, {width}, {height}]\n"
+  )
+
+
+def create_get_physical_frame_boundary_response(
+    left: int, top: int, right: int, bottom: int
+) -> adb_pb2.AdbResponse:
+  """Returns an AdbResponse for `dumpsys input | grep physicalFrame`."""
+  return create_successful_generic_response(
+      f"physicalFrame=[{left}, {top}, {right}, {bottom}]\n"
+  )
+
+
+def create_get_orientation_response(orientation: int) -> adb_pb2.AdbResponse:
+  """Returns an AdbResponse for `dumpsys window | grep mCurrentRotation`.
+
+  Args:
+    orientation: 0 for portrait, 1 for landscape, 2 for reverse portrait, 3
+      for reverse landscape.
+  """
+  return create_successful_generic_response(
+      f"mCurrentRotation=ROTATION_{orientation * 90}\n"
+  )
@@ -16,6 +16,7 @@ from unittest import mock
 
 from absl.testing import absltest
 from android_env import env_interface
+from android_world.env import adb_utils
 from android_world.utils import fake_adb_responses
 from android_world.utils import file_utils
 
@@ -85,5 +86,24 @@ class FakeAdbResponsesTest(absltest.TestCase):
     )
 
 
+  def test_create_geometry_responses(self):
+    env = mock.create_autospec(env_interface.AndroidEnvInterface)
+    env.execute_adb_call.side_effect = [
+        fake_adb_responses.create_get_logical_screen_size_response(
+            2400, 1080
+        ),
+        fake_adb_responses.create_get_orientation_response(1),
+        fake_adb_responses.create_get_physical_frame_boundary_response(
+            0, 0, 1080, 2400
+        ),
+    ]
+
+    self.assertEqual(adb_utils.get_logical_screen_size(env), (2400, 1080))
+    self.assertEqual(adb_utils.get_orientation(env), 1)
+    self.assertEqual(
+        adb_utils.get_physical_frame_boundary(env, orientation=1),
+        (0, 0, 2400, 1080),
+    )
+
 if __name__ == "__main__":
   absltest.main()
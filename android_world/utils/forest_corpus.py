@@ -0,0 +1,231 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Corpus of recorded accessibility forests.
+
+A corpus is a directory of `forest_<index>.pb` files, each holding one
+serialized `AndroidAccessibilityForest` proto. Corpora are recorded from a
+live device with `ForestRecorder` and replayed offline, e.g. by the
+representation benchmarks, without an emulator.
+
+Corpora recorded with the uiautomator fallback hold `dump_<index>.xml` files
+with the raw XML dumps instead.
+
+A corpus may also hold a `steps.jsonl` file that labels forests with the
+action taken on them, one `{"forest": <file name>, "action": <action dict>}`
+object per line. Offline evaluations use these as ground truth.
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Any
+from typing import Iterator
+from typing import Optional
+
+from absl import logging
+from android_env.proto.a11y import android_accessibility_forest_pb2
+
+_FILE_TEMPLATE = 'forest_{:06d}.pb'
+_FILE_PATTERN = re.compile(r'forest_(\d+)\.pb$')
+_DUMP_TEMPLATE = 'dump_{:06d}.xml'
+_DUMP_PATTERN = re.compile(r'dump_(\d+)\.xml$')
+STEPS_FILE = 'steps.jsonl'
+
+
+def _indexed_paths(directory: str, pattern: re.Pattern[str]) -> list[str]:
+  paths = []
+  for path in glob.glob(os.path.join(directory, '*')):
+    match = pattern.search(os.path.basename(path))
+    if match:
+      paths.append((int(match.group(1)), path))
+  return [path for _, path in sorted(paths)]
+
+
+def forest_paths(directory: str) -> list[str]:
+  """Returns the forest files in a corpus directory, in recording order."""
+  return _indexed_paths(directory, _FILE_PATTERN)
+
+
+def dump_paths(directory: str) -> list[str]:
+  """Returns the uiautomator dump files in a corpus, in recording order."""
+  return _indexed_paths(directory, _DUMP_PATTERN)
+
+
+def load_dump(path: str) -> str:
+  """Reads a single uiautomator XML dump."""
+  with open(path, encoding='utf-8') as f:
+    return f.read()
+
+
+def load_forest(
+    path: str,
+) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
+  """Reads a single serialized forest."""
+  forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+  with open(path, 'rb') as f:
+    forest.ParseFromString(f.read())
+  return forest
+
+
+def iter_corpus(
+    directory: str,
+) -> Iterator[android_accessibility_forest_pb2.AndroidAccessibilityForest]:
+  """Yields the forests of a corpus one at a time."""
+  for path in forest_paths(directory):
+    yield load_forest(path)
+
+
+def load_corpus(
+    directory: str,
+) -> list[android_accessibility_forest_pb2.AndroidAccessibilityForest]:
+  """Loads all forests of a corpus."""
+  return list(iter_corpus(directory))
+
+
+def load_steps(directory: str) -> list[tuple[str, dict[str, Any]]]:
+  """Loads the labelled steps of a corpus.
+
+  Args:
+    directory: Corpus directory.
+
+  Returns:
+    (forest path, action) pairs in file order; empty if the corpus has no
+    steps file.
+  """
+  path = os.path.join(directory, STEPS_FILE)
+  if not os.path.exists(path):
+    return []
+  steps = []
+  with open(path) as f:
+    for line in f:
+      if not line.strip():
+        continue
+      step = json.loads(line)
+      steps.append((os.path.join(directory, step['forest']), step['action']))
+  return steps
+
+
+class ForestRecorder:
+  """Appends forests to a corpus directory.
+
+  Recording resumes after the highest existing index, so several runs can
+  share one directory.
+  """
+
+  def __init__(self, directory: str, max_forests: Optional[int] = None):
+    """Initializes the recorder.
+
+    Args:
+      directory: Corpus directory; created if missing.
+      max_forests: Stop recording once the directory holds this many forests,
+        and likewise for dumps. None records without limit.
+    """
+    os.makedirs(directory, exist_ok=True)
+    self._directory = directory
+    self._max_forests = max_forests
+    existing = forest_paths(directory)
+    self._num_forests = len(existing)
+    self._next_index = (
+        int(_FILE_PATTERN.search(existing[-1]).group(1)) + 1 if existing else 0
+    )
+    existing_dumps = dump_paths(directory)
+    self._num_dumps = len(existing_dumps)
+    self._next_dump_index = (
+        int(_DUMP_PATTERN.search(existing_dumps[-1]).group(1)) + 1
+        if existing_dumps
+        else 0
+    )
+
+  @property
+  def directory(self) -> str:
+    return self._directory
+
+  @property
+  def num_forests(self) -> int:
+    return self._num_forests
+
+  @property
+  def num_dumps(self) -> int:
+    return self._num_dumps
+
+  def record(
+      self,
+      forest: android_accessibility_forest_pb2.AndroidAccessibilityForest,
+  ) -> Optional[str]:
+    """Writes the forest to the corpus.
+
+    Args:
+      forest: The forest to store.
+
+    Returns:
+      The path of the written file, or None if the corpus is full.
+    """
+    if self._max_forests is not None and self._num_forests >= self._max_forests:
+      return None
+    path = os.path.join(
+        self._directory, _FILE_TEMPLATE.format(self._next_index)
+    )
+    try:
+      with open(path, 'wb') as f:
+        f.write(forest.SerializeToString())
+    except OSError as e:
+      # Recording is a debugging aid and must never break the episode.
+      logging.warning('Could not record forest to %s: %s', path, e)
+      return None
+    self._next_index += 1
+    self._num_forests += 1
+    return path
+
+  def record_dump(self, xml_dump: str) -> Optional[str]:
+    """Writes a uiautomator XML dump to the corpus.
+
+    Dumps are counted separately from forests, against the same limit.
+
+    Args:
+      xml_dump: The dump as returned by `adb_utils.uiautomator_dump`.
+
+    Returns:
+      The path of the written file, or None if the corpus is full.
+    """
+    if self._max_forests is not None and self._num_dumps >= self._max_forests:
+      return None
+    path = os.path.join(
+        self._directory, _DUMP_TEMPLATE.format(self._next_dump_index)
+    )
+    try:
+      with open(path, 'w', encoding='utf-8') as f:
+        f.write(xml_dump)
+    except OSError as e:
+      logging.warning('Could not record dump to %s: %s', path, e)
+      return None
+    self._next_dump_index += 1
+    self._num_dumps += 1
+    return path
+
+  def record_step(self, forest_path: str, action: dict[str, Any]) -> None:
+    """Labels a recorded forest with the action taken on it.
+
+    Args:
+      forest_path: Path returned by `record`.
+      action: The action as a JSON-serializable dict.
+    """
+    line = json.dumps(
+        {'forest': os.path.basename(forest_path), 'action': action}
+    )
+    try:
+      with open(os.path.join(self._directory, STEPS_FILE), 'a') as f:
+        f.write(line + '\n')
+    except OSError as e:
+      logging.warning('Could not record step for %s: %s', forest_path, e)
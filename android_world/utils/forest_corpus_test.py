@@ -0,0 +1,97 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+
+from absl.testing import absltest
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+
+
+class ForestCorpusTest(absltest.TestCase):
+
+  def test_round_trip(self):
+    directory = tempfile.mkdtemp()
+    forests = [synthetic_forest.generate_forest(30, seed=i) for i in range(3)]
+    recorder = forest_corpus.ForestRecorder(directory)
+
+    paths = [recorder.record(forest) for forest in forests]
+
+    self.assertEqual(forest_corpus.forest_paths(directory), paths)
+    self.assertEqual(forest_corpus.load_corpus(directory), forests)
+    self.assertEqual(recorder.num_forests, 3)
+
+  def test_resumes_after_existing_forests(self):
+    directory = tempfile.mkdtemp()
+    forest_corpus.ForestRecorder(directory).record(
+        synthetic_forest.generate_forest(5)
+    )
+
+    path = forest_corpus.ForestRecorder(directory).record(
+        synthetic_forest.generate_forest(5, seed=1)
+    )
+
+    self.assertEqual(os.path.basename(path), 'forest_000001.pb')
+    self.assertLen(forest_corpus.load_corpus(directory), 2)
+
+  def test_stops_at_max_forests(self):
+    directory = tempfile.mkdtemp()
+    recorder = forest_corpus.ForestRecorder(directory, max_forests=1)
+    forest = synthetic_forest.generate_forest(5)
+
+    self.assertIsNotNone(recorder.record(forest))
+    self.assertIsNone(recorder.record(forest))
+    self.assertLen(forest_corpus.forest_paths(directory), 1)
+
+  def test_record_and_load_steps(self):
+    directory = tempfile.mkdtemp()
+    recorder = forest_corpus.ForestRecorder(directory)
+    path = recorder.record(synthetic_forest.generate_forest(5))
+    action = {'action_type': 'click', 'index': 3}
+
+    recorder.record_step(path, action)
+
+    self.assertEqual(forest_corpus.load_steps(directory), [(path, action)])
+
+  def test_load_steps_without_steps_file(self):
+    self.assertEmpty(forest_corpus.load_steps(tempfile.mkdtemp()))
+
+  def test_record_dumps(self):
+    directory = tempfile.mkdtemp()
+    recorder = forest_corpus.ForestRecorder(directory, max_forests=2)
+    recorder.record(synthetic_forest.generate_forest(5))
+    dumps = ['<hierarchy rotation="0" />', '<hierarchy rotation="1" />']
+
+    paths = [recorder.record_dump(dump) for dump in dumps]
+
+    self.assertIsNone(recorder.record_dump(dumps[0]))
+    self.assertEqual(forest_corpus.dump_paths(directory), paths)
+    self.assertEqual([forest_corpus.load_dump(p) for p in paths], dumps)
+    self.assertLen(forest_corpus.forest_paths(directory), 1)
+    self.assertEqual(
+        forest_corpus.ForestRecorder(directory).record_dump(dumps[0]),
+        os.path.join(directory, 'dump_000002.xml'),
+    )
+
+  def test_ignores_unrelated_files(self):
+    directory = tempfile.mkdtemp()
+    for name in ('notes.txt', 'forest_abc.pb'):
+      with open(os.path.join(directory, name), 'w') as f:
+        f.write('')
+
+    self.assertEmpty(forest_corpus.forest_paths(directory))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,159 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Content and perceptual hashes for finding duplicate screenshots.
+
+Runs save many identical screenshots: the screen after a no-op action, MCTS
+replays of the same path, repeated tasks. `content_hash` identifies
+byte-identical pixels. `perceptual_hash` is a 64-bit difference hash (dHash)
+that stays the same or nearly so under small changes such as a blinking
+cursor or a clock tick, so near-duplicates are within a small Hamming
+distance of each other.
+"""
+
+import hashlib
+import threading
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+EXACT = 'exact'
+PERCEPTUAL = 'perceptual'
+MODES = (EXACT, PERCEPTUAL)
+
+
+def content_hash(pixels: np.ndarray) -> bytes:
+  """Returns a digest of the shape, dtype and bytes of an array."""
+  pixels = np.ascontiguousarray(pixels)
+  digest = hashlib.blake2b(digest_size=16)
+  digest.update(f'{pixels.dtype.str}{pixels.shape}'.encode())
+  digest.update(memoryview(pixels).cast('B'))
+  return digest.digest()
+
+
+def perceptual_hash(pixels: np.ndarray, hash_size: int = 8) -> int:
+  """Returns the difference hash of an image.
+
+  The image is shrunk to hash_size rows of hash_size + 1 grayscale pixels;
+  each bit tells whether a pixel is brighter than its right neighbour.
+
+  Args:
+    pixels: An (H, W) grayscale or (H, W, 3) RGB image.
+    hash_size: Bits per row and number of rows.
+
+  Returns:
+    A hash_size * hash_size bit integer.
+  """
+  pixels = np.asarray(pixels)
+  if pixels.ndim == 3:
+    pixels = cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_RGB2GRAY)
+  small = cv2.resize(
+      pixels, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA
+  )
+  bits = (small[:, 1:] > small[:, :-1]).ravel()
+  return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(first: int, second: int) -> int:
+  return (first ^ second).bit_count()
+
+
+class DuplicateIndex:
+  """Remembers saved screenshots and finds earlier copies of new ones.
+
+  Safe to use from several threads.
+  """
+
+  def __init__(self, mode: str = EXACT, max_distance: int = 4):
+    """Initializes an empty index.
+
+    Args:
+      mode: EXACT matches identical pixels only; PERCEPTUAL also matches
+        images whose perceptual hashes differ in at most max_distance bits.
+      max_distance: Largest Hamming distance of a perceptual match.
+    """
+    if mode not in MODES:
+      raise ValueError(f'Unknown mode {mode!r}; expected one of {MODES}.')
+    self.mode = mode
+    self.max_distance = max_distance
+    self._lock = threading.Lock()
+    # Values holding each content, first claimed first. Linked duplicates
+    # are holders too, so the content stays known if the first is rewritten.
+    self._holders = {}
+    # (perceptual hash, exact key) of each content, in perceptual mode.
+    self._perceptual = []
+    # Exact key of the content each value holds.
+    self._keys = {}
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._holders)
+
+  def key(self, pixels: np.ndarray) -> Any:
+    """Returns the hash new screenshots are looked up and stored under."""
+    if self.mode == EXACT:
+      return content_hash(pixels)
+    return content_hash(pixels), perceptual_hash(pixels)
+
+  def claim(self, key: Any, value: str) -> Optional[str]:
+    """Returns the value of an earlier duplicate, or stores value for key.
+
+    A value claimed again, e.g. a path written again with other content, is
+    first forgotten under its old content. Values given an earlier duplicate
+    are remembered as holding its content, so it can still be found when
+    the first value is rewritten.
+
+    Args:
+      key: The result of self.key for the new screenshot.
+      value: What later duplicates are given, e.g. the screenshot's path.
+
+    Returns:
+      The value stored for the first duplicate of key, or None if there is
+      none, in which case value is stored.
+    """
+    if self.mode == EXACT:
+      exact, perceptual = key, None
+    else:
+      exact, perceptual = key
+    with self._lock:
+      match = exact if exact in self._holders else None
+      if match is None and perceptual is not None:
+        for other, other_exact in self._perceptual:
+          if hamming_distance(perceptual, other) <= self.max_distance:
+            match = other_exact
+            break
+      if match is not None and value in self._holders[match]:
+        return value
+      self._forget(value)
+      if match is not None:
+        self._holders[match].append(value)
+        self._keys[value] = match
+        return self._holders[match][0]
+      self._holders[exact] = [value]
+      self._keys[value] = exact
+      if perceptual is not None:
+        self._perceptual.append((perceptual, exact))
+    return None
+
+  def _forget(self, value: str) -> None:
+    exact = self._keys.pop(value, None)
+    if exact is None:
+      return
+    holders = self._holders[exact]
+    holders.remove(value)
+    if not holders:
+      del self._holders[exact]
+      self._perceptual = [
+          entry for entry in self._perceptual if entry[1] != exact
+      ]
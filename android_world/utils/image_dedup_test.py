@@ -0,0 +1,178 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+
+from absl.testing import absltest
+from android_world.utils import image_dedup
+import cv2
+import numpy as np
+
+
+def _screen(seed=0):
+  """A synthetic screen of flat boxes on white."""
+  rng = np.random.default_rng(seed)
+  pixels = np.full((480, 270, 3), 255, np.uint8)
+  for _ in range(12):
+    x, y = rng.integers(0, 200), rng.integers(0, 400)
+    pixels[y : y + 60, x : x + 70] = rng.integers(0, 256, size=3)
+  return pixels
+
+
+class ContentHashTest(absltest.TestCase):
+
+  def test_equal_pixels_hash_equal(self):
+    self.assertEqual(
+        image_dedup.content_hash(_screen()),
+        image_dedup.content_hash(_screen().copy()),
+    )
+
+  def test_one_pixel_changes_hash(self):
+    changed = _screen()
+    changed[0, 0, 0] ^= 1
+
+    self.assertNotEqual(
+        image_dedup.content_hash(_screen()), image_dedup.content_hash(changed)
+    )
+
+  def test_shape_and_dtype_change_hash(self):
+    data = np.arange(24, dtype=np.uint8)
+
+    hashes = {
+        image_dedup.content_hash(data),
+        image_dedup.content_hash(data.reshape(4, 6)),
+        image_dedup.content_hash(data.view(np.int8)),
+    }
+
+    self.assertLen(hashes, 3)
+
+  def test_hashes_views(self):
+    pixels = _screen()
+
+    self.assertEqual(
+        image_dedup.content_hash(pixels[:, ::2]),
+        image_dedup.content_hash(pixels[:, ::2].copy()),
+    )
+
+
+class PerceptualHashTest(absltest.TestCase):
+
+  def test_is_64_bits(self):
+    self.assertLess(image_dedup.perceptual_hash(_screen()), 1 << 64)
+
+  def test_near_duplicates_are_close(self):
+    cursor = _screen()
+    cv2.rectangle(cursor, (100, 100), (101, 120), (0, 0, 0), -1)
+    noisy = np.clip(
+        _screen().astype(int)
+        + np.random.default_rng(0).integers(-3, 4, size=cursor.shape),
+        0,
+        255,
+    ).astype(np.uint8)
+
+    original = image_dedup.perceptual_hash(_screen())
+    for variant in (cursor, noisy):
+      self.assertLessEqual(
+          image_dedup.hamming_distance(
+              original, image_dedup.perceptual_hash(variant)
+          ),
+          4,
+      )
+
+  def test_different_screens_are_far(self):
+    self.assertGreater(
+        image_dedup.hamming_distance(
+            image_dedup.perceptual_hash(_screen(0)),
+            image_dedup.perceptual_hash(_screen(1)),
+        ),
+        8,
+    )
+
+  def test_accepts_grayscale(self):
+    gray = cv2.cvtColor(_screen(), cv2.COLOR_RGB2GRAY)
+
+    self.assertEqual(
+        image_dedup.perceptual_hash(gray),
+        image_dedup.perceptual_hash(_screen()),
+    )
+
+
+class DuplicateIndexTest(absltest.TestCase):
+
+  def test_exact_mode(self):
+    index = image_dedup.DuplicateIndex()
+    near = _screen()
+    near[0, 0] = 0
+
+    self.assertIsNone(index.claim(index.key(_screen()), 'first'))
+    self.assertEqual(index.claim(index.key(_screen()), 'second'), 'first')
+    self.assertIsNone(index.claim(index.key(near), 'near'))
+    self.assertLen(index, 2)
+
+  def test_perceptual_mode(self):
+    index = image_dedup.DuplicateIndex(image_dedup.PERCEPTUAL, max_distance=4)
+    near = _screen()
+    near[0, 0] = 0
+
+    self.assertIsNone(index.claim(index.key(_screen()), 'first'))
+    self.assertEqual(index.claim(index.key(near), 'near'), 'first')
+    self.assertIsNone(index.claim(index.key(_screen(1)), 'other'))
+
+  def test_forgets_value_claimed_with_new_content(self):
+    index = image_dedup.DuplicateIndex()
+    old, new = index.key(_screen()), index.key(_screen(1))
+
+    self.assertIsNone(index.claim(old, 'step1'))
+    self.assertEqual(index.claim(old, 'step2'), 'step1')
+    self.assertIsNone(index.claim(new, 'step1'))
+    self.assertEqual(index.claim(old, 'step3'), 'step2')
+    self.assertEqual(index.claim(new, 'step1'), 'step1')
+    self.assertEqual(index.claim(new, 'step2'), 'step1')
+    self.assertEqual(index.claim(old, 'step3'), 'step3')
+    self.assertLen(index, 2)
+    self.assertEqual(index.claim(new, 'step3'), 'step1')
+    self.assertLen(index, 1)
+
+  def test_forgets_value_linked_to_other_content(self):
+    index = image_dedup.DuplicateIndex(image_dedup.PERCEPTUAL)
+    first, second = index.key(_screen()), index.key(_screen(1))
+    index.claim(first, 'step1')
+    index.claim(second, 'step2')
+
+    self.assertEqual(index.claim(first, 'step2'), 'step1')
+    self.assertIsNone(index.claim(second, 'step3'))
+
+  def test_claims_once_across_threads(self):
+    index = image_dedup.DuplicateIndex()
+    key = index.key(_screen())
+    owners = []
+
+    def claim(name):
+      if index.claim(key, name) is None:
+        owners.append(name)
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertLen(owners, 1)
+
+  def test_rejects_unknown_mode(self):
+    with self.assertRaises(ValueError):
+      image_dedup.DuplicateIndex('fuzzy')
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,275 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Background writer for screenshots saved while an agent steps.
+
+Encoding and writing screenshots on the agent thread adds tens of
+milliseconds to every step. `ScreenshotWriter` hands them to a small thread
+pool instead: `submit` returns as soon as the screenshot is queued, and
+`flush` waits until everything queued has reached disk. The queue is
+bounded, so a slow disk makes `submit` block rather than letting screenshots
+pile up in memory.
+
+Screenshots may be numpy arrays or anything `np.asarray` accepts, such as
+`m3a_utils.SetOfMarkScreenshot`, which is then drawn on the writer thread.
+They must not be modified after they are submitted.
+
+With deduplication on, a screenshot whose pixels match one already written is
+saved as a hard link to the earlier file rather than encoded again, so run
+directories keep their file names but not the duplicate bytes.
+"""
+
+import concurrent.futures
+import dataclasses
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from absl import logging
+from android_world.utils import image_dedup
+import numpy as np
+from PIL import Image
+
+# Format name -> (PIL format, file extension, whether quality applies).
+_FORMATS = {
+    'jpeg': ('JPEG', '.jpg', True),
+    'png': ('PNG', '.png', False),
+    'webp': ('WEBP', '.webp', True),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class WriterConfig:
+  """How screenshots are encoded and queued.
+
+  Attributes:
+    image_format: One of 'jpeg', 'png' or 'webp'.
+    quality: Encoder quality from 1 to 100 for 'jpeg' and 'webp'; None keeps
+      the PIL default. Must be None for 'png'.
+    downscale: Integer factor both dimensions are divided by before encoding.
+    num_workers: Encoding threads.
+    max_pending: Screenshots queued or being written before submit blocks.
+    dedup: None to write every screenshot, 'exact' to link screenshots with
+      identical pixels to the first copy, or 'perceptual' to also link near
+      duplicates, which then show the first copy's pixels.
+    max_distance: Largest perceptual hash distance linked in 'perceptual'
+      mode; see image_dedup.DuplicateIndex.
+  """
+
+  image_format: str = 'jpeg'
+  quality: Optional[int] = None
+  downscale: int = 1
+  num_workers: int = 2
+  max_pending: int = 8
+  dedup: Optional[str] = None
+  max_distance: int = 4
+
+  def __post_init__(self):
+    if self.image_format not in _FORMATS:
+      raise ValueError(
+          f'Unknown image format {self.image_format!r}; expected one of'
+          f' {sorted(_FORMATS)}.'
+      )
+    if self.quality is not None:
+      if not _FORMATS[self.image_format][2]:
+        raise ValueError(f'{self.image_format} does not take a quality.')
+      if not 1 <= self.quality <= 100:
+        raise ValueError(f'quality must be in [1, 100], got {self.quality}.')
+    if self.downscale < 1:
+      raise ValueError(f'downscale must be at least 1, got {self.downscale}.')
+    if self.num_workers < 1:
+      raise ValueError(
+          f'num_workers must be at least 1, got {self.num_workers}.'
+      )
+    if self.max_pending < 1:
+      raise ValueError(
+          f'max_pending must be at least 1, got {self.max_pending}.'
+      )
+
+    if self.dedup is not None and self.dedup not in image_dedup.MODES:
+      raise ValueError(
+          f'Unknown dedup mode {self.dedup!r}; expected None or one of'
+          f' {image_dedup.MODES}.'
+      )
+
+  @property
+  def extension(self) -> str:
+    return _FORMATS[self.image_format][1]
+
+
+@dataclasses.dataclass
+class WriterStats:
+  """Counters accumulated by a ScreenshotWriter.
+
+  Attributes:
+    num_written: Screenshots written to disk.
+    num_failed: Screenshots whose encoding or write raised.
+    bytes_written: Total size of the written files.
+    write_seconds: Total time spent converting, encoding and writing.
+    blocked_seconds: Total time submit waited on a full queue.
+    num_deduplicated: Screenshots linked to an earlier copy.
+    bytes_saved: Total size of the files those links point to.
+  """
+
+  num_written: int = 0
+  num_failed: int = 0
+  bytes_written: int = 0
+  write_seconds: float = 0.0
+  blocked_seconds: float = 0.0
+  num_deduplicated: int = 0
+  bytes_saved: int = 0
+
+
+def _link(original: str, path: str) -> bool:
+  """Makes path a hard link to original; returns whether it could."""
+  if os.path.abspath(original) == os.path.abspath(path):
+    return os.path.exists(path)
+  temporary = path + '.link'
+  try:
+    os.link(original, temporary)
+    os.replace(temporary, path)
+  except OSError:
+    # The original may still be being written, have failed, or live on a
+    # file system without hard links; the caller then writes a copy.
+    return False
+  return True
+
+
+class ScreenshotWriter:
+  """Writes screenshots to disk on a bounded pool of background threads."""
+
+  def __init__(self, config: Optional[WriterConfig] = None):
+    self.config = config or WriterConfig()
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=self.config.num_workers,
+        thread_name_prefix='screenshot_writer',
+    )
+    self._slots = threading.BoundedSemaphore(self.config.max_pending)
+    self._lock = threading.Lock()
+    self._pending = set()
+    self._stats = WriterStats()
+    self._closed = False
+    self._index = None
+    if self.config.dedup is not None:
+      self._index = image_dedup.DuplicateIndex(
+          self.config.dedup, self.config.max_distance
+      )
+
+  def __enter__(self) -> 'ScreenshotWriter':
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  @property
+  def stats(self) -> WriterStats:
+    """Returns a snapshot of the counters."""
+    with self._lock:
+      return dataclasses.replace(self._stats)
+
+  def submit(self, path: str, screenshot: Any) -> str:
+    """Queues a screenshot to be written.
+
+    Blocks while max_pending screenshots are already queued.
+
+    Args:
+      path: Destination path without extension; the configured format's
+        extension is appended.
+      screenshot: An (H, W, 3) image, or anything np.asarray turns into one.
+
+    Returns:
+      The path the screenshot will be written to.
+
+    Raises:
+      RuntimeError: If the writer was closed.
+    """
+    if self._closed:
+      raise RuntimeError('ScreenshotWriter is closed.')
+    path += self.config.extension
+    start = time.perf_counter()
+    self._slots.acquire()
+    blocked = time.perf_counter() - start
+    try:
+      future = self._executor.submit(self._write, path, screenshot)
+    except BaseException:
+      self._slots.release()
+      raise
+    with self._lock:
+      self._stats.blocked_seconds += blocked
+      self._pending.add(future)
+    future.add_done_callback(self._done)
+    return path
+
+  def _done(self, future: concurrent.futures.Future) -> None:
+    with self._lock:
+      self._pending.discard(future)
+    self._slots.release()
+
+  def _write(self, path: str, screenshot: Any) -> None:
+    start = time.perf_counter()
+    try:
+      pixels = np.uint8(screenshot)
+      if self._index is not None:
+        original = self._index.claim(self._index.key(pixels), path)
+        if original is not None and _link(original, path):
+          with self._lock:
+            self._stats.num_deduplicated += 1
+            self._stats.bytes_saved += os.path.getsize(path)
+            self._stats.write_seconds += time.perf_counter() - start
+          return
+      image = Image.fromarray(pixels)
+      if self.config.downscale > 1:
+        image = image.reduce(self.config.downscale)
+      pil_format = _FORMATS[self.config.image_format][0]
+      options = {}
+      if self.config.quality is not None:
+        options['quality'] = self.config.quality
+      # A new file rather than a write in place: path may be a hard link to
+      # screenshots that must keep their pixels.
+      temporary = f'{path}.{threading.get_ident()}.tmp'
+      try:
+        image.save(temporary, pil_format, **options)
+        os.replace(temporary, path)
+      finally:
+        if os.path.exists(temporary):
+          os.remove(temporary)
+      size = os.path.getsize(path)
+    except Exception:  # pylint: disable=broad-exception-caught
+      logging.exception('Failed to write screenshot %s.', path)
+      with self._lock:
+        self._stats.num_failed += 1
+      return
+    with self._lock:
+      self._stats.num_written += 1
+      self._stats.bytes_written += size
+      self._stats.write_seconds += time.perf_counter() - start
+
+  def flush(self, timeout: Optional[float] = None) -> bool:
+    """Waits until every submitted screenshot has been written.
+
+    Args:
+      timeout: Seconds to wait at most; None waits indefinitely.
+
+    Returns:
+      True if nothing is left pending.
+    """
+    with self._lock:
+      pending = list(self._pending)
+    _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+    return not not_done
+
+  def close(self) -> None:
+    """Flushes and stops the worker threads."""
+    self._closed = True
+    self._executor.shutdown(wait=True)
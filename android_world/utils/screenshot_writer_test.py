@@ -0,0 +1,277 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import threading
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.utils import screenshot_writer
+import numpy as np
+from PIL import Image
+
+
+class _BlockingScreenshot:
+  """Screenshot whose conversion waits until released."""
+
+  def __init__(self, pixels, release):
+    self._pixels = pixels
+    self._release = release
+
+  def __array__(self, dtype=None, copy=None):
+    del copy
+    self._release.wait()
+    return self._pixels.astype(dtype) if dtype else self._pixels
+
+
+def _pixels(height=64, width=48):
+  return np.random.default_rng(0).integers(
+      0, 256, size=(height, width, 3), dtype=np.uint8
+  )
+
+
+class ScreenshotWriterTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = tempfile.mkdtemp()
+
+  def _path(self, name):
+    return os.path.join(self.directory, name)
+
+  @parameterized.parameters(
+      ('jpeg', None, '.jpg', 'JPEG'),
+      ('jpeg', 40, '.jpg', 'JPEG'),
+      ('png', None, '.png', 'PNG'),
+      ('webp', 60, '.webp', 'WEBP'),
+  )
+  def test_writes_format(self, image_format, quality, extension, pil_format):
+    config = screenshot_writer.WriterConfig(
+        image_format=image_format, quality=quality
+    )
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      path = writer.submit(self._path('step'), _pixels())
+      self.assertTrue(writer.flush())
+
+    self.assertEqual(path, self._path('step' + extension))
+    with Image.open(path) as image:
+      self.assertEqual(image.format, pil_format)
+      self.assertEqual(image.size, (48, 64))
+
+  def test_png_is_lossless(self):
+    pixels = _pixels()
+    config = screenshot_writer.WriterConfig(image_format='png')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      path = writer.submit(self._path('step'), pixels)
+
+    with Image.open(path) as image:
+      np.testing.assert_array_equal(np.asarray(image), pixels)
+
+  def test_default_matches_synchronous_jpeg(self):
+    pixels = _pixels()
+    expected = self._path('expected.jpg')
+    Image.fromarray(pixels).save(expected, 'JPEG')
+
+    with screenshot_writer.ScreenshotWriter() as writer:
+      path = writer.submit(self._path('step'), pixels)
+
+    with open(path, 'rb') as written, open(expected, 'rb') as reference:
+      self.assertEqual(written.read(), reference.read())
+
+  def test_downscales(self):
+    config = screenshot_writer.WriterConfig(image_format='png', downscale=4)
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      path = writer.submit(self._path('step'), _pixels(65, 48))
+
+    with Image.open(path) as image:
+      self.assertEqual(image.size, (12, 17))
+
+  def test_converts_array_likes(self):
+    release = threading.Event()
+    release.set()
+    pixels = _pixels()
+    config = screenshot_writer.WriterConfig(image_format='png')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      path = writer.submit(
+          self._path('step'), _BlockingScreenshot(pixels, release)
+      )
+
+    with Image.open(path) as image:
+      np.testing.assert_array_equal(np.asarray(image), pixels)
+
+  def test_flush_waits_for_pending_writes(self):
+    release = threading.Event()
+    writer = screenshot_writer.ScreenshotWriter()
+    path = writer.submit(
+        self._path('step'), _BlockingScreenshot(_pixels(), release)
+    )
+
+    self.assertFalse(writer.flush(timeout=0.05))
+    self.assertFalse(os.path.exists(path))
+    release.set()
+    self.assertTrue(writer.flush())
+    self.assertTrue(os.path.exists(path))
+    writer.close()
+
+  def test_submit_blocks_when_queue_is_full(self):
+    release = threading.Event()
+    config = screenshot_writer.WriterConfig(num_workers=1, max_pending=2)
+    writer = screenshot_writer.ScreenshotWriter(config)
+    for index in range(2):
+      writer.submit(
+          self._path(f'step{index}'), _BlockingScreenshot(_pixels(), release)
+      )
+    submitted = threading.Event()
+
+    def submit_third():
+      writer.submit(self._path('step2'), _pixels())
+      submitted.set()
+
+    thread = threading.Thread(target=submit_third)
+    thread.start()
+    self.assertFalse(submitted.wait(0.1))
+    release.set()
+    thread.join()
+    writer.close()
+
+    self.assertTrue(submitted.is_set())
+    self.assertEqual(writer.stats.num_written, 3)
+    self.assertGreater(writer.stats.blocked_seconds, 0.05)
+
+  def test_counts_bytes_and_failures(self):
+    with screenshot_writer.ScreenshotWriter() as writer:
+      path = writer.submit(self._path('step'), _pixels())
+      writer.submit(self._path('missing/step'), _pixels())
+      writer.flush()
+      stats = writer.stats
+
+    self.assertEqual(stats.num_written, 1)
+    self.assertEqual(stats.num_failed, 1)
+    self.assertEqual(stats.bytes_written, os.path.getsize(path))
+    self.assertGreater(stats.write_seconds, 0)
+
+  def test_exact_dedup_links_identical_screenshots(self):
+    pixels = _pixels()
+    changed = pixels.copy()
+    changed[0, 0] ^= 1
+    config = screenshot_writer.WriterConfig(num_workers=1, dedup='exact')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      first = writer.submit(self._path('step1'), pixels)
+      writer.flush()
+      second = writer.submit(self._path('step2'), pixels.copy())
+      third = writer.submit(self._path('step3'), changed)
+      writer.flush()
+      stats = writer.stats
+
+    self.assertTrue(os.path.samefile(first, second))
+    self.assertFalse(os.path.samefile(first, third))
+    self.assertEqual(stats.num_written, 2)
+    self.assertEqual(stats.num_deduplicated, 1)
+    self.assertEqual(stats.bytes_saved, os.path.getsize(first))
+
+  def test_perceptual_dedup_links_near_duplicates(self):
+    pixels = np.full((64, 48, 3), 255, np.uint8)
+    pixels[10:40, 5:30] = (30, 60, 90)
+    near = pixels.copy()
+    near[0, 0] = 0
+    config = screenshot_writer.WriterConfig(dedup='perceptual')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      first = writer.submit(self._path('step1'), pixels)
+      writer.flush()
+      second = writer.submit(self._path('step2'), near)
+
+    self.assertTrue(os.path.samefile(first, second))
+
+  def test_dedup_overwrites_existing_file(self):
+    pixels = _pixels()
+    with open(self._path('step2.jpg'), 'w') as f:
+      f.write('stale')
+    config = screenshot_writer.WriterConfig(dedup='exact')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      first = writer.submit(self._path('step1'), pixels)
+      writer.flush()
+      second = writer.submit(self._path('step2'), pixels)
+
+    self.assertTrue(os.path.samefile(first, second))
+    self.assertCountEqual(
+        os.listdir(self.directory), ['step1.jpg', 'step2.jpg']
+    )
+
+  def test_dedup_rewrite_does_not_change_linked_files(self):
+    first = _pixels()
+    second = first.copy()
+    second[0, 0] ^= 1
+    config = screenshot_writer.WriterConfig(
+        image_format='png', num_workers=1, dedup='exact'
+    )
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      step1 = writer.submit(self._path('step1'), first)
+      writer.flush()
+      step2 = writer.submit(self._path('step2'), first)
+      writer.flush()
+      writer.submit(self._path('step1'), second)
+      writer.flush()
+      step3 = writer.submit(self._path('step3'), first)
+      writer.flush()
+
+    def read(path):
+      with Image.open(path) as image:
+        return np.asarray(image)
+
+    np.testing.assert_array_equal(read(step1), second)
+    np.testing.assert_array_equal(read(step2), first)
+    np.testing.assert_array_equal(read(step3), first)
+    self.assertTrue(os.path.samefile(step2, step3))
+    self.assertCountEqual(
+        os.listdir(self.directory), ['step1.png', 'step2.png', 'step3.png']
+    )
+
+  def test_dedup_writes_copy_when_original_is_missing(self):
+    pixels = _pixels()
+    config = screenshot_writer.WriterConfig(dedup='exact')
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+      first = writer.submit(self._path('step1'), pixels)
+      writer.flush()
+      os.remove(first)
+      second = writer.submit(self._path('step2'), pixels)
+      writer.flush()
+      stats = writer.stats
+
+    self.assertTrue(os.path.exists(second))
+    self.assertEqual(stats.num_written, 2)
+    self.assertEqual(stats.num_deduplicated, 0)
+
+  def test_rejects_submit_after_close(self):
+    writer = screenshot_writer.ScreenshotWriter()
+    writer.close()
+
+    with self.assertRaises(RuntimeError):
+      writer.submit(self._path('step'), _pixels())
+
+  @parameterized.parameters(
+      dict(image_format='gif'),
+      dict(image_format='png', quality=80),
+      dict(quality=0),
+      dict(downscale=0),
+      dict(num_workers=0),
+      dict(max_pending=0),
+      dict(dedup='fuzzy'),
+  )
+  def test_rejects_invalid_config(self, **kwargs):
+    with self.assertRaises(ValueError):
+      screenshot_writer.WriterConfig(**kwargs)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,184 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A simulated device for testing actuation waits without an emulator.
+
+A SimulatedDevice answers the adb requests actuation issues and UI tree reads,
+with the delays of a device: a tap focuses the text field under it, and shows
+the keyboard, focus_seconds later; HOME brings the launcher to the front
+home_seconds later. Typed text goes into the focused field, or is lost if no
+field has focus yet, so a test can tell whether a wait was long enough.
+Every adb request and tree read costs virtual time on a
+simulated_screen.VirtualClock.
+"""
+
+import dataclasses
+import shlex
+from typing import Optional, Sequence
+
+from android_env.proto import adb_pb2
+from android_world.env import representation_utils
+from android_world.utils import simulated_screen
+
+APP_ACTIVITY = 'com.example.notes/.MainActivity'
+HOME_ACTIVITY = 'com.google.android.apps.nexuslauncher/.NexusLauncherActivity'
+
+
+def text_field(
+    x_min: int, y_min: int, x_max: int, y_max: int, text: str = ''
+) -> representation_utils.UIElement:
+  """Returns an editable, unfocused element with the given box."""
+  return representation_utils.UIElement(
+      text=text,
+      class_name='android.widget.EditText',
+      bbox_pixels=representation_utils.BoundingBox(x_min, x_max, y_min, y_max),
+      is_editable=True,
+      is_focused=False,
+      is_clickable=True,
+  )
+
+
+class SimulatedDevice:
+  """Device whose screen reacts to taps and buttons after fixed delays."""
+
+  def __init__(
+      self,
+      clock: simulated_screen.VirtualClock,
+      elements: Sequence[representation_utils.UIElement],
+      focus_seconds: float = 0.3,
+      home_seconds: float = 0.4,
+      adb_seconds: float = 0.03,
+      tree_seconds: float = 0.1,
+      reports_keyboard: bool = True,
+  ):
+    """Initializes the device showing elements in APP_ACTIVITY.
+
+    Args:
+      clock: The clock the code under test uses.
+      elements: UI elements on screen; taps focus the editable ones.
+      focus_seconds: Time from a tap until the field under it has focus.
+      home_seconds: Time from pressing HOME until the launcher is in front.
+      adb_seconds: Virtual time one adb request takes.
+      tree_seconds: Virtual time one UI tree read takes.
+      reports_keyboard: Whether `dumpsys input_method` shows the keyboard
+        state.
+    """
+    self._clock = clock
+    self._elements = list(elements)
+    self._focus_seconds = focus_seconds
+    self._home_seconds = home_seconds
+    self._adb_seconds = adb_seconds
+    self._tree_seconds = tree_seconds
+    self._reports_keyboard = reports_keyboard
+    self._scheduled: list[tuple[float, str, Optional[int]]] = []
+    self._focused: Optional[int] = None
+    self.activity = APP_ACTIVITY
+    self.keyboard_shown = False
+    self.typed: dict[int, str] = {}
+    self.lost_text = ''
+    self.num_adb_requests = 0
+    self.num_tree_reads = 0
+
+  @property
+  def focused(self) -> Optional[int]:
+    """Index of the focused element, if any."""
+    self._apply_due()
+    return self._focused
+
+  def _schedule(self, delay: float, event: str, index: Optional[int] = None):
+    self._scheduled.append((self._clock.time() + delay, event, index))
+    self._scheduled.sort(key=lambda scheduled: scheduled[0])
+
+  def _apply_due(self) -> None:
+    now = self._clock.time()
+    while self._scheduled and self._scheduled[0][0] <= now:
+      _, event, index = self._scheduled.pop(0)
+      if event == 'focus':
+        self._focused = index
+        self.keyboard_shown = True
+      elif event == 'home':
+        self.activity = HOME_ACTIVITY
+        self._focused = None
+        self.keyboard_shown = False
+
+  def _type(self, text: str) -> None:
+    if self._focused is None:
+      self.lost_text += text
+    else:
+      self.typed[self._focused] = self.typed.get(self._focused, '') + text
+
+  def _tap(self, x: float, y: float) -> None:
+    for index, element in enumerate(self._elements):
+      box = element.bbox_pixels
+      if (
+          element.is_editable
+          and box is not None
+          and box.x_min <= x <= box.x_max
+          and box.y_min <= y <= box.y_max
+      ):
+        self._schedule(self._focus_seconds, 'focus', index)
+        return
+
+  def _shell(self, command: str) -> bytes:
+    output = b''
+    for part in command.split(' && '):
+      args = shlex.split(part)
+      if args[:2] == ['input', 'text']:
+        self._type(args[2].replace('%s', ' '))
+      elif args[:2] == ['input', 'keyevent'] and args[2] == 'KEYCODE_ENTER':
+        self._type('\n')
+      elif args[:2] == ['dumpsys', 'input_method']:
+        if self._reports_keyboard:
+          shown = 'true' if self.keyboard_shown else 'false'
+          output += f'  mInputShown={shown}\n'.encode()
+      elif args[:3] == ['cmd', 'package', 'resolve-activity']:
+        output += f'priority=0 isDefault=true\n{HOME_ACTIVITY}\n'.encode()
+    return output
+
+  def execute_adb_call(
+      self, request: adb_pb2.AdbRequest
+  ) -> adb_pb2.AdbResponse:
+    """Applies an adb request and returns its response."""
+    self._clock.sleep(self._adb_seconds)
+    self._apply_due()
+    self.num_adb_requests += 1
+    response = adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+    if request.HasField('tap'):
+      self._tap(request.tap.x, request.tap.y)
+    elif request.HasField('press_button'):
+      button = request.press_button.button
+      if button == adb_pb2.AdbRequest.PressButton.HOME:
+        self._schedule(self._home_seconds, 'home')
+      elif button == adb_pb2.AdbRequest.PressButton.ENTER:
+        self._type('\n')
+    elif request.HasField('input_text'):
+      self._type(request.input_text.text.replace('%s', ' '))
+    elif request.HasField('get_current_activity'):
+      response.get_current_activity.full_activity = self.activity
+    elif request.HasField('generic'):
+      args = list(request.generic.args)
+      if args and args[0] == 'shell':
+        response.generic.output = self._shell(' '.join(args[1:]))
+    return response
+
+  def get_ui_elements(self) -> list[representation_utils.UIElement]:
+    """Returns the elements on screen, with the focused one marked."""
+    self._clock.sleep(self._tree_seconds)
+    self._apply_due()
+    self.num_tree_reads += 1
+    if self.activity != APP_ACTIVITY:
+      return []
+    return [
+        dataclasses.replace(element, is_focused=index == self._focused)
+        for index, element in enumerate(self._elements)
+    ]
@@ -0,0 +1,90 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for simulated_device."""
+
+from absl.testing import absltest
+from android_world.env import adb_utils
+from android_world.utils import simulated_device
+from android_world.utils import simulated_screen
+
+
+class SimulatedDeviceTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.clock = simulated_screen.VirtualClock()
+    self.device = simulated_device.SimulatedDevice(
+        self.clock,
+        [simulated_device.text_field(0, 0, 100, 50)],
+        focus_seconds=0.5,
+        home_seconds=0.5,
+        adb_seconds=0.01,
+        tree_seconds=0.1,
+    )
+
+  def test_tap_focuses_field_after_delay(self):
+    adb_utils.tap_screen(10, 10, self.device)
+
+    self.assertIsNone(self.device.focused)
+    self.assertFalse(self.device.get_ui_elements()[0].is_focused)
+    self.clock.sleep(0.5)
+    self.assertTrue(self.device.get_ui_elements()[0].is_focused)
+    self.assertTrue(self.device.keyboard_shown)
+
+  def test_tap_outside_fields_focuses_nothing(self):
+    adb_utils.tap_screen(500, 500, self.device)
+    self.clock.sleep(1.0)
+
+    self.assertIsNone(self.device.focused)
+
+  def test_typing_goes_to_focused_field_or_is_lost(self):
+    adb_utils.type_text('early', self.device)
+    adb_utils.tap_screen(10, 10, self.device)
+    self.clock.sleep(0.5)
+    adb_utils.type_text("it's late\nnow", self.device)
+    adb_utils.type_text('words', self.device, bulk=False)
+
+    self.assertEqual(self.device.lost_text, 'early')
+    self.assertEqual(self.device.typed, {0: "it's late\nnowwords"})
+
+  def test_home_shows_launcher_after_delay(self):
+    adb_utils.press_home_button(self.device)
+
+    self.assertEqual(
+        adb_utils.get_current_activity(self.device)[0],
+        simulated_device.APP_ACTIVITY,
+    )
+    self.clock.sleep(0.5)
+    self.assertEqual(
+        adb_utils.get_current_activity(self.device)[0],
+        simulated_device.HOME_ACTIVITY,
+    )
+    self.assertEqual(self.device.get_ui_elements(), [])
+    self.assertEqual(
+        adb_utils.get_home_activity(self.device),
+        simulated_device.HOME_ACTIVITY,
+    )
+
+  def test_requests_cost_time(self):
+    adb_utils.is_keyboard_shown(self.device)
+    self.device.get_ui_elements()
+
+    self.assertAlmostEqual(self.clock.time(), 0.11)
+    self.assertEqual(self.device.num_adb_requests, 1)
+    self.assertEqual(self.device.num_tree_reads, 1)
+
+
+if __name__ == '__main__':
+  absltest.main()
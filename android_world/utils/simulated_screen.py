@@ -0,0 +1,131 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Simulated screens for testing UI stabilization without a device.
+
+A SimulatedScreen replays one transition: after an action its content
+changes at scheduled times, then stays put. Time is a VirtualClock that
+sleeping advances, so waits of seconds run instantly and exactly. Fetching
+the screen costs fetch_seconds of virtual time, like a device round trip.
+
+random_transition draws change schedules that look like app transitions: a
+burst of quick changes (animations, lists filling in) with an occasional
+longer pause (a network load) before the final content appears.
+"""
+
+import random
+from typing import Sequence
+
+
+class VirtualClock:
+  """Clock that only advances when slept on."""
+
+  def __init__(self, now: float = 0.0):
+    self.now = now
+
+  def time(self) -> float:
+    return self.now
+
+  def sleep(self, seconds: float) -> None:
+    if seconds < 0:
+      raise ValueError(f'Cannot sleep for {seconds} seconds.')
+    self.now += seconds
+
+
+class SimulatedScreen:
+  """Screen whose content changes at fixed times after an action."""
+
+  def __init__(
+      self,
+      clock: VirtualClock,
+      change_times: Sequence[float],
+      fetch_seconds: float = 0.0,
+      event_delay: float = 0.0,
+      event_times: Sequence[float] = (),
+  ):
+    """Starts a transition at the clock's current time.
+
+    Args:
+      clock: The clock the stabilizer under test uses.
+      change_times: Seconds after now at which the content changes.
+      fetch_seconds: Virtual time one fetch takes.
+      event_delay: Seconds after a change or event until its accessibility
+        event is seen.
+      event_times: Seconds after now of accessibility events that do not
+        change the content, e.g. from a progress indicator.
+    """
+    self._clock = clock
+    self._start = clock.time()
+    self._change_times = sorted(change_times)
+    self._fetch_seconds = fetch_seconds
+    self._event_delay = event_delay
+    self._event_times = sorted([*change_times, *event_times])
+    self.num_fetches = 0
+
+  @property
+  def settled_at(self) -> float:
+    """Clock time of the last change."""
+    return self._start + (self._change_times[-1] if self._change_times else 0)
+
+  def _elapsed(self) -> float:
+    return self._clock.time() - self._start
+
+  def content(self) -> int:
+    """Number of changes that happened so far; identifies the content."""
+    elapsed = self._elapsed()
+    return sum(change <= elapsed for change in self._change_times)
+
+  def fetch(self) -> int:
+    """Returns the content after spending fetch_seconds on the round trip."""
+    self.num_fetches += 1
+    self._clock.sleep(self._fetch_seconds)
+    return self.content()
+
+  def last_event_time(self) -> float | None:
+    """Clock time of the latest accessibility event seen, if any."""
+    elapsed = self._elapsed()
+    seen = [
+        event
+        for event in self._event_times
+        if event + self._event_delay <= elapsed
+    ]
+    if not seen:
+      return None
+    return self._start + seen[-1] + self._event_delay
+
+
+def random_transition(
+    rng: random.Random,
+    max_changes: int = 6,
+    burst_gap: float = 0.08,
+    pause_probability: float = 0.15,
+    max_pause: float = 1.5,
+) -> list[float]:
+  """Returns the change times of a random transition.
+
+  Args:
+    rng: Source of randomness.
+    max_changes: Upper bound on the number of changes.
+    burst_gap: Mean gap between consecutive changes of a burst, in seconds.
+    pause_probability: Chance that a gap is a pause instead.
+    max_pause: Longest pause, in seconds.
+  """
+  times = []
+  now = 0.0
+  for _ in range(rng.randint(1, max_changes)):
+    if times and rng.random() < pause_probability:
+      now += rng.uniform(0.2, max_pause)
+    else:
+      now += rng.expovariate(1 / burst_gap)
+    times.append(now)
+  return times
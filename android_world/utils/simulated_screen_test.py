@@ -0,0 +1,62 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+
+from absl.testing import absltest
+from android_world.utils import simulated_screen
+
+
+class SimulatedScreenTest(absltest.TestCase):
+
+  def test_content_follows_change_times(self):
+    clock = simulated_screen.VirtualClock(10.0)
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.45, 0.15], fetch_seconds=0.1
+    )
+
+    contents = []
+    for _ in range(6):
+      contents.append(screen.fetch())
+
+    self.assertEqual(contents, [0, 1, 1, 1, 2, 2])
+    self.assertEqual(screen.num_fetches, 6)
+    self.assertAlmostEqual(screen.settled_at, 10.45)
+
+  def test_last_event_time(self):
+    clock = simulated_screen.VirtualClock()
+    screen = simulated_screen.SimulatedScreen(
+        clock, [0.2], event_delay=0.1, event_times=[0.5]
+    )
+
+    self.assertIsNone(screen.last_event_time())
+    clock.sleep(0.35)
+    self.assertAlmostEqual(screen.last_event_time(), 0.3)
+    clock.sleep(1.0)
+    self.assertAlmostEqual(screen.last_event_time(), 0.6)
+
+  def test_clock_rejects_negative_sleep(self):
+    with self.assertRaises(ValueError):
+      simulated_screen.VirtualClock().sleep(-1)
+
+  def test_random_transition_is_increasing(self):
+    rng = random.Random(0)
+    for _ in range(50):
+      times = simulated_screen.random_transition(rng, max_changes=4)
+      self.assertBetween(len(times), 1, 4)
+      self.assertEqual(times, sorted(times))
+      self.assertGreater(times[0], 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
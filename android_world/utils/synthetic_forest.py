@@ -0,0 +1,354 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Generates synthetic accessibility forests for tests and benchmarks.
+
+The forests mimic what the a11y forwarder returns for ordinary app screens:
+nested layouts whose bounds subdivide their parent, leaves that are text,
+buttons, check boxes or edit fields, and a few scrollable containers. Node
+unique ids are their index within the window, children always follow their
+parent, and the tree stays shallow even at 10k nodes.
+
+`forest_to_xml_dump` renders a forest's application window in the format of
+`uiautomator dump`, for the XML fallback path.
+"""
+
+import random
+from xml.sax import saxutils
+
+from android_env.proto.a11y import android_accessibility_forest_pb2
+from android_env.proto.a11y import android_accessibility_node_info_pb2
+from android_env.proto.a11y import android_accessibility_window_info_pb2
+
+_WORDS = (
+    'Settings', 'Network', 'Wi-Fi', 'Bluetooth', 'Battery', 'Display',
+    'Sound', 'Storage', 'Apps', 'Connected', 'Off', 'On', 'Today', 'Inbox',
+    'Search', 'Contacts', 'Calendar', 'Save', 'Cancel', 'Delete', '42%',
+    'Alarm', 'Recipes', 'Notes', 'Open', 'Share', 'More options', 'Back',
+)
+_CONTAINER_CLASSES = (
+    'android.widget.LinearLayout',
+    'android.widget.FrameLayout',
+    'android.view.ViewGroup',
+    'android.widget.RelativeLayout',
+)
+_SCROLLABLE_CLASS = 'androidx.recyclerview.widget.RecyclerView'
+_LEAF_KINDS = (
+    # (class name, weight)
+    ('android.widget.TextView', 6),
+    ('android.widget.Button', 2),
+    ('android.widget.ImageView', 2),
+    ('android.widget.ImageButton', 1),
+    ('android.widget.CheckBox', 1),
+    ('android.widget.Switch', 1),
+    ('android.widget.EditText', 1),
+)
+_KEYBOARD_PACKAGE = 'com.google.android.inputmethod.latin'
+
+
+def _phrase(rng: random.Random, max_words: int = 3) -> str:
+  return ' '.join(rng.sample(_WORDS, rng.randint(1, max_words)))
+
+
+def _split_bounds(
+    rng: random.Random,
+    bounds: tuple[int, int, int, int],
+    num_parts: int,
+    vertical: bool,
+) -> list[tuple[int, int, int, int]]:
+  """Splits (left, top, right, bottom) into num_parts adjacent rectangles."""
+  left, top, right, bottom = bounds
+  start, end = (top, bottom) if vertical else (left, right)
+  cuts = sorted(rng.randint(start, end) for _ in range(num_parts - 1))
+  edges = [start] + cuts + [end]
+  parts = []
+  for lo, hi in zip(edges, edges[1:]):
+    if vertical:
+      parts.append((left, lo, right, hi))
+    else:
+      parts.append((lo, top, hi, bottom))
+  return parts
+
+
+def _fill_leaf(
+    rng: random.Random,
+    node: android_accessibility_node_info_pb2.AndroidAccessibilityNodeInfo,
+) -> None:
+  """Assigns a leaf widget type and the matching text and flags."""
+  classes, weights = zip(*_LEAF_KINDS)
+  class_name = rng.choices(classes, weights)[0]
+  node.class_name = class_name
+  if class_name == 'android.widget.TextView':
+    node.text = _phrase(rng)
+    node.is_clickable = rng.random() < 0.2
+  elif class_name in ('android.widget.ImageView', 'android.widget.ImageButton'):
+    if rng.random() < 0.7:
+      node.content_description = _phrase(rng, max_words=2)
+    node.is_clickable = class_name == 'android.widget.ImageButton'
+  elif class_name in ('android.widget.CheckBox', 'android.widget.Switch'):
+    node.text = _phrase(rng)
+    node.is_checkable = True
+    node.is_checked = rng.random() < 0.5
+    node.is_clickable = True
+  elif class_name == 'android.widget.EditText':
+    node.is_editable = True
+    node.is_clickable = True
+    node.is_focusable = True
+    if rng.random() < 0.5:
+      node.text = _phrase(rng)
+    else:
+      node.hint_text = _phrase(rng, max_words=2)
+  else:
+    node.text = _phrase(rng, max_words=2)
+    node.is_clickable = True
+  node.is_long_clickable = node.is_clickable and rng.random() < 0.1
+
+
+def _add_window_tree(
+    rng: random.Random,
+    window: android_accessibility_window_info_pb2.AndroidAccessibilityWindowInfo,
+    num_nodes: int,
+    package_name: str,
+    bounds: tuple[int, int, int, int],
+    max_children: int,
+    invisible_fraction: float,
+    disabled_fraction: float = 0.0,
+    hidden_subtree_fraction: float = 0.0,
+    depth_first: bool = False,
+) -> None:
+  """Fills the window's tree with num_nodes nodes.
+
+  Parents are expanded breadth-first, or depth-first (first child first) if
+  depth_first is set, until all nodes have been created.
+  """
+  nodes = []
+  node_bounds = []
+  node_depth = []
+  next_parent = 0
+  unexpanded = []
+  while len(nodes) < num_nodes:
+    if not nodes:
+      parent_index, count = None, 1
+    else:
+      if depth_first:
+        parent_index = unexpanded.pop()
+      else:
+        parent_index = next_parent
+        next_parent += 1
+      count = min(rng.randint(1, max_children), num_nodes - len(nodes))
+    if parent_index is None:
+      child_bounds = [bounds]
+      depth = 0
+    else:
+      child_bounds = _split_bounds(
+          rng, node_bounds[parent_index], count,
+          vertical=node_depth[parent_index] % 2 == 0)
+      depth = node_depth[parent_index] + 1
+    for rect in child_bounds:
+      node = window.tree.nodes.add()
+      node.unique_id = len(nodes)
+      node.window_id = window.id
+      node.package_name = package_name
+      node.depth = depth
+      node.drawing_order = len(nodes)
+      # Only draw when requested so existing seeds keep their forests.
+      node.is_enabled = not (
+          disabled_fraction and rng.random() < disabled_fraction
+      )
+      node.is_visible_to_user = rng.random() >= invisible_fraction
+      (node.bounds_in_screen.left, node.bounds_in_screen.top,
+       node.bounds_in_screen.right, node.bounds_in_screen.bottom) = rect
+      if parent_index is not None:
+        nodes[parent_index].child_ids.append(node.unique_id)
+      nodes.append(node)
+      node_bounds.append(rect)
+      node_depth.append(depth)
+    if depth_first:
+      unexpanded.extend(
+          reversed(range(len(nodes) - len(child_bounds), len(nodes)))
+      )
+
+  if hidden_subtree_fraction:
+    # Parents precede their children, so hiding propagates in one pass.
+    hidden = set()
+    for node in nodes:
+      if node.unique_id in hidden or (
+          node.child_ids and rng.random() < hidden_subtree_fraction
+      ):
+        node.is_visible_to_user = False
+        hidden.update(node.child_ids)
+
+  for node in nodes:
+    if node.child_ids:
+      if rng.random() < 0.05:
+        node.class_name = _SCROLLABLE_CLASS
+        node.is_scrollable = True
+      else:
+        node.class_name = rng.choice(_CONTAINER_CLASSES)
+        node.is_clickable = rng.random() < 0.15
+      if rng.random() < 0.05:
+        node.content_description = _phrase(rng, max_words=2)
+    else:
+      _fill_leaf(rng, node)
+    if rng.random() < 0.4:
+      node.view_id_resource_name = (
+          f'{package_name}:id/{node.class_name.rsplit(".", 1)[-1].lower()}'
+          f'_{node.unique_id}'
+      )
+
+
+def generate_forest(
+    num_nodes: int,
+    seed: int = 0,
+    num_windows: int = 1,
+    screen_size: tuple[int, int] = (1080, 2400),
+    max_children: int = 6,
+    invisible_fraction: float = 0.05,
+    include_keyboard: bool = False,
+    disabled_fraction: float = 0.0,
+    hidden_subtree_fraction: float = 0.0,
+    depth_first: bool = False,
+) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
+  """Generates a synthetic forest.
+
+  Args:
+    num_nodes: Total number of nodes across the application windows.
+    seed: Seed for the random generator; equal seeds give equal forests.
+    num_windows: Number of application windows. The first one receives most
+      of the nodes, the rest behave like small system bars.
+    screen_size: Screen (width, height) in pixels.
+    max_children: Maximum number of children of a container.
+    invisible_fraction: Probability that a node is not visible to the user.
+    include_keyboard: Whether to add an input-method window on top.
+    disabled_fraction: Probability that an application node is disabled.
+    hidden_subtree_fraction: Probability that a container is hidden together
+      with its whole subtree, like a collapsed drawer or an off-screen page.
+    depth_first: Whether to expand containers depth-first, which gives the
+      deep, narrow hierarchies of nested layouts.
+
+  Returns:
+    The generated forest.
+  """
+  if num_nodes < num_windows:
+    raise ValueError('Need at least one node per window.')
+  rng = random.Random(seed)
+  width, height = screen_size
+  forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+
+  small = max(1, num_nodes // 20)
+  sizes = [small] * (num_windows - 1)
+  sizes.insert(0, num_nodes - sum(sizes))
+  for index, size in enumerate(sizes):
+    window = forest.windows.add()
+    window.id = index
+    window.layer = num_windows - index
+    if index == 0:
+      window.window_type = window.TYPE_APPLICATION
+      package_name = 'com.example.app'
+      bounds = (0, 0, width, height)
+    else:
+      window.window_type = window.TYPE_SYSTEM
+      package_name = 'com.android.systemui'
+      bounds = (0, 0, width, height // 30)
+    (window.bounds_in_screen.left, window.bounds_in_screen.top,
+     window.bounds_in_screen.right, window.bounds_in_screen.bottom) = bounds
+    _add_window_tree(rng, window, size, package_name, bounds, max_children,
+                     invisible_fraction, disabled_fraction,
+                     hidden_subtree_fraction, depth_first)
+
+  if include_keyboard:
+    window = forest.windows.add()
+    window.id = num_windows
+    window.window_type = window.TYPE_INPUT_METHOD
+    bounds = (0, height * 2 // 3, width, height)
+    _add_window_tree(rng, window, 40, _KEYBOARD_PACKAGE, bounds, max_children,
+                     invisible_fraction=0.0)
+  return forest
+
+
+_XML_ENTITIES = {'"': '&quot;'}
+
+
+def _xml_flag(value: bool) -> str:
+  return 'true' if value else 'false'
+
+
+def _xml_node(
+    nodes: list[android_accessibility_node_info_pb2.AndroidAccessibilityNodeInfo],
+    node_id: int,
+    index: int,
+    depth: int,
+    lines: list[str],
+) -> None:
+  """Appends the XML of a node and its subtree, one element per line."""
+  node = nodes[node_id]
+  bounds = node.bounds_in_screen
+  attributes = [
+      ('index', str(index)),
+      ('text', node.text),
+      ('resource-id', node.view_id_resource_name),
+      ('class', node.class_name),
+      ('package', node.package_name),
+      ('content-desc', node.content_description),
+      ('checkable', _xml_flag(node.is_checkable)),
+      ('checked', _xml_flag(node.is_checked)),
+      ('clickable', _xml_flag(node.is_clickable)),
+      ('enabled', _xml_flag(node.is_enabled)),
+      ('focusable', _xml_flag(node.is_focusable)),
+      ('focused', _xml_flag(node.is_focused)),
+      ('scrollable', _xml_flag(node.is_scrollable)),
+      ('long-clickable', _xml_flag(node.is_long_clickable)),
+      ('password', 'false'),
+      ('selected', _xml_flag(node.is_selected)),
+      ('bounds',
+       f'[{bounds.left},{bounds.top}][{bounds.right},{bounds.bottom}]'),
+  ]
+  rendered = ' '.join(
+      f'{name}="{saxutils.escape(value, _XML_ENTITIES)}"'
+      for name, value in attributes
+  )
+  indent = '  ' * depth
+  if not node.child_ids:
+    lines.append(f'{indent}<node {rendered} />')
+    return
+  lines.append(f'{indent}<node {rendered}>')
+  for child_index, child_id in enumerate(node.child_ids):
+    _xml_node(nodes, child_id, child_index, depth + 1, lines)
+  lines.append(f'{indent}</node>')
+
+
+def forest_to_xml_dump(
+    forest: android_accessibility_forest_pb2.AndroidAccessibilityForest,
+    rotation: int = 0,
+) -> str:
+  """Renders the first window of a forest like `uiautomator dump` does.
+
+  Only the tree of the first window is rendered, as uiautomator only dumps
+  the active window. Node unique ids must be their index in the window.
+
+  Args:
+    forest: A forest, typically from `generate_forest`.
+    rotation: Value of the rotation attribute of the hierarchy.
+
+  Returns:
+    The XML dump.
+  """
+  lines = [
+      "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>",
+      f'<hierarchy rotation="{rotation}">',
+  ]
+  nodes = list(forest.windows[0].tree.nodes)
+  if nodes:
+    _xml_node(nodes, 0, 0, 1, lines)
+  lines.append('</hierarchy>')
+  return '\n'.join(lines)
@@ -0,0 +1,134 @@
+# Copyright 2024 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.env import representation_utils
+from android_world.utils import synthetic_forest
+import xml.etree.ElementTree as ET
+
+
+class SyntheticForestTest(parameterized.TestCase):
+
+  @parameterized.parameters(1, 50, 10_000)
+  def test_node_count(self, num_nodes):
+    forest = synthetic_forest.generate_forest(num_nodes)
+
+    self.assertEqual(
+        sum(len(window.tree.nodes) for window in forest.windows), num_nodes
+    )
+
+  def test_is_deterministic(self):
+    self.assertEqual(
+        synthetic_forest.generate_forest(200, seed=3),
+        synthetic_forest.generate_forest(200, seed=3),
+    )
+    self.assertNotEqual(
+        synthetic_forest.generate_forest(200, seed=3),
+        synthetic_forest.generate_forest(200, seed=4),
+    )
+
+  def test_disabled_fraction(self):
+    default = synthetic_forest.generate_forest(400, seed=5)
+    disabled = synthetic_forest.generate_forest(
+        400, seed=5, disabled_fraction=0.3
+    )
+
+    self.assertTrue(
+        all(node.is_enabled for node in default.windows[0].tree.nodes)
+    )
+    self.assertTrue(
+        any(not node.is_enabled for node in disabled.windows[0].tree.nodes)
+    )
+
+  def test_depth_first(self):
+    breadth_first = synthetic_forest.generate_forest(500, seed=2)
+    depth_first = synthetic_forest.generate_forest(
+        500, seed=2, depth_first=True
+    )
+
+    max_depth = lambda forest: max(
+        node.depth for node in forest.windows[0].tree.nodes
+    )
+    self.assertGreater(max_depth(depth_first), 5 * max_depth(breadth_first))
+    nodes = depth_first.windows[0].tree.nodes
+    for position, node in enumerate(nodes):
+      for child_id in node.child_ids:
+        self.assertGreater(child_id, position)
+        self.assertEqual(nodes[child_id].depth, node.depth + 1)
+
+  def test_hidden_subtrees(self):
+    forest = synthetic_forest.generate_forest(
+        500, invisible_fraction=0.0, hidden_subtree_fraction=0.2
+    )
+
+    nodes = forest.windows[0].tree.nodes
+    self.assertTrue(any(not node.is_visible_to_user for node in nodes))
+    for node in nodes:
+      if not node.is_visible_to_user:
+        for child_id in node.child_ids:
+          self.assertFalse(nodes[child_id].is_visible_to_user)
+
+  def test_tree_structure(self):
+    forest = synthetic_forest.generate_forest(
+        500, num_windows=2, include_keyboard=True
+    )
+
+    self.assertLen(forest.windows, 3)
+    for window in forest.windows:
+      nodes = window.tree.nodes
+      parents = {}
+      for index, node in enumerate(nodes):
+        self.assertEqual(node.unique_id, index)
+        for child_id in node.child_ids:
+          self.assertGreater(child_id, node.unique_id)
+          self.assertNotIn(child_id, parents)
+          parents[child_id] = node.unique_id
+          child_bounds = nodes[child_id].bounds_in_screen
+          self.assertGreaterEqual(child_bounds.left, node.bounds_in_screen.left)
+          self.assertLessEqual(
+              child_bounds.bottom, node.bounds_in_screen.bottom
+          )
+      self.assertLen(parents, len(nodes) - 1)
+    self.assertIn(
+        'inputmethod', forest.windows[-1].tree.nodes[0].package_name
+    )
+
+  def test_has_ui_elements(self):
+    forest = synthetic_forest.generate_forest(300)
+
+    elements = representation_utils.forest_to_ui_elements(forest)
+
+    self.assertTrue(any(element.is_clickable for element in elements))
+    self.assertTrue(any(element.is_editable for element in elements))
+    self.assertTrue(any(element.text for element in elements))
+
+
+  def test_xml_dump(self):
+    forest = synthetic_forest.generate_forest(120, num_windows=2)
+    forest.windows[0].tree.nodes[1].text = 'Tom & "Jerry" <3'
+
+    root = ET.fromstring(synthetic_forest.forest_to_xml_dump(forest))
+
+    self.assertEqual(root.tag, 'hierarchy')
+    nodes = list(root.iter('node'))
+    self.assertLen(nodes, len(forest.windows[0].tree.nodes))
+    self.assertEqual(nodes[1].get('text'), 'Tom & "Jerry" <3')
+    bounds = forest.windows[0].tree.nodes[0].bounds_in_screen
+    self.assertEqual(
+        nodes[0].get('bounds'),
+        f'[{bounds.left},{bounds.top}][{bounds.right},{bounds.bottom}]',
+    )
+
+if __name__ == '__main__':
+  absltest.main()
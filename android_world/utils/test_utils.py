@@ -233,8 +233,12 @@ class FakeAsyncEnv(interface.AsyncAndroidEnv):
         ui_elements=[],
     )
 
-  def execute_action(self, action: json_action.JSONAction):
-    del action
+  def execute_action(
+      self,
+      action: json_action.JSONAction,
+      state: interface.State | None = None,
+  ):
+    del action, state
 
   def run_adb_command(self, command: str) -> adb_pb2.AdbResponse:
     del command
@@ -0,0 +1,143 @@
+"""Replays recorded steps through the action pruning rules.
+
+Each step's candidates are extracted as VDroidAgent does and pruned. The
+report compares the verifier calls saved against the ground-truth actions
+that pruning would have lost, overall and per rule.
+
+Ground truth comes from the `steps.jsonl` file of a recorded corpus (see
+android_world.utils.forest_corpus). Without a corpus, synthetic screens with
+some disabled elements are used and the ground truth is a uniformly random
+candidate, which only gives a random baseline for the loss rate.
+
+Usage:
+    python -m benchmarks.action_pruning_eval --corpus_dir=/tmp/forests
+    python -m benchmarks.action_pruning_eval --rules=rules.json
+"""
+
+import collections
+import json
+import math
+import random
+
+from absl import app
+from absl import flags
+from android_world.agents import action_pruning
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation.html_representation import extract_actions_with_display_id_v2
+
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Recorded corpus with a steps.jsonl; synthetic if unset.')
+_RULES = flags.DEFINE_string(
+    'rules', None, 'JSON rules file; the default rules if unset.')
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 200, 'Synthetic steps.')
+_NUM_NODES = flags.DEFINE_integer('num_nodes', 300, 'Nodes per synthetic screen.')
+_DISABLED_FRACTION = flags.DEFINE_float(
+    'disabled_fraction', 0.1, 'Share of disabled synthetic nodes.')
+_NUM_ACTORS = flags.DEFINE_integer(
+    'num_actors', 2, 'Size of the first verifier batch, as in VDroidAgent.')
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 16, 'Verifier batch size.')
+
+
+def _action_key(action):
+    """Identifies an action up to the free text filled in after scoring."""
+    return (action.get('action_type'), action.get('index'),
+            action.get('direction'))
+
+
+def _num_batches(num_candidates):
+    """Verifier batches VDroidAgent.score_by_batch sends for a candidate list."""
+    rest = max(0, num_candidates - _NUM_ACTORS.value)
+    return 1 + math.ceil(rest / _BATCH_SIZE.value)
+
+
+def _synthetic_steps():
+    rng = random.Random(0)
+    for seed in range(_NUM_STEPS.value):
+        forest = synthetic_forest.generate_forest(
+            _NUM_NODES.value, seed=seed, num_windows=2,
+            disabled_fraction=_DISABLED_FRACTION.value)
+        candidates = extract_actions_with_display_id_v2(forest)
+        yield forest, json.loads(rng.choice(candidates))
+
+
+def _recorded_steps(directory):
+    for path, action in forest_corpus.load_steps(directory):
+        yield forest_corpus.load_forest(path), action
+
+
+def main(argv):
+    del argv
+    if _CORPUS_DIR.value:
+        steps = _recorded_steps(_CORPUS_DIR.value)
+        source = _CORPUS_DIR.value
+    else:
+        steps = _synthetic_steps()
+        source = 'synthetic, uniformly random ground truth'
+    rules = (action_pruning.load_rules(_RULES.value) if _RULES.value
+             else action_pruning.DEFAULT_RULES)
+    pruner = action_pruning.ActionPruner(rules)
+
+    totals = collections.Counter()
+    lost_by_rule = collections.Counter()
+    timed = None
+    for forest, truth in steps:
+        candidates, extra_attributes = extract_actions_with_display_id_v2(
+            forest, return_mapping=True)
+        elements = action_pruning.elements_by_display_id(forest, extra_attributes)
+        package = action_pruning.foreground_package(forest)
+        result = pruner.apply(candidates, elements, package)
+        timed = timed or (candidates, elements, package)
+
+        truth_key = _action_key(truth)
+        keys = {_action_key(json.loads(c)) for c in candidates}
+        pruned = {_action_key(json.loads(c)): rule for c, rule in result.pruned}
+        demoted = {_action_key(json.loads(c)) for c, _ in result.demoted}
+        totals['steps'] += 1
+        totals['candidates'] += len(candidates)
+        totals['verified'] += len(result.actions)
+        totals['batches_before'] += _num_batches(len(candidates))
+        totals['batches_after'] += _num_batches(len(result.actions))
+        if truth_key not in keys:
+            totals['truth_not_candidate'] += 1
+        elif truth_key in pruned:
+            totals['truth_lost'] += 1
+            lost_by_rule[pruned[truth_key]] += 1
+        elif truth_key in demoted:
+            totals['truth_demoted'] += 1
+
+    if not totals['steps']:
+        raise app.UsageError(f'No labelled steps in {_CORPUS_DIR.value}.')
+    steps_count = totals['steps']
+    saved = totals['candidates'] - totals['verified']
+    print(f'source: {source}')
+    print(f'steps:                      {steps_count}')
+    print(f'verifier calls:             {totals["candidates"]} -> '
+          f'{totals["verified"]} ({saved} saved, '
+          f'{100 * saved / max(1, totals["candidates"]):.1f}%)')
+    print(f'verifier batches:           {totals["batches_before"]} -> '
+          f'{totals["batches_after"]}')
+    print(f'ground truth lost:          {totals["truth_lost"]} '
+          f'({100 * totals["truth_lost"] / steps_count:.1f}% of steps)')
+    print(f'ground truth demoted:       {totals["truth_demoted"]}')
+    print(f'ground truth not candidate: {totals["truth_not_candidate"]}')
+    print()
+    print(f'{"rule":<32} {"effect":>7} {"hits":>7} {"truth lost":>11}')
+    hits = pruner.hits
+    for rule in pruner.rules:
+        print(f'{rule.name:<32} {rule.effect:>7} {hits.get(rule.name, 0):>7} '
+              f'{lost_by_rule[rule.name]:>11}')
+    print()
+
+    candidates, elements, package = timed
+    pruner = action_pruning.ActionPruner(rules)
+    print(benchmark_utils.format_table([
+        benchmark_utils.measure(
+            'prune', f'{len(candidates)} candidates',
+            lambda: pruner.apply(candidates, elements, package)),
+    ]))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,109 @@
+"""Compares fixed sleeps and condition waits on a scripted action sequence.
+
+Actuation used to sleep a fixed second after clicking into a text field and
+after pressing HOME for the app drawer. It now polls a condition through an
+android_world.env.wait_conditions.Waiter. This replays a scripted sequence
+(type into three fields, clear one, open the app drawer) on a simulated
+device (android_world.utils.simulated_device) in virtual time, for devices
+that take --focus_seconds to focus a tapped field and as long to bring up
+the home screen, and reports per mode:
+  * wait s: time spent in the waits, including the polls;
+  * total s: virtual time of the whole sequence;
+  * missed: input_text actions whose text did not end up in their field,
+    because it was typed before the field had focus.
+Each UI tree read of a poll costs --tree_seconds and each adb request
+--adb_seconds.
+
+Usage:
+    python -m benchmarks.action_wait_benchmark
+    python -m benchmarks.action_wait_benchmark --focus_seconds=0.1,0.5,1.5
+"""
+
+import json
+import types
+
+from absl import app
+from absl import flags
+from android_world.env import actuation
+from android_world.env import json_action
+from android_world.env import wait_conditions
+from android_world.utils import simulated_device
+from android_world.utils import simulated_screen
+
+_FOCUS_SECONDS = flags.DEFINE_list(
+    'focus_seconds', ['0.15', '0.3', '0.6', '1.2'],
+    'Device reaction times to measure.')
+_TREE_SECONDS = flags.DEFINE_float(
+    'tree_seconds', 0.1, 'Time of one UI tree read.')
+_ADB_SECONDS = flags.DEFINE_float(
+    'adb_seconds', 0.03, 'Time of one adb request.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the results to.')
+
+_FIELDS = [
+    simulated_device.text_field(0, 200, 1080, 300),
+    simulated_device.text_field(0, 400, 1080, 500),
+    simulated_device.text_field(0, 600, 1080, 1200),
+]
+
+
+def _script():
+    return [
+        json_action.JSONAction(action_type='input_text', index=0,
+                               text='Groceries'),
+        json_action.JSONAction(action_type='input_text', index=1,
+                               text='Saturday 10am'),
+        json_action.JSONAction(action_type='input_text', index=2,
+                               text='milk, eggs, bread\ncoffee'),
+        json_action.JSONAction(action_type='clear_text', index=1),
+        types.SimpleNamespace(action_type='launch_adb_activity',
+                              activity_nickname='app_drawer'),
+    ]
+
+
+def _replay(mode, focus_seconds):
+    clock = simulated_screen.VirtualClock()
+    device = simulated_device.SimulatedDevice(
+        clock, _FIELDS, focus_seconds=focus_seconds,
+        home_seconds=focus_seconds, adb_seconds=_ADB_SECONDS.value,
+        tree_seconds=_TREE_SECONDS.value)
+    waiter = wait_conditions.Waiter(
+        wait_conditions.WaitConfig(mode=mode), clock.time, clock.sleep)
+    missed = 0
+    for action in _script():
+        if action.action_type == 'input_text':
+            before = device.typed.get(action.index, '')
+        actuation.execute_adb_action(
+            action, _FIELDS, (1080, 2400), device, waiter)
+        if action.action_type == 'input_text':
+            after = device.typed.get(action.index, '')
+            missed += after != before + action.text + '\n'
+    return {'wait_s': waiter.stats.total_seconds, 'total_s': clock.time(),
+            'missed': missed, 'timeouts': waiter.stats.num_timeouts}
+
+
+def main(argv):
+    del argv
+    results = []
+    for value in _FOCUS_SECONDS.value:
+        focus_seconds = float(value)
+        for mode in (wait_conditions.FIXED, wait_conditions.CONDITION):
+            result = _replay(mode, focus_seconds)
+            result.update(focus_seconds=focus_seconds, mode=mode)
+            results.append(result)
+
+    print(f'{len(_script())} actions, tree read {_TREE_SECONDS.value}s, '
+          f'adb request {_ADB_SECONDS.value}s')
+    print(f'{"device s":>8} {"mode":<10} {"wait s":>7} {"total s":>8} '
+          f'{"missed":>6} {"timeouts":>8}')
+    for result in results:
+        print(f'{result["focus_seconds"]:8.2f} {result["mode"]:<10} '
+              f'{result["wait_s"]:7.2f} {result["total_s"]:8.2f} '
+              f'{result["missed"]:6d} {result["timeouts"]:8d}')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,151 @@
+"""Compares one adb process per shell command with a persistent shell session.
+
+adb_utils used to reach the device through android_env's adb controller,
+which starts an `adb shell` process for every command. With a session
+attached (android_world.env.adb_shell_session) the commands are written to
+one long-lived shell instead, one at a time or as a batch. This runs the
+shell commands of a typical task setup (clearing app data, resetting
+settings, preparing files) through:
+  * one-shot: a new process per command, as the adb controller does;
+  * session: ShellSession.run per command;
+  * batch: one ShellSession.run_batch for the whole setup.
+and reports the processes started and the wall time per setup.
+
+The commands are echoed rather than run, so that the device is left alone
+and only the per-command overhead is measured. Without --device they go to
+a local /bin/sh, which has none of adb's connection cost, so the one-shot
+numbers here are a lower bound; pass --device to measure against a device.
+
+Usage:
+    python -m benchmarks.adb_shell_benchmark
+    python -m benchmarks.adb_shell_benchmark --device=emulator-5554 \
+        --adb_path=~/Android/Sdk/platform-tools/adb
+"""
+
+import os
+import shlex
+import subprocess
+
+from absl import app
+from absl import flags
+from android_world.env import adb_shell_session
+from benchmarks import benchmark_utils
+
+# Shell commands issued while setting up a typical task.
+SETUP_COMMANDS = (
+    'am force-stop com.simplemobiletools.calendar.pro',
+    'pm clear com.simplemobiletools.calendar.pro',
+    'am force-stop com.android.contacts',
+    'pm clear com.android.providers.contacts',
+    'settings put global auto_time 0',
+    'settings put global airplane_mode_on 0',
+    'settings put system screen_off_timeout 2147483647',
+    'settings put secure show_ime_with_hard_keyboard 1',
+    'svc wifi enable',
+    'svc data enable',
+    'rm -rf /sdcard/Download/*',
+    'mkdir -p /sdcard/Download',
+    'rm -rf /sdcard/DCIM/*',
+    'mkdir -p /sdcard/DCIM',
+    'content delete --uri content://sms',
+    'content delete --uri content://call_log/calls',
+    'date 1015153423.00',
+    'input keyevent KEYCODE_HOME',
+    'wm size',
+    'dumpsys window displays',
+)
+
+_ADB_PATH = flags.DEFINE_string(
+    'adb_path', 'adb', 'Location of the adb binary, with --device.')
+_DEVICE = flags.DEFINE_string(
+    'device', None, 'Serial of a device to run against instead of /bin/sh.')
+_REPEATS = flags.DEFINE_integer('repeats', 10, 'Timed setups per variant.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+class _CountingPopen:
+    """subprocess.Popen that counts the processes it starts."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return subprocess.Popen(*args, **kwargs)
+
+
+def _shell_argv():
+    if _DEVICE.value:
+        return [os.path.expanduser(_ADB_PATH.value), '-s', _DEVICE.value,
+                'shell']
+    return ['/bin/sh']
+
+
+def _commands():
+    return ['echo ' + shlex.quote(command) for command in SETUP_COMMANDS]
+
+
+def _one_shot(popen, commands):
+    argv = _shell_argv()
+    for command in commands:
+        if _DEVICE.value:
+            args = argv + [command]
+        else:
+            args = argv + ['-c', command]
+        process = popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        process.communicate()
+        if process.returncode:
+            raise RuntimeError(f'{command} exited with {process.returncode}')
+
+
+def _session(session, commands):
+    for command in commands:
+        if session.run(command).exit_code:
+            raise RuntimeError(f'{command} failed')
+
+
+def _batch(session, commands):
+    if any(result.exit_code for result in session.run_batch(commands)):
+        raise RuntimeError('A command failed')
+
+
+def main(argv):
+    del argv
+    commands = _commands()
+    case = f'{len(commands)} commands on {_DEVICE.value or "/bin/sh"}'
+    measurements = []
+    processes = {}
+
+    popen = _CountingPopen()
+    measurement = benchmark_utils.measure(
+        'one-shot', case, lambda: _one_shot(popen, commands),
+        repeats=_REPEATS.value, trace_allocations=False)
+    measurements.append(measurement)
+    processes['one-shot'] = popen.count / (measurement.runs + 1)
+
+    for name, run in (('session', _session), ('batch', _batch)):
+        popen = _CountingPopen()
+        with adb_shell_session.ShellSession(_shell_argv(), popen=popen) as session:
+            measurement = benchmark_utils.measure(
+                name, case, lambda run=run, session=session: run(
+                    session, commands),
+                repeats=_REPEATS.value, trace_allocations=False)
+            measurements.append(measurement)
+            processes[name] = popen.count / (measurement.runs + 1)
+            round_trips = (session.stats.num_round_trips
+                           / (measurement.runs + 1))
+        print(f'{name}: {round_trips:.0f} round trips per setup')
+
+    print(case)
+    print(f'{"variant":<9} {"processes/setup":>15} {"p50 ms":>8} '
+          f'{"p99 ms":>8}')
+    for measurement in measurements:
+        print(f'{measurement.name:<9} {processes[measurement.name]:15.2f} '
+              f'{measurement.p50_ms:8.2f} {measurement.p99_ms:8.2f}')
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
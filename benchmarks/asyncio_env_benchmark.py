@@ -0,0 +1,158 @@
+"""Compares sequential and asyncio-driven episodes on simulated devices.
+
+android_world.env.asyncio_env.AsyncioEnv exposes observe, act and
+wait_stable as coroutines. This drives simulated devices through its
+ExecutorController, as a real AsyncAndroidEnv would be, in wall time: every
+device call blocks for --io_seconds and the screen changes --change_seconds
+and twice that after each action. Each step waits for the screen to settle,
+spends --think_seconds of agent work (asyncio.sleep, standing in for model
+calls awaited on the loop) and acts. It reports, for --num_devices devices:
+  * sequential: one device after the other, the agent work after the wait;
+  * pipelined: one device after the other, with the half of the agent work
+    that needs only the previous step (saving its screenshots, say)
+    overlapping the wait;
+  * concurrent: all devices on one event loop.
+
+Usage:
+    python -m benchmarks.asyncio_env_benchmark
+    python -m benchmarks.asyncio_env_benchmark --num_devices=8 --num_steps=5
+"""
+
+import asyncio
+import json
+import time
+
+from absl import app
+from absl import flags
+from android_world.env import asyncio_env
+from android_world.env import interface
+from android_world.env import json_action
+from android_world.env import representation_utils
+from android_world.env import ui_stabilizer
+import numpy as np
+
+_NUM_DEVICES = flags.DEFINE_integer('num_devices', 4, 'Simulated devices.')
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 3, 'Steps per episode.')
+_IO_SECONDS = flags.DEFINE_float('io_seconds', 0.03, 'Time of a device call.')
+_CHANGE_SECONDS = flags.DEFINE_float(
+    'change_seconds', 0.15, 'Time until the screen changes after an action.')
+_THINK_SECONDS = flags.DEFINE_float(
+    'think_seconds', 0.4, 'Agent work per step.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the results to.')
+
+_CLICK = json_action.JSONAction(action_type='click', index=0)
+_SETTLE = ui_stabilizer.StabilizerConfig(
+    min_interval=0.05, max_interval=0.2, settle_seconds=0.3)
+
+
+class _SimulatedEnv:
+    """The blocking calls AsyncioEnv.from_env uses, on a simulated screen."""
+
+    def __init__(self):
+        self._acted_at = None
+        self._num_actions = 0
+        self.controller = self
+
+    def _state(self):
+        version = 10 * self._num_actions
+        if self._acted_at is not None:
+            elapsed = time.monotonic() - self._acted_at
+            version += sum(elapsed >= _CHANGE_SECONDS.value * i for i in (1, 2))
+        return interface.State(
+            pixels=np.zeros((1, 1, 3), np.uint8), forest=None,
+            ui_elements=[representation_utils.UIElement(text=str(version))])
+
+    def reset(self, go_home):
+        del go_home
+        time.sleep(_IO_SECONDS.value)
+        return self._state()
+
+    def get_state(self, wait_to_stabilize):
+        del wait_to_stabilize
+        time.sleep(_IO_SECONDS.value)
+        return self._state()
+
+    def probe_ui_digest(self):
+        time.sleep(_IO_SECONDS.value)
+        return self._state().ui_element_table.content_hash
+
+    def execute_action(self, action, state):
+        del action, state
+        time.sleep(_IO_SECONDS.value)
+        self._num_actions += 1
+        self._acted_at = time.monotonic()
+
+    def last_a11y_event_time(self):
+        return None
+
+    def close(self):
+        pass
+
+
+async def _think(share=1.0):
+    await asyncio.sleep(_THINK_SECONDS.value * share)
+
+
+async def _sequential_episode(env):
+    await env.reset()
+    for _ in range(_NUM_STEPS.value):
+        state = await env.wait_stable()
+        await _think()
+        await env.act(_CLICK, state)
+
+
+async def _pipelined_episode(env):
+    await env.reset()
+    state = await env.wait_stable()
+    for step in range(_NUM_STEPS.value):
+        await _think(0.5)
+        await env.act(_CLICK, state)
+        # The other half of the agent's work needs only the previous step.
+        if step + 1 < _NUM_STEPS.value:
+            state, _ = await asyncio.gather(env.wait_stable(), _think(0.5))
+        else:
+            await _think(0.5)
+
+
+async def _run(mode):
+    envs = [
+        asyncio_env.AsyncioEnv.from_env(
+            _SimulatedEnv(), stabilizer_config=_SETTLE)
+        for _ in range(_NUM_DEVICES.value)
+    ]
+    try:
+        if mode == 'concurrent':
+            await asyncio.gather(*(_sequential_episode(env) for env in envs))
+        else:
+            episode = (_pipelined_episode if mode == 'pipelined'
+                       else _sequential_episode)
+            for env in envs:
+                await episode(env)
+    finally:
+        for env in envs:
+            env.close()
+
+
+def main(argv):
+    del argv
+    results = []
+    for mode in ('sequential', 'pipelined', 'concurrent'):
+        start = time.perf_counter()
+        asyncio.run(_run(mode))
+        results.append({'mode': mode, 'seconds': time.perf_counter() - start})
+
+    print(f'{_NUM_DEVICES.value} devices x {_NUM_STEPS.value} steps, '
+          f'device call {_IO_SECONDS.value}s, agent work '
+          f'{_THINK_SECONDS.value}s per step')
+    print(f'{"mode":<11} {"seconds":>8} {"speedup":>8}')
+    for result in results:
+        speedup = results[0]['seconds'] / result['seconds']
+        print(f'{result["mode"]:<11} {result["seconds"]:8.2f} {speedup:7.2f}x')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,125 @@
+"""Timing and allocation helpers shared by the benchmark scripts."""
+
+import contextlib
+import dataclasses
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+
+@dataclasses.dataclass(frozen=True)
+class Measurement:
+    """Summary of repeated calls to one function on one input."""
+    name: str
+    case: str
+    runs: int
+    p50_ms: float
+    p99_ms: float
+    peak_kib: float
+    retained_kib: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+@contextlib.contextmanager
+def silence_stdout():
+    """Drops prints from the code under test, which would skew timings."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure_allocations(fn: Callable[[], Any]) -> tuple[float, float]:
+    """Returns (peak, retained) KiB traced by tracemalloc during one call."""
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return (peak - before) / 1024, (current - before) / 1024
+
+
+def measure(
+    name: str,
+    case: str,
+    fn: Callable[[], Any],
+    repeats: int = 20,
+    max_seconds: Optional[float] = None,
+    warmup: int = 1,
+    trace_allocations: bool = True,
+    clock: Callable[[], float] = time.perf_counter,
+) -> Measurement:
+    """Times fn and reports the p50/p99 latency and its allocations.
+
+    Args:
+        name: Name of the measured function.
+        case: Name of the input it ran on.
+        fn: Zero-argument callable to measure.
+        repeats: Maximum number of timed calls.
+        max_seconds: Stop repeating once this much time was spent; at least one
+            timed call is always made.
+        warmup: Untimed calls made first.
+        trace_allocations: Whether to make one more call under tracemalloc.
+            Tracing slows the call down, so it is never timed.
+        clock: Clock the calls are timed with; time.process_time gives CPU
+            time instead of wall time. max_seconds always counts wall time.
+
+    Returns:
+        The measurement.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeats:
+        start = clock()
+        fn()
+        samples.append(clock() - start)
+        if max_seconds is not None and time.perf_counter() - started > max_seconds:
+            break
+    peak_kib, retained_kib = (
+        measure_allocations(fn) if trace_allocations else (0.0, 0.0))
+    samples_ms = np.array(samples) * 1e3
+    return Measurement(
+        name=name,
+        case=case,
+        runs=len(samples),
+        p50_ms=float(np.percentile(samples_ms, 50)),
+        p99_ms=float(np.percentile(samples_ms, 99)),
+        peak_kib=peak_kib,
+        retained_kib=retained_kib,
+    )
+
+
+def format_table(measurements: Sequence[Measurement]) -> str:
+    """Renders measurements as an aligned plain-text table."""
+    header = ('case', 'name', 'runs', 'p50 ms', 'p99 ms', 'peak KiB',
+              'retained KiB')
+    rows = [header]
+    for m in measurements:
+        rows.append((m.case, m.name, str(m.runs), f'{m.p50_ms:.3f}',
+                     f'{m.p99_ms:.3f}', f'{m.peak_kib:.1f}',
+                     f'{m.retained_kib:.1f}'))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = []
+    for row in rows:
+        cells = [cell.ljust(width) if i < 2 else cell.rjust(width)
+                 for i, (cell, width) in enumerate(zip(row, widths))]
+        lines.append('  '.join(cells))
+    return '\n'.join(lines)
+
+
+def write_json(path: str, measurements: Sequence[Measurement]) -> None:
+    with open(path, 'w') as f:
+        json.dump([m.to_dict() for m in measurements], f, indent=2)
@@ -0,0 +1,48 @@
+"""Tests for benchmark_utils."""
+
+from absl.testing import absltest
+from benchmarks import benchmark_utils
+
+
+class BenchmarkUtilsTest(absltest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        measurement = benchmark_utils.measure(
+            'append', 'case', lambda: calls.append(bytearray(1 << 20)),
+            repeats=4, warmup=2)
+
+        self.assertEqual(measurement.runs, 4)
+        self.assertLen(calls, 7)  # Warmup, timed and traced calls.
+        self.assertLessEqual(measurement.p50_ms, measurement.p99_ms)
+        self.assertGreaterEqual(measurement.peak_kib, 1024)
+
+    def test_measure_stops_at_time_budget(self):
+        measurement = benchmark_utils.measure(
+            'noop', 'case', lambda: None, repeats=1000, max_seconds=0.0,
+            trace_allocations=False)
+
+        self.assertEqual(measurement.runs, 1)
+
+    def test_measure_with_custom_clock(self):
+        ticks = iter(range(0, 100, 5))
+        measurement = benchmark_utils.measure(
+            'noop', 'case', lambda: None, repeats=3, warmup=0,
+            trace_allocations=False, clock=lambda: next(ticks))
+
+        self.assertEqual(measurement.p50_ms, 5000.0)
+
+    def test_format_table(self):
+        measurement = benchmark_utils.Measurement(
+            name='html', case='synthetic-10', runs=3, p50_ms=1.0, p99_ms=2.5,
+            peak_kib=10.0, retained_kib=1.0)
+
+        lines = benchmark_utils.format_table([measurement]).splitlines()
+
+        self.assertLen(lines, 2)
+        self.assertIn('p99 ms', lines[0])
+        self.assertIn('2.500', lines[1])
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -0,0 +1,116 @@
+"""Measures the per-step cost of parsing candidate actions in VDroidAgent.
+
+"string" replays what the agent did while candidates travelled as JSON
+strings: every candidate is decoded once for pruning, and the chosen action
+is scanned for placeholders, decoded with extract_json for execution, for
+the search bookkeeping and for the replay of the path, and once more with
+json.loads for the rule-based summary. "parsed" builds CandidateAction
+objects once and reads their fields afterwards.
+
+Steps come from the steps.jsonl of a recorded corpus (see
+android_world.utils.forest_corpus) or from synthetic screens with a random
+chosen action.
+
+Usage:
+    python -m benchmarks.candidate_action_benchmark --corpus_dir=/tmp/forests
+"""
+
+import json
+import random
+
+from absl import app
+from absl import flags
+from android_world.agents import action_pruning
+from android_world.agents import agent_utils
+from android_world.agents import candidate_action
+from android_world.env import json_action
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation.html_representation import extract_actions_with_display_id_v2
+
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Recorded corpus with a steps.jsonl; synthetic if unset.')
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 20, 'Synthetic steps.')
+_NUM_NODES = flags.DEFINE_integer('num_nodes', 300, 'Nodes per synthetic screen.')
+_REPEATS = flags.DEFINE_integer('repeats', 20, 'Timed runs per step set.')
+
+_COMPLETIONS = {'input_text': 'text_input', 'open_app': 'name',
+                'answer': 'answer_text'}
+
+
+def _string_step(candidates, chosen):
+    for candidate in candidates:
+        json.loads(candidate)
+    for key, missing_field in _COMPLETIONS.items():
+        if key in chosen and f'<{missing_field}>' in chosen:
+            break
+    for _ in range(3):
+        json_action.JSONAction(**agent_utils.extract_json(chosen))
+    json.loads(chosen)
+
+
+def _parsed_step(candidates, chosen_index, elements):
+    parsed = [candidate_action.CandidateAction.parse(c, elements)
+              for c in candidates]
+    chosen = parsed[chosen_index]
+    chosen.needs_completion
+    for _ in range(3):
+        chosen.to_json_action()
+    chosen.to_dict()
+
+
+def _steps():
+    """Yields (candidates, chosen index, elements by display id)."""
+    if _CORPUS_DIR.value:
+        labelled = ((forest_corpus.load_forest(path), action)
+                    for path, action in forest_corpus.load_steps(_CORPUS_DIR.value))
+    else:
+        labelled = ((synthetic_forest.generate_forest(_NUM_NODES.value, seed=seed),
+                     None) for seed in range(_NUM_STEPS.value))
+    rng = random.Random(0)
+    for forest, truth in labelled:
+        candidates, extra_attributes = extract_actions_with_display_id_v2(
+            forest, return_mapping=True)
+        elements = action_pruning.elements_by_display_id(forest, extra_attributes)
+        chosen = rng.randrange(len(candidates))
+        if truth is not None:
+            for i, candidate in enumerate(candidates):
+                action = json.loads(candidate)
+                if all(action.get(k) == truth.get(k)
+                       for k in ('action_type', 'index', 'direction')):
+                    chosen = i
+                    break
+        yield candidates, chosen, elements
+
+
+def main(argv):
+    del argv
+    steps = list(_steps())
+    if not steps:
+        raise app.UsageError(f'No labelled steps in {_CORPUS_DIR.value}.')
+    num_candidates = sum(len(candidates) for candidates, _, _ in steps)
+
+    def run_string():
+        for candidates, chosen, _ in steps:
+            _string_step(candidates, candidates[chosen])
+
+    def run_parsed():
+        for candidates, chosen, elements in steps:
+            _parsed_step(candidates, chosen, elements)
+
+    case = f'{len(steps)} steps, {num_candidates / len(steps):.0f} cand/step'
+    measurements = [
+        benchmark_utils.measure('string', case, run_string,
+                                repeats=_REPEATS.value),
+        benchmark_utils.measure('parsed', case, run_parsed,
+                                repeats=_REPEATS.value),
+    ]
+    print(benchmark_utils.format_table(measurements))
+    for m in measurements:
+        print(f'{m.name}: {1e3 * m.p50_ms / len(steps):.1f} us/step, '
+              f'{1e3 * m.p50_ms / num_candidates:.2f} us/candidate')
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,180 @@
+"""Benchmarks the autodroid DeviceState on deep view hierarchies.
+
+DeviceState memoizes ancestor chains, nearest flagged ancestors and
+descendant lists per window. This benchmark times it against a subclass
+that restores the recursive lookups, on synthetic depth-first forests and,
+optionally, on the deepest forests of a corpus recorded with
+android_world.utils.forest_corpus.ForestRecorder. Both variants must produce
+the same state string and traversal results before they are timed.
+
+Usage:
+    python -m benchmarks.device_state_benchmark --sizes=500,2000,4000
+    python -m benchmarks.device_state_benchmark --corpus_dir=/tmp/forests \
+        --sizes= --min_depth=15
+"""
+
+import contextlib
+import io
+
+from absl import app
+from absl import flags
+import networkx as nx
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation import autodroid_repsentation
+
+_SIZES = flags.DEFINE_list(
+    'sizes', ['500', '2000', '4000'],
+    'Node counts of the synthetic depth-first forests. Empty to skip them.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed for the synthetic forests.')
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Directory of recorded forests.')
+_MIN_DEPTH = flags.DEFINE_integer(
+    'min_depth', 10, 'Only corpus forests at least this deep are used.')
+_REPEATS = flags.DEFINE_integer('repeats', 10, 'Timed runs per case.')
+_MAX_SECONDS = flags.DEFINE_float(
+    'max_seconds', 20.0, 'Time budget per variant and case.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+_FLAGS = ('clickable', 'checkable', 'long_clickable')
+
+
+class RecursiveDeviceState(autodroid_repsentation.DeviceState):
+    """DeviceState with the recursive, unmemoized tree lookups."""
+
+    def get_all_ancestors(self, view_dict):
+        result = []
+        parent_id = view_dict.parent if view_dict.parent is not None else -1
+        if 0 <= parent_id < len(self.views):
+            result.append(parent_id)
+            result += self.get_all_ancestors(self.views[parent_id])
+        return result
+
+    def _get_self_ancestors_property(self, view, key, default=None):
+        all_views = [view] + [self.views[i]
+                              for i in self.get_all_ancestors(view)]
+        for v in all_views:
+            value = getattr(v, key, None)
+            if value:
+                return value
+        return default
+
+    def _get_ancestor_id(self, view, key, default=None):
+        if getattr(view, key, None):
+            return view.resource_id
+        all_views = [view] + [self.views[i]
+                              for i in self.get_all_ancestors(view)]
+        for v in all_views:
+            if getattr(v, key, None):
+                return v.resource_id
+        return default
+
+    def _extract_all_children(self, id):
+        successors = []
+        try:
+            successors_of_view = nx.dfs_successors(
+                self.view_graph, source=id, depth_limit=100)
+        except:
+            return []
+        for v in successors_of_view.values():
+            for successor_id in v:
+                if successor_id not in successors and successor_id != id:
+                    successors.append(successor_id)
+        return successors
+
+
+VARIANTS = {
+    'recursive': RecursiveDeviceState,
+    'memoized': autodroid_repsentation.DeviceState,
+}
+
+
+def _depth(forest):
+    return max((node.depth for window in forest.windows
+                for node in window.tree.nodes), default=0)
+
+
+def _cases():
+    """Yields (case name, list of forests)."""
+    for size in _SIZES.value:
+        forest = synthetic_forest.generate_forest(
+            int(size), seed=_SEED.value, depth_first=True)
+        yield f'deep-{size}', [forest]
+    if _CORPUS_DIR.value:
+        forests = [forest for forest in
+                   forest_corpus.iter_corpus(_CORPUS_DIR.value)
+                   if _depth(forest) >= _MIN_DEPTH.value]
+        if not forests:
+            raise ValueError(
+                f'No forests of depth {_MIN_DEPTH.value} in {_CORPUS_DIR.value}.')
+        yield f'corpus-{len(forests)}', forests
+
+
+def _build(variant, forest):
+    # The button grouping prints every view that has no description.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return VARIANTS[variant](forest)
+
+
+def _traversal(state):
+    results = [state.state_str]
+    for window, views in enumerate(state.view_groups):
+        state.views = views
+        state.view_graph = state.graph_groups[window]
+        try:
+            results.append([state._get_ancestor_id(v, key)
+                            for v in views for key in _FLAGS])
+            results.append([state._extract_all_children(v.resource_id)
+                            for v in views])
+        except (IndexError, RecursionError) as e:
+            results.append(type(e).__name__)
+    return results
+
+
+def main(argv):
+    del argv
+    measurements = []
+    summary = []
+    for case, forests in _cases():
+        overflows = 0
+        for forest in forests:
+            expected = _traversal(_build('recursive', forest))
+            if 'RecursionError' in expected:
+                # Past the interpreter's recursion limit only the memoized
+                # lookups still answer; the state strings must still agree.
+                overflows += 1
+                expected = expected[:1]
+                actual = _traversal(_build('memoized', forest))[:1]
+            else:
+                actual = _traversal(_build('memoized', forest))
+            if actual != expected:
+                raise AssertionError(f'Variants disagree on {case}.')
+        for variant in VARIANTS:
+
+            def run_all(variant=variant, forests=forests):
+                return [_build(variant, forest) for forest in forests]
+
+            measurement = benchmark_utils.measure(
+                variant, case, run_all, repeats=_REPEATS.value,
+                max_seconds=_MAX_SECONDS.value)
+            measurements.append(measurement)
+            print(benchmark_utils.format_table([measurement]).splitlines()[-1],
+                  flush=True)
+        num_nodes = sum(len(window.tree.nodes) for forest in forests
+                        for window in forest.windows)
+        summary.append(f'{case:<14} {num_nodes:>7} nodes, max depth '
+                       f'{max(_depth(forest) for forest in forests)}, '
+                       f'{overflows} too deep for the recursive lookups')
+
+    print()
+    print(benchmark_utils.format_table(measurements))
+    print()
+    print('\n'.join(summary))
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
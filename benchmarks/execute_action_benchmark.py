@@ -0,0 +1,132 @@
+"""Measures the step latency saved by executing actions on the observed state.
+
+AsyncAndroidEnv.execute_action used to fetch a new state before every action
+to resolve its element index, although the agent had just observed the screen
+it chose the action on. Agents now pass that state and the environment reuses
+it when no action was executed since.
+
+This runs agent steps (observe, read the screen geometry, click an element)
+against a controller that sleeps --fetch_ms per observation and --adb_ms per
+adb call, and reports per-step latency and observations fetched with and
+without passing the state.
+
+Usage:
+    python -m benchmarks.execute_action_benchmark
+    python -m benchmarks.execute_action_benchmark --fetch_ms=300 --adb_ms=50
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from android_world.env import android_world_controller
+from android_world.env import interface
+from android_world.env import json_action
+from android_world.env import representation_utils
+from android_world.utils import fake_adb_responses
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+import numpy as np
+
+_SCREEN_SIZE = (1080, 2400)
+
+_FETCH_MS = flags.DEFINE_float(
+    'fetch_ms', 150.0, 'Simulated latency of fetching an observation.')
+_ADB_MS = flags.DEFINE_float('adb_ms', 30.0, 'Simulated latency of adb calls.')
+_NUM_NODES = flags.DEFINE_integer('num_nodes', 300, 'Nodes per screen.')
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 10, 'Agent steps per run.')
+_REPEATS = flags.DEFINE_integer('repeats', 3, 'Timed runs per variant.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+class _Timestep:
+
+    def __init__(self, observation):
+        self.observation = observation
+
+
+class SlowController:
+    """Controller answering after a fixed latency and counting observations."""
+
+    def __init__(self, fetch_seconds, adb_seconds, num_nodes):
+        self._fetch_seconds = fetch_seconds
+        self._adb_seconds = adb_seconds
+        forest = synthetic_forest.generate_forest(
+            num_nodes, screen_size=_SCREEN_SIZE)
+        for window in forest.windows:
+            window.bounds_in_screen.right, window.bounds_in_screen.bottom = (
+                _SCREEN_SIZE)
+        self._observation = {
+            'pixels': np.zeros((_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3),
+                               np.uint8),
+            android_world_controller.OBSERVATION_KEY_FOREST: forest,
+            android_world_controller.OBSERVATION_KEY_UI_ELEMENTS: [
+                representation_utils.UIElement(
+                    text='Button', is_clickable=True,
+                    bbox_pixels=representation_utils.BoundingBox(
+                        0, 100, 0, 100)),
+            ],
+        }
+        self.fetches = 0
+
+    def step(self, unused_action):
+        time.sleep(self._fetch_seconds)
+        self.fetches += 1
+        return _Timestep(self._observation)
+
+    reset = step
+
+    def execute_adb_call(self, request):
+        time.sleep(self._adb_seconds)
+        command = ' '.join(request.generic.args)
+        if 'logicalFrame' in command:
+            return fake_adb_responses.create_get_logical_screen_size_response(
+                *_SCREEN_SIZE)
+        if 'physicalFrame' in command:
+            return (
+                fake_adb_responses.create_get_physical_frame_boundary_response(
+                    0, 0, *_SCREEN_SIZE))
+        if 'mCurrentRotation' in command:
+            return fake_adb_responses.create_get_orientation_response(0)
+        return fake_adb_responses.create_successful_generic_response('')
+
+
+def _run_episode(env, pass_state):
+    action = json_action.JSONAction(action_type=json_action.CLICK, index=0)
+    for _ in range(_NUM_STEPS.value):
+        state = env.get_state(wait_to_stabilize=False)
+        # VDroid reads the geometry to describe the screen.
+        _ = env.logical_screen_size, env.physical_frame_boundary
+        env.execute_action(action, state=state if pass_state else None)
+
+
+def main(argv):
+    del argv
+    measurements = []
+    fetches = {}
+    for name, pass_state in (('refetch', False), ('reuse', True)):
+        controller = SlowController(
+            _FETCH_MS.value / 1e3, _ADB_MS.value / 1e3, _NUM_NODES.value)
+        env = interface.AsyncAndroidEnv(controller)
+        _run_episode(env, pass_state)
+        fetches[name] = controller.fetches / _NUM_STEPS.value
+        measurement = benchmark_utils.measure(
+            name, f'{_NUM_STEPS.value} steps',
+            lambda env=env, pass_state=pass_state: _run_episode(
+                env, pass_state),
+            repeats=_REPEATS.value, warmup=0, trace_allocations=False)
+        measurements.append(measurement)
+
+    print(f'fetch {_FETCH_MS.value:.0f} ms, adb {_ADB_MS.value:.0f} ms, '
+          f'{_NUM_NODES.value} nodes')
+    print(f'{"variant":<8} {"fetches/step":>12} {"ms/step":>9}')
+    for measurement in measurements:
+        print(f'{measurement.name:<8} {fetches[measurement.name]:12.1f} '
+              f'{measurement.p50_ms / _NUM_STEPS.value:9.1f}')
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,132 @@
+"""Benchmarks lazy forest decoding and the visibility filter.
+
+Two comparisons per case:
+  * decoding a serialized forest fully vs. reading only the window headers
+    and the focused window's nodes through LazyForest;
+  * building vdroid's HTML and actions from the full forest vs. from
+    forest_view.filter_forest(forest), timing the filter as part of it.
+
+Every case first checks that the filtered forest gives identical HTML,
+clean HTML and actions.
+
+Usage:
+    python -m benchmarks.forest_view_benchmark --sizes=100,1000,3000
+    python -m benchmarks.forest_view_benchmark --corpus_dir=/tmp/forests --sizes=
+"""
+
+from absl import app
+from absl import flags
+from android_env.proto.a11y import android_accessibility_forest_pb2
+from android_world.env import forest_view
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation import html_representation
+
+_SIZES = flags.DEFINE_list(
+    'sizes', ['100', '1000', '3000'],
+    'Node counts of the synthetic forests. Empty to skip them.')
+_HIDDEN_SUBTREE_FRACTION = flags.DEFINE_float(
+    'hidden_subtree_fraction', 0.1,
+    'Probability that a synthetic container is hidden with its subtree.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed for the synthetic forests.')
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Corpus directory with recorded forests.')
+_REPEATS = flags.DEFINE_integer('repeats', 10, 'Timed runs per case.')
+_MAX_SECONDS = flags.DEFINE_float(
+    'max_seconds', 20.0, 'Time budget per variant and case.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _cases():
+    """Yields (case name, list of forests)."""
+    for size in _SIZES.value:
+        forest = synthetic_forest.generate_forest(
+            int(size), seed=_SEED.value, num_windows=2,
+            hidden_subtree_fraction=_HIDDEN_SUBTREE_FRACTION.value)
+        forest.windows[0].is_focused = True
+        yield f'synthetic-{size}', [forest]
+    if _CORPUS_DIR.value:
+        forests = [forest_corpus.load_forest(path)
+                   for path in forest_corpus.forest_paths(_CORPUS_DIR.value)]
+        if not forests:
+            raise ValueError(f'No forests found in {_CORPUS_DIR.value}.')
+        yield f'corpus-{len(forests)}', forests
+
+
+def _vdroid_inputs(forest):
+    return (html_representation.turn_tree_to_html_input(forest),
+            html_representation.extract_actions_with_display_id_v2(forest))
+
+
+def _check_unchanged(case, forests):
+    for forest in forests:
+        filtered = forest_view.filter_forest(forest)
+        for build in (_vdroid_inputs,
+                      html_representation.turn_tree_to_clean_html_input):
+            if build(filtered) != build(forest):
+                raise AssertionError(f'Filtering changed the output on {case}.')
+
+
+def _decode_full(blobs):
+    results = []
+    for blob in blobs:
+        forest = (android_accessibility_forest_pb2.AndroidAccessibilityForest
+                  .FromString(blob))
+        focused = next((w for w in forest.windows if w.is_focused), None)
+        results.append(
+            (list(forest.windows), [] if focused is None else list(
+                focused.tree.nodes)))
+    return results
+
+
+def _decode_focused(blobs):
+    results = []
+    for blob in blobs:
+        view = forest_view.LazyForest.from_serialized(blob)
+        headers = [view.window_header(i) for i in range(len(view))]
+        focused = view.focused_window()
+        nodes = [] if focused is None else list(view.nodes(focused))
+        results.append((headers, nodes))
+    return results
+
+
+def main(argv):
+    del argv
+    measurements = []
+    summary = []
+    for case, forests in _cases():
+        _check_unchanged(case, forests)
+        blobs = [forest.SerializeToString() for forest in forests]
+        num_nodes = sum(len(w.tree.nodes) for f in forests for w in f.windows)
+        num_kept = sum(len(w.tree.nodes) for f in forests
+                       for w in forest_view.filter_forest(f).windows)
+        variants = {
+            'decode-full': lambda blobs=blobs: _decode_full(blobs),
+            'decode-lazy-focused': lambda blobs=blobs: _decode_focused(blobs),
+            'html-full': lambda forests=forests: [
+                _vdroid_inputs(f) for f in forests],
+            'html-filtered': lambda forests=forests: [
+                _vdroid_inputs(forest_view.filter_forest(f)) for f in forests],
+        }
+        for name, fn in variants.items():
+            measurement = benchmark_utils.measure(
+                name, case, fn, repeats=_REPEATS.value,
+                max_seconds=_MAX_SECONDS.value)
+            measurements.append(measurement)
+            print(benchmark_utils.format_table([measurement]).splitlines()[-1],
+                  flush=True)
+        summary.append(f'{case:<18} kept {num_kept}/{num_nodes} nodes '
+                       f'({100 * num_kept / max(num_nodes, 1):.1f}%)')
+
+    print()
+    print(benchmark_utils.format_table(measurements))
+    print()
+    print('\n'.join(summary))
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,40 @@
+"""Times the cleaned HTML emitter against the BeautifulSoup cleanup path.
+
+Usage:
+    python -m benchmarks.html_cleanup_benchmark --num_nodes=2000
+"""
+
+from absl import app
+from absl import flags
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation import html_representation
+
+_NUM_NODES = flags.DEFINE_integer(
+    'num_nodes', 500, 'Number of nodes in the synthetic screen.')
+_REPEATS = flags.DEFINE_integer('repeats', 20, 'Timed runs per path.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed for the synthetic screen.')
+
+
+def main(argv):
+    del argv
+    forest = synthetic_forest.generate_forest(_NUM_NODES.value, seed=_SEED.value)
+    reparsed = html_representation._clean_html_input_by_reparsing(forest)
+    emitted = html_representation.emit_clean_html(forest)
+    assert emitted == reparsed, 'Emitter output differs from the reparsing path.'
+
+    case = f'synthetic-{_NUM_NODES.value}'
+    legacy = benchmark_utils.measure(
+        'generate + BeautifulSoup cleanup', case,
+        lambda: html_representation._clean_html_input_by_reparsing(forest),
+        repeats=_REPEATS.value)
+    direct = benchmark_utils.measure(
+        'direct emitter', case,
+        lambda: html_representation.emit_clean_html(forest),
+        repeats=_REPEATS.value)
+    print(benchmark_utils.format_table([legacy, direct]))
+    print(f'speedup (p50): {legacy.p50_ms / direct.p50_ms:.1f}x')
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,126 @@
+"""Compares the per-element and batched set-of-mark renderers.
+
+m3a_utils.add_ui_element_marks draws every label with cv2.putText;
+m3a_utils.add_ui_element_marks_batched blends labels rendered once into a
+m3a_utils.GlyphAtlas. This times, per screen:
+  * reference: add_ui_element_marks;
+  * batched-cold: the batched renderer with a fresh atlas on every call;
+  * batched-warm: the batched renderer with the shared atlas.
+for synthetic screens of several sizes and element counts, with and without
+add_image_desc, and reports the largest pixel difference between outputs
+(expected to be 0).
+
+Usage:
+    python -m benchmarks.mark_renderer_benchmark
+    python -m benchmarks.mark_renderer_benchmark \
+        --screen_sizes=1080x2400 --num_nodes=100,3000
+"""
+
+from absl import app
+from absl import flags
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+import numpy as np
+
+_SCREEN_SIZES = flags.DEFINE_list(
+    'screen_sizes', ['720x1280', '1080x2400', '1440x3200'],
+    'Screen sizes as WIDTHxHEIGHT.')
+_NUM_NODES = flags.DEFINE_list(
+    'num_nodes', ['100', '1000', '3000'], 'Nodes per synthetic screen.')
+_ADD_IMAGE_DESC = flags.DEFINE_multi_enum(
+    'add_image_desc', ['false', 'true'], ['false', 'true'],
+    'add_image_desc settings to measure.')
+_REPEATS = flags.DEFINE_integer('repeats', 10, 'Timed runs per variant.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _reference(pixels, ui_elements, screen_size, add_image_desc):
+    m3a_utils.add_ui_element_marks(
+        pixels, ui_elements, screen_size, (0, 0, *screen_size), 0,
+        add_image_desc=add_image_desc)
+
+
+def _batched_cold(pixels, ui_elements, screen_size, add_image_desc):
+    if add_image_desc:
+        atlas = m3a_utils.GlyphAtlas(0.5, 1)
+    else:
+        atlas = m3a_utils.GlyphAtlas(0.7, 2)
+    m3a_utils.add_ui_element_marks_batched(
+        pixels, ui_elements, screen_size, (0, 0, *screen_size), 0,
+        add_image_desc=add_image_desc, atlas=atlas)
+
+
+def _batched_warm(pixels, ui_elements, screen_size, add_image_desc):
+    m3a_utils.add_ui_element_marks_batched(
+        pixels, ui_elements, screen_size, (0, 0, *screen_size), 0,
+        add_image_desc=add_image_desc)
+
+
+VARIANTS = {
+    'reference': _reference,
+    'batched-cold': _batched_cold,
+    'batched-warm': _batched_warm,
+}
+
+
+def _max_difference(a, b):
+    return int(np.abs(a.astype(np.int16) - b).max())
+
+
+def main(argv):
+    del argv
+    measurements = []
+    summary = []
+    for size in _SCREEN_SIZES.value:
+        width, height = (int(value) for value in size.split('x'))
+        screen_size = (width, height)
+        pixels = np.random.default_rng(0).integers(
+            0, 256, size=(height, width, 3), dtype=np.uint8)
+        for num_nodes in (int(value) for value in _NUM_NODES.value):
+            forest = synthetic_forest.generate_forest(
+                num_nodes, screen_size=screen_size)
+            ui_elements = representation_utils.forest_to_ui_elements(
+                forest, exclude_invisible_elements=True)
+            for setting in _ADD_IMAGE_DESC.value:
+                add_image_desc = setting == 'true'
+                case = f'{size}/{num_nodes}/desc={setting}'
+                outputs = {}
+                p50 = {}
+                for name, variant in VARIANTS.items():
+                    outputs[name] = pixels.copy()
+                    variant(outputs[name], ui_elements, screen_size,
+                            add_image_desc)
+
+                    def run(variant=variant, add_image_desc=add_image_desc):
+                        variant(pixels.copy(), ui_elements, screen_size,
+                                add_image_desc)
+
+                    measurement = benchmark_utils.measure(
+                        name, case, run, repeats=_REPEATS.value,
+                        trace_allocations=False)
+                    measurements.append(measurement)
+                    p50[name] = measurement.p50_ms
+                difference = max(
+                    _max_difference(outputs['reference'], outputs[name])
+                    for name in VARIANTS)
+                summary.append((case, len(ui_elements), p50, difference))
+
+    print(benchmark_utils.format_table(measurements))
+    print()
+    print('p50 ms per screen:')
+    for case, num_elements, p50, difference in summary:
+        print(f'  {case:<28} {num_elements:5d} elements  '
+              f'reference {p50["reference"]:7.2f}  '
+              f'cold {p50["batched-cold"]:7.2f}  '
+              f'warm {p50["batched-warm"]:7.2f} '
+              f'({p50["reference"] / p50["batched-warm"]:4.2f}x)  '
+              f'max pixel diff {difference}')
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,103 @@
+"""Benchmarks the screen representation builders without an emulator.
+
+Each builder (HTML v1/v2 and the cleaned HTML, action extraction v2/v3, group
+bounding boxes, UI elements and the autodroid DeviceState) is timed on
+synthetic forests of the requested sizes and, optionally, on a corpus recorded
+with android_world.utils.forest_corpus.ForestRecorder.
+
+Usage:
+    python -m benchmarks.representation_benchmark --sizes=100,1000,10000
+    python -m benchmarks.representation_benchmark --corpus_dir=/tmp/forests \
+        --sizes= --builders=html_v1,group_boxes
+"""
+
+from absl import app
+from absl import flags
+from android_world.env import representation_utils
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation import autodroid_repsentation
+from html_representation import bbox_representation
+from html_representation import html_representation
+
+# Geometry used by the group bounding boxes; matches the synthetic screen.
+_SCREEN_SIZE = (1080, 2400)
+_PHYSICAL_FRAME_BOUNDARY = (0, 0, 1080, 2400)
+
+BUILDERS = {
+    'html_v1': html_representation.turn_tree_to_html_input,
+    'html_v2': html_representation.turn_tree_to_html_input_v2,
+    'clean_html': html_representation.turn_tree_to_clean_html_input,
+    'actions_v2': html_representation.extract_actions_with_display_id_v2,
+    'actions_v3': html_representation.extract_actions_with_display_id_v3,
+    'group_boxes': lambda forest: bbox_representation.turn_tree_to_group_bounding_boxes(
+        0, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY, forest),
+    'ui_elements': lambda forest: representation_utils.forest_to_ui_elements(
+        forest, exclude_invisible_elements=True),
+    'device_state': autodroid_repsentation.DeviceState,
+}
+
+_SIZES = flags.DEFINE_list(
+    'sizes', ['100', '1000', '10000'],
+    'Node counts of the synthetic forests. Empty to skip them.')
+_NUM_WINDOWS = flags.DEFINE_integer(
+    'num_windows', 2, 'Application windows per synthetic forest.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed for the synthetic forests.')
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Directory of recorded forests to benchmark as well.')
+_BUILDERS = flags.DEFINE_list(
+    'builders', list(BUILDERS), 'Builders to benchmark.')
+_REPEATS = flags.DEFINE_integer('repeats', 20, 'Timed runs per case.')
+_MAX_SECONDS = flags.DEFINE_float(
+    'max_seconds', 10.0,
+    'Time budget per builder and case; slow cases get fewer runs.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _cases():
+    """Yields (case name, list of forests)."""
+    for size in _SIZES.value:
+        size = int(size)
+        forest = synthetic_forest.generate_forest(
+            size, seed=_SEED.value, num_windows=_NUM_WINDOWS.value,
+            include_keyboard=True)
+        yield f'synthetic-{size}', [forest]
+    if _CORPUS_DIR.value:
+        forests = forest_corpus.load_corpus(_CORPUS_DIR.value)
+        if not forests:
+            raise ValueError(f'No forests found in {_CORPUS_DIR.value}.')
+        yield f'corpus-{len(forests)}', forests
+
+
+def main(argv):
+    del argv
+    unknown = set(_BUILDERS.value) - set(BUILDERS)
+    if unknown:
+        raise app.UsageError(f'Unknown builders: {sorted(unknown)}')
+
+    measurements = []
+    for case, forests in _cases():
+        for name in _BUILDERS.value:
+            builder = BUILDERS[name]
+
+            def run_all(builder=builder, forests=forests):
+                return [builder(forest) for forest in forests]
+
+            with benchmark_utils.silence_stdout():
+                measurement = benchmark_utils.measure(
+                    name, case, run_all, repeats=_REPEATS.value,
+                    max_seconds=_MAX_SECONDS.value)
+            measurements.append(measurement)
+            print(benchmark_utils.format_table([measurement]).splitlines()[-1],
+                  flush=True)
+
+    print()
+    print(benchmark_utils.format_table(measurements))
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,135 @@
+"""Benchmarks the content-free screen signature and reports collision stats.
+
+Screens come from a recorded corpus (see android_world.utils.forest_corpus)
+or, without one, from a synthetic session in which every screen is revisited
+several times with different text. The statistics report how many distinct
+screens each identity keeps apart and whether two different structures ever
+share a signature.
+
+Usage:
+    python -m benchmarks.screen_signature_benchmark --corpus_dir=/tmp/forests
+    python -m benchmarks.screen_signature_benchmark --num_screens=100
+"""
+
+import collections
+import hashlib
+import random
+
+from absl import app
+from absl import flags
+from android_world.env import representation_utils
+from android_world.env import screen_signature
+from android_world.env import ui_element_table
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Directory of recorded forests; synthetic if unset.')
+_NUM_SCREENS = flags.DEFINE_integer(
+    'num_screens', 50, 'Distinct screens in the synthetic session.')
+_VISITS = flags.DEFINE_integer(
+    'visits', 4, 'Times each synthetic screen is revisited with new text.')
+_NUM_NODES = flags.DEFINE_integer(
+    'num_nodes', 300, 'Nodes per synthetic screen.')
+_BUCKET_PX = flags.DEFINE_integer(
+    'bucket_px', screen_signature.DEFAULT_BUCKET_PX, 'Layout grid size.')
+_REPEATS = flags.DEFINE_integer('repeats', 20, 'Timed runs per function.')
+
+
+def _synthetic_session():
+    rng = random.Random(0)
+    forests = []
+    for seed in range(_NUM_SCREENS.value):
+        for _ in range(_VISITS.value):
+            forest = synthetic_forest.generate_forest(_NUM_NODES.value, seed=seed)
+            for window in forest.windows:
+                for node in window.tree.nodes:
+                    if node.text:
+                        node.text = f'{node.text} {rng.randint(0, 999)}'
+            forests.append(forest)
+    return forests
+
+
+def _structure_key(elements, bucket_px):
+    """Exact, unhashed form of what the signature covers."""
+    table = ui_element_table.UIElementTable.from_ui_elements(elements)
+    buckets = screen_signature.layout_buckets(table, bucket_px).tolist()
+    return tuple(sorted(
+        (str(e.class_name), str(e.resource_name), str(e.package_name),
+         bool(e.is_checkable), bool(e.is_clickable), bool(e.is_editable),
+         bool(e.is_long_clickable), bool(e.is_scrollable), bool(e.is_visible),
+         tuple(cell))
+        for e, cell in zip(elements, buckets)))
+
+
+def _class_resource_signature(elements):
+    """The content-free state string of autodroid's DeviceState, hashed."""
+    views = {f'[class]{e.class_name}[resource_id]{e.resource_name}'
+             for e in elements}
+    return hashlib.md5(','.join(sorted(views)).encode('utf-8')).hexdigest()
+
+
+def main(argv):
+    del argv
+    if _CORPUS_DIR.value:
+        forests = forest_corpus.load_corpus(_CORPUS_DIR.value)
+        source = _CORPUS_DIR.value
+    else:
+        forests = _synthetic_session()
+        source = (f'synthetic: {_NUM_SCREENS.value} screens x '
+                  f'{_VISITS.value} visits')
+    screens = [
+        representation_utils.forest_to_ui_elements(
+            forest, exclude_invisible_elements=True)
+        for forest in forests
+    ]
+    tables = [ui_element_table.UIElementTable.from_ui_elements(elements)
+              for elements in screens]
+    bucket_px = _BUCKET_PX.value
+
+    signatures = [screen_signature.screen_signature(t, bucket_px)
+                  for t in tables]
+    by_signature = collections.defaultdict(set)
+    for elements, signature in zip(screens, signatures):
+        by_signature[signature].add(_structure_key(elements, bucket_px))
+    collisions = sum(len(keys) - 1 for keys in by_signature.values())
+
+    print(f'source: {source}')
+    print(f'observations:                   {len(screens)}')
+    print(f'distinct contents (table hash): '
+          f'{len({t.content_hash for t in tables})}')
+    print(f'distinct class/resource sets:   '
+          f'{len({_class_resource_signature(e) for e in screens})}')
+    print(f'distinct screen signatures:     {len(by_signature)}')
+    print(f'distinct structures:            '
+          f'{sum(len(keys) for keys in by_signature.values())}')
+    print(f'signature collisions:           {collisions}')
+    print()
+
+    mid = len(screens) // 2
+    elements, table = screens[mid], tables[mid]
+    case = f'{len(elements)} elements'
+    measurements = [
+        benchmark_utils.measure(
+            'signature (cached table)', case,
+            lambda: screen_signature.screen_signature(table, bucket_px),
+            repeats=_REPEATS.value),
+        benchmark_utils.measure(
+            'signature (from list)', case,
+            lambda: screen_signature.screen_signature(elements, bucket_px),
+            repeats=_REPEATS.value),
+        benchmark_utils.measure(
+            'class/resource md5', case,
+            lambda: _class_resource_signature(elements),
+            repeats=_REPEATS.value),
+        benchmark_utils.measure(
+            'content table', case,
+            lambda: ui_element_table.UIElementTable.from_ui_elements(elements),
+            repeats=_REPEATS.value),
+    ]
+    print(benchmark_utils.format_table(measurements))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,180 @@
+"""Counts the screenshot copies and memory of a VDroid episode.
+
+VDroid used to copy every observed screenshot into its state, copy it again
+for the screenshot writer, and hand out copies of the set-of-mark render; the
+marks of chosen actions were then drawn on the state's copy in place. It now
+shares read-only views (android_world.env.screenshot_buffer) and copies only
+to draw: once to render the marks and once per action mark.
+
+This replays an episode through both pipelines, saving every step like
+store_screen does and marking each step's screenshot with the action taken
+from it, and reports:
+  * copies: full-screenshot numpy copies per step, counted on the arrays the
+    pipeline is given (PIL's own encoding buffers are not included);
+  * peak / retained: tracemalloc peak and end-of-episode memory, with the
+    episode's states kept alive as in the search tree;
+  * p50: wall time of the replay.
+The screenshots themselves are allocated before tracing, as the environment
+would have, and are kept alive by both pipelines.
+
+Usage:
+    python -m benchmarks.screenshot_copy_benchmark --num_steps=20
+    python -m benchmarks.screenshot_copy_benchmark --corpus_dir=/tmp/forests
+"""
+
+import shutil
+import tempfile
+
+from absl import app
+from absl import flags
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+from android_world.env import screenshot_buffer
+from android_world.utils import forest_corpus
+from android_world.utils import screenshot_writer
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+import numpy as np
+
+_SCREEN_SIZE = (1080, 2400)
+_PHYSICAL_FRAME_BOUNDARY = (0, 0, 1080, 2400)
+_ORIENTATION = 0
+
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Recorded episode; one forest per step.')
+_NUM_STEPS = flags.DEFINE_integer(
+    'num_steps', 20, 'Steps of the synthetic episode.')
+_NUM_NODES = flags.DEFINE_integer(
+    'num_nodes', 300, 'Nodes per synthetic screen.')
+_REPEATS = flags.DEFINE_integer('repeats', 3, 'Timed replays per pipeline.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+class _CountedScreenshot(np.ndarray):
+    """Screenshot array counting the full copies made from it."""
+
+    copies = 0
+
+    def __array_finalize__(self, obj):
+        if (obj is not None and self.base is None
+                and self.nbytes == getattr(obj, 'nbytes', -1)):
+            _CountedScreenshot.copies += 1
+
+
+class _CopyingSetOfMarkScreenshot(m3a_utils.SetOfMarkScreenshot):
+    """The former conversion, which copied the render for every consumer."""
+
+    def __array__(self, dtype=None, copy=None):
+        del copy
+        rendered = self.render()
+        return rendered.copy() if dtype is None else rendered.astype(dtype)
+
+
+def _episode():
+    """Returns (case name, list of (ui_elements, pixels))."""
+    if _CORPUS_DIR.value:
+        forests = forest_corpus.load_corpus(_CORPUS_DIR.value)
+        if not forests:
+            raise ValueError(f'No forests found in {_CORPUS_DIR.value}.')
+        case = f'corpus-{len(forests)}'
+    else:
+        forests = [synthetic_forest.generate_forest(_NUM_NODES.value, seed=i)
+                   for i in range(_NUM_STEPS.value)]
+        case = f'synthetic-{len(forests)}x{_NUM_NODES.value}'
+    rng = np.random.default_rng(0)
+    steps = []
+    for forest in forests:
+        ui_elements = representation_utils.forest_to_ui_elements(
+            forest, exclude_invisible_elements=True)
+        pixels = rng.integers(
+            0, 256, size=(_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3),
+            dtype=np.uint8).view(_CountedScreenshot)
+        steps.append((ui_elements, pixels))
+    return case, steps
+
+
+def _mark(screenshot, ui_elements):
+    m3a_utils.add_ui_element_mark(
+        screenshot, ui_elements[0], 0, _SCREEN_SIZE,
+        _PHYSICAL_FRAME_BOUNDARY, _ORIENTATION)
+
+
+def _copying_step(ui_elements, pixels, parent):
+    state = {'screenshot_raw': pixels.copy()}
+    state['screenshot_som'] = _CopyingSetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY,
+        _ORIENTATION)
+    if parent is not None:
+        _mark(parent['screenshot_raw'], parent['ui_elements'])
+    return state, state['screenshot_raw'].copy()
+
+
+def _shared_step(ui_elements, pixels, parent):
+    state = {'screenshot_raw': screenshot_buffer.share(pixels)}
+    state['screenshot_som'] = m3a_utils.SetOfMarkScreenshot(
+        state['screenshot_raw'], ui_elements, _SCREEN_SIZE,
+        _PHYSICAL_FRAME_BOUNDARY, _ORIENTATION)
+    if parent is not None:
+        marked = screenshot_buffer.writable_copy(parent['screenshot_raw'])
+        _mark(marked, parent['ui_elements'])
+        parent['screenshot_raw'] = screenshot_buffer.share(marked)
+    return state, state['screenshot_raw']
+
+
+PIPELINES = {'copying': _copying_step, 'shared': _shared_step}
+
+
+def _replay(step_fn, steps):
+    """Runs an episode and returns its states, as the search tree keeps."""
+    directory = tempfile.mkdtemp()
+    config = screenshot_writer.WriterConfig(num_workers=1)
+    try:
+        with screenshot_writer.ScreenshotWriter(config) as writer:
+            states = []
+            parent = None
+            for index, (ui_elements, pixels) in enumerate(steps):
+                state, raw = step_fn(ui_elements, pixels, parent)
+                state['ui_elements'] = ui_elements
+                prefix = f'{directory}/iter_1_step{index + 1}'
+                writer.submit(prefix, raw)
+                writer.submit(prefix + '_ann', state['screenshot_som'])
+                writer.flush()
+                states.append(state)
+                parent = state
+    finally:
+        shutil.rmtree(directory)
+    return states
+
+
+def main(argv):
+    del argv
+    case, steps = _episode()
+    frame_mib = steps[0][1].nbytes / (1 << 20)
+    measurements = []
+    summary = {}
+    for name, step_fn in PIPELINES.items():
+        _CountedScreenshot.copies = 0
+        _replay(step_fn, steps)
+        copies = _CountedScreenshot.copies / len(steps)
+        peak_kib, retained_kib = benchmark_utils.measure_allocations(
+            lambda step_fn=step_fn: _replay(step_fn, steps))
+        measurement = benchmark_utils.measure(
+            name, case, lambda step_fn=step_fn: _replay(step_fn, steps),
+            repeats=_REPEATS.value, trace_allocations=False)
+        measurements.append(measurement)
+        summary[name] = (copies, peak_kib / 1024, retained_kib / 1024,
+                         measurement.p50_ms)
+
+    print(f'{case}, {frame_mib:.1f} MiB per screenshot')
+    print(f'{"pipeline":<9} {"copies/step":>11} {"peak MiB":>9} '
+          f'{"retained MiB":>13} {"p50 ms":>8}')
+    for name, (copies, peak, retained, p50) in summary.items():
+        print(f'{name:<9} {copies:11.2f} {peak:9.1f} {retained:13.1f} '
+              f'{p50:8.1f}')
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
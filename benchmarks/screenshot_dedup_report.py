@@ -0,0 +1,140 @@
+"""Reports the disk space screenshot deduplication saves on a run directory.
+
+Scans a run directory for saved screenshots (.jpg, .png, .webp) and episode
+checkpoints (.pkl.gz) and reports:
+  * screenshots: how many have the same decoded pixels as an earlier one, and
+    the bytes that writing them as hard links (ScreenshotWriter with
+    dedup='exact') saves; with --max_distance, the same for near duplicates
+    (dedup='perceptual'). Files that are already hard links are counted once.
+  * checkpoints: their size now and when re-pickled with the checkpointer's
+    array deduplication. Checkpoints written before it existed shrink;
+    checkpoints written since should not change.
+
+Usage:
+    python -m benchmarks.screenshot_dedup_report --run_dir=/tmp/runs/run_1
+    python -m benchmarks.screenshot_dedup_report --run_dir=/tmp/runs/run_1 \
+        --max_distance=4 --output_json=/tmp/dedup.json
+"""
+
+import json
+import os
+
+from absl import app
+from absl import flags
+from android_world import checkpointer
+from android_world.utils import image_dedup
+import numpy as np
+from PIL import Image
+
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+_RUN_DIR = flags.DEFINE_string('run_dir', None, 'Run directory to scan.')
+_MAX_DISTANCE = flags.DEFINE_integer(
+    'max_distance', None,
+    'Also count screenshots within this perceptual hash distance.')
+_CHECKPOINTS = flags.DEFINE_boolean(
+    'checkpoints', True, 'Whether to re-pickle the checkpoints found.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the report to.')
+
+
+def _find_files(run_dir):
+    """Returns (screenshot paths, checkpoint paths) below run_dir, sorted."""
+    screenshots, checkpoints = [], []
+    for root, _, names in os.walk(run_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.lower().endswith(_IMAGE_EXTENSIONS):
+                screenshots.append(path)
+            elif name.endswith('.pkl.gz'):
+                checkpoints.append(path)
+    return sorted(screenshots), sorted(checkpoints)
+
+
+def _screenshot_report(paths, max_distance):
+    """Counts duplicate screenshots and the bytes linking them saves."""
+    indices = {'exact': image_dedup.DuplicateIndex(image_dedup.EXACT)}
+    if max_distance is not None:
+        indices['perceptual'] = image_dedup.DuplicateIndex(
+            image_dedup.PERCEPTUAL, max_distance)
+    report = {'files': len(paths), 'unreadable': 0, 'bytes': 0}
+    for mode in indices:
+        report[mode] = {'duplicates': 0, 'bytes_saved': 0}
+    seen_inodes = set()
+    for path in paths:
+        stat = os.stat(path)
+        inode = (stat.st_dev, stat.st_ino)
+        if inode in seen_inodes:
+            continue
+        seen_inodes.add(inode)
+        report['bytes'] += stat.st_size
+        try:
+            with Image.open(path) as image:
+                pixels = np.asarray(image.convert('RGB'))
+        except OSError:
+            report['unreadable'] += 1
+            continue
+        for mode, index in indices.items():
+            if index.claim(index.key(pixels), path) is not None:
+                report[mode]['duplicates'] += 1
+                report[mode]['bytes_saved'] += stat.st_size
+    report['linked_files'] = len(paths) - len(seen_inodes)
+    return report
+
+
+def _checkpoint_report(paths):
+    """Compares checkpoint sizes with their deduplicated re-pickling."""
+    report = {'files': len(paths), 'unreadable': 0, 'bytes': 0,
+              'deduplicated_bytes': 0}
+    for path in paths:
+        try:
+            data = checkpointer._unzip_and_read_pickle(path)  # pylint: disable=protected-access
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f'Unable to load {path}: {e}')
+            report['unreadable'] += 1
+            continue
+        report['bytes'] += os.path.getsize(path)
+        report['deduplicated_bytes'] += len(
+            checkpointer._gzip_pickle(data))  # pylint: disable=protected-access
+    return report
+
+
+def _mib(num_bytes):
+    return f'{num_bytes / (1 << 20):.1f} MiB'
+
+
+def main(argv):
+    del argv
+    if not _RUN_DIR.value:
+        raise app.UsageError('--run_dir is required.')
+    screenshots, checkpoints = _find_files(_RUN_DIR.value)
+    report = {'screenshots': _screenshot_report(screenshots, _MAX_DISTANCE.value)}
+    if _CHECKPOINTS.value:
+        report['checkpoints'] = _checkpoint_report(checkpoints)
+
+    images = report['screenshots']
+    print(f'Screenshots: {images["files"]} files, '
+          f'{images["linked_files"]} already linked, {_mib(images["bytes"])}')
+    for mode in ('exact', 'perceptual'):
+        if mode in images:
+            saved = images[mode]['bytes_saved']
+            share = saved / images['bytes'] if images['bytes'] else 0.0
+            print(f'  {mode:<10} {images[mode]["duplicates"]:6d} duplicates, '
+                  f'{_mib(saved)} saved ({share:.1%})')
+    if images['unreadable']:
+        print(f'  {images["unreadable"]} files could not be decoded')
+    if 'checkpoints' in report:
+        pickles = report['checkpoints']
+        saved = pickles['bytes'] - pickles['deduplicated_bytes']
+        print(f'Checkpoints: {pickles["files"]} files, {_mib(pickles["bytes"])} '
+              f'-> {_mib(pickles["deduplicated_bytes"])} deduplicated '
+              f'({_mib(saved)} saved)')
+        if pickles['unreadable']:
+            print(f'  {pickles["unreadable"]} files could not be loaded')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
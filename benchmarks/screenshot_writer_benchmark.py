@@ -0,0 +1,171 @@
+"""Measures the step latency and disk size of saving VDroid screenshots.
+
+VDroid.store_screen used to encode and write the raw and annotated
+screenshots of every step on the agent thread. It now queues them on an
+android_world.utils.screenshot_writer.ScreenshotWriter. This replays an
+episode of synthetic screens and reports, for each encoder setting:
+  * sync: per-step time of encoding and writing both images inline;
+  * async: per-step time store_screen still spends (copying the raw
+    screenshot and queueing), plus the flush wait at episode end;
+  * the average on-disk size of a step's two files.
+Between steps the replay sleeps --step_seconds to stand in for the model
+calls, during which the writer threads catch up.
+
+Screens are drawn from synthetic forests as flat-colored element boxes on
+white, which compress roughly like app screens; random pixels would not.
+
+Usage:
+    python -m benchmarks.screenshot_writer_benchmark
+    python -m benchmarks.screenshot_writer_benchmark --num_steps=30 \
+        --settings=jpeg,webp:80:2
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+from android_world.utils import screenshot_writer
+from android_world.utils import synthetic_forest
+import numpy as np
+from PIL import Image
+
+_SCREEN_SIZE = (1080, 2400)
+_PHYSICAL_FRAME_BOUNDARY = (0, 0, 1080, 2400)
+
+_SETTINGS = flags.DEFINE_list(
+    'settings',
+    ['jpeg', 'jpeg:50', 'jpeg::2', 'png', 'png::2', 'webp:80', 'webp:80:2'],
+    'Encoder settings as FORMAT[:QUALITY[:DOWNSCALE]].')
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 20, 'Steps of the episode.')
+_NUM_NODES = flags.DEFINE_integer('num_nodes', 300, 'Nodes per screen.')
+_STEP_SECONDS = flags.DEFINE_float(
+    'step_seconds', 0.2, 'Sleep between steps standing in for model calls.')
+_NUM_WORKERS = flags.DEFINE_integer('num_workers', 2, 'Writer threads.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _parse_setting(setting):
+    image_format, quality, downscale = (setting.split(':') + ['', ''])[:3]
+    return screenshot_writer.WriterConfig(
+        image_format=image_format,
+        quality=int(quality) if quality else None,
+        downscale=int(downscale) if downscale else 1,
+        num_workers=_NUM_WORKERS.value)
+
+
+def _screen(seed):
+    """Returns (pixels, ui_elements) of a synthetic screen."""
+    forest = synthetic_forest.generate_forest(_NUM_NODES.value, seed=seed)
+    ui_elements = representation_utils.forest_to_ui_elements(
+        forest, exclude_invisible_elements=True)
+    pixels = np.full((_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3), 255, np.uint8)
+    rng = np.random.default_rng(seed)
+    for element in ui_elements:
+        box = element.bbox_pixels
+        if box is None:
+            continue
+        color = rng.integers(160, 256, size=3)
+        pixels[int(box.y_min):int(box.y_max),
+               int(box.x_min):int(box.x_max)] = color
+    return pixels, ui_elements
+
+
+def _steps():
+    return [_screen(seed) for seed in range(_NUM_STEPS.value)]
+
+
+def _annotated(pixels, ui_elements):
+    return m3a_utils.SetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY, 0)
+
+
+def _save(config, path, screenshot):
+    image = Image.fromarray(np.uint8(screenshot))
+    if config.downscale > 1:
+        image = image.reduce(config.downscale)
+    options = {} if config.quality is None else {'quality': config.quality}
+    image.save(path + config.extension, config.image_format.upper(), **options)
+
+
+def _replay_sync(config, steps, directory):
+    latencies = []
+    for index, (pixels, ui_elements) in enumerate(steps):
+        raw, annotated = pixels.copy(), _annotated(pixels, ui_elements)
+        start = time.perf_counter()
+        prefix = os.path.join(directory, f'iter_1_step{index + 1}')
+        _save(config, prefix, raw)
+        _save(config, prefix + '_ann', annotated)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(_STEP_SECONDS.value)
+    return latencies, 0.0
+
+
+def _replay_async(config, steps, directory):
+    latencies = []
+    with screenshot_writer.ScreenshotWriter(config) as writer:
+        for index, (pixels, ui_elements) in enumerate(steps):
+            raw, annotated = pixels.copy(), _annotated(pixels, ui_elements)
+            start = time.perf_counter()
+            prefix = os.path.join(directory, f'iter_1_step{index + 1}')
+            writer.submit(prefix, raw.copy())
+            writer.submit(prefix + '_ann', annotated)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(_STEP_SECONDS.value)
+        start = time.perf_counter()
+        writer.flush()
+        flush_seconds = time.perf_counter() - start
+        stats = writer.stats
+    if stats.num_failed:
+        raise AssertionError(f'{stats.num_failed} screenshots failed.')
+    return latencies, flush_seconds
+
+
+def _directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory))
+
+
+def main(argv):
+    del argv
+    steps = _steps()
+    results = []
+    for setting in _SETTINGS.value:
+        config = _parse_setting(setting)
+        for mode, replay in (('sync', _replay_sync), ('async', _replay_async)):
+            directory = tempfile.mkdtemp()
+            try:
+                latencies, flush_seconds = replay(config, steps, directory)
+                step_bytes = _directory_bytes(directory) / len(steps)
+            finally:
+                shutil.rmtree(directory)
+            results.append({
+                'setting': setting,
+                'mode': mode,
+                'p50_ms': float(np.percentile(latencies, 50)) * 1e3,
+                'p95_ms': float(np.percentile(latencies, 95)) * 1e3,
+                'flush_ms': flush_seconds * 1e3,
+                'kib_per_step': step_bytes / 1024,
+            })
+
+    print(f'{_NUM_STEPS.value} steps, {_STEP_SECONDS.value}s between steps, '
+          f'{_NUM_WORKERS.value} writer threads')
+    print(f'{"setting":<12} {"mode":<6} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"flush ms":>9} {"KiB/step":>9}')
+    for result in results:
+        print(f'{result["setting"]:<12} {result["mode"]:<6} '
+              f'{result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} '
+              f'{result["flush_ms"]:9.1f} {result["kib_per_step"]:9.1f}')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
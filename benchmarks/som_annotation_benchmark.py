@@ -0,0 +1,147 @@
+"""Measures the per-step CPU time of set-of-mark screenshot annotation.
+
+VDroid used to mark every observed screenshot (and compute the group
+bounding boxes) while stepping; it now wraps the screenshot in a
+m3a_utils.SetOfMarkScreenshot that draws only when the artifact is saved.
+This replays an episode and times, in CPU time per step:
+  * eager: the former per-step work;
+  * lazy: the work left when nothing is saved (if_store_screen=False);
+  * lazy+save: the lazy work plus rendering, as when every step is saved.
+Rendered images are checked to equal the eager ones.
+
+The episode is a corpus recorded with
+android_world.utils.forest_corpus.ForestRecorder (one forest per step), or a
+sequence of synthetic screens. Pixels are not recorded, so every step uses a
+random screenshot of the screen size; drawing cost does not depend on them.
+
+Usage:
+    python -m benchmarks.som_annotation_benchmark --num_steps=20
+    python -m benchmarks.som_annotation_benchmark --corpus_dir=/tmp/forests
+"""
+
+import functools
+import time
+
+from absl import app
+from absl import flags
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+from html_representation import bbox_representation
+import numpy as np
+
+_SCREEN_SIZE = (1080, 2400)
+_PHYSICAL_FRAME_BOUNDARY = (0, 0, 1080, 2400)
+_ORIENTATION = 0
+
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Recorded episode; one forest per step.')
+_NUM_STEPS = flags.DEFINE_integer(
+    'num_steps', 20, 'Steps of the synthetic episode.')
+_NUM_NODES = flags.DEFINE_integer(
+    'num_nodes', 300, 'Nodes per synthetic screen.')
+_ADD_IMAGE_DESC = flags.DEFINE_multi_enum(
+    'add_image_desc', ['false', 'true'], ['false', 'true'],
+    'VDroid add_image_desc settings to measure.')
+_REPEATS = flags.DEFINE_integer('repeats', 5, 'Timed replays per variant.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _episode():
+    """Returns (case name, list of (forest, ui_elements, pixels))."""
+    if _CORPUS_DIR.value:
+        forests = forest_corpus.load_corpus(_CORPUS_DIR.value)
+        if not forests:
+            raise ValueError(f'No forests found in {_CORPUS_DIR.value}.')
+        case = f'corpus-{len(forests)}'
+    else:
+        forests = [synthetic_forest.generate_forest(_NUM_NODES.value, seed=i)
+                   for i in range(_NUM_STEPS.value)]
+        case = f'synthetic-{len(forests)}x{_NUM_NODES.value}'
+    rng = np.random.default_rng(0)
+    steps = []
+    for forest in forests:
+        ui_elements = representation_utils.forest_to_ui_elements(
+            forest, exclude_invisible_elements=True)
+        pixels = rng.integers(
+            0, 256, size=(_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3), dtype=np.uint8)
+        steps.append((forest, ui_elements, pixels))
+    return case, steps
+
+
+def _eager(forest, ui_elements, pixels, add_image_desc):
+    raw = pixels.copy()
+    annotated = pixels.copy()
+    m3a_utils.add_ui_element_marks(
+        annotated, ui_elements, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY,
+        _ORIENTATION, add_image_desc=add_image_desc)
+    group_bounding_boxes = bbox_representation.turn_tree_to_group_bounding_boxes(
+        _ORIENTATION, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY, forest)
+    if add_image_desc:
+        m3a_utils.apply_group_bouding_boxes(annotated, group_bounding_boxes)
+    return raw, annotated.copy()
+
+
+def _lazy(forest, ui_elements, pixels, add_image_desc):
+    group_bounding_boxes = None
+    if add_image_desc:
+        group_bounding_boxes = functools.partial(
+            bbox_representation.turn_tree_to_group_bounding_boxes,
+            _ORIENTATION, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY, forest)
+    return pixels.copy(), m3a_utils.SetOfMarkScreenshot(
+        pixels, ui_elements, _SCREEN_SIZE, _PHYSICAL_FRAME_BOUNDARY,
+        _ORIENTATION, add_image_desc=add_image_desc,
+        group_bounding_boxes=group_bounding_boxes)
+
+
+def _lazy_saved(forest, ui_elements, pixels, add_image_desc):
+    raw, screenshot = _lazy(forest, ui_elements, pixels, add_image_desc)
+    return raw, screenshot.render()
+
+
+VARIANTS = {'eager': _eager, 'lazy': _lazy, 'lazy+save': _lazy_saved}
+
+
+def main(argv):
+    del argv
+    case, steps = _episode()
+    measurements = []
+    per_step = {}
+    for setting in _ADD_IMAGE_DESC.value:
+        add_image_desc = setting == 'true'
+        for step in steps:
+            _, eager = _eager(*step, add_image_desc)
+            _, lazy = _lazy_saved(*step, add_image_desc)
+            if not np.array_equal(eager, lazy):
+                raise AssertionError('Lazy annotation differs from eager.')
+        for name, variant in VARIANTS.items():
+
+            def replay(variant=variant, add_image_desc=add_image_desc):
+                return [variant(*step, add_image_desc) for step in steps]
+
+            measurement = benchmark_utils.measure(
+                f'{name}/desc={setting}', case, replay,
+                repeats=_REPEATS.value, trace_allocations=False,
+                clock=time.process_time)
+            measurements.append(measurement)
+            per_step[(name, setting)] = measurement.p50_ms / len(steps)
+
+    print(benchmark_utils.format_table(measurements))
+    print()
+    print('CPU ms per step (p50 of replays / steps):')
+    for setting in _ADD_IMAGE_DESC.value:
+        eager = per_step[('eager', setting)]
+        lazy = per_step[('lazy', setting)]
+        saved = per_step[('lazy+save', setting)]
+        print(f'  add_image_desc={setting:<5} eager {eager:7.2f}  '
+              f'lazy {lazy:7.2f} (saves {eager - lazy:6.2f})  '
+              f'lazy+save {saved:7.2f} (saves {eager - saved:6.2f})')
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,135 @@
+"""Counts the screenshots taken while waiting for the screen to stabilize.
+
+AsyncAndroidEnv.get_state(wait_to_stabilize=True), which
+base_agent.get_post_transition_state uses, fetched a full state, screenshot
+included, for every poll although only the UI elements were compared. It now
+polls the UI tree alone and takes one screenshot once the tree is stable.
+
+This replays random transitions (android_world.utils.simulated_screen)
+against a controller on a virtual clock whose observations cost
+--screenshot_ms + --tree_ms and whose UI tree reads cost --tree_ms, and
+reports per transition the screenshots taken, tree reads, the device time
+they cost, the wait, and how often the returned state missed the last
+change.
+
+Usage:
+    python -m benchmarks.stability_probe_benchmark
+    python -m benchmarks.stability_probe_benchmark --screenshot_ms=120 \
+        --tree_ms=40 --num_transitions=500
+"""
+
+import json
+import random
+
+from absl import app
+from absl import flags
+from android_world.env import android_world_controller
+from android_world.env import interface
+from android_world.env import representation_utils
+from android_world.env import ui_stabilizer
+from android_world.utils import simulated_screen
+import numpy as np
+
+_SCREEN_SIZE = (1080, 2400)
+
+_NUM_TRANSITIONS = flags.DEFINE_integer(
+    'num_transitions', 300, 'Simulated transitions per mode.')
+_SCREENSHOT_MS = flags.DEFINE_float(
+    'screenshot_ms', 80.0, 'Virtual time of capturing a screenshot.')
+_TREE_MS = flags.DEFINE_float(
+    'tree_ms', 40.0, 'Virtual time of reading the a11y tree.')
+_SETTLE_SECONDS = flags.DEFINE_float(
+    'settle_seconds', 1.5, 'StabilizerConfig.settle_seconds.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed of the transitions.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the results to.')
+
+
+class _Timestep:
+
+    def __init__(self, observation):
+        self.observation = observation
+
+
+class SimulatedController:
+    """Controller showing a simulated screen and counting screenshots."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self.screen = None
+        self.screenshots = 0
+        self.tree_reads = 0
+        self._pixels = np.zeros((_SCREEN_SIZE[1], _SCREEN_SIZE[0], 3),
+                                np.uint8)
+
+    def get_ui_elements(self):
+        self.tree_reads += 1
+        self._clock.sleep(_TREE_MS.value / 1e3)
+        return [representation_utils.UIElement(
+            text=f'content {self.screen.content()}', is_clickable=True)]
+
+    def step(self, unused_action):
+        self.screenshots += 1
+        self._clock.sleep(_SCREENSHOT_MS.value / 1e3)
+        return _Timestep({
+            'pixels': self._pixels,
+            android_world_controller.OBSERVATION_KEY_FOREST: None,
+            android_world_controller.OBSERVATION_KEY_UI_ELEMENTS:
+                self.get_ui_elements(),
+        })
+
+
+def _replay(transitions, use_probes):
+    clock = simulated_screen.VirtualClock()
+    controller = SimulatedController(clock)
+    env = interface.AsyncAndroidEnv(controller)
+    env._stabilizer = ui_stabilizer.UIStabilizer(  # pylint: disable=protected-access
+        ui_stabilizer.StabilizerConfig(
+            settle_seconds=_SETTLE_SECONDS.value, use_probes=use_probes),
+        clock=clock.time, sleep=clock.sleep)
+    missed = 0
+    for change_times in transitions:
+        controller.screen = simulated_screen.SimulatedScreen(
+            clock, change_times)
+        state = env.get_state(wait_to_stabilize=True)
+        final = f'content {len(change_times)}'
+        missed += state.ui_elements[0].text != final
+        clock.sleep(max(0.0, controller.screen.settled_at - clock.time()))
+    histogram = env.stabilizer.histogram
+    return {
+        'mode': 'probes' if use_probes else 'full states',
+        'screenshots': controller.screenshots / len(transitions),
+        'tree_reads': controller.tree_reads / len(transitions),
+        'device_ms': (controller.screenshots * _SCREENSHOT_MS.value
+                      + controller.tree_reads * _TREE_MS.value)
+                     / len(transitions),
+        'wait_mean_s': histogram.mean_seconds,
+        'missed_rate': missed / len(transitions),
+    }
+
+
+def main(argv):
+    del argv
+    rng = random.Random(_SEED.value)
+    transitions = [simulated_screen.random_transition(rng)
+                   for _ in range(_NUM_TRANSITIONS.value)]
+    results = [_replay(transitions, use_probes)
+               for use_probes in (False, True)]
+
+    print(f'{len(transitions)} transitions, screenshot '
+          f'{_SCREENSHOT_MS.value:.0f} ms, tree {_TREE_MS.value:.0f} ms, '
+          f'settle {_SETTLE_SECONDS.value} s')
+    print(f'{"mode":<12} {"screenshots":>11} {"tree reads":>10} '
+          f'{"device ms":>9} {"wait s":>7} {"missed":>7}')
+    for result in results:
+        print(f'{result["mode"]:<12} {result["screenshots"]:11.2f} '
+              f'{result["tree_reads"]:10.2f} {result["device_ms"]:9.0f} '
+              f'{result["wait_mean_s"]:7.2f} '
+              f'{result["missed_rate"]:7.1%}')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
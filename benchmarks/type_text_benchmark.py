@@ -0,0 +1,107 @@
+"""Compares word-by-word and bulk typing in adb_utils.type_text.
+
+type_text used to issue one adb request per word, space and newline, each
+starting `input` on the device. It now types lines of printable ASCII with
+one `input text` per chunk of up to 100 characters, sending consecutive
+lines as one shell command. For a few typical texts this counts, per mode,
+the adb requests and `input` invocations issued, and estimates the device
+time from them:
+  adb requests * --adb_request_ms + input invocations * --input_ms
+where --input_ms stands for starting `input` (an app_process) on the device
+and --adb_request_ms for starting adb and reaching the device; with a
+persistent shell session (adb_shell_session) the latter mostly disappears.
+Typing itself (one key event per character) costs the same in both modes
+and is left out.
+
+Usage:
+    python -m benchmarks.type_text_benchmark
+    python -m benchmarks.type_text_benchmark --input_ms=400 --adb_request_ms=20
+"""
+
+import json
+
+from absl import app
+from absl import flags
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+
+TEXTS = {
+    'search': 'weather in paris',
+    'title': 'Quarterly report: Q3 (draft) & notes',
+    'note': (
+        'Remember to buy milk, eggs, bread and coffee on the way home. '
+        'Call the dentist before 5pm to move the appointment to next week, '
+        'and send the slides to the team by Friday morning; ask about the '
+        "budget numbers if they're still missing."
+    ),
+    'message': (
+        'Hi Sam,\n\nThanks for the update. The meeting is moved to 3pm.\n'
+        'Please bring the printed agenda.\n\nBest,\nAlex'
+    ),
+    'unicode': 'Café at 5 — see you there 😀\nok',
+}
+
+_INPUT_MS = flags.DEFINE_float(
+    'input_ms', 250.0, 'Device time to start one `input` command.')
+_ADB_REQUEST_MS = flags.DEFINE_float(
+    'adb_request_ms', 40.0, 'Time to issue one adb request.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the results to.')
+
+
+class _CountingEnv:
+    """Accepts adb requests and counts them and the `input` calls in them."""
+
+    def __init__(self):
+        self.num_requests = 0
+        self.num_inputs = 0
+
+    def execute_adb_call(self, request):
+        self.num_requests += 1
+        if request.HasField('generic'):
+            command = ' '.join(request.generic.args[1:])
+            self.num_inputs += sum(
+                part.startswith('input ') for part in command.split(' && '))
+        else:
+            self.num_inputs += 1
+        return adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+
+
+def _estimate_ms(env):
+    return (env.num_requests * _ADB_REQUEST_MS.value
+            + env.num_inputs * _INPUT_MS.value)
+
+
+def main(argv):
+    del argv
+    results = []
+    for name, text in TEXTS.items():
+        result = {'text': name, 'chars': len(text)}
+        for mode, bulk in (('words', False), ('bulk', True)):
+            env = _CountingEnv()
+            adb_utils.type_text(text, env, bulk=bulk)
+            result[mode] = {'requests': env.num_requests,
+                            'inputs': env.num_inputs,
+                            'estimated_ms': _estimate_ms(env)}
+        results.append(result)
+
+    print(f'input {_INPUT_MS.value:.0f} ms, adb request '
+          f'{_ADB_REQUEST_MS.value:.0f} ms')
+    print(f'{"text":<8} {"chars":>5} {"words req/input":>16} '
+          f'{"bulk req/input":>15} {"words ms":>9} {"bulk ms":>8} '
+          f'{"saved":>6}')
+    for result in results:
+        words, bulk = result['words'], result['bulk']
+        saved = 1 - bulk['estimated_ms'] / words['estimated_ms']
+        print(f'{result["text"]:<8} {result["chars"]:5d} '
+              f'{words["requests"]:>8d}/{words["inputs"]:<7d} '
+              f'{bulk["requests"]:>7d}/{bulk["inputs"]:<7d} '
+              f'{words["estimated_ms"]:9.0f} {bulk["estimated_ms"]:8.0f} '
+              f'{saved:6.0%}')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,160 @@
+"""Compares UI stabilization strategies on simulated screen transitions.
+
+AsyncAndroidEnv used to poll every 0.5 s until three consecutive
+observations matched the first one, which takes at least 1.5 s per
+transition. It now uses android_world.env.ui_stabilizer, which compares
+digests, polls adaptively and can wait for accessibility events to stop.
+
+This replays random transitions (android_world.utils.simulated_screen) on
+a virtual clock and reports, per strategy:
+  * wait: seconds from the first fetch to the returned observation;
+  * overshoot: seconds the wait lasted past the screen's last change;
+  * fetches: observations per transition;
+  * false-stable: share of transitions returned before the last change.
+Pauses in a transition longer than 0.2 s can emit accessibility events every
+0.1 s (--loading_events), as a progress indicator does.
+
+Usage:
+    python -m benchmarks.ui_stabilizer_benchmark
+    python -m benchmarks.ui_stabilizer_benchmark --num_transitions=2000 \
+        --fetch_ms=250 --max_pause=3
+"""
+
+import json
+import random
+
+from absl import app
+from absl import flags
+from android_world.env import ui_stabilizer
+from android_world.utils import simulated_screen
+import numpy as np
+
+_NUM_TRANSITIONS = flags.DEFINE_integer(
+    'num_transitions', 1000, 'Simulated transitions per strategy.')
+_FETCH_MS = flags.DEFINE_float(
+    'fetch_ms', 150.0, 'Virtual time one observation takes.')
+_MAX_PAUSE = flags.DEFINE_float(
+    'max_pause', 1.5, 'Longest pause within a transition, in seconds.')
+_LOADING_EVENTS = flags.DEFINE_boolean(
+    'loading_events', True, 'Whether pauses emit accessibility events.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed of the transitions.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the results to.')
+
+
+class LegacyStabilizer:
+    """The former AsyncAndroidEnv._get_stable_state loop."""
+
+    def __init__(self, clock, stability_threshold=3, sleep_duration=0.5,
+                 timeout=120.0):
+        self._clock = clock
+        self._stability_threshold = stability_threshold
+        self._sleep_duration = sleep_duration
+        self._timeout = timeout
+
+    def wait(self, fetch):
+        prior = fetch()
+        stable_checks = 0
+        elapsed_time = 0.0
+        current = fetch()
+        while (stable_checks < self._stability_threshold
+               and elapsed_time < self._timeout):
+            if prior == current:
+                stable_checks += 1
+                if stable_checks == self._stability_threshold:
+                    break
+            else:
+                stable_checks = 0
+                prior = current
+            self._clock.sleep(self._sleep_duration)
+            elapsed_time += self._sleep_duration
+            current = fetch()
+        return current
+
+
+def _strategies(clock, screen_events):
+    def adaptive(**config):
+        return ui_stabilizer.UIStabilizer(
+            ui_stabilizer.StabilizerConfig(**config),
+            digest=lambda content: content,
+            last_event_time=lambda: screen_events[0].last_event_time(),
+            clock=clock.time, sleep=clock.sleep)
+
+    return {
+        'legacy (3 x 0.5 s)': LegacyStabilizer(clock),
+        'settle 0.3 s': adaptive(settle_seconds=0.3),
+        'settle 0.5 s': adaptive(settle_seconds=0.5),
+        'settle 1.0 s': adaptive(settle_seconds=1.0),
+        'settle 1.5 s (default)': adaptive(),
+        'settle 0.5 s + events': adaptive(settle_seconds=0.5,
+                                          event_quiet_seconds=0.3),
+        'settle 1.0 s + events': adaptive(settle_seconds=1.0,
+                                          event_quiet_seconds=0.3),
+    }
+
+
+def _loading_events(change_times):
+    """Events every 0.1 s during the pauses of a transition."""
+    events = []
+    previous = 0.0
+    for change in change_times:
+        if change - previous > 0.2:
+            events.extend(np.arange(previous + 0.1, change, 0.1).tolist())
+        previous = change
+    return events
+
+
+def main(argv):
+    del argv
+    rng = random.Random(_SEED.value)
+    transitions = [
+        simulated_screen.random_transition(rng, max_pause=_MAX_PAUSE.value)
+        for _ in range(_NUM_TRANSITIONS.value)]
+    clock = simulated_screen.VirtualClock()
+    current_screen = [None]
+    results = []
+    for name, stabilizer in _strategies(clock, current_screen).items():
+        waits, overshoots, fetches, false_stable = [], [], [], 0
+        for change_times in transitions:
+            screen = simulated_screen.SimulatedScreen(
+                clock, change_times, fetch_seconds=_FETCH_MS.value / 1e3,
+                event_times=(_loading_events(change_times)
+                             if _LOADING_EVENTS.value else ()))
+            current_screen[0] = screen
+            start = clock.time()
+            stabilizer.wait(screen.fetch)
+            waits.append(clock.time() - start)
+            fetches.append(screen.num_fetches)
+            if clock.time() < screen.settled_at:
+                false_stable += 1
+            else:
+                overshoots.append(clock.time() - screen.settled_at)
+            # Let the screen finish before the next action.
+            clock.sleep(max(0.0, screen.settled_at - clock.time()))
+        results.append({
+            'strategy': name,
+            'wait_p50_s': float(np.percentile(waits, 50)),
+            'wait_p95_s': float(np.percentile(waits, 95)),
+            'overshoot_mean_s': float(np.mean(overshoots or [0.0])),
+            'fetches_mean': float(np.mean(fetches)),
+            'false_stable_rate': false_stable / len(transitions),
+        })
+
+    print(f'{len(transitions)} transitions, {_FETCH_MS.value:.0f} ms per '
+          f'fetch, pauses up to {_MAX_PAUSE.value} s, loading events '
+          f'{"on" if _LOADING_EVENTS.value else "off"}')
+    print(f'{"strategy":<24} {"wait p50":>9} {"wait p95":>9} '
+          f'{"overshoot":>10} {"fetches":>8} {"false-stable":>13}')
+    for result in results:
+        print(f'{result["strategy"]:<24} {result["wait_p50_s"]:9.2f} '
+              f'{result["wait_p95_s"]:9.2f} '
+              f'{result["overshoot_mean_s"]:10.2f} '
+              f'{result["fetches_mean"]:8.1f} '
+              f'{result["false_stable_rate"]:13.1%}')
+    if _OUTPUT_JSON.value:
+        with open(_OUTPUT_JSON.value, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    app.run(main)
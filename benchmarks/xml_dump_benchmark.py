@@ -0,0 +1,87 @@
+"""Benchmarks parsing uiautomator XML dumps into UI elements.
+
+Compares the DOM-based reference parser with the streaming one on dumps
+rendered from synthetic forests and, optionally, on dumps recorded with
+android_world.utils.forest_corpus.ForestRecorder. Every dump is checked to
+parse to identical elements before it is timed.
+
+Usage:
+    python -m benchmarks.xml_dump_benchmark --sizes=100,1000,10000
+    python -m benchmarks.xml_dump_benchmark --corpus_dir=/tmp/forests --sizes=
+"""
+
+from absl import app
+from absl import flags
+from android_world.env import representation_utils
+from android_world.utils import forest_corpus
+from android_world.utils import synthetic_forest
+from benchmarks import benchmark_utils
+
+PARSERS = {
+    'dom': representation_utils._xml_dump_to_ui_elements_dom,
+    'streaming': representation_utils.xml_dump_to_ui_elements,
+}
+
+_SIZES = flags.DEFINE_list(
+    'sizes', ['100', '1000', '10000'],
+    'Node counts of the synthetic dumps. Empty to skip them.')
+_SEED = flags.DEFINE_integer('seed', 0, 'Seed for the synthetic dumps.')
+_CORPUS_DIR = flags.DEFINE_string(
+    'corpus_dir', None, 'Corpus directory with recorded dump_*.xml files.')
+_REPEATS = flags.DEFINE_integer('repeats', 20, 'Timed runs per case.')
+_MAX_SECONDS = flags.DEFINE_float(
+    'max_seconds', 10.0, 'Time budget per parser and case.')
+_OUTPUT_JSON = flags.DEFINE_string(
+    'output_json', None, 'Optional path to write the measurements to.')
+
+
+def _cases():
+    """Yields (case name, list of dumps)."""
+    for size in _SIZES.value:
+        forest = synthetic_forest.generate_forest(int(size), seed=_SEED.value)
+        yield f'synthetic-{size}', [synthetic_forest.forest_to_xml_dump(forest)]
+    if _CORPUS_DIR.value:
+        dumps = [forest_corpus.load_dump(path)
+                 for path in forest_corpus.dump_paths(_CORPUS_DIR.value)]
+        if not dumps:
+            raise ValueError(f'No dumps found in {_CORPUS_DIR.value}.')
+        yield f'corpus-{len(dumps)}', dumps
+
+
+def main(argv):
+    del argv
+    measurements = []
+    throughput = []
+    for case, dumps in _cases():
+        reference = [PARSERS['dom'](dump) for dump in dumps]
+        for dump, expected in zip(dumps, reference):
+            if PARSERS['streaming'](dump) != expected:
+                raise AssertionError(f'Parsers disagree on a dump of {case}.')
+        num_bytes = sum(len(dump.encode('utf-8')) for dump in dumps)
+        num_nodes = sum(len(elements) for elements in reference)
+        for name, parser in PARSERS.items():
+
+            def run_all(parser=parser, dumps=dumps):
+                return [parser(dump) for dump in dumps]
+
+            measurement = benchmark_utils.measure(
+                name, case, run_all, repeats=_REPEATS.value,
+                max_seconds=_MAX_SECONDS.value)
+            measurements.append(measurement)
+            seconds = measurement.p50_ms / 1e3
+            throughput.append(
+                f'{case:<18} {name:<10} {num_bytes / seconds / 2**20:8.1f} MiB/s '
+                f'{num_nodes / seconds / 1e3:8.1f} k nodes/s')
+            print(benchmark_utils.format_table([measurement]).splitlines()[-1],
+                  flush=True)
+
+    print()
+    print(benchmark_utils.format_table(measurements))
+    print()
+    print('\n'.join(throughput))
+    if _OUTPUT_JSON.value:
+        benchmark_utils.write_json(_OUTPUT_JSON.value, measurements)
+
+
+if __name__ == '__main__':
+    app.run(main)
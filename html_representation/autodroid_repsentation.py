@@ -76,6 +76,105 @@ class Polished_UIElement:
     display_id: Optional[str] = None
 
 
+class _ViewIndex(object):
+    """Derived tree properties of one window's views, each computed once.
+
+    Ancestor chains and the nearest ancestor with a given flag are filled
+    top-down along the parent links and shared by every view below; the
+    descendant lists of `DeviceState._extract_all_children` are memoized
+    per source view. The views must not change once indexed.
+    """
+
+    def __init__(self, views, view_graph=None):
+        self.views = views
+        self.view_graph = view_graph
+        self._ancestors = {}
+        self._nearest = {}
+        self._descendants = {}
+
+    @staticmethod
+    def _parent_id(view):
+        parent_id = getattr(view, 'parent', None)
+        return -1 if parent_id is None else parent_id
+
+    def _in_range(self, view_id):
+        return 0 <= view_id < len(self.views)
+
+    def _check_chain(self, chain):
+        # A parent cycle made the recursive lookups this replaces overflow.
+        if len(chain) > len(self.views):
+            raise RecursionError('Cyclic parent links between views.')
+
+    def ancestors(self, view):
+        """Returns the ids of the view's ancestors, nearest first."""
+        chain = []
+        parent_id = self._parent_id(view)
+        while self._in_range(parent_id) and parent_id not in self._ancestors:
+            chain.append(parent_id)
+            self._check_chain(chain)
+            parent_id = self._parent_id(self.views[parent_id])
+        above = self._ancestors.get(parent_id, ())
+        for view_id in reversed(chain):
+            above = (view_id,) + above
+            self._ancestors[view_id] = above
+        first = self._parent_id(view)
+        return self._ancestors[first] if self._in_range(first) else ()
+
+    def nearest_ancestor(self, view, key):
+        """Returns the id of the nearest ancestor whose `key` is truthy."""
+        memo = self._nearest.setdefault(key, {})
+        chain = []
+        parent_id = self._parent_id(view)
+        while self._in_range(parent_id) and parent_id not in memo:
+            chain.append(parent_id)
+            self._check_chain(chain)
+            if getattr(self.views[parent_id], key, None):
+                nearest = parent_id
+                break
+            parent_id = self._parent_id(self.views[parent_id])
+        else:
+            nearest = memo.get(parent_id)
+        for view_id in chain:
+            memo[view_id] = nearest
+        return nearest
+
+    def self_or_ancestor_property(self, view, key, default=None):
+        value = getattr(view, key, None)
+        if value:
+            return value
+        nearest = self.nearest_ancestor(view, key)
+        if nearest is None:
+            return default
+        return getattr(self.views[nearest], key)
+
+    def self_or_ancestor_resource_id(self, view, key, default=None):
+        if getattr(view, key, None):
+            return view.resource_id
+        nearest = self.nearest_ancestor(view, key)
+        if nearest is None:
+            return default
+        return self.views[nearest].resource_id
+
+    def descendants(self, view_id):
+        """Returns the successors of view_id in the view graph, DFS-grouped."""
+        successors = self._descendants.get(view_id)
+        if successors is None:
+            try:
+                successors_of_view = nx.dfs_successors(
+                    self.view_graph, source=view_id, depth_limit=100)
+            except:
+                successors_of_view = {}
+            successors = []
+            seen = {view_id}
+            for successor_ids in successors_of_view.values():
+                for successor_id in successor_ids:
+                    if successor_id not in seen:
+                        seen.add(successor_id)
+                        successors.append(successor_id)
+            self._descendants[view_id] = successors
+        return list(successors)
+
+
 class DeviceState(object):
     """
     the state of the current device
@@ -93,6 +192,16 @@ class DeviceState(object):
     def activity_short_name(self):
         return self.foreground_activity.split('.')[-1]
 
+    def _view_index(self):
+        """Returns the memoized tree properties of the current window."""
+        index = getattr(self, '_cached_view_index', None)
+        view_graph = getattr(self, 'view_graph', None)
+        if index is None or index.views is not self.views or \
+                index.view_graph is not view_graph:
+            index = _ViewIndex(self.views, view_graph)
+            self._cached_view_index = index
+        return index
+
     def _save_important_view_ids(self):
         _, _, _, important_view_ids = self.get_described_actions(
             remove_time_and_ip=False)
@@ -473,12 +582,7 @@ class DeviceState(object):
         :param view_dict: dict, an element of DeviceState.views
         :return: list of int, each int is an ancestor node id
         """
-        result = []
-        parent_id = self.__safe_ele_get(view_dict, 'parent', -1)
-        if 0 <= parent_id < len(self.views):
-            result.append(parent_id)
-            result += self.get_all_ancestors(self.views[parent_id])
-        return result
+        return list(self._view_index().ancestors(view_dict))
 
     def get_all_children(self, view_dict):
         """
@@ -573,13 +677,7 @@ class DeviceState(object):
     #     return [] + possible_events
 
     def _get_self_ancestors_property(self, view, key, default=None):
-        all_views = [view] + [self.views[i]
-                              for i in self.get_all_ancestors(view)]
-        for v in all_views:
-            value = self.__safe_ele_get(v, key)
-            if value:
-                return value
-        return default
+        return self._view_index().self_or_ancestor_property(view, key, default)
 
     def _merge_text(self, view_text, content_description):
         text = ''
@@ -767,32 +865,11 @@ class DeviceState(object):
                         break
 
     def _get_ancestor_id(self, view, key, default=None):
-        if self.__safe_ele_get(view, key=key, default=False):
-            return view.resource_id
-        all_views = [view] + [self.views[i]
-                              for i in self.get_all_ancestors(view)]
-        for v in all_views:
-            value = self.__safe_ele_get(v, key)
-            if value:
-                return v.resource_id
-        return default
+        return self._view_index().self_or_ancestor_resource_id(
+            view, key, default)
 
     def _extract_all_children(self, id):
-        successors = []
-        try:
-            successors_of_view = nx.dfs_successors(
-                self.view_graph, source=id, depth_limit=100)
-        except:
-            successors_of_view = None
-            # print("id too large")
-            return []
-
-        for k, v in successors_of_view.items():
-            for successor_id in v:
-                if successor_id not in successors and successor_id != id:
-                    successors.append(successor_id)
-
-        return successors
+        return self._view_index().descendants(id)
         # if len(self.viewtree.children(id)) == 0:
         #     return
         # else:
@@ -1283,6 +1360,7 @@ class DeviceState(object):
                     ['android:id/navigationBarBackground',
                      'android:id/statusBarBackground']:
                 enabled_view_ids.append(view_dict.unique_id)
+        enabled_view_id_set = set(enabled_view_ids)
 
         # enabled_view_ids_groups.append(enabled_view_ids)
 
@@ -1296,7 +1374,7 @@ class DeviceState(object):
 
         view_descs = []
         available_actions = []
-        removed_view_ids = []
+        removed_view_ids = set()
 
         important_view_ids = []
 
@@ -1454,8 +1532,8 @@ class DeviceState(object):
 
                 if group_buttons:
                     for clickable_child in clickable_children_ids:
-                        if clickable_child in enabled_view_ids and clickable_child != view_id:
-                            removed_view_ids.append(clickable_child)
+                        if clickable_child in enabled_view_id_set and clickable_child != view_id:
+                            removed_view_ids.add(clickable_child)
 
             elif scrollable:
                 # print(view_id, 'continued')
@@ -0,0 +1,212 @@
+"""Tests for autodroid_repsentation."""
+
+import contextlib
+import hashlib
+import io
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_env.proto.a11y import android_accessibility_forest_pb2
+from android_world.utils import synthetic_forest
+from html_representation import autodroid_repsentation
+
+_FLAGS = ('clickable', 'checkable', 'long_clickable')
+
+_NODES = (
+    (0, [1, 5, 6, 7], {'class_name': 'android.widget.FrameLayout'}),
+    (1, [2, 3, 4], {'class_name': 'android.widget.LinearLayout',
+                    'is_clickable': True}),
+    (2, [], {'class_name': 'android.widget.TextView', 'text': 'Wi-Fi'}),
+    (3, [], {'class_name': 'android.widget.TextView',
+             'text': 'Connected 12:30'}),
+    (4, [], {'class_name': 'android.widget.Switch', 'is_checkable': True,
+             'is_checked': True, 'is_clickable': True}),
+    (5, [], {'class_name': 'android.widget.EditText', 'is_editable': True,
+             'content_description': 'Search', 'text': 'cafe'}),
+    (6, [8, 9], {'class_name': 'androidx.recyclerview.widget.RecyclerView',
+                 'is_scrollable': True}),
+    (7, [], {'class_name': 'android.widget.ImageButton',
+             'is_clickable': True, 'content_description': 'More options'}),
+    (8, [], {'class_name': 'android.widget.TextView',
+             'text': 'Mon 3 Jan', 'is_long_clickable': True}),
+    (9, [], {'class_name': 'android.widget.TextView', 'text': 'Hidden',
+             'is_visible_to_user': False}),
+)
+
+# Produced by the recursive, unmemoized traversal.
+_GOLDEN_STATE_STR = (
+    '<div class="button-group">\n'
+    '    <button id=0>Wi-Fi</button>\n'
+    '    <button id=1>Connected 12:30</button>\n'
+    '    <button id=2></button>\n'
+    '</div>\n'
+    "<input id=3 text='Search'>cafe</input>\n"
+    "<button id=5 text='More options'></button>\n"
+    '<p id=6>Mon 3 Jan</p>\n'
+)
+_GOLDEN_DESCRIBED_WITHOUT_TIME = (
+    '<div class="button-group">\n'
+    '    <button id=0>Wi-Fi</button>\n'
+    '    <button id=1></button>\n'
+    '    <button id=2></button>\n'
+    '</div>\n'
+    "<input id=3 text='Search'>cafe</input>\n"
+    "<button id=5 text='More options'></button>\n"
+    '<p id=6> 3 </p>'
+)
+_GOLDEN_IMPORTANT_VIEW_IDS = [
+    ['Wi-Fi', 2], ['Searchcafe', 5], ['More options', 7]]
+_GOLDEN_ANCESTORS = [
+    [], [0], [1, 0], [1, 0], [1, 0], [0], [0], [0], [6, 0], [6, 0]]
+_GOLDEN_CHILDREN = [
+    [1, 5, 6, 7, 2, 3, 4, 8, 9], [2, 3, 4], [], [], [], [], [8, 9], [], [],
+    []]
+_GOLDEN_CLICKABLE = [
+    None, True, True, True, True, None, None, True, None, None]
+
+# sha256 prefixes of _traversal_outputs, also from the unmemoized traversal.
+_GOLDEN_DIGESTS = (
+    (300, 0, {}, 'b7728615703698f2'),
+    (800, 1, {'depth_first': True}, '03cb9dda80148b0f'),
+    (400, 2, {'num_windows': 3, 'include_keyboard': True},
+     '50b5db9b6bf7cfc1'),
+    (500, 3, {'hidden_subtree_fraction': 0.1, 'depth_first': True},
+     'c14225b738b3c956'),
+    (600, 4, {'max_children': 2, 'invisible_fraction': 0.2},
+     '93c1be770094b854'),
+)
+
+
+def _device_state(forest):
+    # The button grouping prints views that have no description.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return autodroid_repsentation.DeviceState(forest)
+
+
+def _select_window(state, window):
+    state.views = state.view_groups[window]
+    state.view_graph = state.graph_groups[window]
+
+
+def _guarded(fn):
+    # Some lookups mix unique ids and positions and fail on later windows;
+    # the failure is part of the expected output.
+    try:
+        return repr(fn())
+    except Exception as e:  # pylint: disable=broad-except
+        return 'error ' + type(e).__name__
+
+
+def _traversal_outputs(state):
+    outputs = [state.state_str]
+    for window, views in enumerate(state.view_groups):
+        _select_window(state, window)
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs.append(_guarded(lambda: state.get_described_actions(
+                remove_time_and_ip=True)))
+        outputs.append(_guarded(
+            lambda: [state.get_all_ancestors(v) for v in views]))
+        outputs.append(_guarded(lambda: [
+            state._get_self_ancestors_property(v, key)
+            for v in views for key in _FLAGS]))
+        outputs.append(_guarded(lambda: [
+            state._get_ancestor_id(v, key)
+            for v in views for key in _FLAGS]))
+        outputs.append(_guarded(
+            lambda: [state._extract_all_children(v.resource_id)
+                     for v in views]))
+        outputs.append(_guarded(
+            lambda: [state.view_scrollable(v) for v in views]))
+    return hashlib.sha256('\n'.join(outputs).encode()).hexdigest()[:16]
+
+
+def _small_forest():
+    forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+    window = forest.windows.add()
+    for unique_id, child_ids, fields in _NODES:
+        node = window.tree.nodes.add()
+        node.unique_id = unique_id
+        node.is_visible_to_user = True
+        node.child_ids.extend(child_ids)
+        for key, value in fields.items():
+            setattr(node, key, value)
+    return forest
+
+
+class DeviceStateGoldenTest(parameterized.TestCase):
+
+    def test_small_forest(self):
+        state = _device_state(_small_forest())
+        _select_window(state, 0)
+
+        self.assertEqual(state.state_str, _GOLDEN_STATE_STR)
+        described, _, _, important_view_ids = state.get_described_actions(
+            remove_time_and_ip=True)
+        self.assertEqual(described, _GOLDEN_DESCRIBED_WITHOUT_TIME)
+        self.assertEqual(important_view_ids, _GOLDEN_IMPORTANT_VIEW_IDS)
+        self.assertEqual(
+            [state.get_all_ancestors(v) for v in state.views],
+            _GOLDEN_ANCESTORS)
+        self.assertEqual(
+            [state._extract_all_children(v.resource_id)
+             for v in state.views],
+            _GOLDEN_CHILDREN)
+        self.assertEqual(
+            [state._get_self_ancestors_property(v, 'clickable')
+             for v in state.views],
+            _GOLDEN_CLICKABLE)
+
+    @parameterized.parameters(*_GOLDEN_DIGESTS)
+    def test_synthetic_forests(self, num_nodes, seed, kwargs, digest):
+        forest = synthetic_forest.generate_forest(
+            num_nodes, seed=seed, **kwargs)
+
+        self.assertEqual(_traversal_outputs(_device_state(forest)), digest)
+
+
+class ViewIndexTest(absltest.TestCase):
+
+    def test_returned_lists_are_copies(self):
+        state = _device_state(_small_forest())
+        _select_window(state, 0)
+
+        state._extract_all_children(1).append(99)
+        state.get_all_ancestors(state.views[2]).append(99)
+
+        self.assertEqual(state._extract_all_children(1), [2, 3, 4])
+        self.assertEqual(state.get_all_ancestors(state.views[2]), [1, 0])
+
+    def test_switching_windows_rebuilds_the_index(self):
+        forest = synthetic_forest.generate_forest(200, num_windows=2)
+        state = _device_state(forest)
+
+        _select_window(state, 0)
+        first = state._extract_all_children(0)
+        _select_window(state, 1)
+        second = state._extract_all_children(0)
+
+        self.assertNotEqual(first, second)
+        self.assertLen(second, len(state.view_groups[1]) - 1)
+
+    def test_deep_chain(self):
+        forest = synthetic_forest.generate_forest(
+            3000, max_children=1, invisible_fraction=0.0)
+        state = _device_state(forest)
+        _select_window(state, 0)
+
+        ancestors = state.get_all_ancestors(state.views[-1])
+
+        self.assertEqual(ancestors, list(range(2998, -1, -1)))
+
+    def test_parent_cycle_raises(self):
+        state = _device_state(_small_forest())
+        _select_window(state, 0)
+        state.views[0].parent = 2
+        state._cached_view_index = None
+
+        with self.assertRaises(RecursionError):
+            state.get_all_ancestors(state.views[2])
+
+
+if __name__ == '__main__':
+    absltest.main()
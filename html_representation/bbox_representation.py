@@ -1,6 +1,7 @@
 from typing import Any
 from android_env.proto.a11y import android_accessibility_forest_pb2
-from android_world.agents.m3a_utils import _logical_to_physical, get_color_for_group
+from android_world.agents.m3a_utils import get_color_for_group
+from android_world.env import geometry
 
 
 def turn_tree_to_group_bounding_boxes(
@@ -10,91 +11,78 @@ def turn_tree_to_group_bounding_boxes(
     forest: android_accessibility_forest_pb2.AndroidAccessibilityForest | Any,
     exclude_invisible_elements: bool = True,
 ) -> dict:
-    display_id_counter = 0
-    extra_attributes = {}
+    """
+    Computes a colored bounding box around the children of every node that has any.
+
+    The physical corners of all nodes of a window are computed at once with
+    android_world.env.geometry, and each subtree reports the extent of its boxes
+    so the groups are formed in a single pass.
+    """
     group_bounding_boxes = {}
     group_index = 0  # Counter to assign colors to each group
 
-    for window in forest.windows:
-        for node in window.tree.nodes:
-            node_display_id = None
-            if not node.child_ids or node.content_description or node.is_scrollable:
-                if exclude_invisible_elements and not node.is_visible_to_user:
-                    node_display_id = None
-                else:
-                    node_display_id = display_id_counter
-
-            extra_attributes[(window.id, node.unique_id)] = {
-                "display_id": node_display_id}
-
-            if node_display_id is not None:
-                display_id_counter += 1
-
-    def format_node(node, window_id):
-        """Recursively calculates bounding boxes for a node and its children."""
-        bounding_boxes = []
+    def format_node(node_index, window_id):
+        """Returns the (min x, min y, max x, max y) corners of the node's subtree."""
         nonlocal group_index
-
-        # Calculate bounding box for the node itself, if applicable
-        if node.bounds_in_screen:
-            upper_left_logical, lower_right_logical = _ui_element_logical_corner(
-                node, orientation
-            )
-            upper_left_physical = _logical_to_physical(
-                upper_left_logical,
-                logical_screen_size,
-                physical_frame_boundary,
-                orientation,
-            )
-            lower_right_physical = _logical_to_physical(
-                lower_right_logical,
-                logical_screen_size,
-                physical_frame_boundary,
-                orientation,
+        node = nodes[node_index]
+        # Box of the node itself, as (upper left x, y, lower right x, y).
+        extent = corners[node_index]
+
+        # Extent of all boxes below the node.
+        group_extent = None
+        for child_id in node.child_ids:
+            # Find the child node by ID within the same window
+            child_index = node_index_by_id.get(child_id)
+            if child_index is not None and child_id not in processed_nodes:
+                processed_nodes.add(child_id)
+                child_extent = format_node(child_index, window_id)
+                if group_extent is None:
+                    group_extent = child_extent
+                else:
+                    group_extent = (
+                        min(group_extent[0], child_extent[0]),
+                        min(group_extent[1], child_extent[1]),
+                        max(group_extent[2], child_extent[2]),
+                        max(group_extent[3], child_extent[3]),
+                    )
+
+        # Calculate the bounding box for the entire group of children
+        if group_extent is not None:
+            # Assign a color to this group based on group_index
+            group_color = get_color_for_group(group_index)
+            group_bounding_boxes[(window_id, node.unique_id)] = {
+                "bounding_box": (group_extent[:2], group_extent[2:]),
+                "color": group_color
+            }
+            group_index += 1  # Increment the group index for the next group
+            return (
+                min(extent[0], group_extent[0]),
+                min(extent[1], group_extent[1]),
+                max(extent[2], group_extent[2]),
+                max(extent[3], group_extent[3]),
             )
-            bounding_boxes.append((upper_left_physical, lower_right_physical))
-
-        # Recursively calculate bounding boxes for child nodes if they exist
-        child_bounding_boxes = []
-        if node.child_ids:
-            for child_id in node.child_ids:
-                # Find the child node by ID within the same window
-                child_node = next(
-                    (n for n in window.tree.nodes if n.unique_id == child_id), None)
-                if child_node and (window_id, child_id) not in processed_nodes:
-                    processed_nodes.add((window_id, child_id))
-                    _, child_boxes = format_node(child_node, window_id)
-                    # Add each child bounding box to the list for group calculation
-                    child_bounding_boxes.extend(child_boxes)
-
-            # Calculate the bounding box for the entire group of children
-            if child_bounding_boxes:
-                group_top_left = (
-                    min(box[0][0] for box in child_bounding_boxes),
-                    min(box[0][1] for box in child_bounding_boxes),
-                )
-                group_bottom_right = (
-                    max(box[1][0] for box in child_bounding_boxes),
-                    max(box[1][1] for box in child_bounding_boxes),
-                )
-                # Assign a color to this group based on group_index
-                group_color = get_color_for_group(group_index)
-                group_bounding_boxes[(window_id, node.unique_id)] = {
-                    "bounding_box": (group_top_left, group_bottom_right),
-                    "color": group_color
-                }
-                group_index += 1  # Increment the group index for the next group
-
-        return None, bounding_boxes + child_bounding_boxes
+        return tuple(extent)
 
     # Initialize the bounding box calculation
     for window in forest.windows:
+        nodes = window.tree.nodes
+        if not nodes:
+            continue
+        corners = geometry.physical_corners(
+            geometry.node_bounds(nodes),
+            logical_screen_size,
+            physical_frame_boundary,
+            orientation,
+        ).tolist()
+        node_index_by_id = {}
+        for index, node in enumerate(nodes):
+            node_index_by_id.setdefault(node.unique_id, index)
         processed_nodes = set()  # Track processed nodes to avoid duplication
 
-        for node in window.tree.nodes:
-            if (window.id, node.unique_id) not in processed_nodes:
-                processed_nodes.add((window.id, node.unique_id))
-                format_node(node, window.id)
+        for index, node in enumerate(nodes):
+            if node.unique_id not in processed_nodes:
+                processed_nodes.add(node.unique_id)
+                format_node(index, window.id)
 
     return group_bounding_boxes
 
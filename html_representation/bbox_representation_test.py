@@ -0,0 +1,83 @@
+"""Tests for bbox_representation."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents.m3a_utils import _logical_to_physical, get_color_for_group
+from android_world.utils import synthetic_forest
+from html_representation import bbox_representation
+
+
+def _reference_group_bounding_boxes(
+        orientation, logical_screen_size, physical_frame_boundary, forest):
+    """The original per-node implementation, kept to check the vectorized one."""
+    group_bounding_boxes = {}
+    group_index = 0
+
+    def format_node(node, window_id):
+        nonlocal group_index
+        upper_left, lower_right = bbox_representation._ui_element_logical_corner(
+            node, orientation)
+        bounding_boxes = [(
+            _logical_to_physical(upper_left, logical_screen_size,
+                                 physical_frame_boundary, orientation),
+            _logical_to_physical(lower_right, logical_screen_size,
+                                 physical_frame_boundary, orientation),
+        )]
+        child_bounding_boxes = []
+        for child_id in node.child_ids:
+            child_node = next(
+                (n for n in window.tree.nodes if n.unique_id == child_id), None)
+            if child_node and child_id not in processed_nodes:
+                processed_nodes.add(child_id)
+                child_bounding_boxes.extend(format_node(child_node, window_id))
+        if child_bounding_boxes:
+            group_bounding_boxes[(window_id, node.unique_id)] = {
+                "bounding_box": (
+                    (min(box[0][0] for box in child_bounding_boxes),
+                     min(box[0][1] for box in child_bounding_boxes)),
+                    (max(box[1][0] for box in child_bounding_boxes),
+                     max(box[1][1] for box in child_bounding_boxes)),
+                ),
+                "color": get_color_for_group(group_index),
+            }
+            group_index += 1
+        return bounding_boxes + child_bounding_boxes
+
+    for window in forest.windows:
+        processed_nodes = set()
+        for node in window.tree.nodes:
+            if node.unique_id not in processed_nodes:
+                processed_nodes.add(node.unique_id)
+                format_node(node, window.id)
+    return group_bounding_boxes
+
+
+class GroupBoundingBoxesTest(parameterized.TestCase):
+
+    @parameterized.product(
+        orientation=(0, 1, 2, 3),
+        logical_screen_size=((1080, 2400), (2400, 1080)),
+    )
+    def test_matches_reference(self, orientation, logical_screen_size):
+        forest = synthetic_forest.generate_forest(
+            400, seed=orientation, num_windows=2, include_keyboard=True)
+        physical_frame_boundary = (0, 60, 1080, 2340)
+
+        expected = _reference_group_bounding_boxes(
+            orientation, logical_screen_size, physical_frame_boundary, forest)
+        actual = bbox_representation.turn_tree_to_group_bounding_boxes(
+            orientation, logical_screen_size, physical_frame_boundary, forest)
+
+        self.assertNotEmpty(actual)
+        self.assertEqual(actual, expected)
+        self.assertEqual(list(actual), list(expected))
+
+    def test_invalid_orientation(self):
+        forest = synthetic_forest.generate_forest(5)
+        with self.assertRaises(ValueError):
+            bbox_representation.turn_tree_to_group_bounding_boxes(
+                5, (1080, 2400), (0, 0, 1080, 2400), forest)
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -14,7 +14,21 @@ def turn_tree_to_clean_html_input(
     forest: android_accessibility_forest_pb2.AndroidAccessibilityForest | Any,
     exclude_invisible_elements: bool = True,
 ) -> str:
+    """
+    Converts the forest into the cleaned, one-tag-per-line HTML.
+
+    The cleaned form is emitted straight from the tree. Screens whose text an
+    HTML parser would reinterpret (markup characters, entities or quotes) are
+    sent through the original generate-then-reparse path so that the output is
+    unchanged for every input.
+    """
+    html_desc = emit_clean_html(forest)
+    if html_desc is None:
+        html_desc = _clean_html_input_by_reparsing(forest)
+    return html_desc
 
+
+def _clean_html_input_by_reparsing(forest) -> str:
     html_desc = turn_tree_to_html_input(
         forest, exclude_invisible_elements=True)
     html_desc = aggregate_html_cleanup(html_desc)
@@ -24,6 +38,142 @@ def turn_tree_to_clean_html_input(
     return html_desc
 
 
+# One element as produced by node_to_text. Values holding characters that an
+# HTML parser would not keep verbatim do not match, and the caller falls back
+# to reparsing.
+_NODE_HTML_PATTERN = re.compile(
+    r"<(p|button|checkbox|input) id=(\d+)(?: checked=(True|False))?"
+    r"(?: text='([^'\"&<]*)')?>([^\"&<]*)</\1>")
+_BLANK_LINES_PATTERN = re.compile(r'\n\s*\n')
+
+
+def _collapse_blank_lines(value: str) -> str:
+    if '\n' in value:
+        return _BLANK_LINES_PATTERN.sub('\n', value)
+    return value
+
+
+def _clean_element_line(node_html: str, in_clickable: bool) -> Optional[str]:
+    """Renders a node_to_text element the way the reparsing cleanup prints it."""
+    match = _NODE_HTML_PATTERN.fullmatch(node_html)
+    if match is None:
+        return None
+    tag, element_id, checked, text, content = match.groups()
+    if tag == 'p' and in_clickable:
+        tag = 'button'
+    attrs = f' id="{element_id}"'
+    if checked is not None:
+        attrs += f' checked="{checked}"'
+    if text is not None:
+        attrs += f' text="{_collapse_blank_lines(text)}"'
+    return f'<{tag}{attrs}>{_collapse_blank_lines(content.strip())}</{tag}>'
+
+
+class _FallbackToReparse(Exception):
+    pass
+
+
+def emit_clean_html(
+    forest: android_accessibility_forest_pb2.AndroidAccessibilityForest | Any,
+    indent_spaces: int = 2,
+) -> Optional[str]:
+    """
+    Emits the output of turn_tree_to_clean_html_input without BeautifulSoup.
+
+    The traversal mirrors turn_tree_to_html_input, and the post-processing is
+    folded into it: empty <div>s are never produced, the text of an <input> is
+    kept inside the tag, and every element is written on its own line. Returns
+    None when an element holds text that the parser would rewrite.
+    """
+    extra_attributes = {}
+    display_id_counter = 0
+    windows = [window for window in forest.windows
+               if not (window.tree.nodes and 'com.google.android.inputmethod' in window.tree.nodes[0].package_name)]
+
+    for window in windows:
+        for node in window.tree.nodes:
+            node_display_id = None
+            if not node.child_ids or node.content_description or node.is_scrollable:
+                if not node.is_visible_to_user:
+                    node_display_id = None
+                elif node.package_name == "com.android.systemui" and (
+                    (node.view_id_resource_name and "notificationIcons" in node.view_id_resource_name)
+                    or (node.content_description and "notification" in node.content_description.lower())
+                ):
+                    node_display_id = None
+                else:
+                    node_display_id = display_id_counter
+            extra_attributes[(window.id, node.unique_id)] = node_display_id
+            if node_display_id is not None:
+                display_id_counter += 1
+
+    # A block is either one element line or a list of blocks printed as a <div>.
+    def format_node(node, window_id, node_dict, processed_nodes, in_clickable):
+        elements = []
+        element_id = extra_attributes.get((window_id, node.unique_id))
+        if element_id is not None:
+            node_html = node_to_text(node, element_id)
+            if node_html != '':
+                line = _clean_element_line(node_html, in_clickable)
+                if line is None:
+                    raise _FallbackToReparse()
+                elements.append(line)
+
+        child_elements = []
+        for child_id in node.child_ids:
+            child_node = node_dict.get(child_id)
+            if child_node is not None and child_id not in processed_nodes:
+                processed_nodes.add(child_id)
+                child_block = format_node(
+                    child_node, window_id, node_dict, processed_nodes,
+                    in_clickable or node.is_clickable)
+                if child_block:
+                    child_elements.append(child_block)
+        if len(child_elements) == 1:
+            elements.append(child_elements[0])
+        elif child_elements:
+            elements.append(child_elements)
+
+        if len(elements) == 1:
+            return elements[0]
+        return elements
+
+    blocks = []
+    try:
+        for window in windows:
+            node_dict = {}
+            for node in window.tree.nodes:
+                node_dict.setdefault(node.unique_id, node)
+            processed_nodes = set()
+            for node in window.tree.nodes:
+                if node.unique_id not in processed_nodes:
+                    processed_nodes.add(node.unique_id)
+                    block = format_node(
+                        node, window.id, node_dict, processed_nodes, False)
+                    if block:
+                        blocks.append(block)
+    except _FallbackToReparse:
+        return None
+
+    if not blocks:
+        return ''
+
+    lines = []
+
+    def write_block(block, level):
+        indent = " " * (indent_spaces * level)
+        if isinstance(block, str):
+            lines.append(indent + block)
+            return
+        lines.append(f"{indent}<div>")
+        for child_block in block:
+            write_block(child_block, level + 1)
+        lines.append(f"{indent}</div>")
+
+    write_block(blocks, 0)
+    return "\n".join(lines)
+
+
 def remove_empty_divs_keep_indent(html_str: str) -> str:
     """
     Removes empty <div> blocks from html_str but tries to preserve
@@ -0,0 +1,171 @@
+"""Tests for html_representation."""
+
+import random
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_env.proto.a11y import android_accessibility_forest_pb2
+from html_representation import html_representation
+
+
+def _add_window(forest, window_id, nodes, package_name='com.example.app'):
+    """Adds a window built from (unique_id, child_ids, fields) tuples."""
+    window = forest.windows.add()
+    window.id = window_id
+    for unique_id, child_ids, fields in nodes:
+        node = window.tree.nodes.add()
+        node.unique_id = unique_id
+        node.package_name = package_name
+        node.is_visible_to_user = True
+        node.child_ids.extend(child_ids)
+        for key, value in fields.items():
+            setattr(node, key, value)
+    return window
+
+
+def _single_window_forest(nodes, **kwargs):
+    forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+    _add_window(forest, 0, nodes, **kwargs)
+    return forest
+
+
+_PLAIN_TEXTS = (
+    '', 'OK', 'Settings', 'x > y', 'line one\n\n  line two', '  padded  ',
+    '\n', 'price $5', 'user@example.com', '#tag', 'naïve café', '日本語',
+    'tab\there', 'crlf\r\nend', 'slider', 'Media volume', '\xa0nbsp\xa0',
+)
+_MARKUP_TEXTS = _PLAIN_TEXTS + (
+    "Don't allow", 'Tom & Jerry', 'a < b', 'say "hi"', '</p>',
+)
+
+
+def _random_forest(rng, texts, num_windows=2, max_nodes=25):
+    forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+    for window_index in range(num_windows):
+        num_nodes = rng.randint(1, max_nodes)
+        nodes = []
+        for unique_id in range(num_nodes):
+            children = [
+                child for child in range(unique_id + 1, num_nodes)
+                if rng.random() < 2.0 / num_nodes]
+            # Occasionally reference a missing or repeated child.
+            if rng.random() < 0.05:
+                children.append(num_nodes + 3)
+            if children and rng.random() < 0.05:
+                children.append(children[0])
+            fields = {
+                'text': rng.choice(texts),
+                'content_description': rng.choice(texts),
+                'is_clickable': rng.random() < 0.3,
+                'is_scrollable': rng.random() < 0.1,
+                'is_checkable': rng.random() < 0.1,
+                'is_checked': rng.random() < 0.5,
+                'is_editable': rng.random() < 0.1,
+                'is_long_clickable': rng.random() < 0.05,
+                'is_visible_to_user': rng.random() < 0.9,
+                'view_id_resource_name': rng.choice(
+                    ('', 'com.example:id/slider', 'com.example:id/title')),
+            }
+            nodes.append((unique_id, children, fields))
+        package_name = rng.choice(
+            ('com.example.app', 'com.android.systemui',
+             'com.google.android.inputmethod.latin'))
+        _add_window(forest, window_index, nodes, package_name=package_name)
+    return forest
+
+
+class CleanHtmlParityTest(parameterized.TestCase):
+
+    def assertMatchesReparsing(self, forest):
+        expected = html_representation._clean_html_input_by_reparsing(forest)
+        self.assertEqual(
+            html_representation.turn_tree_to_clean_html_input(forest), expected)
+
+    def test_empty_forest(self):
+        forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+        self.assertEqual(html_representation.emit_clean_html(forest), '')
+        self.assertMatchesReparsing(forest)
+
+    def test_nested_layout(self):
+        forest = _single_window_forest([
+            (1, [2, 3], {}),
+            (2, [4, 5], {'is_clickable': True}),
+            (3, [], {'text': 'Footer'}),
+            (4, [], {'text': 'Wi-Fi'}),
+            (5, [], {'text': 'Connected'}),
+        ])
+        html = html_representation.emit_clean_html(forest)
+        self.assertEqual(
+            html,
+            '<div>\n'
+            '  <div>\n'
+            '    <div>\n'
+            '      <button id="1">Wi-Fi</button>\n'
+            '      <button id="2">Connected</button>\n'
+            '    </div>\n'
+            '    <p id="0">Footer</p>\n'
+            '  </div>\n'
+            '</div>')
+        self.assertMatchesReparsing(forest)
+
+    def test_input_and_checkbox(self):
+        forest = _single_window_forest([
+            (1, [2, 3, 4], {}),
+            (2, [], {'text': ' Search ', 'is_editable': True,
+                     'content_description': 'Query'}),
+            (3, [], {'is_editable': True}),
+            (4, [], {'text': 'Dark theme', 'is_checkable': True,
+                     'is_checked': True}),
+        ])
+        html = html_representation.emit_clean_html(forest)
+        self.assertIn('<input id="0" text="Query">Search</input>', html)
+        self.assertIn('<input id="1"></input>', html)
+        self.assertIn(
+            '<checkbox id="2" checked="True">Dark theme</checkbox>', html)
+        self.assertMatchesReparsing(forest)
+
+    def test_invisible_and_keyboard_windows_are_skipped(self):
+        forest = android_accessibility_forest_pb2.AndroidAccessibilityForest()
+        _add_window(forest, 0, [
+            (1, [], {'text': 'Hidden', 'is_visible_to_user': False}),
+            (2, [], {'text': 'Shown'}),
+        ])
+        _add_window(forest, 1, [(1, [], {'text': 'q'})],
+                    package_name='com.google.android.inputmethod.latin')
+        self.assertEqual(
+            html_representation.emit_clean_html(forest),
+            '<div>\n  <p id="0">Shown</p>\n</div>')
+        self.assertMatchesReparsing(forest)
+
+    @parameterized.parameters(
+        "Don't allow", 'Tom & Jerry', 'a < b', 'say "hi"', '&amp;')
+    def test_text_the_parser_rewrites_falls_back(self, text):
+        forest = _single_window_forest([(1, [], {'content_description': text,
+                                                 'text': text})])
+        self.assertIsNone(html_representation.emit_clean_html(forest))
+        self.assertMatchesReparsing(forest)
+
+    def test_blank_lines_are_collapsed(self):
+        forest = _single_window_forest([
+            (1, [], {'text': 'one\n\n\ntwo', 'content_description': 'a\n \nb'}),
+        ])
+        self.assertEqual(
+            html_representation.emit_clean_html(forest),
+            '<div>\n  <p id="0" text="a\nb">one\ntwo</p>\n</div>')
+        self.assertMatchesReparsing(forest)
+
+    @parameterized.parameters(_PLAIN_TEXTS, _MARKUP_TEXTS)
+    def test_random_forests(self, *texts):
+        rng = random.Random(0)
+        for _ in range(300):
+            self.assertMatchesReparsing(_random_forest(rng, texts))
+
+    def test_plain_text_screens_skip_reparsing(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            forest = _random_forest(rng, _PLAIN_TEXTS)
+            self.assertIsNotNone(html_representation.emit_clean_html(forest))
+
+
+if __name__ == '__main__':
+    absltest.main()
@@ -30,11 +30,15 @@ from absl import logging
 from android_world import checkpointer as checkpointer_lib
 from android_world import registry
 from android_world import suite_utils
+from android_world.agents import action_pruning
 from android_world.agents import base_agent, infer
 from android_world.agents import m3a
 from android_world.agents import vdroid
+from android_world.env import device_pool
 from android_world.env import env_launcher
 from android_world.env import interface
+from android_world.env import wait_conditions
+from android_world.utils import screenshot_writer
 import subprocess
 
 logging.set_verbosity(logging.WARNING)
@@ -45,6 +49,9 @@ os.environ['GRPC_TRACE'] = 'none'  # Disable tracing
 
 set_seed(42)
 
+# We use llama-3.1-8B-Instruct as the base model for V-Droid.
+_BASE_MODEL_NAME = "unsloth/Meta-Llama-3.1-8B-Instruct-bnb-4bit"
+
 
 def _find_adb_directory() -> str:
     """Returns the directory where adb is located."""
@@ -142,6 +149,21 @@ _LORA_DIR = flags.DEFINE_string('lora_dir', 'V-Droid-8B-0323', help='The path to
 _ITERATION = flags.DEFINE_string('iteration', '1', help='The search iteration.')
 _SUMMARY = flags.DEFINE_string('summary', 'llm', help='The summary mode.')
 _NUM_GPUS = flags.DEFINE_integer('num_gpus', 2, help='The num of gpu for parallel execution of verifier.')
+_PRUNING_RULES = flags.DEFINE_string(
+    'pruning_rules', None,
+    help='JSON file with the action pruning rules. Uses the default rules if unset; an empty list disables pruning.')
+_SCREENSHOT_FORMAT = flags.DEFINE_enum(
+    'screenshot_format', 'jpeg', ['jpeg', 'png', 'webp'],
+    help='Format of the screenshots VDroid saves.')
+_SCREENSHOT_QUALITY = flags.DEFINE_integer(
+    'screenshot_quality', None,
+    help='Encoder quality (1-100) of saved JPEG or WebP screenshots; the PIL default if unset.')
+_SCREENSHOT_DOWNSCALE = flags.DEFINE_integer(
+    'screenshot_downscale', 1, help='Factor saved screenshots are shrunk by.')
+_SCREENSHOT_DEDUP = flags.DEFINE_enum(
+    'screenshot_dedup', 'none', ['none', 'exact', 'perceptual'],
+    help='Hard-link saved screenshots to earlier identical (exact) or also nearly identical'
+    ' (perceptual) ones instead of writing them again.')
 
 
 _FIXED_TASK_SEED = flags.DEFINE_boolean(
@@ -161,21 +183,58 @@ _GRPC_PORT = flags.DEFINE_integer(
     'The port for the gprc communication.',
 )
 
+_NUM_DEVICES = flags.DEFINE_integer(
+    'num_devices',
+    1,
+    'Number of emulators to run tasks on in parallel. Device i is'
+    ' emulator-<console_port + 2i> with gRPC port grpc_port + i; each gets an'
+    ' agent of its own. VDroid agents share one set of num_gpus model actors.',
+)
+
+_PERSISTENT_ADB_SHELL = flags.DEFINE_boolean(
+    'persistent_adb_shell',
+    False,
+    'Whether to run adb shell commands through one long-lived `adb shell`'
+    ' process instead of starting adb for every command.',
+)
+
+_ACTION_WAITS = flags.DEFINE_enum(
+    'action_waits',
+    'condition',
+    ['condition', 'fixed'],
+    'How actions wait for the device, e.g. for a text field to get focus'
+    ' before typing: poll the condition, or sleep a fixed second.',
+)
+
 
 def _get_agent(
     env: interface.AsyncEnv,
     family: str | None = None,
+    actors: list | None = None,
 ) -> base_agent.EnvironmentInteractingAgent:
-    """Gets agent."""
+    """Gets agent.
+
+    Args:
+        env: The environment the agent acts on.
+        family: The suite family.
+        actors: VDroid model actors shared with the agents of other devices. If
+            None, the agent starts its own.
+    """
     print('Initializing agent...')
     agent = None
 
-    # We use llama-3.1-8B-Instruct as the base model for V-Droid.
-    base_model_name = "unsloth/Meta-Llama-3.1-8B-Instruct-bnb-4bit"
-
     if _AGENT_NAME.value == "VDroid":
-        agent = vdroid.VDroidAgent(env, base_model_name, adapter_dir=_LORA_DIR.value, llm_name=_LLM_NAME.value, service_name=_SERVICE_NAME.value, n_iters=int(
-            _ITERATION.value), family=family, summary_mode=_SUMMARY.value, num_actors=_NUM_GPUS.value)
+        pruning_rules = None
+        if _PRUNING_RULES.value:
+            pruning_rules = action_pruning.load_rules(_PRUNING_RULES.value)
+        agent = vdroid.VDroidAgent(env, _BASE_MODEL_NAME, adapter_dir=_LORA_DIR.value, llm_name=_LLM_NAME.value, service_name=_SERVICE_NAME.value, n_iters=int(
+            _ITERATION.value), family=family, summary_mode=_SUMMARY.value, num_actors=_NUM_GPUS.value,
+            pruning_rules=pruning_rules, actors=actors,
+            screenshot_config=screenshot_writer.WriterConfig(
+                image_format=_SCREENSHOT_FORMAT.value,
+                quality=_SCREENSHOT_QUALITY.value,
+                downscale=_SCREENSHOT_DOWNSCALE.value,
+                dedup=None if _SCREENSHOT_DEDUP.value == 'none' else _SCREENSHOT_DEDUP.value))
 
     if not agent:
         raise ValueError(f'Unknown agent: {_AGENT_NAME.value}')
@@ -201,21 +260,51 @@ def disable_key_board(emulator_id="emulator-5554"):
     return
 
 
-def _main() -> None:
-    """Runs eval suite and gets rewards back."""
+def _load_env(console_port: int, grpc_port: int, device_name: str) -> interface.AsyncEnv:
+    """Connects to and sets up the emulator."""
     env = env_launcher.load_and_setup_env(
-        console_port=_DEVICE_CONSOLE_PORT.value,
+        console_port=console_port,
         emulator_setup=_EMULATOR_SETUP.value,
         adb_path=_ADB_PATH.value,
-        grpc_port=_GRPC_PORT.value,
-        device_name=_DEVICE_NAME.value,
+        grpc_port=grpc_port,
+        device_name=device_name,
         family=_SUITE_FAMILY.value,
+        persistent_shell=_PERSISTENT_ADB_SHELL.value,
+        wait_config=wait_conditions.WaitConfig(mode=_ACTION_WAITS.value),
     )
 
     if _EMULATOR_SETUP.value:
-        disable_key_board(emulator_id=_DEVICE_NAME.value)
+        disable_key_board(emulator_id=device_name)
 
     env_launcher.verify_api_level(env)
+    return env
+
+
+def _make_agent(
+    env: interface.AsyncEnv,
+    actors: list | None = None,
+) -> base_agent.EnvironmentInteractingAgent:
+    agent = _get_agent(env, _SUITE_FAMILY.value, actors)
+
+    if _SUITE_FAMILY.value.startswith('miniwob'):
+        agent.transition_pause = _MINIWOB_TRANSITION_PAUSE
+    else:
+        agent.transition_pause = None
+    return agent
+
+
+def _main() -> None:
+    """Runs eval suite and gets rewards back."""
+    if _NUM_DEVICES.value > 1:
+        envs = {}
+        for i in range(_NUM_DEVICES.value):
+            console_port = _DEVICE_CONSOLE_PORT.value + 2 * i
+            device_name = f'emulator-{console_port}'
+            envs[device_name] = _load_env(
+                console_port, _GRPC_PORT.value + i, device_name)
+    else:
+        envs = {_DEVICE_NAME.value: _load_env(
+            _DEVICE_CONSOLE_PORT.value, _GRPC_PORT.value, _DEVICE_NAME.value)}
 
     n_task_combinations = _N_TASK_COMBINATIONS.value
     task_registry = registry.TaskRegistry()
@@ -229,14 +318,7 @@ def _main() -> None:
 
     suite.suite_family = _SUITE_FAMILY.value
 
-    agent = _get_agent(env, _SUITE_FAMILY.value)
-
-    if _SUITE_FAMILY.value.startswith('miniwob'):
-        agent.transition_pause = _MINIWOB_TRANSITION_PAUSE
-    else:
-        agent.transition_pause = None
-
-    checkpoint_dir = f"./saved/" + agent.name + \
+    checkpoint_dir = f"./saved/" + _AGENT_NAME.value + \
         '_' + _SAVE_NAME.value + '/task_info/'
 
     print(
@@ -244,19 +326,54 @@ def _main() -> None:
         f' {checkpoint_dir}'
     )
 
-    suite_utils.run(
-        suite,
-        agent,
-        checkpointer=checkpointer_lib.IncrementalCheckpointer(checkpoint_dir),
-        demo_mode=False,
-        save_name=_SAVE_NAME.value,
-    )
+    checkpointer = checkpointer_lib.IncrementalCheckpointer(checkpoint_dir)
+    if len(envs) > 1:
+        actors = None
+        if _AGENT_NAME.value == "VDroid":
+            # One set of model actors serves every device; starting a set per
+            # agent would need num_devices * num_gpus GPUs.
+            actors = vdroid.start_model_actors(
+                _SERVICE_NAME.value, _BASE_MODEL_NAME, _LORA_DIR.value,
+                _NUM_GPUS.value)
+        agents = []
+
+        def make_agent(env: interface.AsyncEnv) -> base_agent.EnvironmentInteractingAgent:
+            agents.append(_make_agent(env, actors))
+            return agents[-1]
+
+        pool = device_pool.DevicePool(envs)
+        try:
+            suite_utils.run_parallel(
+                suite,
+                pool,
+                make_agent,
+                checkpointer=checkpointer,
+                agent_name=_AGENT_NAME.value,
+                save_name=_SAVE_NAME.value,
+            )
+        finally:
+            for agent in agents:
+                agent.close()
+            pool.close()
+    else:
+        env, = envs.values()
+        agent = _make_agent(env)
+        try:
+            suite_utils.run(
+                suite,
+                agent,
+                checkpointer=checkpointer,
+                demo_mode=False,
+                save_name=_SAVE_NAME.value,
+            )
+        finally:
+            agent.close()
+        env.close()
 
     print(
         f'Finished running agent {_AGENT_NAME.value} on {_SUITE_FAMILY.value}'
         f' family. Wrote to {checkpoint_dir}.'
     )
-    env.close()
 
 
 def main(argv: Sequence[str]) -> None:
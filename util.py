@@ -552,7 +552,7 @@ if __name__ == "__main__":
                 continue
             
             node.node_info["ui_elements"]
-            action = json.loads(node.action)
+            action = json.loads(str(node.action))
             # pdb.set_trace()
             summary = generate_step_summary(action, node.parent.node_info["ui_elements"], node.node_info["ui_elements"], )
             print(summary)
\ No newline at end of file